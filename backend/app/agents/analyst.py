@@ -1,61 +1,173 @@
 import os
 import json
+import asyncio
+import time
 from typing import Dict, Any, List
 from dotenv import load_dotenv
 
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import SystemMessage, HumanMessage
-from langchain_core.prompts import ChatPromptTemplate
-from langchain_core.output_parsers import JsonOutputParser
 from pydantic import BaseModel, Field
 
-from app.tools.definitions import AVAILABLE_TOOLS
+from app.agents.prompt_builder import PromptBuilder, investigation_context
+from app.cache.ttl_cache import TTLCache, fingerprint
+from app.clients.batching import MicroBatcher
+from app.telemetry.metrics import LLM_ERRORS, record_llm_call
+from app.tools.definitions import AVAILABLE_TOOLS, ToolResult
 
 load_dotenv()
 
+# Seconds a tool result stays fresh. Status pages change slowly; error counts
+# move with the outage, so keep those short.
+TOOL_CACHE_TTLS = {
+    "check_external_status": 30.0,
+    "query_database": 5.0,
+}
+DIAGNOSIS_CACHE_TTL = 60.0
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("ANALYST_MAX_CONCURRENCY", "4"))
+ANALYST_MODEL = "gpt-4o"
+# Concurrent diagnoses (different issuers) are sent to the model as one call
+ANALYST_BATCH_MAX = int(os.getenv("ANALYST_BATCH_MAX", "4"))
+ANALYST_BATCH_WAIT_S = float(os.getenv("ANALYST_BATCH_WAIT_S", "0.05"))
+
+# Static prefix: identical on every call so provider-side prompt caching applies
+SYSTEM_PROMPT = """You are an expert Payment Support Analyst.
+Your job is to diagnose payment anomalies based on the provided alert and tool outputs.
+
+You have access to these tools (results provided):
+- check_external_status: Checks status pages of banks.
+- query_database: Checks historical error counts.
+
+Analyze the situation and provide a structured diagnosis.
+
+{format_instructions}"""
+
+BATCH_SYSTEM_PROMPT = """You are an expert Payment Support Analyst.
+Your job is to diagnose payment anomalies based on the provided alerts and tool outputs.
+Several independent incidents are given; diagnose each one on its own evidence only.
+
+You have access to these tools (results provided):
+- check_external_status: Checks status pages of banks.
+- query_database: Checks historical error counts.
+
+Return one diagnosis per incident, in the order given.
+
+{format_instructions}"""
+
 class AnalystInvestigation(BaseModel):
     root_cause: str = Field(description="The identified root cause of the anomaly")
     confidence: float = Field(description="Confidence score between 0.0 and 1.0")
     evidence: List[str] = Field(description="List of evidence supporting the diagnosis")
     recommended_action: str = Field(description="High level recommendation (e.g. 'Route Traffic')")
 
+class AnalystBatchInvestigation(BaseModel):
+    diagnoses: List[AnalystInvestigation] = Field(description="One diagnosis per incident, in the order given")
+
+def evidence_fingerprint(context: Dict[str, Any]) -> str:
+    """
+    What a diagnosis rests on, minus what changes on every refresh (sample
+    ids, timestamps, exact counts): the status page, which error codes are
+    showing, and the error total to within a factor of two.
+    """
+    errors = context.get("recent_errors") or {}
+    return fingerprint({
+        "status": context.get("external_status"),
+        "error_codes": sorted({str(row["error"]) for row in errors.get("rows", [])}),
+        "errors_bucket": int(errors.get("total_errors", 0)).bit_length(),  # 0, 1, 2-3, 4-7, ...
+    })
+
+
 class AnalystAgent:
-    def __init__(self):
+    def __init__(self, max_concurrency: int = None, timeout_s: float = None):
         self.api_key = os.getenv("OPENAI_API_KEY")
         self.tools = AVAILABLE_TOOLS
+        # Bound concurrent investigations and LLM round-trips so an alert storm
+        # can't pile up unbounded work behind the simulation loop.
+        self.max_concurrency = max_concurrency or DEFAULT_MAX_CONCURRENCY
+        self.timeout_s = timeout_s or float(os.getenv("ANALYST_TIMEOUT_S", "20"))
+        self._slots = asyncio.Semaphore(self.max_concurrency)
+        self.in_flight = 0
+        self.tool_cache = TTLCache(max_entries=512, max_bytes=1024 * 1024)
+        self.diagnosis_cache = TTLCache(max_entries=256, max_bytes=1024 * 1024, default_ttl=DIAGNOSIS_CACHE_TTL)
+        self.prompts = PromptBuilder(ANALYST_MODEL)
+        # Agents are built off the event loop: resolve tiktoken's encoding (possibly a download) now, not mid-alert
+        self.prompts.counter.count("")
         if self.api_key and self.api_key.startswith("sk-"):
-            self.llm = ChatOpenAI(model="gpt-4o", temperature=0)
+            # langchain/openai are imported here, not at module level: they
+            # dominate startup and mock mode never needs them
+            from langchain_openai import ChatOpenAI
+            from app.clients.http_pool import default_pool
+            # Shared keep-alive pool; it owns retries and the circuit breaker, so the SDK's are off
+            self.llm = ChatOpenAI(model=ANALYST_MODEL, temperature=0, max_retries=0,
+                                  http_async_client=default_pool().client)
             self._setup_chain()
         else:
             self.llm = None
             print("WARNING: AnalystAgent running in MOCK mode (No OpenAI Key)")
 
     def _setup_chain(self):
-        system_prompt = """You are an expert Payment Support Analyst. 
-        Your job is to diagnose payment anomalies based on the provided alert and tool outputs.
-        
-        You have access to these tools (results provided):
-        - check_external_status: Checks status pages of banks.
-        - query_database: Checks historical error counts.
+        from langchain_core.output_parsers import JsonOutputParser
+        from langchain_core.prompts import ChatPromptTemplate
 
-        Analyze the situation and provide a structured diagnosis.
-        """
-        
-        parser = JsonOutputParser(pydantic_object=AnalystInvestigation)
-        
+        # Parsers are applied after the call (not piped), so the message's token usage can be recorded
+        self.parser = JsonOutputParser(pydantic_object=AnalystInvestigation)
         prompt = ChatPromptTemplate.from_messages([
-            ("system", system_prompt),
-            ("human", "Alert: {alert}\nContext: {context}\n\nProvide diagnosis.\n{format_instructions}")
-        ])
+            ("system", SYSTEM_PROMPT),
+            ("human", "Alert: {alert}\n\nContext:\n{context}\n\nProvide diagnosis.")
+        ]).partial(format_instructions=self.parser.get_format_instructions())
+
+        self.chain = prompt | self.llm
+
+        self.batch_parser = JsonOutputParser(pydantic_object=AnalystBatchInvestigation)
+        batch_prompt = ChatPromptTemplate.from_messages([
+            ("system", BATCH_SYSTEM_PROMPT),
+            ("human", "{incidents}\n\nProvide one diagnosis per incident.")
+        ]).partial(format_instructions=self.batch_parser.get_format_instructions())
+        self.batch_chain = batch_prompt | self.llm
+        self.batcher = MicroBatcher(self._diagnose_batch, max_size=ANALYST_BATCH_MAX, max_wait_s=ANALYST_BATCH_WAIT_S)
 
-        self.chain = prompt | self.llm | parser
+    async def _call_model(self, chain, parser, inputs: Dict[str, str]) -> Any:
+        start = time.perf_counter()
+        try:
+            message = await chain.ainvoke(inputs)
+        except Exception:
+            LLM_ERRORS.labels("analyst").inc()
+            raise
+        record_llm_call("analyst", time.perf_counter() - start, message.usage_metadata)
+        return parser.parse(message.content)
+
+    async def _diagnose(self, request: Dict[str, str]) -> Dict[str, Any]:
+        return await self._call_model(self.chain, self.parser, request)
+
+    async def _diagnose_batch(self, requests: List[Dict[str, str]]) -> List[Dict[str, Any]]:
+        """One model call for every diagnosis requested within the batching window."""
+        if len(requests) == 1:
+            return [await self._diagnose(requests[0])]
+        incidents = "\n\n".join(f"### Incident {i}\nAlert: {r['alert']}\n\nContext:\n{r['context']}"
+                                 for i, r in enumerate(requests, 1))
+        result = await self._call_model(self.batch_chain, self.batch_parser, {"incidents": incidents})
+        diagnoses = result.get("diagnoses", []) if isinstance(result, dict) else []
+        if len(diagnoses) != len(requests):
+            # Model didn't keep the shape; answer each on its own rather than guess the mapping
+            return list(await asyncio.gather(*(self._diagnose(r) for r in requests)))
+        return diagnoses
 
     async def investigate(self, alert: str, issuer: str) -> Dict[str, Any]:
         """
         Main entry point. 
         1. Uses tools to gather context.
         2. Calls LLM (or mock) to diagnose.
+
+        Never blocks the event loop: tools run in worker threads and the chain
+        is awaited via ainvoke, at most `max_concurrency` at a time and each
+        bounded by `timeout_s`.
         """
+        async with self._slots:
+            self.in_flight += 1
+            try:
+                return await self._investigate(alert, issuer)
+            finally:
+                self.in_flight -= 1
+
+    async def _investigate(self, alert: str, issuer: str) -> Dict[str, Any]:
         print(f"ANALYST: Investigating {alert} on {issuer}...")
         
         # 1. Gather Context (Hardcoded tool usage for now to save latency/complexity)
@@ -63,30 +175,59 @@ class AnalystAgent:
         context = {}
         
         # Check external status for the issuer
-        status_tool = self.tools["check_external_status"]
-        status_result = status_tool.execute(issuer)
+        status_result = await self._run_tool("check_external_status", issuer)
         context["external_status"] = status_result.data
         
-        # Query DB for recent errors (Mock query)
-        db_tool = self.tools["query_database"]
-        db_result = db_tool.execute(f"SELECT * FROM errors WHERE issuer='{issuer}' AND time > NOW() - INTERVAL '5 min'")
+        # Query DB for recent errors (parameterized; last 5 minutes)
+        db_result = await self._run_tool("query_database", issuer, 5)
         context["recent_errors"] = db_result.data
         
-        # 2. Diagnose
+        # 2. Diagnose (same alert on the same evidence -> same diagnosis)
+        cache_key = (alert, issuer, evidence_fingerprint(context))
+        cached = self.diagnosis_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached)
+
         if self.llm:
             try:
-                result = self.chain.invoke({
-                    "alert": alert,
-                    "context": str(context),
-                    "format_instructions": JsonOutputParser(pydantic_object=AnalystInvestigation).get_format_instructions()
-                })
+                result = await asyncio.wait_for(self.batcher.submit({
+                    "alert": f"{alert} on {issuer}",
+                    "context": investigation_context(self.prompts, context),
+                }), timeout=self.timeout_s)
+                self.diagnosis_cache.set(cache_key, result)
                 return result
+            except asyncio.TimeoutError:
+                print(f"ANALYST ERROR: LLM timed out after {self.timeout_s}s")
+                return self._mock_diagnosis(alert, issuer, context)
             except Exception as e:
                 print(f"ANALYST ERROR: {e}")
                 return self._mock_diagnosis(alert, issuer, context)
         else:
             return self._mock_diagnosis(alert, issuer, context)
 
+    async def _run_tool(self, name: str, *args) -> ToolResult:
+        """Execute a tool (natively async, else in a worker thread), serving fresh results from the cache."""
+        key = (name,) + args
+        result = self.tool_cache.get(key)
+        if result is None:
+            tool = self.tools[name]
+            if hasattr(tool, "aexecute"):
+                result = await tool.aexecute(*args)
+            else:
+                result = await asyncio.to_thread(tool.execute, *args)
+            ttl = TOOL_CACHE_TTLS.get(name)
+            if result.success and ttl:
+                self.tool_cache.set(key, result.model_dump(), ttl=ttl)
+            return result
+        return ToolResult(**result)
+
+    def cache_stats(self) -> Dict[str, Any]:
+        return {
+            "tools": self.tool_cache.stats(),
+            "diagnoses": self.diagnosis_cache.stats(),
+            "batching": self.batcher.stats() if self.llm else None,
+        }
+
     def _mock_diagnosis(self, alert, issuer, context):
         """Fallback if no LLM"""
         is_degraded = context.get("external_status", {}).get("status") == "degraded"
@@ -1,30 +1,128 @@
-from langchain_openai import ChatOpenAI
-from langchain_core.messages import HumanMessage, SystemMessage
+import asyncio
+import os
+import time
+from collections import deque
+from typing import Any, AsyncGenerator, Dict, Optional, Sequence
+
+import numpy as np
+
+from app.agents.prompt_builder import PromptBuilder, chat_context
+from app.telemetry.metrics import LLM_ERRORS, record_llm_call
+
+ASSISTANT_MODEL = "gpt-3.5-turbo"
+
+OFFLINE_REPLY = "Neural Core offline: no OPENAI_API_KEY configured. Check /incidents and /events directly."
+
+# Static prefix: identical on every call so provider-side prompt caching applies
+SYSTEM_PROMPT = """You are the 'Sentinel Assistant', an AI embedded in the PaySentinel Payment Operations Center.
+Your job is to answer the user's questions about the payment system's status, recent alerts, and performance.
+
+You will be provided with a 'Context' containing open incidents (each rolls up many Watchdog alerts) and recent agent events.
+
+Guidelines:
+- Be concise and professional, like a military or sci-fi operator.
+- If everything is normal, report all systems nominal.
+- If there were alerts, summarize what happened and what the agents (Watchdog, Analyst, Manager) did.
+- Do not hallucinate events that are not in the context."""
 
 class AssistantAgent:
-    def __init__(self):
-        self.llm = ChatOpenAI(model="gpt-3.5-turbo", temperature=0.7)
-        self.system_prompt = """
-        You are the 'Sentinel Assistant', an AI embedded in the PaySentinel Payment Operations Center.
-        Your job is to answer the user's questions about the payment system's status, recent alerts, and performance.
-        
-        You will be provided with a 'Context' containing recent logs and metrics.
-        
-        Guidelines:
-        - Be concise and professional, like a military or sci-fi operator.
-        - If everything is normal, report all systems nominal.
-        - If there were alerts, summarize what happened and what the agents (Watchdog, Analyst, Manager) did.
-        - Do not hallucinate events that are not in the context.
-        """
+    def __init__(self, max_sessions: int = None):
+        if os.getenv("OPENAI_API_KEY"):
+            from langchain_openai import ChatOpenAI  # heavy; only once an Assistant is actually needed
+            from app.clients.http_pool import default_pool
+            # stream_usage: the last streamed chunk carries token counts for /metrics
+            self.llm = ChatOpenAI(model=ASSISTANT_MODEL, temperature=0.7, max_retries=0, stream_usage=True,
+                                  http_async_client=default_pool().client)
+        else:
+            self.llm = None
+            print("WARNING: AssistantAgent running in OFFLINE mode (No OpenAI Key)")
+        self.system_prompt = SYSTEM_PROMPT
+        self.prompts = PromptBuilder(ASSISTANT_MODEL)
+        # Agents are built off the event loop: resolve tiktoken's encoding (possibly a download) now, not mid-alert
+        self.prompts.counter.count("")
+        # Chat sessions (plain or streaming) allowed at once; the rest get a 429
+        # so chat load can't crowd the detection pipeline off the event loop.
+        self.max_sessions = max_sessions or int(os.getenv("CHAT_MAX_SESSIONS", "4"))
+        self.sessions = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.ttft_ms: deque = deque(maxlen=512)  # time to first token of recent streams
 
-    async def chat(self, user_query: str, system_context: str) -> str:
-        messages = [
+    def open_session(self) -> bool:
+        if self.sessions >= self.max_sessions:
+            self.rejected += 1
+            return False
+        self.sessions += 1
+        return True
+
+    def close_session(self):
+        self.sessions -= 1
+
+    def build_context(self, user_query: str, events: Sequence[Dict[str, Any]],
+                      incidents: Optional[Dict[str, Any]] = None) -> str:
+        """Incident rollups plus the highest-ranked events that fit the model's token budget."""
+        return chat_context(self.prompts, user_query, events, incidents)
+
+    def _messages(self, user_query: str, system_context: str):
+        from langchain_core.messages import HumanMessage, SystemMessage
+
+        return [
             SystemMessage(content=self.system_prompt),
             HumanMessage(content=f"Context:\n{system_context}\n\nUser Question: {user_query}")
         ]
-        
+
+    async def stream_chat(self, user_query: str, system_context: str) -> AsyncGenerator[str, None]:
+        """
+        Yield the reply as the model produces it. Cancelling the consumer (e.g.
+        the client disconnecting) closes the model stream, which aborts the
+        upstream request instead of generating tokens nobody reads.
+        """
+        if self.llm is None:
+            yield OFFLINE_REPLY
+            return
+        start = time.perf_counter()
+        stream = self.llm.astream(self._messages(user_query, system_context))
+        first = True
+        usage = None
+        try:
+            async for chunk in stream:
+                usage = chunk.usage_metadata or usage
+                if not chunk.content:
+                    continue
+                if first:
+                    self.ttft_ms.append((time.perf_counter() - start) * 1000)
+                    first = False
+                yield chunk.content
+        except (asyncio.CancelledError, GeneratorExit):
+            self.cancelled += 1
+            raise
+        except Exception as e:
+            LLM_ERRORS.labels("assistant").inc()
+            yield f"Error contacting Neural Core: {str(e)}"
+        else:
+            record_llm_call("assistant", time.perf_counter() - start, usage)
+        finally:
+            await stream.aclose()
+
+    def chat_stats(self) -> Dict[str, Any]:
+        ttft = np.array(self.ttft_ms)
+        return {
+            "sessions": self.sessions,
+            "max_sessions": self.max_sessions,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "ttft_ms": {f"p{q}": round(float(np.percentile(ttft, q)), 1) for q in (50, 95, 99)} if len(ttft) else None,
+        }
+
+    async def chat(self, user_query: str, system_context: str) -> str:
+        if self.llm is None:
+            return OFFLINE_REPLY
+        messages = self._messages(user_query, system_context)
+        start = time.perf_counter()
         try:
             response = await self.llm.ainvoke(messages)
-            return response.content
         except Exception as e:
+            LLM_ERRORS.labels("assistant").inc()
             return f"Error contacting Neural Core: {str(e)}"
+        record_llm_call("assistant", time.perf_counter() - start, response.usage_metadata)
+        return response.content
@@ -1,14 +1,26 @@
 import os
 from typing import Dict, Any
 from dotenv import load_dotenv
-from app.tools.definitions import AVAILABLE_TOOLS
+from app.tools.definitions import AVAILABLE_TOOLS, ToolResult
 
 load_dotenv()
 
+# Processor the Manager diverts a failing issuer's traffic to
+FALLBACK_PROCESSOR = os.getenv("FALLBACK_PROCESSOR", "ADYEN")
+# Cluster mode: the same reroute isn't repeated (by any node) within this long, unless rolled back
+ACTION_TTL_S = float(os.getenv("MANAGER_ACTION_TTL_S", "600"))
+
+
+def route_key(issuer: str) -> str:
+    """Idempotency key of the Manager's reroute for an issuer."""
+    return f"route_traffic:{issuer}:{FALLBACK_PROCESSOR}"
+
 class ManagerAgent:
-    def __init__(self):
+    def __init__(self, coordinator=None):
         self.tools = AVAILABLE_TOOLS
         self.decision_history = []
+        # ClusterNode in cluster mode: actions go through its idempotency keys
+        self.coordinator = coordinator
     
     async def decide_and_act(self, investigation: Dict[str, Any], issuer: str) -> Dict[str, Any]:
         """
@@ -20,15 +32,12 @@ class ManagerAgent:
         confidence = investigation.get("confidence", 0.0)
         root_cause = investigation.get("root_cause")
         
-        print(f"DEBUG: Manager Decision - Action: {action}, Confidence: {confidence}, Issuer: {issuer}")
-
         decision_log = {
             "decision": "MONITOR",
             "reason": "Confidence too low or no action needed.",
             "tool_output": None
         }
 
-        # Policy Check: Only act if confidence > 0.8
         # Policy Check: Only act if confidence > 0.8
         if confidence > 0.8:
             if action and "route traffic" in action.lower().replace("_", " "):
@@ -36,13 +45,33 @@ class ManagerAgent:
                 
                 # Execute Tool
                 tool = self.tools["route_traffic"]
-                # Logic: Route 50% away from failing issuer to STRIPE (fallback)
-                result = tool.execute(percentage=50, destination="STRIPE", target_issuer=issuer)
+                # Logic: Route 50% away from failing issuer to the fallback processor
+                async def act():
+                    return (await tool.aexecute(percentage=50, destination=FALLBACK_PROCESSOR,
+                                                target_issuer=issuer)).model_dump()
+
+                if self.coordinator is None:
+                    result = ToolResult(**await act())
+                else:
+                    ran, outcome = await self.coordinator.run_once(route_key(issuer), ACTION_TTL_S, act)
+                    if not ran:
+                        print(f"MANAGER: Routing for {issuer} already applied by {(outcome or {}).get('node')}. Skipping.")
+                        decision_log["reason"] = f"Routing for {issuer} already applied in the cluster"
+                        return decision_log
+                    result = ToolResult(**outcome)
+
+                if not result.success:
+                    # Nothing changed (e.g. the load balancer refused): nothing to roll back, and the next alert may retry
+                    print(f"MANAGER: Routing change for {issuer} failed: {result.message}")
+                    if self.coordinator is not None:
+                        await self.coordinator.forget(route_key(issuer))
+                    return {"decision": "ROUTE_FAILED", "reason": result.message, "tool_output": result.model_dump(),
+                            "issuer": issuer}
                 
                 decision_log = {
                     "decision": "ROUTED_TRAFFIC",
                     "reason": f"Mitigating {root_cause}",
-                    "tool_output": result.dict(),
+                    "tool_output": result.model_dump(),
                     "issuer": issuer
                 }
                 
@@ -52,18 +81,21 @@ class ManagerAgent:
 
         return decision_log
 
-    def rollback_last_action(self) -> Dict[str, Any]:
+    async def rollback_last_action(self) -> Dict[str, Any]:
         if not self.decision_history:
             return {"status": "failed", "message": "No actions to rollback"}
         
         last_action = self.decision_history.pop()
         
         if last_action["decision"] == "ROUTED_TRAFFIC":
-            # Reverse the routing (Route 0% / Reset)
+            # Restore the issuer's routing as it was before the change (by routing table version)
             tool = self.tools["route_traffic"]
             issuer = last_action["issuer"]
-            # In a real system, we'd restore previous state. Here we just reset to 0 diversion.
-            tool.execute(percentage=0, destination="ORIGINAL", target_issuer=issuer)
-            return {"status": "success", "message": f"Rolled back routing for {issuer}", "original_action": last_action}
+            previous = ((last_action.get("tool_output") or {}).get("data") or {}).get("previous_version")
+            result = await tool.arollback(issuer, previous)
+            if self.coordinator is not None:
+                await self.coordinator.forget(route_key(issuer))
+            return {"status": "success", "message": f"Rolled back routing for {issuer} to v{previous}",
+                    "original_action": last_action, "tool_output": result.model_dump()}
             
         return {"status": "failed", "message": "Unknown action type"}
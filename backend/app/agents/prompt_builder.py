@@ -0,0 +1,212 @@
+import math
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to a character estimate
+    tiktoken = None
+
+# Tokens of context we allow per model, leaving the rest of the window for the
+# static prefix and the reply. Override with PROMPT_BUDGET_<MODEL> (e.g.
+# PROMPT_BUDGET_GPT_4O=6000).
+MODEL_BUDGETS = {
+    "gpt-4o": 1500,
+    "gpt-3.5-turbo": 800,
+}
+DEFAULT_BUDGET = 800
+CHARS_PER_TOKEN = 3.5  # conservative for log lines full of ids and numbers
+
+# Watchdog lines that IncidentManager already rolls up into one incident line
+_ALERT_LINE = re.compile(r"^ALERT: (\S+) on (\S+) \((inc_\d+)")
+_LEVEL_SCORE = {"danger": 30.0, "warning": 20.0, "info": 10.0}
+_SEVERITY_SCORE = {"low": 0.0, "medium": 10.0, "high": 20.0, "critical": 30.0}
+
+
+class TokenCounter:
+    """
+    Token counts for one model: tiktoken when its encoding can be loaded,
+    otherwise ~3.5 chars/token. The encoding is resolved on first use since
+    tiktoken may need to download it.
+    """
+
+    def __init__(self, model: str):
+        self.model = model
+        self._encoding = None
+        self._resolved = tiktoken is None
+
+    @property
+    def exact(self) -> bool:
+        self._resolve()
+        return self._encoding is not None
+
+    def _resolve(self):
+        if not self._resolved:
+            self._resolved = True
+            try:
+                self._encoding = tiktoken.encoding_for_model(self.model)
+            except Exception:  # unknown model or the BPE file can't be fetched (offline)
+                print(f"PROMPTS: no tiktoken encoding for {self.model}, estimating tokens from length")
+
+    def count(self, text: str) -> int:
+        self._resolve()
+        if self._encoding is not None:
+            return len(self._encoding.encode(text))
+        return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def budget_for(model: str) -> int:
+    env = "PROMPT_BUDGET_" + re.sub(r"[^A-Z0-9]", "_", model.upper())
+    return int(os.getenv(env, MODEL_BUDGETS.get(model, DEFAULT_BUDGET)))
+
+
+@dataclass
+class ContextItem:
+    section: str
+    text: str
+    score: float  # higher is kept first when the budget runs out
+    order: float  # position within its section once selected (e.g. timestamp)
+
+
+class PromptBuilder:
+    """
+    Fits ranked context lines into a model's token budget.
+
+    Items are taken best-score first until the budget is spent, then rendered
+    grouped by section (in the order sections were given) and by `order`
+    within each, with a note of how many lines were left out. The static part
+    of a prompt (system prompt, format instructions) stays out of here so it
+    is byte-identical across calls and the provider's prompt cache can reuse it.
+    """
+
+    def __init__(self, model: str, budget_tokens: Optional[int] = None, counter: Optional[TokenCounter] = None):
+        self.model = model
+        self.budget_tokens = budget_tokens or budget_for(model)
+        self.counter = counter or TokenCounter(model)
+        self.last_tokens = 0
+        self.last_dropped = 0
+
+    def render(self, items: Sequence[ContextItem], sections: Sequence[str], empty: str = "") -> str:
+        chosen: Dict[str, List[ContextItem]] = {section: [] for section in sections}
+        used = sum(self.counter.count(f"{section}:\n") for section in sections)
+        dropped = 0
+        for item in sorted(items, key=lambda i: -i.score):
+            cost = self.counter.count(item.text) + 1  # newline
+            if used + cost > self.budget_tokens:
+                dropped += 1
+                continue
+            chosen[item.section].append(item)
+            used += cost
+
+        blocks = []
+        for section in sections:
+            if chosen[section]:
+                lines = [item.text for item in sorted(chosen[section], key=lambda i: i.order)]
+                blocks.append(f"{section}:\n" + "\n".join(lines))
+        if dropped:
+            blocks.append(f"({dropped} lower-priority lines omitted)")
+        text = "\n\n".join(blocks) or empty
+        self.last_tokens = self.counter.count(text)
+        self.last_dropped = dropped
+        return text
+
+
+# -- /chat context ------------------------------------------------------------
+
+def _clock(ts: float) -> str:
+    return datetime.fromtimestamp(ts).strftime("%H:%M:%S")
+
+
+def incident_items(snapshot: Dict[str, Any], mentioned: Iterable[str] = ()) -> List[ContextItem]:
+    """One line per incident (open ones first, by severity) in place of its stream of alert lines."""
+    mentioned = set(mentioned)
+    items = []
+    for status, base in (("open", 100.0), ("resolved", 40.0)):
+        for rank, inc in enumerate(snapshot.get(status, [])):
+            text = (f"{inc['incident_id']} {inc['issuer']} {inc['alert_type']}: {inc['severity']}, {status}, "
+                    f"{inc['alert_count']} alerts since {inc['opened_at'][11:19]}, {inc['investigations']} investigations")
+            score = base + _SEVERITY_SCORE.get(inc["severity"], 0.0) - rank * 0.01
+            if inc["issuer"] in mentioned:
+                score += 50.0
+            items.append(ContextItem("Incidents", text, score, -score))
+    return items
+
+
+def event_items(events: Sequence[Dict[str, Any]], mentioned: Iterable[str] = (),
+                skip_incident_alerts: bool = True) -> List[ContextItem]:
+    """
+    Agent/system events ranked by level, issuer mentions and recency.
+    Repeats of the same message collapse into one line with a count, and
+    Watchdog alert lines that belong to an incident are dropped (the incident
+    line covers them) except the first of each, which dates the outage.
+    """
+    mentioned = set(mentioned)
+    seen_incidents = set()
+    groups: Dict[tuple, List[Dict[str, Any]]] = {}
+    for event in events:
+        alert = _ALERT_LINE.match(event["message"]) if event["agent"] == "Watchdog" else None
+        if alert and skip_incident_alerts:
+            if alert.group(3) in seen_incidents:
+                continue
+            seen_incidents.add(alert.group(3))
+        groups.setdefault((event["agent"], event["level"], event["message"]), []).append(event)
+
+    items = []
+    newest = events[-1]["seq"] if events else 0
+    for (agent, level, message), repeats in groups.items():
+        last = repeats[-1]
+        score = _LEVEL_SCORE.get(level, 0.0) - (newest - last["seq"]) * 0.05
+        if last.get("issuer") in mentioned:
+            score += 15.0
+        if len(repeats) == 1:
+            text = f"[{_clock(last['ts'])}] {agent}: {message}"
+        else:
+            text = f"[{_clock(repeats[0]['ts'])}-{_clock(last['ts'])}] {agent}: {message} (x{len(repeats)})"
+        items.append(ContextItem("Recent events", text, score, last["seq"]))
+    return items
+
+
+def chat_context(builder: PromptBuilder, query: str, events: Sequence[Dict[str, Any]],
+                 incidents: Optional[Dict[str, Any]] = None) -> str:
+    upper = query.upper()
+    mentioned = {e["issuer"] for e in events if e.get("issuer") and e["issuer"].upper() in upper}
+    items = event_items(events, mentioned, skip_incident_alerts=incidents is not None)
+    if incidents is not None:
+        items += incident_items(incidents, mentioned)
+    return builder.render(items, ("Incidents", "Recent events"), empty="No recent significant events.")
+
+
+# -- Analyst context ----------------------------------------------------------
+
+def investigation_context(builder: PromptBuilder, context: Dict[str, Any]) -> str:
+    """
+    Tool outputs as compact lines instead of str() of the raw dicts: error
+    counts rolled up per code (with a per-minute trend), then as many sample
+    failures as the budget allows.
+    """
+    items = []
+    status = context.get("external_status") or {}
+    if status:
+        items.append(ContextItem("External status", f"{status.get('status')}: {status.get('details')}", 100.0, 0))
+
+    errors = context.get("recent_errors") or {}
+    if errors:
+        items.append(ContextItem(
+            "Recent errors",
+            f"{errors.get('total_errors', 0)} errors for {errors.get('issuer')} in the last {errors.get('window_minutes')} min",
+            90.0, 0))
+        by_code: Dict[str, Dict[str, int]] = {}
+        for row in errors.get("rows", []):
+            by_code.setdefault(row["error"], {})[row["timestamp"]] = row["count"]
+        ranked = sorted(by_code.items(), key=lambda kv: -sum(kv[1].values()))
+        for rank, (code, minutes) in enumerate(ranked):
+            # Ordered by the full ISO timestamp, labelled HH:MM
+            trend = ", ".join(f"{minute[11:16]} {count}" for minute, count in sorted(minutes.items()))
+            items.append(ContextItem("Recent errors", f"{code}: {sum(minutes.values())} ({trend})", 80.0 - rank, 1 + rank))
+        for i, tx in enumerate(errors.get("recent_failures", [])):
+            text = f"{tx['timestamp'][11:19]} {tx['error']} {tx['latency_ms']}ms {tx['region']}"
+            items.append(ContextItem("Sample failures", text, 20.0 - i * 0.1, i))
+    return builder.render(items, ("External status", "Recent errors", "Sample failures"), empty="No tool output.")
@@ -0,0 +1,57 @@
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict
+
+
+class AgentRegistry:
+    """
+    Agents built on first use instead of at import time.
+
+    The LLM-backed agents pull in langchain/openai and construct their
+    clients when created, which is most of the process's startup time. Each
+    is registered here with a factory and built the first time something asks
+    for it; `aget` builds it in a worker thread so the event loop (and
+    /health) keeps running meanwhile, and concurrent callers share one build.
+    """
+
+    def __init__(self):
+        self._factories: Dict[str, Callable[[], Any]] = {}
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self.build_ms: Dict[str, float] = {}
+
+    def register(self, name: str, factory: Callable[[], Any]):
+        self._factories[name] = factory
+
+    def get(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is None:
+            with self._lock:
+                instance = self._instances.get(name)
+                if instance is None:
+                    start = time.perf_counter()
+                    instance = self._instances[name] = self._factories[name]()
+                    self.build_ms[name] = round((time.perf_counter() - start) * 1000, 1)
+        return instance
+
+    async def aget(self, name: str) -> Any:
+        instance = self._instances.get(name)
+        if instance is None:
+            instance = await asyncio.to_thread(self.get, name)
+        return instance
+
+    def loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    async def warm(self, *names: str):
+        """Build agents ahead of their first use, one at a time, off the event loop."""
+        for name in names or list(self._factories):
+            try:
+                await self.aget(name)
+            except Exception as e:
+                print(f"AGENT WARMUP ERROR ({name}): {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {name: {"loaded": name in self._instances, "build_ms": self.build_ms.get(name)}
+                for name in self._factories}
@@ -0,0 +1,163 @@
+import asyncio
+import json
+import multiprocessing
+import threading
+import zlib
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from app.agents.watchdog import WatchdogAgent
+from app.analytics.batch import ALERT_LABELS
+from app.analytics.rolling import WindowSummary
+from app.models import transaction_batch as batch_codes
+from app.models.transaction import TransactionSchema
+from app.models.transaction_batch import TransactionBatch
+
+# Message kinds (first byte of every frame sent to a shard)
+BATCH = b"B"
+TAILS = b"T"
+STATS = b"S"
+WINDOWS = b"W"
+STOP = b"Q"
+
+
+def shard_for(issuer: str, shards: int) -> int:
+    """Stable issuer -> shard mapping (same in every process and across restarts)."""
+    return zlib.crc32(issuer.encode()) % shards
+
+
+def _shard_worker(conn, watchdog_kwargs: Dict[str, Any]):
+    """Shard process: owns the WatchdogAgent state for its issuers and answers over the pipe."""
+    watchdog = WatchdogAgent(**watchdog_kwargs)
+    rows = alerts = 0
+    while True:
+        message = conn.recv_bytes()
+        kind, body = message[:1], memoryview(message)[1:]
+        if kind == BATCH:
+            batch = TransactionBatch.from_bytes(body)
+            codes = watchdog.process_batch_codes(batch)
+            rows += len(batch)
+            alerts += int(np.count_nonzero(codes))
+            conn.send_bytes(codes.tobytes())
+        elif kind == TAILS:
+            request = json.loads(bytes(body))
+            conn.send_bytes(json.dumps(watchdog.tail_latency(request["issuer"], request["include_bins"])).encode())
+        elif kind == WINDOWS:
+            conn.send_bytes(json.dumps({issuer: summary.to_list()
+                                        for issuer, summary in watchdog.summaries().items()}).encode())
+        elif kind == STATS:
+            conn.send_bytes(json.dumps({"rows": rows, "alerts": alerts, "issuers": sorted(watchdog.windows)}).encode())
+        else:
+            conn.close()
+            return
+
+
+class ShardedWatchdog:
+    """
+    WatchdogAgent spread over worker processes, one core each.
+
+    Transactions are hash-partitioned by issuer, and every detection rule is
+    per-issuer, so each shard sees exactly the rows (in order) that the
+    single-process Watchdog would for its issuers and labels come back
+    identical. Batches travel as TransactionBatch bytes over a pipe per
+    shard; all shards are sent their slice before any reply is read, so the
+    shards work in parallel. Label codes (one byte per row) come back and
+    are scattered into place.
+    """
+
+    def __init__(self, shards: int, **watchdog_kwargs):
+        self.shards = shards
+        self.watchdog_kwargs = watchdog_kwargs
+        self._conns: List[Any] = []
+        self._procs: List[multiprocessing.Process] = []
+        self._shard_of = np.zeros(0, np.int32)  # issuer code -> shard
+        self._lock = threading.Lock()  # one request/reply exchange on the pipes at a time
+
+    def start(self):
+        if self._procs:
+            return
+        # spawn, not fork: the parent has the event loop and writer threads running
+        ctx = multiprocessing.get_context("spawn")
+        for shard in range(self.shards):
+            parent, child = ctx.Pipe()
+            proc = ctx.Process(target=_shard_worker, args=(child, self.watchdog_kwargs),
+                               name=f"watchdog-shard-{shard}", daemon=True)
+            proc.start()
+            child.close()
+            self._conns.append(parent)
+            self._procs.append(proc)
+
+    def close(self):
+        with self._lock:  # let an in-flight batch finish first
+            for conn in self._conns:
+                conn.send_bytes(STOP)
+            for proc in self._procs:
+                proc.join(timeout=5)
+            for conn in self._conns:
+                conn.close()
+            self._conns, self._procs = [], []
+
+    def _routes(self, issuer_codes: np.ndarray) -> np.ndarray:
+        names = batch_codes.ISSUERS.names
+        if len(self._shard_of) < len(names):
+            self._shard_of = np.array([shard_for(name, self.shards) for name in names], np.int32)
+        return self._shard_of[issuer_codes]
+
+    def process_batch_codes(self, transactions: Union[TransactionBatch, Sequence[TransactionSchema]]) -> np.ndarray:
+        """Same result as WatchdogAgent.process_batch_codes, computed across the shards."""
+        batch = transactions if isinstance(transactions, TransactionBatch) else TransactionBatch.from_schemas(transactions)
+        codes = np.zeros(len(batch), np.int8)
+        if not len(batch):
+            return codes
+        self.start()
+        routes = self._routes(batch.issuer)
+        order = np.argsort(routes, kind="stable")
+        bounds = np.searchsorted(routes[order], np.arange(self.shards + 1))
+
+        with self._lock:
+            sent = []
+            for shard in range(self.shards):
+                rows = order[bounds[shard]:bounds[shard + 1]]
+                if len(rows):
+                    self._conns[shard].send_bytes(BATCH + batch[rows].to_bytes())
+                    sent.append((shard, rows))
+            for shard, rows in sent:
+                codes[rows] = np.frombuffer(self._conns[shard].recv_bytes(), np.int8)
+        return codes
+
+    def process_batch(self, transactions: Union[TransactionBatch, Sequence[TransactionSchema]]) -> List[Optional[str]]:
+        return ALERT_LABELS[self.process_batch_codes(transactions)].tolist()
+
+    async def process_batch_async(self, batch: TransactionBatch) -> np.ndarray:
+        """process_batch_codes with the pipe round trip off the event loop."""
+        return await asyncio.to_thread(self.process_batch_codes, batch)
+
+    def process_transaction(self, tx: TransactionSchema):
+        return ALERT_LABELS[self.process_batch_codes([tx])[0]]
+
+    def _ask(self, shards: Sequence[int], message: bytes) -> List[Dict[str, Any]]:
+        self.start()
+        with self._lock:
+            for shard in shards:
+                self._conns[shard].send_bytes(message)
+            return [json.loads(self._conns[shard].recv_bytes()) for shard in shards]
+
+    def tail_latency(self, issuer: Optional[str] = None, include_bins: bool = False) -> Dict[str, Any]:
+        shards = range(self.shards) if issuer is None else [shard_for(issuer, self.shards)]
+        request = TAILS + json.dumps({"issuer": issuer, "include_bins": include_bins}).encode()
+        merged: Dict[str, Any] = {}
+        for reply in self._ask(shards, request):
+            merged.update(reply)
+        return dict(sorted(merged.items()))
+
+    def summaries(self) -> Dict[str, WindowSummary]:
+        merged: Dict[str, WindowSummary] = {}
+        for reply in self._ask(range(self.shards), WINDOWS):
+            merged.update({issuer: WindowSummary(*values) for issuer, values in reply.items()})
+        return merged
+
+    check_summary = staticmethod(WatchdogAgent.check_summary)
+
+    def stats(self) -> List[Dict[str, Any]]:
+        return [{"shard": shard, **reply} for shard, reply in enumerate(self._ask(range(self.shards), STATS))]
@@ -1,47 +1,142 @@
-from collections import deque
-from statistics import mean, stdev
-from typing import Dict, List
+import os
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+import numpy as np
+
+from app.analytics.batch import ALERT_LABELS, NO_ALERT, TAIL_LATENCY, batch_label_codes, encode_issuers
+from app.analytics.rolling import RollingWindow, WindowSummary
+from app.analytics.tail_latency import TailLatency
+from app.models import transaction_batch as batch_codes
 from app.models.transaction import TransactionSchema, TransactionStatus
+from app.models.transaction_batch import TransactionBatch
 
 class WatchdogAgent:
-    def __init__(self, window_size: int = 50, z_threshold: float = 2.0):
+    def __init__(self, window_size: int = 50, z_threshold: float = 2.0,
+                 p99_over_baseline_pct: float = None, p99_min_delta_ms: float = None,
+                 tail_check_every: int = 25):
         self.window_size = window_size
         self.z_threshold = z_threshold
-        # Store metrics per issuer
-        self.latency_windows: Dict[str, deque] = {}
-        self.success_windows: Dict[str, deque] = {}
-        
+        # Rolling latency/success stats per issuer (O(1) per transaction)
+        self.windows: Dict[str, RollingWindow] = {}
+        # Tail latency sketches per issuer (recent minute vs previous 30 minutes)
+        self.tails: Dict[str, TailLatency] = {}
+        self.p99_over_baseline_pct = p99_over_baseline_pct if p99_over_baseline_pct is not None else float(
+            os.getenv("WATCHDOG_P99_OVER_BASELINE_PCT", "50"))
+        self.p99_min_delta_ms = p99_min_delta_ms if p99_min_delta_ms is not None else float(
+            os.getenv("WATCHDOG_P99_MIN_DELTA_MS", "100"))
+        self.tail_check_every = tail_check_every
+
+    def _tail(self, issuer: str) -> TailLatency:
+        tail = self.tails.get(issuer)
+        if tail is None:
+            tail = self.tails[issuer] = TailLatency(self.p99_over_baseline_pct, self.p99_min_delta_ms)
+        return tail
+
     def process_transaction(self, tx: TransactionSchema):
-        if tx.issuer not in self.latency_windows:
-            self.latency_windows[tx.issuer] = deque(maxlen=self.window_size)
-            self.success_windows[tx.issuer] = deque(maxlen=self.window_size)
-            
-        self.latency_windows[tx.issuer].append(tx.latency_ms)
-        self.success_windows[tx.issuer].append(1 if tx.status == TransactionStatus.SUCCESS else 0)
-        
-        return self.detect_anomalies(tx.issuer)
-        
+        window = self.windows.get(tx.issuer)
+        if window is None:
+            window = self.windows[tx.issuer] = RollingWindow(self.window_size)
+
+        window.push(tx.latency_ms, 1 if tx.status == TransactionStatus.SUCCESS else 0)
+        tail = self._tail(tx.issuer)
+        ts = tx.timestamp.timestamp()
+        tail.add(ts, tx.latency_ms)
+
+        alert = self.detect_anomalies(tx.issuer)
+        # The p99 rule reads whole sketches, so it runs every tail_check_every events per issuer
+        if alert is None and tail.seen % self.tail_check_every == 0:
+            alert = self.detect_tail_regression(tx.issuer, ts)
+        return alert
+
+    def process_batch(self, transactions: Union[TransactionBatch, Sequence[TransactionSchema]]) -> List[Optional[str]]:
+        """
+        Vectorized equivalent of calling process_transaction on each item in order.
+        Returns one alert label (or None) per transaction. Shares the per-issuer
+        windows with the scalar path, so both can be mixed freely.
+        Columnar batches skip the per-object extraction entirely.
+        """
+        return ALERT_LABELS[self.process_batch_codes(transactions)].tolist()
+
+    def process_batch_codes(self, transactions: Union[TransactionBatch, Sequence[TransactionSchema]]) -> np.ndarray:
+        """process_batch, as int8 label codes (see analytics.batch.ALERT_LABELS)."""
+        if not len(transactions):
+            return np.zeros(0, np.int8)
+        if isinstance(transactions, TransactionBatch):
+            return batch_label_codes(self.windows, self.window_size, transactions.issuer, batch_codes.ISSUERS.names,
+                                     transactions.latency_ms, transactions.success, self.z_threshold,
+                                     self._tail_pass(transactions.timestamp, transactions.latency_ms))
+        codes, names = encode_issuers([tx.issuer for tx in transactions])
+        latencies = np.fromiter((tx.latency_ms for tx in transactions), np.int64, len(transactions))
+        successes = np.fromiter((tx.status == TransactionStatus.SUCCESS for tx in transactions), np.int64, len(transactions))
+        timestamps = np.fromiter((tx.timestamp.timestamp() for tx in transactions), np.float64, len(transactions))
+        return batch_label_codes(self.windows, self.window_size, codes, names, latencies, successes, self.z_threshold,
+                                 self._tail_pass(timestamps, latencies))
+
+    def _tail_pass(self, timestamps: np.ndarray, latencies: np.ndarray):
+        """Per-issuer step for batch_label_codes: feed the sketches and run the p99 rule at the same rows the scalar path would."""
+        bin_indexes = None
+
+        def run(issuer: str, rows: np.ndarray, labels: np.ndarray):
+            nonlocal bin_indexes
+            tail = self._tail(issuer)
+            if bin_indexes is None:
+                bin_indexes = tail.mapping.indexes(latencies)
+            for position in tail.add_many(timestamps[rows], bin_indexes[rows], self.tail_check_every):
+                row = rows[position]
+                if labels[row] == NO_ALERT:
+                    self._report_tail(issuer)
+                    labels[row] = TAIL_LATENCY
+
+        return run
+
     def detect_anomalies(self, issuer: str):
-        latencies = self.latency_windows[issuer]
-        if len(latencies) < 10:
+        window = self.windows[issuer]
+        if len(window) < 10:
             return # not enough data
-            
+
         # Check Latency Spike
-        avg_latency = mean(latencies)
-        try:
-            std_dev = stdev(latencies)
-            if std_dev > 0 and (latencies[-1] - avg_latency) / std_dev > self.z_threshold:
-                print(f"Watchdog ALERT: Latency Spike for {issuer}. Value: {latencies[-1]}ms, Z-Score > {self.z_threshold}")
-                return "LATENCY_SPIKE"
-        except ValueError:
-            pass
+        avg_latency = window.mean()
+        std_dev = window.stdev()
+        last_latency = window.last_latency
+        if std_dev and (last_latency - avg_latency) / std_dev > self.z_threshold:
+            print(f"Watchdog ALERT: Latency Spike for {issuer}. Value: {last_latency}ms, Z-Score > {self.z_threshold}")
+            return "LATENCY_SPIKE"
 
         # Check Success Rate Drop (Simple threshold for now)
-        successes = self.success_windows[issuer]
-        if len(successes) > 10:
-            rate = sum(successes) / len(successes)
+        if len(window) > 10:
+            rate = window.success_rate()
             if rate < 0.8: # Below 80% success
                  print(f"Watchdog ALERT: Success Rate Drop for {issuer}. Rate: {rate*100:.1f}%")
                  return "SUCCESS_DROP"
-        
+
+        return None
+
+    def summaries(self) -> Dict[str, WindowSummary]:
+        """Per-issuer window sums, for merging with other nodes' (cluster mode)."""
+        return {issuer: window.summary() for issuer, window in self.windows.items()}
+
+    @staticmethod
+    def check_summary(issuer: str, summary: WindowSummary):
+        """The success rate rule of detect_anomalies, on a merged cluster-wide window."""
+        if summary.count > 10 and summary.success_rate() < 0.8:
+            print(f"Watchdog ALERT: Cluster Success Rate Drop for {issuer}. Rate: {summary.success_rate()*100:.1f}% "
+                  f"over {summary.count} samples")
+            return "SUCCESS_DROP"
+        return None
+
+    def detect_tail_regression(self, issuer: str, now: float):
+        # Recent p99 above max(baseline p99 * (1 + pct), baseline p99 + min delta)
+        if self.tails[issuer].regressed(now):
+            self._report_tail(issuer)
+            return "TAIL_LATENCY"
         return None
+
+    def _report_tail(self, issuer: str):
+        tail = self.tails[issuer]
+        recent_p99 = tail.snapshot()["recent"]["p99"]
+        print(f"Watchdog ALERT: Tail Latency for {issuer}. p99 {recent_p99:.0f}ms vs baseline {tail.baseline_p99:.0f}ms")
+
+    def tail_latency(self, issuer: Optional[str] = None, include_bins: bool = False) -> Dict[str, Any]:
+        """Recent vs baseline latency percentiles per issuer (optionally with the sparse sketch bins)."""
+        issuers = [issuer] if issuer is not None else sorted(self.tails)
+        return {name: self.tails[name].snapshot(include_bins=include_bins) for name in issuers if name in self.tails}
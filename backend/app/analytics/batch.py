@@ -0,0 +1,95 @@
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.analytics.rolling import RollingWindow
+
+# Label codes used inside the vectorized pass; index into ALERT_LABELS
+NO_ALERT, LATENCY_SPIKE, SUCCESS_DROP, TAIL_LATENCY = 0, 1, 2, 3
+ALERT_LABELS = np.array([None, "LATENCY_SPIKE", "SUCCESS_DROP", "TAIL_LATENCY"], dtype=object)
+
+
+def rolling_labels(window: RollingWindow,
+                   latencies: np.ndarray,
+                   successes: np.ndarray,
+                   z_threshold: float) -> np.ndarray:
+    """
+    Vectorized equivalent of feeding `latencies`/`successes` one by one into
+    `window` and running the Watchdog rules after each push.
+
+    Rolling sums come from cumulative sums over (window history + batch), so
+    every position sees exactly the samples the scalar path would. The window
+    is left holding the tail of the batch, ready for the next call.
+    Returns an int8 array of label codes (see ALERT_LABELS).
+    """
+    size = window.maxlen
+    history = len(window)
+    lat = np.concatenate((np.fromiter(window.latencies, np.int64, history), latencies.astype(np.int64)))
+    ok = np.concatenate((np.fromiter(window.successes, np.int64, history), successes.astype(np.int64)))
+
+    zero = np.zeros(1, np.int64)
+    lat_cs = np.concatenate((zero, np.cumsum(lat)))
+    sq_cs = np.concatenate((zero, np.cumsum(lat * lat)))
+    ok_cs = np.concatenate((zero, np.cumsum(ok)))
+
+    end = np.arange(history + 1, len(lat) + 1)
+    start = np.maximum(end - size, 0)
+    n = end - start
+    lat_sum = lat_cs[end] - lat_cs[start]
+    sq_sum = sq_cs[end] - sq_cs[start]
+    ok_sum = ok_cs[end] - ok_cs[start]
+
+    # Same formulas as RollingWindow.mean/stdev/success_rate
+    with np.errstate(divide="ignore", invalid="ignore"):
+        avg = lat_sum / n
+        std = np.sqrt((n * sq_sum - lat_sum * lat_sum) / (n * (n - 1)))
+        z = (lat[history:] - avg) / std
+        rate = ok_sum / n
+
+    spike = (n >= 10) & (std > 0) & (z > z_threshold)
+    drop = ~spike & (n > 10) & (rate < 0.8)
+    labels = np.zeros(len(end), np.int8)
+    labels[spike] = LATENCY_SPIKE
+    labels[drop] = SUCCESS_DROP
+
+    window.load(lat[-size:].tolist(), ok[-size:].tolist())
+    return labels
+
+
+def encode_issuers(issuers: Sequence[str]) -> Tuple[np.ndarray, List[str]]:
+    """Map issuer names to dense integer codes (first-seen order)."""
+    index: Dict[str, int] = {}
+    codes = np.fromiter((index.setdefault(i, len(index)) for i in issuers), np.int32, len(issuers))
+    return codes, list(index)
+
+
+def batch_label_codes(windows: Dict[str, RollingWindow], window_size: int,
+                      issuer_codes: np.ndarray,
+                      issuer_names: Sequence[str],
+                      latencies: np.ndarray,
+                      successes: np.ndarray,
+                      z_threshold: float,
+                      per_issuer: Optional[Callable[[str, np.ndarray, np.ndarray], None]] = None) -> np.ndarray:
+    """
+    Group a batch by issuer code and run `rolling_labels` once per issuer.
+    Returns int8 label codes (see ALERT_LABELS).
+    `per_issuer(issuer, rows, labels)` runs after each issuer's rolling pass
+    and may fill in further label codes for `rows` (still NO_ALERT ones only).
+    """
+    # Narrow codes sort with a radix sort, which is much cheaper at 1M rows
+    sort_codes = issuer_codes.astype(np.uint16) if len(issuer_names) <= 0xFFFF else issuer_codes
+    order = np.argsort(sort_codes, kind="stable")
+    bounds = np.searchsorted(sort_codes[order], np.arange(len(issuer_names) + 1))
+
+    labels = np.zeros(len(issuer_codes), np.int8)
+    for code, issuer in enumerate(issuer_names):
+        rows = order[bounds[code]:bounds[code + 1]]
+        if not len(rows):
+            continue
+        window = windows.get(issuer)
+        if window is None:
+            window = windows[issuer] = RollingWindow(window_size)
+        labels[rows] = rolling_labels(window, latencies[rows], successes[rows], z_threshold)
+        if per_issuer is not None:
+            per_issuer(issuer, rows, labels)
+    return labels
@@ -0,0 +1,100 @@
+import math
+from collections import deque
+from dataclasses import dataclass
+from typing import List, Optional
+
+
+@dataclass
+class WindowSummary:
+    """
+    The running sums behind a RollingWindow. Sums add, so summaries of the
+    same issuer's windows on several nodes merge into the stats of their
+    combined samples.
+    """
+    count: int = 0
+    latency_sum: int = 0
+    latency_sq_sum: int = 0
+    success_count: int = 0
+
+    def merge(self, other: "WindowSummary") -> "WindowSummary":
+        return WindowSummary(self.count + other.count, self.latency_sum + other.latency_sum,
+                             self.latency_sq_sum + other.latency_sq_sum, self.success_count + other.success_count)
+
+    def mean(self) -> float:
+        return self.latency_sum / self.count
+
+    def stdev(self) -> Optional[float]:
+        if self.count < 2:
+            return None
+        return math.sqrt((self.count * self.latency_sq_sum - self.latency_sum ** 2) / (self.count * (self.count - 1)))
+
+    def success_rate(self) -> float:
+        return self.success_count / self.count
+
+    def to_list(self) -> List[int]:
+        return [self.count, self.latency_sum, self.latency_sq_sum, self.success_count]
+
+
+class RollingWindow:
+    """
+    Fixed-size sliding window over (latency, success) samples with O(1) updates.
+
+    Keeps running sums for latency (sum and sum of squares) plus a running
+    success counter, adjusted as samples enter and leave the deque. Latencies
+    are integers, so the sums stay exact and removals never accumulate the
+    floating point drift a sliding Welford update would.
+    """
+
+    def __init__(self, maxlen: int):
+        self.maxlen = maxlen
+        self.latencies: deque = deque(maxlen=maxlen)
+        self.successes: deque = deque(maxlen=maxlen)
+        self.latency_sum = 0
+        self.latency_sq_sum = 0
+        self.success_count = 0
+
+    def __len__(self) -> int:
+        return len(self.latencies)
+
+    def push(self, latency: int, success: int):
+        if len(self.latencies) == self.maxlen:
+            old_latency = self.latencies[0]
+            self.latency_sum -= old_latency
+            self.latency_sq_sum -= old_latency * old_latency
+            self.success_count -= self.successes[0]
+
+        self.latencies.append(latency)
+        self.successes.append(success)
+        self.latency_sum += latency
+        self.latency_sq_sum += latency * latency
+        self.success_count += success
+
+    @property
+    def last_latency(self) -> int:
+        return self.latencies[-1]
+
+    def mean(self) -> float:
+        return self.latency_sum / len(self.latencies)
+
+    def stdev(self) -> Optional[float]:
+        """Sample standard deviation, or None with fewer than two samples."""
+        n = len(self.latencies)
+        if n < 2:
+            return None
+        # n * sum(x^2) - sum(x)^2 == n * sum((x - mean)^2), exact in ints
+        spread = n * self.latency_sq_sum - self.latency_sum * self.latency_sum
+        return math.sqrt(spread / (n * (n - 1)))
+
+    def success_rate(self) -> float:
+        return self.success_count / len(self.successes)
+
+    def load(self, latencies, successes):
+        """Replace the window contents (keeps the last `maxlen` samples)."""
+        self.latencies = deque((int(x) for x in latencies), maxlen=self.maxlen)
+        self.successes = deque((int(x) for x in successes), maxlen=self.maxlen)
+        self.latency_sum = sum(self.latencies)
+        self.latency_sq_sum = sum(x * x for x in self.latencies)
+        self.success_count = sum(self.successes)
+
+    def summary(self) -> WindowSummary:
+        return WindowSummary(len(self.latencies), self.latency_sum, self.latency_sq_sum, self.success_count)
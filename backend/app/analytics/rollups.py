@@ -0,0 +1,375 @@
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.analytics.sketch import LatencySketch, LogMapping
+from app.models import transaction_batch as batch_codes
+from app.models.transaction import TransactionSchema
+from app.models.transaction_batch import TransactionBatch
+
+DIMENSIONS = ("issuer", "region", "payment_method", "processor")
+VOCABS = (batch_codes.ISSUERS, batch_codes.REGIONS, batch_codes.METHODS, batch_codes.PROCESSORS)
+
+# (bucket width in seconds, buckets retained)
+RESOLUTIONS: Tuple[Tuple[int, int], ...] = ((1, 120), (10, 180), (60, 180), (3600, 48))
+
+# Coarser than the Watchdog's sketches: one of these lives in every bucket
+ROLLUP_MAPPING = LogMapping(relative_accuracy=0.05)
+
+NO_LATENCY = np.iinfo(np.int32).max
+PENDING_ROWS = 256
+# Series kept at once; past it a new series takes over the least recently seen one's buckets
+MAX_KEYS = 4096
+
+
+class _Resolution:
+    """
+    Ring of `slots` buckets per series key at one bucket width. Every stat is
+    a (keys, slots) array, so a whole TransactionBatch lands with a handful
+    of scatter-adds. Sketch counts live in a shared pool of `nbins` rows,
+    handed to a (key, slot) when its bucket gets its first row and returned
+    when the slot moves on or expires: memory follows the (key, bucket) pairs
+    with traffic, not keys x slots.
+    """
+
+    def __init__(self, seconds: int, slots: int, nbins: int, keys: int = 16):
+        self.seconds = seconds
+        self.slots = slots
+        self.nbins = nbins
+        self.bucket = np.full((keys, slots), -1, np.int64)  # bucket number held by each slot
+        self.count = np.zeros((keys, slots), np.int32)
+        self.successes = np.zeros((keys, slots), np.int32)
+        self.latency_sum = np.zeros((keys, slots), np.int64)
+        self.latency_min = np.full((keys, slots), NO_LATENCY, np.int32)  # latency_ms is an int32 column
+        self.latency_max = np.zeros((keys, slots), np.int32)
+        self.sketch = np.zeros((keys, slots), np.int32)  # pool row of each slot's sketch; 0 (always empty) = none
+        self.bins = np.zeros((keys + 1, nbins), np.uint32)
+        self._free: List[int] = []
+        self._used = 1  # pool rows handed out at least once
+        self._swept = 0  # newest bucket as of the last expiry sweep
+
+    def grow(self, keys: int):
+        extra = keys - len(self.bucket)
+        if extra <= 0:
+            return
+        pad = lambda a, fill: np.concatenate([a, np.full((extra,) + a.shape[1:], fill, a.dtype)])
+        self.bucket = pad(self.bucket, -1)
+        self.count = pad(self.count, 0)
+        self.successes = pad(self.successes, 0)
+        self.latency_sum = pad(self.latency_sum, 0)
+        self.latency_min = pad(self.latency_min, NO_LATENCY)
+        self.latency_max = pad(self.latency_max, 0)
+        self.sketch = pad(self.sketch, 0)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(a.nbytes for a in (self.bucket, self.count, self.successes, self.latency_sum, self.latency_min,
+                                      self.latency_max, self.sketch, self.bins))
+
+    def _allocate(self, n: int) -> np.ndarray:
+        reused = self._free[len(self._free) - n:] if n <= len(self._free) else self._free[:]
+        del self._free[len(self._free) - len(reused):]
+        fresh = n - len(reused)
+        if self._used + fresh > len(self.bins):
+            self.bins = np.concatenate([self.bins, np.zeros((max(len(self.bins), fresh), self.nbins), np.uint32)])
+        rows = np.array(reused + list(range(self._used, self._used + fresh)), np.int64)
+        self._used += fresh
+        return rows
+
+    def _reset(self, flat):
+        self.count.reshape(-1)[flat] = 0
+        self.successes.reshape(-1)[flat] = 0
+        self.latency_sum.reshape(-1)[flat] = 0
+        self.latency_min.reshape(-1)[flat] = NO_LATENCY
+        self.latency_max.reshape(-1)[flat] = 0
+        sketch = self.sketch.reshape(-1)
+        rows = sketch[flat]
+        rows = rows[rows > 0]
+        if len(rows):
+            self.bins[rows] = 0
+            self._free.extend(rows.tolist())
+        sketch[flat] = 0
+
+    def clear(self, key: int):
+        """Forget a key's buckets (it is about to hold another series)."""
+        self._reset(np.arange(key * self.slots, (key + 1) * self.slots))
+        self.bucket[key] = -1
+
+    def _expire(self, newest: int):
+        """Free slots whose bucket has aged out of the ring (a slot otherwise only resets when its key is seen)."""
+        held = self.bucket.reshape(-1)
+        dead = np.flatnonzero((held >= 0) & (held <= newest - self.slots))
+        if len(dead):
+            self._reset(dead)
+            held[dead] = -1
+        self._swept = newest
+
+    def add_batch(self, keys: np.ndarray, ts: np.ndarray, success: np.ndarray, latency: np.ndarray,
+                  bin_indexes: np.ndarray):
+        bucket = (ts // self.seconds).astype(np.int64)
+        flat = keys * self.slots + bucket % self.slots
+
+        newest = int(bucket.max())
+        if newest >= self._swept + max(1, self.slots // 4):
+            self._expire(newest)
+
+        # Advance slots that now hold a newer bucket, then drop rows older than their slot
+        held = self.bucket.reshape(-1)
+        touched = np.unique(flat)
+        before = held[touched]
+        np.maximum.at(held, flat, bucket)
+        advanced = touched[held[touched] != before]
+        if len(advanced):
+            self._reset(advanced)
+        current = bucket == held[flat]
+        if not current.all():
+            flat, success, latency, bin_indexes = flat[current], success[current], latency[current], bin_indexes[current]
+
+        # Values in each array's own dtype: ufunc.at takes a far slower path when it has to cast
+        np.add.at(self.count.reshape(-1), flat, np.ones(len(flat), np.int32))
+        np.add.at(self.successes.reshape(-1), flat, success)
+        np.add.at(self.latency_sum.reshape(-1), flat, latency.astype(np.int64))
+        np.minimum.at(self.latency_min.reshape(-1), flat, latency)
+        np.maximum.at(self.latency_max.reshape(-1), flat, latency)
+        sketch = self.sketch.reshape(-1)
+        missing = np.unique(flat[sketch[flat] == 0])
+        if len(missing):
+            sketch[missing] = self._allocate(len(missing))
+        np.add.at(self.bins.reshape(-1), sketch[flat].astype(np.int64) * self.nbins + bin_indexes,
+                  np.ones(len(flat), np.uint32))
+
+
+class RollupEngine:
+    """
+    Incrementally maintained 1s/10s/1m/1h rollups of transaction traffic,
+    one series per (issuer, region, payment_method, processor). Each bucket
+    keeps count, successes, latency sum/min/max and a mergeable latency
+    sketch, so any window, filter or grouping is answered by summing a few
+    buckets instead of rescanning transactions. At most `max_keys` series
+    are kept: past that, the least recently seen series is dropped.
+    """
+
+    def __init__(self, resolutions: Sequence[Tuple[int, int]] = RESOLUTIONS, mapping: LogMapping = ROLLUP_MAPPING,
+                 max_keys: int = MAX_KEYS):
+        self.mapping = mapping
+        self.max_keys = max_keys
+        self.resolutions = [_Resolution(seconds, slots, mapping.nbins) for seconds, slots in resolutions]
+        self._key_index: Dict[int, int] = {}
+        self._packed: List[int] = []
+        self.key_codes: List[Tuple[int, int, int, int]] = []
+        self.last_seen = np.zeros(len(self.resolutions[0].bucket))  # newest timestamp per key
+        self._pending: List[TransactionSchema] = []
+        self.recorded = 0
+        self.keys_evicted = 0
+
+    def _keys(self, uniques: List[int]) -> np.ndarray:
+        """Key per packed series value; new series get a fresh key or the least recently seen ones' keys."""
+        keys = [self._key_index.get(packed, -1) for packed in uniques]
+        new = [i for i, key in enumerate(keys) if key < 0]
+        recycle: List[int] = []
+        if len(self.key_codes) + len(new) > self.max_keys:
+            # Never a key this batch already uses; a batch with more series than max_keys overflows the cap
+            candidates = np.ones(len(self.key_codes), bool)
+            candidates[[key for key in keys if key >= 0]] = False
+            order = np.argsort(self.last_seen[:len(self.key_codes)], kind="stable")
+            recycle = order[candidates[order]][:len(self.key_codes) + len(new) - self.max_keys].tolist()
+        for i in new:
+            packed = uniques[i]
+            codes = (packed >> 48, (packed >> 32) & 0xFFFF, (packed >> 16) & 0xFFFF, packed & 0xFFFF)
+            if recycle:
+                key = recycle.pop()
+                del self._key_index[self._packed[key]]
+                for resolution in self.resolutions:
+                    resolution.clear(key)
+                self._packed[key], self.key_codes[key] = packed, codes
+                self.keys_evicted += 1
+            else:
+                key = len(self.key_codes)
+                self._packed.append(packed)
+                self.key_codes.append(codes)
+                if key >= len(self.last_seen):
+                    capacity = max(key + 1, min(2 * (key + 1), self.max_keys))
+                    for resolution in self.resolutions:
+                        resolution.grow(capacity)
+                    self.last_seen = np.concatenate([self.last_seen, np.zeros(capacity - len(self.last_seen))])
+            self._key_index[packed] = keys[i] = key
+        return np.array(keys, np.int64)
+
+    def record(self, tx: TransactionSchema):
+        """Buffer a single transaction; buffered rows land as one batch (queries flush first)."""
+        self._pending.append(tx)
+        if len(self._pending) >= PENDING_ROWS:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            pending, self._pending = self._pending, []
+            self._record(TransactionBatch.from_schemas(pending))
+
+    def record_batch(self, batch: TransactionBatch):
+        self.flush()
+        self._record(batch)
+
+    def _record(self, batch: TransactionBatch):
+        if not len(batch):
+            return
+        packed = ((batch.issuer.astype(np.int64) << 48) | (batch.region.astype(np.int64) << 32)
+                  | (batch.payment_method.astype(np.int64) << 16) | batch.processor.astype(np.int64))
+        uniques, inverse = np.unique(packed, return_inverse=True)
+        keys = self._keys(uniques.tolist())[inverse]
+        np.maximum.at(self.last_seen, keys, batch.timestamp)
+        success = batch.success.astype(np.int32)
+        latency = batch.latency_ms.astype(np.int32)
+        bin_indexes = self.mapping.indexes(latency)
+        for resolution in self.resolutions:
+            resolution.add_batch(keys, batch.timestamp, success, latency, bin_indexes)
+        self.recorded += len(batch)
+
+    # -- queries --------------------------------------------------------
+
+    def _label(self, dim: int, code: int) -> str:
+        name = VOCABS[dim].names[code]
+        return getattr(name, "value", name)  # payment methods are enums
+
+    def _resolution_for(self, window_s: float, resolution_s: Optional[int]) -> _Resolution:
+        if resolution_s is not None:
+            for resolution in self.resolutions:
+                if resolution.seconds == resolution_s:
+                    return resolution
+            raise ValueError(f"unknown resolution {resolution_s}s "
+                             f"(available: {[r.seconds for r in self.resolutions]})")
+        # Finest resolution whose retention covers the window
+        for resolution in self.resolutions:
+            if resolution.seconds * resolution.slots >= window_s:
+                return resolution
+        return self.resolutions[-1]
+
+    def _window(self, resolution: _Resolution, window_s: float, now: Optional[float]) -> Tuple[int, int]:
+        """Inclusive bucket range covering the last `window_s` seconds (bucket aligned)."""
+        now = time.time() if now is None else now
+        hi = int(now // resolution.seconds)
+        return max(int((now - window_s) // resolution.seconds) + 1, hi - resolution.slots + 1), hi
+
+    def _matching_keys(self, filters: Dict[str, Optional[str]]) -> List[int]:
+        unknown = set(filters) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"unknown filters {sorted(unknown)}")
+        wanted = []
+        for dim, name in enumerate(DIMENSIONS):
+            value = filters.get(name)
+            if value is not None:
+                code = VOCABS[dim].index.get(value)
+                if code is None:
+                    return []
+                wanted.append((dim, code))
+        return [key for key, codes in enumerate(self.key_codes) if all(codes[dim] == code for dim, code in wanted)]
+
+    def _gather(self, resolution: _Resolution, members: List[int], lo: int, hi: int) -> Dict[str, np.ndarray]:
+        """(members, buckets) views of every stat for buckets lo..hi, zeroed where a slot holds another bucket."""
+        buckets = np.arange(lo, hi + 1)
+        idx = np.ix_(members, buckets % resolution.slots)
+        live = resolution.bucket[idx] == buckets
+        return {
+            "count": np.where(live, resolution.count[idx], 0),
+            "successes": np.where(live, resolution.successes[idx], 0),
+            "latency_sum": np.where(live, resolution.latency_sum[idx], 0),
+            "latency_min": np.where(live, resolution.latency_min[idx], NO_LATENCY),
+            "latency_max": np.where(live, resolution.latency_max[idx], 0),
+            "bins": resolution.bins[resolution.sketch[idx]] * live[..., None],
+        }
+
+    def _summary(self, count: int, successes: int, latency_sum: int, latency_min: int, latency_max: int,
+                 bins: np.ndarray) -> Dict[str, Any]:
+        p50, p95, p99 = self.mapping.quantiles(bins, LatencySketch.QUANTILES)
+        return {
+            "count": count,
+            "successes": successes,
+            "failures": count - successes,
+            "success_rate": round(successes / count, 4) if count else None,
+            "latency_mean": round(latency_sum / count, 1) if count else None,
+            "latency_min": latency_min if count else None,
+            "latency_max": latency_max if count else None,
+            "p50": p50, "p95": p95, "p99": p99,
+        }
+
+    def query(self, window_s: float = 3600, group_by: Optional[str] = None, points: bool = False,
+              resolution_s: Optional[int] = None, now: Optional[float] = None,
+              **filters: Optional[str]) -> Dict[str, Any]:
+        """
+        Aggregate the last `window_s` seconds (aligned to bucket boundaries)
+        over every series matching `filters` (issuer/region/payment_method/
+        processor), optionally split by one dimension, and optionally with a
+        per-bucket time series.
+        """
+        if group_by is not None and group_by not in DIMENSIONS:
+            raise ValueError(f"group_by must be one of {DIMENSIONS}")
+        self.flush()
+        keys = self._matching_keys(filters)
+        resolution = self._resolution_for(window_s, resolution_s)
+        lo, hi = self._window(resolution, window_s, now)
+
+        groups: Dict[str, List[int]] = {}
+        group_dim = DIMENSIONS.index(group_by) if group_by else None
+        for key in keys:
+            label = "all" if group_dim is None else self._label(group_dim, self.key_codes[key][group_dim])
+            groups.setdefault(label, []).append(key)
+
+        result_groups = []
+        for label, members in groups.items():
+            g = self._gather(resolution, members, lo, hi)
+            summary = self._summary(
+                int(g["count"].sum()), int(g["successes"].sum()), int(g["latency_sum"].sum()),
+                int(g["latency_min"].min()), int(g["latency_max"].max()), g["bins"].sum(axis=(0, 1)),
+            )
+            if summary["count"] == 0:
+                continue
+            entry = {"group": label if group_by else None, **summary}
+            if points:
+                entry["points"] = self._points(g, lo, resolution.seconds)
+            result_groups.append(entry)
+
+        return {
+            "window_s": window_s,
+            "resolution_s": resolution.seconds,
+            "from": lo * resolution.seconds,
+            "to": (hi + 1) * resolution.seconds,
+            "filters": {k: v for k, v in filters.items() if v is not None},
+            "group_by": group_by,
+            "groups": sorted(result_groups, key=lambda g: -g["count"]),
+        }
+
+    def _points(self, g: Dict[str, np.ndarray], lo: int, seconds: int) -> List[Dict[str, Any]]:
+        count = g["count"].sum(axis=0)
+        successes = g["successes"].sum(axis=0)
+        latency_sum = g["latency_sum"].sum(axis=0)
+        latency_min = g["latency_min"].min(axis=0)
+        latency_max = g["latency_max"].max(axis=0)
+        bins = g["bins"].sum(axis=0)
+        return [
+            {"ts": (lo + i) * seconds,
+             **self._summary(int(count[i]), int(successes[i]), int(latency_sum[i]),
+                             int(latency_min[i]), int(latency_max[i]), bins[i])}
+            for i in np.flatnonzero(count).tolist()
+        ]
+
+    def sketch(self, window_s: float = 3600, now: Optional[float] = None, **filters: Optional[str]) -> LatencySketch:
+        """Merged latency sketch over a window (e.g. to combine with other nodes)."""
+        self.flush()
+        resolution = self._resolution_for(window_s, None)
+        lo, hi = self._window(resolution, window_s, now)
+        sketch = LatencySketch(self.mapping)
+        keys = self._matching_keys(filters)
+        if keys:
+            sketch.counts += self._gather(resolution, keys, lo, hi)["bins"].sum(axis=(0, 1), dtype=np.int64)
+            sketch.count = int(sketch.counts.sum())
+        return sketch
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "series": len(self.key_codes),
+            "max_keys": self.max_keys,
+            "keys_evicted": self.keys_evicted,
+            "sketch_rows": {f"{r.seconds}s": r._used - 1 - len(r._free) for r in self.resolutions},
+            "bytes": sum(r.nbytes for r in self.resolutions),
+        }
@@ -0,0 +1,90 @@
+import math
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+
+class LogMapping:
+    """
+    DDSketch-style value -> bin mapping. Bin i covers (gamma^(i-1), gamma^i],
+    so any quantile read back from the bins is within `relative_accuracy` of
+    the true sample value. Values at or below 1 share bin 0 and values above
+    `max_value` are clamped into the last bin.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.02, max_value: float = 120_000):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.nbins = int(math.ceil(math.log(max_value) / self.log_gamma)) + 1
+
+    def index(self, value: float) -> int:
+        if value <= 1:
+            return 0
+        return min(self.nbins - 1, int(math.ceil(math.log(value) / self.log_gamma)))
+
+    def indexes(self, values: np.ndarray) -> np.ndarray:
+        logs = np.log(np.maximum(np.asarray(values, np.float64), 1.0))
+        return np.minimum(np.ceil(logs / self.log_gamma), self.nbins - 1).astype(np.intp)
+
+    def value(self, index: int) -> float:
+        """Representative value of a bin (relative error <= relative_accuracy)."""
+        if index <= 0:
+            return 1.0
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def quantiles(self, counts: np.ndarray, qs: Sequence[float]) -> List[float]:
+        """Quantiles of the distribution described by per-bin `counts`."""
+        cumulative = np.cumsum(counts)
+        total = int(cumulative[-1]) if len(cumulative) else 0
+        if total == 0:
+            return [0.0 for _ in qs]
+        ranks = [min(total - 1, int(q * (total - 1))) for q in qs]
+        positions = np.searchsorted(cumulative, np.array(ranks) + 1)
+        return [round(self.value(int(i)), 1) for i in positions]
+
+
+class LatencySketch:
+    """
+    Mergeable, constant-memory latency quantile sketch (fixed array of bin
+    counts over a LogMapping). Two sketches with the same mapping merge by
+    adding their counts, so per-shard or per-bucket sketches roll up exactly.
+    """
+
+    QUANTILES = (0.5, 0.95, 0.99)
+
+    def __init__(self, mapping: LogMapping = None):
+        self.mapping = mapping or DEFAULT_MAPPING
+        self.counts = np.zeros(self.mapping.nbins, np.int64)
+        self.count = 0
+
+    def add(self, value: float):
+        self.counts[self.mapping.index(value)] += 1
+        self.count += 1
+
+    def add_many(self, values: np.ndarray):
+        if len(values):
+            self.counts += np.bincount(self.mapping.indexes(values), minlength=self.mapping.nbins)
+            self.count += len(values)
+
+    def merge(self, other: "LatencySketch"):
+        self.counts += other.counts
+        self.count += other.count
+
+    def quantile(self, q: float) -> float:
+        return self.mapping.quantiles(self.counts, (q,))[0]
+
+    def quantiles(self, qs: Sequence[float] = QUANTILES) -> Dict[str, float]:
+        return {f"p{q * 100:g}": v for q, v in zip(qs, self.mapping.quantiles(self.counts, qs))}
+
+    def to_dict(self) -> Dict:
+        """Sparse form for the API: only non-empty bins are shipped."""
+        nonzero = np.flatnonzero(self.counts)
+        return {
+            "relative_accuracy": self.mapping.relative_accuracy,
+            "count": self.count,
+            "bins": dict(zip(nonzero.tolist(), self.counts[nonzero].tolist())),
+        }
+
+
+DEFAULT_MAPPING = LogMapping()
@@ -0,0 +1,217 @@
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from app.analytics.sketch import DEFAULT_MAPPING, LatencySketch, LogMapping
+
+P99 = 0.99
+
+
+class WindowedSketch:
+    """
+    Latency sketch over a sliding time window: a ring of per-interval bin
+    counts, so expiring old data is just zeroing a slot. Memory is fixed at
+    intervals x bins regardless of traffic.
+
+    Each slot also keeps its sample total and how many samples fall above a
+    movable `mark` bin, which makes "what share of the window is slower than
+    X" an O(intervals) question instead of a pass over the bins.
+    """
+
+    def __init__(self, interval_s: float, intervals: int, mapping: LogMapping = DEFAULT_MAPPING):
+        self.interval_s = interval_s
+        self.intervals = intervals
+        self.mapping = mapping
+        self.counts = np.zeros((intervals, mapping.nbins), np.uint32)
+        self.ids: List[int] = [-1] * intervals  # interval number held by each slot
+        self.totals: List[int] = [0] * intervals
+        self.marked: List[int] = [0] * intervals
+        self.mark = mapping.nbins  # nothing is above the last bin
+
+    def slot(self, interval: int) -> Optional[int]:
+        """Slot for `interval`, recycling it if it holds an older one; None if the interval already expired."""
+        slot = interval % self.intervals
+        held = self.ids[slot]
+        if held < interval:
+            self.counts[slot] = 0
+            self.ids[slot] = interval
+            self.totals[slot] = self.marked[slot] = 0
+        elif held > interval:
+            return None
+        return slot
+
+    def set_mark(self, bin_index: int):
+        if bin_index != self.mark:
+            self.mark = bin_index
+            self.marked = self.counts[:, bin_index + 1:].sum(axis=1, dtype=np.int64).tolist()
+
+    def add(self, ts: float, bin_index: int):
+        slot = self.slot(int(ts // self.interval_s))
+        if slot is not None:
+            self.counts[slot, bin_index] += 1
+            self.totals[slot] += 1
+            if bin_index > self.mark:
+                self.marked[slot] += 1
+
+    def add_to_slot(self, slot: int, bin_indexes: np.ndarray, marked: int):
+        self.counts[slot] += np.bincount(bin_indexes, minlength=self.mapping.nbins).astype(np.uint32)
+        self.totals[slot] += len(bin_indexes)
+        self.marked[slot] += marked
+
+    def add_many(self, ts: np.ndarray, bin_indexes: np.ndarray):
+        intervals = (ts // self.interval_s).astype(np.int64)
+        for interval in np.unique(intervals).tolist():
+            slot = self.slot(interval)
+            if slot is not None:
+                rows = bin_indexes[intervals == interval]
+                self.add_to_slot(slot, rows, int((rows > self.mark).sum()))
+
+    def live(self, lo: int, hi: int) -> List[int]:
+        return [slot for slot, interval in enumerate(self.ids) if lo <= interval <= hi]
+
+    def merged(self, lo: int, hi: int) -> np.ndarray:
+        """Summed bin counts of intervals lo..hi (inclusive)."""
+        return self.counts[self.live(lo, hi)].sum(axis=0, dtype=np.int64)
+
+
+class TailLatency:
+    """
+    Per-issuer tail latency tracker: a recent window (default the last
+    minute, in 10s intervals) against a baseline (default the 30 minutes
+    before it, in 1m intervals).
+
+    The rule is "recent p99 above max(baseline p99 * (1 + over_pct%),
+    baseline p99 + min_delta_ms)". The baseline only moves once per baseline
+    interval, so its threshold is computed then and turned into a mark bin on
+    the recent window; each check just compares marked vs total samples.
+    """
+
+    def __init__(self, over_pct: float = 50, min_delta_ms: float = 100,
+                 min_recent: int = 50, min_baseline: int = 200, mapping: LogMapping = DEFAULT_MAPPING,
+                 recent: Tuple[float, int] = (10, 6), baseline: Tuple[float, int] = (60, 30)):
+        self.over_pct = over_pct
+        self.min_delta_ms = min_delta_ms
+        self.min_recent = min_recent
+        self.min_baseline = min_baseline
+        self.mapping = mapping
+        self.recent = WindowedSketch(recent[0], recent[1], mapping)
+        # The baseline ring also spans the recent window it skips over
+        self.baseline_intervals = baseline[1]
+        self.baseline = WindowedSketch(baseline[0], baseline[1] + int(np.ceil(recent[0] * recent[1] / baseline[0])) + 1,
+                                       mapping)
+        self.baseline_p99: Optional[float] = None
+        self.threshold_ms: Optional[float] = None
+        self._baseline_hi: Optional[int] = None
+        self._interval: Optional[int] = None  # recent interval the baseline was last refreshed for
+        self.seen = 0
+        self.last_ts = 0.0
+
+    # -- windows --------------------------------------------------------
+
+    def _recent_range(self, interval: int) -> Tuple[int, int]:
+        return interval - self.recent.intervals + 1, interval
+
+    def _baseline_range(self, interval: int) -> Tuple[int, int]:
+        """Baseline intervals that end before the recent window (ending at `interval`) starts."""
+        start_s = self._recent_range(interval)[0] * self.recent.interval_s
+        hi = int(start_s // self.baseline.interval_s) - 1
+        return hi - self.baseline_intervals + 1, hi
+
+    def _refresh_baseline(self, interval: int):
+        if interval == self._interval:
+            return
+        self._interval = interval
+        lo, hi = self._baseline_range(interval)
+        if hi == self._baseline_hi:
+            return
+        self._baseline_hi = hi
+        counts = self.baseline.merged(lo, hi)
+        if counts.sum() < self.min_baseline:
+            self.baseline_p99 = self.threshold_ms = None
+            self.recent.set_mark(self.mapping.nbins)
+            return
+        (self.baseline_p99,) = self.mapping.quantiles(counts, (P99,))
+        self.threshold_ms = max(self.baseline_p99 * (1 + self.over_pct / 100), self.baseline_p99 + self.min_delta_ms)
+        # Highest bin whose representative value is still within the threshold
+        mark = self.mapping.index(self.threshold_ms)
+        while mark > 0 and self.mapping.value(mark) > self.threshold_ms:
+            mark -= 1
+        while mark + 1 < self.mapping.nbins and self.mapping.value(mark + 1) <= self.threshold_ms:
+            mark += 1
+        self.recent.set_mark(mark)
+
+    def _over(self, total: int, marked: int) -> bool:
+        # Same rank as LogMapping.quantiles: p99 lands above the mark iff the
+        # marked samples reach past rank int(0.99 * (total - 1))
+        return total >= self.min_recent and marked >= total - int(P99 * (total - 1))
+
+    # -- updates and checks ---------------------------------------------
+
+    def add(self, ts: float, latency: float):
+        bin_index = self.mapping.index(latency)
+        interval = int(ts // self.recent.interval_s)
+        self._refresh_baseline(interval)
+        self.recent.add(ts, bin_index)
+        self.baseline.add(ts, bin_index)
+        self.seen += 1
+        self.last_ts = max(self.last_ts, ts)
+
+    def regressed(self, now: float) -> bool:
+        interval = int(now // self.recent.interval_s)
+        self._refresh_baseline(interval)
+        if self.threshold_ms is None:
+            return False
+        live = self.recent.live(*self._recent_range(interval))
+        return self._over(sum(self.recent.totals[s] for s in live), sum(self.recent.marked[s] for s in live))
+
+    def add_many(self, ts: np.ndarray, bin_indexes: np.ndarray, check_every: int) -> List[int]:
+        """
+        Batched equivalent of add() per row plus regressed() after every
+        `check_every`-th sample. Returns the row positions where the rule fired.
+        """
+        fired: List[int] = []
+        if not len(ts):
+            return fired
+        intervals = (ts // self.recent.interval_s).astype(np.int64)
+        bounds = [0] + (np.flatnonzero(np.diff(intervals)) + 1).tolist() + [len(ts)]
+        for a, b in zip(bounds[:-1], bounds[1:]):
+            interval = int(intervals[a])
+            self._refresh_baseline(interval)
+            run = bin_indexes[a:b]
+            over = np.cumsum(run > self.recent.mark)
+            slot = self.recent.slot(interval)
+
+            first = check_every - self.seen % check_every - 1
+            if self.threshold_ms is not None and first < len(run):
+                live = self.recent.live(*self._recent_range(interval))
+                total0 = sum(self.recent.totals[s] for s in live)
+                marked0 = sum(self.recent.marked[s] for s in live)
+                checks = np.arange(first, len(run), check_every)
+                if slot is None:  # expired rows don't enter the window
+                    totals, marked = np.full(len(checks), total0), np.full(len(checks), marked0)
+                else:
+                    totals, marked = total0 + checks + 1, marked0 + over[checks]
+                hit = (totals >= self.min_recent) & (marked >= totals - (P99 * (totals - 1)).astype(np.int64))
+                fired.extend((a + checks[hit]).tolist())
+
+            if slot is not None:
+                self.recent.add_to_slot(slot, run, int(over[-1]))
+            self.baseline.add_many(ts[a:b], run)
+            self.seen += b - a
+        self.last_ts = max(self.last_ts, float(ts.max()))
+        return fired
+
+    def snapshot(self, now: Optional[float] = None, include_bins: bool = False) -> Dict[str, Any]:
+        """Recent and baseline percentiles as of `now` (default: the newest sample seen)."""
+        interval = int((self.last_ts if now is None else now) // self.recent.interval_s)
+        out: Dict[str, Any] = {"seen": self.seen, "threshold_ms": self.threshold_ms}
+        for name, ring, (lo, hi) in (("recent", self.recent, self._recent_range(interval)),
+                                     ("baseline", self.baseline, self._baseline_range(interval))):
+            sketch = LatencySketch(self.mapping)
+            sketch.counts += ring.merged(lo, hi)
+            sketch.count = int(sketch.counts.sum())
+            entry = {"count": sketch.count, **sketch.quantiles()}
+            if include_bins:
+                entry["sketch"] = sketch.to_dict()
+            out[name] = entry
+        return out
@@ -0,0 +1,227 @@
+import asyncio
+import os
+import random
+import threading
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Optional
+
+import httpx
+
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+# Failures before the request was sent, so retrying can't apply it twice
+NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+class CircuitOpenError(httpx.TransportError):
+    """Raised instead of calling a host whose circuit is open (a TransportError, so SDKs treat it as a connection failure)."""
+
+
+@dataclass
+class HostPolicy:
+    concurrency: int = 16  # requests in flight to the host (until response headers)
+    retries: int = 3
+    backoff_s: float = 0.1  # full-jitter backoff: uniform(0, min(backoff_max_s, backoff_s * 2**attempt))
+    backoff_max_s: float = 2.0
+    retry_unsafe: bool = False  # also retry POST/PATCH (only for side-effect free APIs)
+    failure_threshold: int = 5  # consecutive failures that open the circuit
+    reset_s: float = 10.0  # open circuit lets one probe through after this long
+
+
+class CircuitBreaker:
+    """
+    Per-host breaker: closed until `failure_threshold` consecutive failures,
+    then open (calls fail fast) for `reset_s`, then half-open: a single probe
+    goes through and its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int, reset_s: float):
+        self.failure_threshold = failure_threshold
+        self.reset_s = reset_s
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.opened = 0
+        self.short_circuited = 0
+
+    def allow(self, now: float) -> bool:
+        if self.state == "closed":
+            return True
+        if self.state == "open" and now - self.opened_at >= self.reset_s:
+            self.state = "half_open"
+            return True
+        self.short_circuited += 1
+        return False
+
+    def record_success(self):
+        self.state = "closed"
+        self.failures = 0
+
+    def record_failure(self, now: float):
+        self.failures += 1
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                self.opened += 1
+            self.state = "open"
+            self.opened_at = now
+
+
+class ResilientTransport(httpx.AsyncBaseTransport):
+    """
+    httpx transport that gives every client built on it per-host concurrency
+    limits, retries with jittered backoff (honouring Retry-After) and a
+    circuit breaker. Failures to connect are always retried. Anything that
+    may have reached the server (read timeouts, dropped connections, 429/5xx)
+    is retried only for idempotent methods, unless the host's policy says its
+    POSTs are safe to repeat.
+    """
+
+    def __init__(self, transport: Optional[httpx.AsyncBaseTransport] = None,
+                 policies: Optional[Dict[str, HostPolicy]] = None, default: Optional[HostPolicy] = None):
+        self.transport = transport or httpx.AsyncHTTPTransport()
+        self.policies = policies or {}
+        self.default = default or HostPolicy()
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._slots: Dict[str, asyncio.Semaphore] = {}
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+
+    def policy(self, host: str) -> HostPolicy:
+        return self.policies.get(host, self.default)
+
+    def _host_state(self, host: str, policy: HostPolicy):
+        breaker = self.breakers.get(host)
+        if breaker is None:
+            breaker = self.breakers[host] = CircuitBreaker(policy.failure_threshold, policy.reset_s)
+            self._slots[host] = asyncio.Semaphore(policy.concurrency)
+        return breaker, self._slots[host]
+
+    @staticmethod
+    def _delay(policy: HostPolicy, attempt: int, response: Optional[httpx.Response]) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return min(float(retry_after), policy.backoff_max_s)
+        return random.uniform(0, min(policy.backoff_max_s, policy.backoff_s * 2 ** attempt))
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        host = request.url.netloc.decode()
+        policy = self.policy(request.url.host)
+        breaker, slots = self._host_state(host, policy)
+        retry_sent = policy.retry_unsafe or request.method in IDEMPOTENT_METHODS
+        self.requests += 1
+        attempt = 0
+        while True:
+            if not breaker.allow(time.monotonic()):
+                self.failures += 1
+                raise CircuitOpenError(f"Circuit open for {host}", request=request)
+            try:
+                async with slots:
+                    response = await self.transport.handle_async_request(request)
+            except httpx.TransportError as e:
+                breaker.record_failure(time.monotonic())
+                if attempt >= policy.retries or not (retry_sent or isinstance(e, NOT_SENT_ERRORS)):
+                    self.failures += 1
+                    raise
+                response = None
+            else:
+                if response.status_code < 500:
+                    breaker.record_success()
+                else:
+                    breaker.record_failure(time.monotonic())
+                if response.status_code not in RETRY_STATUSES or not retry_sent or attempt >= policy.retries:
+                    if response.status_code >= 500:
+                        self.failures += 1
+                    return response
+                await response.aclose()
+
+            await asyncio.sleep(self._delay(policy, attempt, response))
+            attempt += 1
+            self.retries += 1
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "hosts": {host: {"circuit": b.state, "opened": b.opened, "short_circuited": b.short_circuited}
+                      for host, b in self.breakers.items()},
+        }
+
+
+class HttpPool:
+    """
+    One keep-alive connection pool for every outbound call (tools, LLM
+    clients), so connections are reused across agents instead of each
+    holding its own.
+    """
+
+    def __init__(self, max_connections: int = 100, max_keepalive: int = 20, timeout_s: float = 10.0,
+                 policies: Optional[Dict[str, HostPolicy]] = None, default: Optional[HostPolicy] = None,
+                 transport: Optional[httpx.AsyncBaseTransport] = None):
+        limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_keepalive,
+                              keepalive_expiry=30.0)
+        self.transport = ResilientTransport(transport or httpx.AsyncHTTPTransport(limits=limits), policies, default)
+        self.client = httpx.AsyncClient(transport=self.transport, timeout=timeout_s)
+
+    async def get_json(self, url: str, **kwargs) -> Any:
+        response = await self.client.get(url, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def post_json(self, url: str, payload: Any, **kwargs) -> Any:
+        response = await self.client.post(url, json=payload, **kwargs)
+        response.raise_for_status()
+        return response.json()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        return self.transport.stats()
+
+
+def _env_policy() -> HostPolicy:
+    return HostPolicy(
+        concurrency=int(os.getenv("HTTP_PER_HOST_LIMIT", "16")),
+        retries=int(os.getenv("HTTP_RETRIES", "3")),
+        failure_threshold=int(os.getenv("HTTP_BREAKER_FAILURES", "5")),
+        reset_s=float(os.getenv("HTTP_BREAKER_RESET_S", "10")),
+    )
+
+
+_default_pool: Optional[HttpPool] = None
+_default_pool_lock = threading.Lock()  # agents are built in worker threads
+
+
+def default_pool() -> HttpPool:
+    """Process-wide pool (created on first use). Model APIs have no side effects, so their POSTs are retried."""
+    global _default_pool
+    with _default_pool_lock:
+        if _default_pool is None:
+            default = _env_policy()
+            llm = HostPolicy(**{**default.__dict__, "retry_unsafe": True,
+                                "concurrency": int(os.getenv("LLM_PER_HOST_LIMIT", "8"))})
+            llm_host = httpx.URL(os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")).host
+            _default_pool = HttpPool(
+                max_connections=int(os.getenv("HTTP_POOL_MAX_CONNECTIONS", "100")),
+                timeout_s=float(os.getenv("HTTP_TIMEOUT_S", "10")),
+                policies={llm_host: llm},
+                default=default,
+            )
+        return _default_pool
+
+
+async def close_default_pool():
+    global _default_pool
+    if _default_pool is not None:
+        await _default_pool.aclose()
+        _default_pool = None
+
+
+def default_pool_stats() -> Dict[str, Any]:
+    return _default_pool.stats() if _default_pool is not None else {"requests": 0, "hosts": {}}
@@ -0,0 +1,162 @@
+import asyncio
+from typing import Any, AsyncIterator, Dict, Optional
+from urllib.parse import urlparse
+
+from app.cluster import resp
+from app.cluster.resp import RespError
+from app.cluster.stand_in import Keyspace, Subscriber
+
+
+class ClusterBackend:
+    """
+    The Redis-shaped operations the cluster layer needs: strings with
+    NX/XX and expiry (leases, idempotency keys), hashes (window summaries)
+    and pub/sub (frames, alerts, decisions). Subclasses provide `_call`
+    (one command, returning its RESP reply) and `subscribe`.
+    """
+
+    async def _call(self, *args: Any) -> Any:
+        raise NotImplementedError
+
+    async def subscribe(self, channel: str) -> AsyncIterator[bytes]:
+        raise NotImplementedError
+        yield  # pragma: no cover
+
+    async def close(self):
+        pass
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self._call("GET", key)
+
+    async def set(self, key: str, value, nx: bool = False, xx: bool = False, px: Optional[int] = None) -> bool:
+        args = ["SET", key, value] + (["NX"] if nx else []) + (["XX"] if xx else []) + (["PX", px] if px else [])
+        return await self._call(*args) is not None
+
+    async def delete(self, *keys: str) -> int:
+        return await self._call("DEL", *keys)
+
+    async def incr(self, key: str) -> int:
+        return await self._call("INCR", key)
+
+    async def pexpire(self, key: str, ms: int) -> bool:
+        return bool(await self._call("PEXPIRE", key, ms))
+
+    async def hset(self, key: str, mapping: Dict[str, Any]):
+        await self._call("HSET", key, *(item for pair in mapping.items() for item in pair))
+
+    async def hgetall(self, key: str) -> Dict[str, bytes]:
+        flat = await self._call("HGETALL", key)
+        return {flat[i].decode(): flat[i + 1] for i in range(0, len(flat), 2)}
+
+    async def hdel(self, key: str, *fields: str) -> int:
+        return await self._call("HDEL", key, *fields)
+
+    async def publish(self, channel: str, payload: bytes) -> int:
+        return await self._call("PUBLISH", channel, payload)
+
+
+def _args(args) -> list:
+    return [arg if isinstance(arg, bytes) else str(arg).encode() for arg in args]
+
+
+class MemoryBackend(ClusterBackend):
+    """
+    A Keyspace in this process. Several ClusterNodes sharing one instance
+    behave like nodes sharing a Redis (tests, single-process benchmarks).
+    """
+
+    def __init__(self, keyspace: Optional[Keyspace] = None, queue_size: int = 10_000):
+        self.keyspace = keyspace or Keyspace()
+        self.queue_size = queue_size
+
+    async def _call(self, *args):
+        reply = self.keyspace.execute(_args(args))
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+    async def subscribe(self, channel: str) -> AsyncIterator[bytes]:
+        queue: asyncio.Queue = asyncio.Queue(self.queue_size)
+
+        def deliver(_, payload: bytes) -> bool:
+            try:
+                queue.put_nowait(payload)
+            except asyncio.QueueFull:  # a consumer this far behind is dropped, like a slow socket
+                return False
+            return True
+
+        subscriber = Subscriber(deliver)
+        self.keyspace.subscribe(channel.encode(), subscriber)
+        try:
+            while True:
+                yield await queue.get()
+        finally:
+            self.keyspace.unsubscribe(subscriber)
+
+
+class RespBackend(ClusterBackend):
+    """
+    Redis (or the stand-in) over TCP. Commands share one connection, one
+    request/reply at a time; each subscription gets its own connection, as
+    subscribed connections can't run other commands.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 6379, db: int = 0, timeout_s: float = 5.0):
+        self.host, self.port, self.db = host, port, db
+        self.timeout_s = timeout_s
+        self._conn = None
+        self._lock = asyncio.Lock()
+
+    async def _connect(self):
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(self.host, self.port), self.timeout_s)
+        if self.db:
+            writer.write(resp.command("SELECT", self.db))
+            await resp.read(reader)
+        return reader, writer
+
+    async def _call(self, *args):
+        async with self._lock:
+            if self._conn is None:
+                self._conn = await self._connect()
+            reader, writer = self._conn
+            try:
+                writer.write(resp.command(*args))
+                reply = await asyncio.wait_for(resp.read(reader), self.timeout_s)
+            except BaseException as e:
+                # Failed or cancelled mid-call: an unread reply would be taken as the next command's, so drop the
+                # connection and reconnect on the next call
+                writer.close()
+                self._conn = None
+                if isinstance(e, (OSError, asyncio.TimeoutError, asyncio.IncompleteReadError)):
+                    raise ConnectionError(f"Cluster backend {self.host}:{self.port} unavailable") from e
+                raise
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+    async def subscribe(self, channel: str) -> AsyncIterator[bytes]:
+        reader, writer = await self._connect()
+        try:
+            writer.write(resp.command("SUBSCRIBE", channel))
+            await resp.read(reader)  # the subscribe confirmation
+            while True:
+                message = await resp.read(reader)
+                if isinstance(message, list) and message[0] == b"message":
+                    yield message[2]
+        finally:
+            writer.close()
+
+    async def close(self):
+        if self._conn is not None:
+            self._conn[1].close()
+            self._conn = None
+
+
+def make_backend(url: str) -> ClusterBackend:
+    """memory:// (this process only) or redis://host:port[/db] (Redis or the stand-in)."""
+    parsed = urlparse(url)
+    if parsed.scheme == "memory":
+        return MemoryBackend()
+    if parsed.scheme == "redis":
+        return RespBackend(parsed.hostname or "127.0.0.1", parsed.port or 6379, int(parsed.path.strip("/") or 0))
+    raise ValueError(f"Unsupported CLUSTER_URL scheme: {url}")
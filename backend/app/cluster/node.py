@@ -0,0 +1,277 @@
+import asyncio
+import json
+import os
+import socket
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+from app.analytics.rolling import WindowSummary
+from app.cluster.backend import ClusterBackend
+
+PREFIX = "paysentinel:"
+LEADER_KEY = PREFIX + "leader"
+EPOCH_KEY = PREFIX + "leader_epoch"
+WINDOWS_KEY = PREFIX + "windows"
+ONCE_PREFIX = PREFIX + "once:"
+FRAMES = PREFIX + "frames"
+ALERTS = PREFIX + "alerts"
+DECISIONS = PREFIX + "decisions"
+
+
+class ClusterNode:
+    """
+    One API worker/replica's view of the cluster, over a ClusterBackend.
+
+    - Leadership: a lease key (SET NX PX), renewed every lease_s/3 by its
+      holder. Only the leader opens incidents and runs Manager actions;
+      each new term bumps a shared epoch. Renewal is GET-then-SET XX, so two
+      nodes can briefly both think they lead around an expiry; actions are
+      guarded by idempotency keys for that reason.
+    - Detector state: every sync_s each node writes its per-issuer window
+      summaries into one hash (a timestamped field per node) and reads all
+      of them back. `windows` is their merge, the same on every node after a
+      sync; nodes silent for stale_s drop out (wall clock, so hosts need
+      NTP).
+    - Actions: `run_once` claims an idempotency key before acting, so an
+      action runs once cluster-wide within its TTL, across leader changes.
+    - Fan-out: frames, forwarded alerts and decision records go over
+      pub/sub, tagged with the sender so nodes skip their own. Frames are
+      queued and sent by one task, so the pipeline never waits on the
+      backend; whatever queued up meanwhile goes out as one message.
+    """
+
+    def __init__(self, backend: ClusterBackend, node_id: Optional[str] = None, lease_s: float = 5.0,
+                 sync_s: float = 0.5, stale_s: Optional[float] = None, max_outbox_frames: int = 10_000):
+        self.backend = backend
+        self.node_id = node_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_s = lease_s
+        self.sync_s = sync_s
+        self.stale_s = stale_s or sync_s * 6
+        self.is_leader = False
+        self.leader: Optional[str] = None
+        self.epoch = 0
+        self.windows: Dict[str, WindowSummary] = {}
+        self.nodes: List[str] = []
+        self.max_outbox_frames = max_outbox_frames
+        self.counts = {"frames_published": 0, "frames_dropped": 0, "frames_received": 0, "alerts_forwarded": 0,
+                       "alerts_received": 0, "decisions_published": 0, "decisions_received": 0, "actions_run": 0,
+                       "actions_suppressed": 0, "leader_terms": 0, "syncs": 0, "backend_errors": 0}
+        self.last_error: Optional[str] = None
+        self._renewed_at = 0.0
+        self._alerts_sent: Dict[Tuple[str, str], float] = {}
+        self._tasks: List[asyncio.Task] = []
+        self._pending: Set[asyncio.Task] = set()
+        self._outbox: List[str] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self._summaries: Optional[Callable[[], Awaitable[Dict[str, WindowSummary]]]] = None
+        self._on_sync: Optional[Callable[["ClusterNode"], None]] = None
+
+    async def start(self, summaries: Callable[[], Awaitable[Dict[str, WindowSummary]]],
+                    on_sync: Optional[Callable[["ClusterNode"], None]] = None,
+                    on_frames: Optional[Callable[[bytes], None]] = None,
+                    on_alert: Optional[Callable[[bytes], None]] = None,
+                    on_decision: Optional[Callable[[bytes], None]] = None):
+        """Campaign and sync once (so leadership is known when this returns), then keep both going."""
+        self._summaries, self._on_sync = summaries, on_sync
+        for channel, handle in ((FRAMES, on_frames), (ALERTS, on_alert), (DECISIONS, on_decision)):
+            if handle is not None:
+                self._tasks.append(asyncio.create_task(self._listen(channel, handle)))
+        await self._guarded(self._campaign)
+        await self._guarded(self._sync)
+        self._tasks += [asyncio.create_task(self._every(self.lease_s / 3, self._campaign)),
+                        asyncio.create_task(self._every(self.sync_s, self._sync))]
+
+    async def stop(self):
+        for task in self._tasks + ([self._flusher] if self._flusher else []):
+            task.cancel()
+        self._tasks, self._flusher = [], None
+        try:
+            if self.is_leader and await self.backend.get(LEADER_KEY) == self.node_id.encode():
+                await self.backend.delete(LEADER_KEY)  # hand over now instead of after the lease runs out
+            await self.backend.hdel(WINDOWS_KEY, self.node_id)
+        except Exception as e:
+            self._error(e)
+        self.is_leader = False
+        await self.backend.close()
+
+    async def _every(self, interval_s: float, step: Callable[[], Awaitable[None]]):
+        while True:
+            await asyncio.sleep(interval_s)
+            await self._guarded(step)
+
+    async def _guarded(self, step: Callable[[], Awaitable[None]]):
+        try:
+            await step()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._error(e)
+            # Can't reach the backend: a leader that can't renew stops acting before its lease could pass on
+            if self.is_leader and time.monotonic() - self._renewed_at > self.lease_s * 2 / 3:
+                self._step_down(None)
+
+    def _error(self, error: Exception):
+        self.counts["backend_errors"] += 1
+        self.last_error = f"{type(error).__name__}: {error}"
+
+    # -- leadership -----------------------------------------------------
+
+    async def _campaign(self):
+        lease_ms = int(self.lease_s * 1000)
+        if self.is_leader:
+            holder = await self.backend.get(LEADER_KEY)
+            if holder == self.node_id.encode() and await self.backend.set(LEADER_KEY, self.node_id, xx=True,
+                                                                          px=lease_ms):
+                self._renewed_at = time.monotonic()
+                return
+            self._step_down(holder)
+        if await self.backend.set(LEADER_KEY, self.node_id, nx=True, px=lease_ms):
+            self._renewed_at = time.monotonic()
+            self.epoch = await self.backend.incr(EPOCH_KEY)
+            self.is_leader, self.leader = True, self.node_id
+            self.counts["leader_terms"] += 1
+            print(f"CLUSTER: {self.node_id} is the leader (epoch {self.epoch})")
+        else:
+            holder = await self.backend.get(LEADER_KEY)
+            self.leader = holder.decode() if holder else None
+
+    def _step_down(self, holder: Optional[bytes]):
+        self.is_leader = False
+        self.leader = holder.decode() if holder else None
+        print(f"CLUSTER: {self.node_id} is no longer the leader (now {self.leader})")
+
+    # -- detector state -------------------------------------------------
+
+    async def _sync(self):
+        now = time.time()
+        local = await self._summaries()
+        await self.backend.hset(WINDOWS_KEY, {self.node_id: json.dumps(
+            {"ts": now, "windows": {issuer: summary.to_list() for issuer, summary in local.items()}})})
+        merged: Dict[str, WindowSummary] = {}
+        live, stale = [], []
+        for node, raw in (await self.backend.hgetall(WINDOWS_KEY)).items():
+            entry = json.loads(raw)
+            if now - entry["ts"] > self.stale_s:
+                stale.append(node)
+                continue
+            live.append(node)
+            for issuer, values in entry["windows"].items():
+                summary = WindowSummary(*values)
+                merged[issuer] = merged[issuer].merge(summary) if issuer in merged else summary
+        if stale and self.is_leader:
+            await self.backend.hdel(WINDOWS_KEY, *stale)
+        self.windows, self.nodes = merged, sorted(live)
+        self.counts["syncs"] += 1
+        if self._on_sync is not None:
+            self._on_sync(self)
+
+    # -- pub/sub --------------------------------------------------------
+
+    async def _listen(self, channel: str, handle: Callable[[bytes], None]):
+        me = self.node_id.encode()
+        while True:
+            try:
+                async for message in self.backend.subscribe(channel):
+                    sender, _, payload = message.partition(b"\n")
+                    if sender != me:
+                        try:
+                            handle(payload)
+                        except Exception as e:
+                            print(f"CLUSTER HANDLER ERROR ({channel}): {e}")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._error(e)
+            await asyncio.sleep(self.sync_s)  # resubscribe
+
+    async def _publish(self, channel: str, payload: bytes):
+        try:
+            await self.backend.publish(channel, self.node_id.encode() + b"\n" + payload)
+        except Exception as e:
+            self._error(e)
+
+    def _spawn(self, coro: Awaitable[None]):
+        task = asyncio.ensure_future(coro)
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    def publish_frames(self, frames: List[str]):
+        """Queue frames for the other nodes (the oldest are dropped past max_outbox_frames)."""
+        self._outbox.extend(frames)
+        if len(self._outbox) > self.max_outbox_frames:
+            dropped = len(self._outbox) - self.max_outbox_frames
+            del self._outbox[:dropped]
+            self.counts["frames_dropped"] += dropped
+        if self._outbox and (self._flusher is None or self._flusher.done()):
+            self._flusher = asyncio.ensure_future(self._flush_frames())
+
+    async def _flush_frames(self):
+        # Frames are single-line JSON, so a batch is newline-joined into one message
+        while self._outbox:
+            frames, self._outbox = self._outbox, []
+            self.counts["frames_published"] += len(frames)
+            await self._publish(FRAMES, "\n".join(frames).encode())
+
+    def received_frames(self, payload: bytes) -> List[str]:
+        frames = payload.decode().split("\n")
+        self.counts["frames_received"] += len(frames)
+        return frames
+
+    def forward_alert(self, issuer: str, alert_type: str):
+        """Hand a locally detected alert to the leader (at most one per issuer and type per sync interval)."""
+        now = time.monotonic()
+        if now - self._alerts_sent.get((issuer, alert_type), -self.sync_s) < self.sync_s:
+            return
+        self._alerts_sent[(issuer, alert_type)] = now
+        self.counts["alerts_forwarded"] += 1
+        self._spawn(self._publish(ALERTS, json.dumps([issuer, alert_type]).encode()))
+
+    def received_alert(self, payload: bytes) -> Tuple[str, str]:
+        self.counts["alerts_received"] += 1
+        issuer, alert_type = json.loads(payload)
+        return issuer, alert_type
+
+    def publish_decision(self, record: Dict[str, Any]):
+        self.counts["decisions_published"] += 1
+        self._spawn(self._publish(DECISIONS, json.dumps(record, default=str).encode()))
+
+    def received_decision(self, payload: bytes) -> Dict[str, Any]:
+        self.counts["decisions_received"] += 1
+        return json.loads(payload)
+
+    # -- idempotent actions ---------------------------------------------
+
+    async def run_once(self, key: str, ttl_s: float, action: Callable[[], Awaitable[Any]]) -> Tuple[bool, Any]:
+        """
+        Run `action` unless some node already claimed `key` in the last
+        `ttl_s`. Returns (True, its result), or (False, the claim record:
+        node, epoch, state and the result once done).
+        """
+        full_key, ttl_ms = ONCE_PREFIX + key, int(ttl_s * 1000)
+        claim = {"node": self.node_id, "epoch": self.epoch, "state": "running", "claimed_at": time.time()}
+        if not await self.backend.set(full_key, json.dumps(claim), nx=True, px=ttl_ms):
+            self.counts["actions_suppressed"] += 1
+            raw = await self.backend.get(full_key)
+            return False, json.loads(raw) if raw else None
+        try:
+            result = await action()
+        except BaseException:
+            await self.backend.delete(full_key)  # failed or cancelled: let a retry (or the next leader) run it
+            raise
+        await self.backend.set(full_key, json.dumps({**claim, "state": "done", "result": result}, default=str),
+                               xx=True, px=ttl_ms)
+        self.counts["actions_run"] += 1
+        return True, result
+
+    async def forget(self, key: str):
+        """Release an idempotency key (e.g. the action was rolled back and may run again)."""
+        await self.backend.delete(ONCE_PREFIX + key)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "node_id": self.node_id, "is_leader": self.is_leader, "leader": self.leader, "epoch": self.epoch,
+            "nodes": self.nodes, **self.counts, "last_error": self.last_error,
+            "windows": {issuer: {"samples": s.count, "success_rate": round(s.success_rate(), 4),
+                                 "mean_latency_ms": round(s.mean(), 1)}
+                        for issuer, s in sorted(self.windows.items()) if s.count},
+        }
@@ -0,0 +1,60 @@
+import asyncio
+from typing import Any
+
+
+class RespError(Exception):
+    """An error reply ("-ERR ...")."""
+
+
+class SimpleString(str):
+    """A status reply ("+OK")."""
+
+
+def _bulk(value: bytes) -> bytes:
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def encode(value: Any) -> bytes:
+    """One RESP2 value: None is a null bulk string, str/bytes are bulk strings, lists are arrays."""
+    if value is None:
+        return b"$-1\r\n"
+    if isinstance(value, RespError):
+        return b"-%s\r\n" % str(value).encode()
+    if isinstance(value, SimpleString):
+        return b"+%s\r\n" % value.encode()
+    if isinstance(value, bool) or isinstance(value, int):
+        return b":%d\r\n" % value
+    if isinstance(value, str):
+        return _bulk(value.encode())
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return _bulk(bytes(value))
+    if isinstance(value, (list, tuple)):
+        return b"*%d\r\n" % len(value) + b"".join(encode(item) for item in value)
+    raise TypeError(f"Can't encode {type(value).__name__} as RESP")
+
+
+def command(*args: Any) -> bytes:
+    """A command as sent by clients: an array of bulk strings."""
+    parts = [arg if isinstance(arg, bytes) else str(arg).encode() for arg in args]
+    return b"*%d\r\n" % len(parts) + b"".join(_bulk(part) for part in parts)
+
+
+async def read(reader: asyncio.StreamReader) -> Any:
+    """Read one value. Error replies are returned (as RespError), not raised."""
+    line = await reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("Connection closed")
+    kind, body = line[:1], line[1:-2]
+    if kind == b"+":
+        return SimpleString(body.decode())
+    if kind == b"-":
+        return RespError(body.decode())
+    if kind == b":":
+        return int(body)
+    if kind == b"$":
+        size = int(body)
+        return None if size < 0 else (await reader.readexactly(size + 2))[:-2]
+    if kind == b"*":
+        size = int(body)
+        return None if size < 0 else [await read(reader) for _ in range(size)]
+    raise RespError(f"Protocol error: unexpected {line[:32]!r}")
@@ -0,0 +1,257 @@
+"""
+Local stand-in for the Redis the cluster layer talks to: the handful of
+commands ClusterNode uses (strings with NX/XX and expiry, INCR, hashes,
+pub/sub), in memory, over the real wire protocol. For tests, benchmarks
+and laptops; point CLUSTER_URL at a real Redis in production.
+
+Run:  python -m app.cluster.stand_in [--port 6390]
+"""
+import argparse
+import asyncio
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from app.cluster import resp
+from app.cluster.resp import RespError, SimpleString
+
+OK = SimpleString("OK")
+# Like Redis' client-output-buffer-limit for pub/sub: a subscriber this far behind is dropped
+SUBSCRIBER_BUFFER_LIMIT = 32 * 1024 * 1024
+
+
+class Subscriber:
+    """Where a channel's messages go: a queue in process, or a socket (see StandInServer)."""
+
+    def __init__(self, deliver: Callable[[bytes, bytes], bool]):
+        self.deliver = deliver  # (channel, payload) -> False if the subscriber should be dropped
+
+
+class Keyspace:
+    """
+    The in-memory side of the stand-in. Keys expire lazily, when next
+    touched (plus a sweep every `sweep_every` writes). `execute` takes a
+    command as a list of bytes and returns a RESP value, so the TCP server
+    and the in-process MemoryBackend share every semantic.
+    """
+
+    def __init__(self, sweep_every: int = 1000):
+        self.data: Dict[bytes, Any] = {}  # bytes for strings, dict for hashes
+        self.expires: Dict[bytes, float] = {}  # key -> monotonic deadline
+        self.channels: Dict[bytes, Set[Subscriber]] = {}
+        self.sweep_every = sweep_every
+        self._writes = 0
+        self.commands = 0
+        self.published = 0
+
+    def _live(self, key: bytes) -> Optional[Any]:
+        deadline = self.expires.get(key)
+        if deadline is not None and time.monotonic() >= deadline:
+            self.data.pop(key, None)
+            del self.expires[key]
+        return self.data.get(key)
+
+    def _write(self, key: bytes, value: Any, px: Optional[int] = None):
+        self.data[key] = value
+        if px is None:
+            self.expires.pop(key, None)
+        else:
+            self.expires[key] = time.monotonic() + px / 1000
+        self._writes += 1
+        if self._writes % self.sweep_every == 0:
+            now = time.monotonic()
+            for stale in [k for k, deadline in self.expires.items() if now >= deadline]:
+                self.data.pop(stale, None)
+                del self.expires[stale]
+
+    def _hash(self, key: bytes) -> Dict[bytes, bytes]:
+        value = self._live(key)
+        if value is None:
+            return {}
+        if not isinstance(value, dict):
+            raise RespError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def subscribe(self, channel: bytes, subscriber: Subscriber) -> int:
+        self.channels.setdefault(channel, set()).add(subscriber)
+        return len(self.channels[channel])
+
+    def unsubscribe(self, subscriber: Subscriber):
+        for channel in list(self.channels):
+            self.channels[channel].discard(subscriber)
+            if not self.channels[channel]:
+                del self.channels[channel]
+
+    def execute(self, args: List[bytes]) -> Any:
+        self.commands += 1
+        handler = getattr(self, "cmd_" + args[0].decode().lower(), None) if args else None
+        if handler is None:
+            return RespError(f"ERR unknown command '{args[0].decode() if args else ''}'")
+        try:
+            return handler(*args[1:])
+        except RespError as e:
+            return e
+        except (TypeError, ValueError):
+            return RespError(f"ERR wrong arguments for '{args[0].decode()}'")
+
+    # -- commands (the subset ClusterNode uses) -------------------------
+
+    def cmd_ping(self, *args):
+        return args[0] if args else SimpleString("PONG")
+
+    def cmd_get(self, key):
+        value = self._live(key)
+        if isinstance(value, dict):
+            raise RespError("WRONGTYPE Operation against a key holding the wrong kind of value")
+        return value
+
+    def cmd_set(self, key, value, *options):
+        px, nx, xx, i = None, False, False, 0
+        while i < len(options):
+            option = options[i].upper()
+            if option == b"NX":
+                nx = True
+            elif option == b"XX":
+                xx = True
+            elif option in (b"PX", b"EX"):
+                i += 1
+                px = int(options[i]) * (1000 if option == b"EX" else 1)
+            else:
+                raise RespError("ERR syntax error")
+            i += 1
+        exists = self._live(key) is not None
+        if (nx and exists) or (xx and not exists):
+            return None
+        self._write(key, value, px)
+        return OK
+
+    def cmd_del(self, *keys):
+        removed = 0
+        for key in keys:
+            if self._live(key) is not None:
+                del self.data[key]
+                self.expires.pop(key, None)
+                removed += 1
+        return removed
+
+    def cmd_pexpire(self, key, ms):
+        if self._live(key) is None:
+            return 0
+        self.expires[key] = time.monotonic() + int(ms) / 1000
+        return 1
+
+    def cmd_incr(self, key):
+        value = int(self._live(key) or 0) + 1
+        self.data[key] = str(value).encode()
+        return value
+
+    def cmd_hset(self, key, *pairs):
+        if not pairs or len(pairs) % 2:
+            raise ValueError
+        fields = self._hash(key)
+        added = sum(field not in fields for field in pairs[::2])
+        fields.update(zip(pairs[::2], pairs[1::2]))
+        if key not in self.data:
+            self._write(key, fields)
+        return added
+
+    def cmd_hgetall(self, key):
+        return [item for pair in self._hash(key).items() for item in pair]
+
+    def cmd_hdel(self, key, *fields):
+        values = self._hash(key)
+        removed = sum(values.pop(field, None) is not None for field in fields)
+        if not values and key in self.data:
+            del self.data[key]
+            self.expires.pop(key, None)
+        return removed
+
+    def cmd_publish(self, channel, payload):
+        subscribers = self.channels.get(channel, ())
+        self.published += 1
+        dropped = [s for s in subscribers if not s.deliver(channel, payload)]
+        for subscriber in dropped:
+            self.unsubscribe(subscriber)
+        return len(subscribers) - len(dropped)
+
+
+class StandInServer:
+    """The Keyspace over TCP, speaking RESP2 (so redis-cli and Redis clients work against it)."""
+
+    def __init__(self, keyspace: Optional[Keyspace] = None):
+        self.keyspace = keyspace or Keyspace()
+        self.connections = 0
+        self.server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 6390) -> "StandInServer":
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        subscriber = None
+        try:
+            while True:
+                args = await resp.read(reader)
+                if not isinstance(args, list) or not args:
+                    writer.write(resp.encode(RespError("ERR expected a command array")))
+                    continue
+                if args[0].upper() == b"SUBSCRIBE":
+                    if subscriber is None:
+                        subscriber = Subscriber(lambda channel, payload: self._push(writer, channel, payload))
+                    for channel in args[1:]:
+                        count = self.keyspace.subscribe(channel, subscriber)
+                        writer.write(resp.encode([b"subscribe", channel, count]))
+                else:
+                    writer.write(resp.encode(self.keyspace.execute(args)))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if subscriber is not None:
+                self.keyspace.unsubscribe(subscriber)
+            writer.close()
+
+    @staticmethod
+    def _push(writer: asyncio.StreamWriter, channel: bytes, payload: bytes) -> bool:
+        if writer.is_closing() or writer.transport.get_write_buffer_size() > SUBSCRIBER_BUFFER_LIMIT:
+            writer.close()
+            return False
+        writer.write(resp.encode([b"message", channel, payload]))
+        return True
+
+    async def close(self):
+        if self.server is not None:
+            self.server.close()
+            await self.server.wait_closed()
+
+
+def serve_in_thread(port: int, host: str = "127.0.0.1") -> StandInServer:
+    """Run a stand-in on its own event loop in a daemon thread (benchmarks)."""
+    server = StandInServer()
+    started = threading.Event()
+
+    def run():
+        loop = asyncio.new_event_loop()
+        loop.run_until_complete(server.start(host, port))
+        started.set()
+        loop.run_forever()
+
+    threading.Thread(target=run, name="cluster-stand-in", daemon=True).start()
+    started.wait()
+    return server
+
+
+async def _main(host: str, port: int):
+    server = await StandInServer().start(host, port)
+    print(f"Cluster stand-in listening on {host}:{port}")
+    async with server.server:
+        await server.server.serve_forever()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="In-memory Redis stand-in for PaySentinel cluster mode")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=6390)
+    args = parser.parse_args()
+    asyncio.run(_main(args.host, args.port))
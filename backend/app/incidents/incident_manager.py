@@ -0,0 +1,146 @@
+import itertools
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+
+# Alert count within one incident at which it reaches each severity
+SEVERITY_LEVELS: List[Tuple[int, str]] = [(1, "low"), (10, "medium"), (50, "high"), (200, "critical")]
+
+
+def severity_for(alert_count: int) -> str:
+    level = SEVERITY_LEVELS[0][1]
+    for threshold, name in SEVERITY_LEVELS:
+        if alert_count >= threshold:
+            level = name
+    return level
+
+
+def severity_rank(severity: str) -> int:
+    return [name for _, name in SEVERITY_LEVELS].index(severity)
+
+
+@dataclass
+class Incident:
+    incident_id: str
+    issuer: str
+    alert_type: str
+    opened_at: datetime
+    severity: str = "low"
+    status: str = "open"
+    alert_count: int = 0
+    investigations: int = 0
+    dispatched_severity: Optional[str] = None
+    last_alert: float = 0.0  # monotonic
+    last_dispatch: float = 0.0  # monotonic
+    investigating: bool = False
+
+    def to_dict(self) -> Dict:
+        return {
+            "incident_id": self.incident_id,
+            "issuer": self.issuer,
+            "alert_type": self.alert_type,
+            "opened_at": self.opened_at.isoformat(),
+            "severity": self.severity,
+            "status": self.status,
+            "alert_count": self.alert_count,
+            "investigations": self.investigations,
+            "investigating": self.investigating,
+        }
+
+
+class IncidentManager:
+    """
+    Coalesces Watchdog alerts into one open incident per (issuer, alert_type).
+
+    `observe` is called for every alert and returns the incident only when it
+    should be (re)investigated: when it opens, when its severity escalates,
+    or when it is still firing after `cooldown_s`. Everything else is just
+    counted, so Analyst/Manager work scales with incidents, not transactions.
+    Incidents resolve after `ttl_s` without alerts. At most `max_in_flight`
+    investigations run at once; a dispatch skipped for that reason is retried
+    on the incident's next alert.
+    """
+
+    def __init__(self, ttl_s: float = 60.0, cooldown_s: float = 30.0,
+                 max_in_flight: int = 4, history_size: int = 100):
+        self.ttl_s = ttl_s
+        self.cooldown_s = cooldown_s
+        self.max_in_flight = max_in_flight
+        self.open: Dict[Tuple[str, str], Incident] = {}
+        self.resolved: deque = deque(maxlen=history_size)
+        self.in_flight = 0
+        self.alerts_seen = 0
+        self.dispatches = 0
+        self._ids = itertools.count(1)
+
+    def observe(self, issuer: str, alert_type: str, now: float = None) -> Optional[Incident]:
+        now = time.monotonic() if now is None else now
+        self.alerts_seen += 1
+        key = (issuer, alert_type)
+
+        incident = self.open.get(key)
+        if incident is not None and now - incident.last_alert > self.ttl_s:
+            self._resolve(key)
+            incident = None
+        if incident is None:
+            incident = Incident(
+                incident_id=f"inc_{next(self._ids):06d}",
+                issuer=issuer,
+                alert_type=alert_type,
+                opened_at=datetime.now(),
+            )
+            self.open[key] = incident
+
+        incident.alert_count += 1
+        incident.last_alert = now
+        incident.severity = severity_for(incident.alert_count)
+
+        if not self._should_dispatch(incident, now):
+            return None
+
+        incident.investigating = True
+        incident.investigations += 1
+        incident.last_dispatch = now
+        incident.dispatched_severity = incident.severity
+        self.in_flight += 1
+        self.dispatches += 1
+        return incident
+
+    def _should_dispatch(self, incident: Incident, now: float) -> bool:
+        if incident.investigating or self.in_flight >= self.max_in_flight:
+            return False
+        if incident.dispatched_severity is None:
+            return True
+        if severity_rank(incident.severity) > severity_rank(incident.dispatched_severity):
+            return True
+        return now - incident.last_dispatch >= self.cooldown_s
+
+    def complete(self, incident: Incident):
+        """Mark the incident's in-flight investigation as finished."""
+        if incident.investigating:
+            incident.investigating = False
+            self.in_flight -= 1
+
+    def expire(self, now: float = None) -> List[Incident]:
+        """Resolve every incident that has been quiet for longer than ttl_s."""
+        now = time.monotonic() if now is None else now
+        stale = [key for key, inc in self.open.items() if now - inc.last_alert > self.ttl_s]
+        return [self._resolve(key) for key in stale]
+
+    def _resolve(self, key: Tuple[str, str]) -> Incident:
+        incident = self.open.pop(key)
+        incident.status = "resolved"
+        self.resolved.append(incident)
+        return incident
+
+    def snapshot(self) -> Dict:
+        self.expire()
+        return {
+            "open": [inc.to_dict() for inc in self.open.values()],
+            "resolved": [inc.to_dict() for inc in reversed(self.resolved)],
+            "alerts_seen": self.alerts_seen,
+            "dispatches": self.dispatches,
+            "in_flight": self.in_flight,
+        }
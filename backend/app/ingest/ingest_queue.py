@@ -0,0 +1,90 @@
+import asyncio
+from collections import deque
+from typing import Any, Deque, Dict
+
+from app.models.transaction_batch import TransactionBatch
+
+
+class IngestQueue:
+    """
+    Bounded queue of TransactionBatch chunks between the sources and the
+    detection pipeline, sized in rows rather than items so one huge POST
+    can't slip past the limit.
+
+    Sources either `offer` (non-blocking; a False return becomes a 429) or
+    `put` (waits for room, which is how streaming sources push back on their
+    senders). The pipeline drains with `get_batch`, which coalesces queued
+    chunks into one batch of up to `max_rows`.
+    """
+
+    def __init__(self, max_rows: int = 100_000):
+        self.max_rows = max_rows
+        self._chunks: Deque[TransactionBatch] = deque()
+        self.rows = 0
+        self._not_empty = asyncio.Event()
+        self._has_room = asyncio.Event()
+        self._has_room.set()
+        self.accepted = 0
+        self.rejected = 0
+        self.high_watermark = 0
+
+    @property
+    def credits(self) -> int:
+        """Rows that can be queued right now."""
+        return max(0, self.max_rows - self.rows)
+
+    def _push(self, batch: TransactionBatch):
+        self._chunks.append(batch)
+        self.rows += len(batch)
+        self.accepted += len(batch)
+        self.high_watermark = max(self.high_watermark, self.rows)
+        self._not_empty.set()
+        if self.rows >= self.max_rows:
+            self._has_room.clear()
+
+    def offer(self, batch: TransactionBatch) -> bool:
+        if not len(batch):
+            return True
+        if len(batch) > self.credits:
+            self.rejected += len(batch)
+            return False
+        self._push(batch)
+        return True
+
+    async def put(self, batch: TransactionBatch):
+        """Queue a batch, waiting while the queue is full (a batch bigger than max_rows waits for an empty queue)."""
+        if not len(batch):
+            return
+        while self.rows and len(batch) > self.credits:
+            self._has_room.clear()
+            await self._has_room.wait()
+        self._push(batch)
+
+    async def get_batch(self, max_rows: int = 5_000) -> TransactionBatch:
+        """Wait for data, then take up to `max_rows` rows (whole chunks, splitting the last if needed)."""
+        while not self._chunks:
+            self._not_empty.clear()
+            await self._not_empty.wait()
+        taken, rows = [], 0
+        while self._chunks and rows < max_rows:
+            chunk = self._chunks.popleft()
+            room = max_rows - rows
+            if len(chunk) > room:
+                self._chunks.appendleft(chunk[room:])
+                chunk = chunk[:room]
+            taken.append(chunk)
+            rows += len(chunk)
+        self.rows -= rows
+        if self.rows < self.max_rows:
+            self._has_room.set()
+        return taken[0] if len(taken) == 1 else TransactionBatch.concat(taken)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "rows": self.rows,
+            "max_rows": self.max_rows,
+            "credits": self.credits,
+            "accepted": self.accepted,
+            "rejected": self.rejected,
+            "high_watermark": self.high_watermark,
+        }
@@ -0,0 +1,69 @@
+import asyncio
+from typing import Any, Dict, List, Sequence, Tuple
+
+from pydantic import ValidationError
+
+from app.models.transaction import TransactionSchema
+from app.models.transaction_batch import TransactionBatch
+
+MAX_REPORTED_ERRORS = 10
+# Below this many lines validation is cheaper than a hop to a worker thread
+INLINE_PARSE_LINES = 256
+
+
+def parse_lines(lines: Sequence[bytes]) -> Tuple[TransactionBatch, int, List[Dict[str, Any]]]:
+    """
+    Validate NDJSON lines as TransactionSchema and pack them into a batch.
+    Returns (batch, rejected line count, the first few errors). Blank lines
+    are skipped; invalid ones, and valid ones whose values don't fit the
+    batch columns, are rejected without failing the rest.
+    """
+    schemas: List[TransactionSchema] = []
+    errors: List[Dict[str, Any]] = []
+    rejected = 0
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            tx = TransactionSchema.model_validate_json(line)
+        except ValidationError as e:
+            first = e.errors(include_url=False)[0]
+            problem = ".".join(str(p) for p in first["loc"]), first["msg"]
+        else:
+            problem = TransactionBatch.out_of_range(tx)
+            if problem is None:
+                schemas.append(tx)
+                continue
+        rejected += 1
+        if len(errors) < MAX_REPORTED_ERRORS:
+            errors.append({"line": number, "field": problem[0], "error": problem[1]})
+    return TransactionBatch.from_schemas(schemas), rejected, errors
+
+
+async def parse_lines_async(lines: Sequence[bytes]) -> Tuple[TransactionBatch, int, List[Dict[str, Any]]]:
+    """parse_lines, off the event loop for anything but small payloads."""
+    if len(lines) <= INLINE_PARSE_LINES:
+        return parse_lines(lines)
+    return await asyncio.to_thread(parse_lines, lines)
+
+
+class LineSplitter:
+    """Reassembles NDJSON lines from a byte stream that splits them arbitrarily."""
+
+    def __init__(self, max_line_bytes: int = 64 * 1024):
+        self.max_line_bytes = max_line_bytes
+        self._partial = b""
+        self.oversized = 0
+
+    def feed(self, chunk: bytes) -> List[bytes]:
+        lines = (self._partial + chunk).split(b"\n")
+        self._partial = lines.pop()
+        if len(self._partial) > self.max_line_bytes:
+            # Not a transaction; drop it rather than buffer without bound
+            self._partial = b""
+            self.oversized += 1
+        return lines
+
+    def flush(self) -> List[bytes]:
+        rest, self._partial = self._partial, b""
+        return [rest] if rest.strip() else []
@@ -0,0 +1,106 @@
+import asyncio
+import json
+from typing import Any, Dict
+
+from fastapi import WebSocket
+
+from app.ingest.ingest_queue import IngestQueue
+from app.ingest.ndjson import LineSplitter, parse_lines_async
+from app.simulator.chaos_simulator import ChaosSimulator
+
+
+class SimulatorSource:
+    """The chaos simulator as just another feed: columnar ticks into the ingest queue."""
+
+    name = "simulator"
+
+    def __init__(self, simulator: ChaosSimulator):
+        self.simulator = simulator
+        self.rows = 0
+
+    async def run(self, queue: IngestQueue):
+        async for batch in self.simulator.run_batches():
+            # A full queue stalls the generator, so the simulator sheds load like any sender
+            await queue.put(batch)
+            self.rows += len(batch)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"rows": self.rows}
+
+
+class TcpSource:
+    """
+    NDJSON over plain TCP, one transaction per line. Each chunk read is parsed
+    and queued with an awaited put before the next read, so when the pipeline
+    falls behind the socket buffers fill and the sender blocks (TCP does the
+    backpressure for us).
+    """
+
+    name = "tcp"
+
+    def __init__(self, host: str = "0.0.0.0", port: int = 9100, read_bytes: int = 256 * 1024):
+        self.host = host
+        self.port = port
+        self.read_bytes = read_bytes
+        self.connections = 0
+        self.rows = 0
+        self.rejected = 0
+
+    async def run(self, queue: IngestQueue):
+        server = await asyncio.start_server(lambda r, w: self._serve(r, w, queue), self.host, self.port)
+        print(f"TCP ingest listening on {self.host}:{self.port}")
+        async with server:
+            await server.serve_forever()
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, queue: IngestQueue):
+        self.connections += 1
+        splitter = LineSplitter()
+        try:
+            while True:
+                chunk = await reader.read(self.read_bytes)
+                lines = splitter.feed(chunk) if chunk else splitter.flush()
+                if lines:
+                    batch, rejected, _ = await parse_lines_async(lines)
+                    await queue.put(batch)
+                    self.rows += len(batch)
+                    self.rejected += rejected
+                if not chunk:
+                    break
+        except ConnectionError:
+            pass
+        finally:
+            self.rejected += splitter.oversized
+            self.connections -= 1
+            writer.close()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"port": self.port, "connections": self.connections, "rows": self.rows, "rejected": self.rejected}
+
+
+async def serve_websocket(websocket: WebSocket, queue: IngestQueue, window_rows: int):
+    """
+    Credit-based NDJSON ingest over a WebSocket.
+
+    The server opens with {"type": "credit", "credits": window_rows}; each
+    text message may carry up to that many lines. Every message is answered
+    with an ack once its rows are queued, returning the credits it used, so a
+    client that only sends while it holds credits never has more than one
+    window in flight and simply stalls while the pipeline catches up. Lines
+    beyond the client's credits are rejected, not queued.
+    """
+    await websocket.accept()
+    credits = window_rows
+    await websocket.send_text(json.dumps({"type": "credit", "credits": credits}))
+    while True:
+        lines = (await websocket.receive_text()).encode().splitlines()
+        lines = [line for line in lines if line.strip()]
+        over = max(0, len(lines) - credits)
+        batch, rejected, errors = await parse_lines_async(lines[:credits])
+        await queue.put(batch)
+        await websocket.send_text(json.dumps({
+            "type": "ack",
+            "accepted": len(batch),
+            "rejected": rejected + over,
+            "errors": errors,
+            "credits": min(len(lines), credits),
+        }))
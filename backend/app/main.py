@@ -1,18 +1,41 @@
 import asyncio
 import json
-from datetime import datetime
-from typing import List
+import os
+import time
+from typing import Dict, List, Optional, Set
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect
+import numpy as np
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 
+from app.models import transaction_batch as batch_codes
 from app.models.transaction import TransactionSchema
 from app.simulator.chaos_simulator import ChaosSimulator
+from app.simulator.injection_rules import parse_bin_range
+from app.routing.routing_table import default_table
 from app.agents.watchdog import WatchdogAgent
-from app.agents.analyst import AnalystAgent
+from app.agents.sharded_watchdog import ShardedWatchdog
+from app.analytics.batch import ALERT_LABELS
+from app.agents.analyst import DEFAULT_MAX_CONCURRENCY as ANALYST_MAX_CONCURRENCY, AnalystAgent
 from app.agents.manager import ManagerAgent
 from app.agents.assistant import AssistantAgent
+from app.agents.registry import AgentRegistry
+from app.incidents.incident_manager import Incident, IncidentManager
+from app.analytics.rollups import RollupEngine
+from app.ingest.ingest_queue import IngestQueue
+from app.ingest.ndjson import parse_lines_async
+from app.ingest.sources import SimulatorSource, TcpSource, serve_websocket
+from app.streaming.broadcaster import Broadcaster
+from app.streaming.wire import dumps, encode_transaction_frame
+from app.cluster.backend import make_backend
+from app.cluster.node import ClusterNode
+from app.storage.event_log import EventLog
+from app.storage import segment_log
+from app.storage.segment_log import SegmentLog
+from app.storage.transaction_store import TransactionStore, default_store
+from app.telemetry.metrics import registry as metrics
 
 app = FastAPI(title="PaySentinel API")
 
@@ -25,120 +48,702 @@ app.add_middleware(
 )
 
 # Global instances
-simulator = ChaosSimulator(base_tps=5)
-watchdog = WatchdogAgent()
-analyst = AnalystAgent()
-manager = ManagerAgent()
-assistant = AssistantAgent()
+routing = default_table() # Issuer -> processor weights: RouteTrafficTool writes, the simulator routes by it
+SIMULATOR_SEED = os.getenv("SIMULATOR_SEED") # Fixed seed -> the same generated traffic every run (benchmarks)
+simulator = ChaosSimulator(base_tps=int(os.getenv("SIMULATOR_TPS", "5")),
+                           seed=int(SIMULATOR_SEED) if SIMULATOR_SEED else None, routing=routing)
+# WATCHDOG_SHARDS > 0 runs detection in that many worker processes (batched loop)
+WATCHDOG_SHARDS = int(os.getenv("WATCHDOG_SHARDS", "0"))
+watchdog = ShardedWatchdog(WATCHDOG_SHARDS) if WATCHDOG_SHARDS > 0 else WatchdogAgent()
+MAX_FRAMES_PER_TICK = 50 # Bigger batches broadcast alerted rows plus a sample, not every transaction
+# LLM-backed agents are built on first use (or by the warm-up after startup), not at import
+agents = AgentRegistry()
+agents.register("analyst", AnalystAgent)
+agents.register("assistant", AssistantAgent)
+AGENTS_WARMUP = os.getenv("AGENTS_WARMUP", "1") == "1"
+# Cluster mode (several workers/replicas): CLUSTER_URL=redis://host:port (Redis or app.cluster.stand_in).
+# Nodes merge detector windows, forward alerts to an elected leader that alone runs incidents and
+# Manager actions (behind idempotency keys), and fan broadcast frames out over pub/sub.
+CLUSTER_URL = os.getenv("CLUSTER_URL")
+cluster = ClusterNode(make_backend(CLUSTER_URL), node_id=os.getenv("NODE_ID"),
+                      lease_s=float(os.getenv("CLUSTER_LEASE_S", "5")),
+                      sync_s=float(os.getenv("CLUSTER_SYNC_S", "0.5"))) if CLUSTER_URL else None
+manager = ManagerAgent(coordinator=cluster)
+incidents = IncidentManager(max_in_flight=ANALYST_MAX_CONCURRENCY)
 
-active_connections: List[WebSocket] = []
-global_event_log: List[dict] = [] # In-memory store for recent events
+broadcaster = Broadcaster()
+# 1s/10s/1m/1h traffic rollups per issuer/region/method/processor, for up to ROLLUP_MAX_KEYS such series
+rollups = RollupEngine(max_keys=int(os.getenv("ROLLUP_MAX_KEYS", "4096")))
+event_log = EventLog(capacity=int(os.getenv("EVENT_LOG_CAPACITY", "1000"))) # Recent agent/system events
+alert_tasks: Set[asyncio.Task] = set() # In-flight Analyst/Manager pipelines
+# Durable transactions/events/decisions, and the indexed SQLite store behind the query_database tool.
+# Opened by startup (open_stores), so importing this module doesn't touch the disk.
+store: Optional[SegmentLog] = None
+tx_store: Optional[TransactionStore] = None
+LOG_SNAPSHOT_CHECK_S = 5.0
+TX_STORE_FLUSH_S = float(os.getenv("PAYSENTINEL_DB_FLUSH_S", "1.0"))
+CHAT_CANDIDATE_EVENTS = 500 # Events ranked for /chat context; the token budget decides how many are sent
+
+# Ingestion: every feed (simulator, POST /ingest, /ws/ingest, TCP) goes through one bounded queue
+ingest_queue = IngestQueue(max_rows=int(os.getenv("INGEST_QUEUE_ROWS", "100000")))
+INGEST_BATCH_ROWS = int(os.getenv("INGEST_BATCH_ROWS", "5000")) # Rows per pipeline pass
+INGEST_MAX_BODY_BYTES = int(os.getenv("INGEST_MAX_BODY_BYTES", str(16 * 1024 * 1024)))
+INGEST_WS_WINDOW = int(os.getenv("INGEST_WS_WINDOW", "2000")) # Credits granted to each /ws/ingest client
+sources = []
+if os.getenv("INGEST_SIMULATOR", "1") == "1":
+    sources.append(SimulatorSource(simulator))
+if os.getenv("INGEST_TCP_PORT"):
+    sources.append(TcpSource(port=int(os.environ["INGEST_TCP_PORT"])))
+
+# Instrumentation (GET /metrics). Stage timers are per pipeline pass, or per incident for investigate/decide.
+STAGE_SECONDS = metrics.histogram("paysentinel_stage_seconds", "Time spent in each pipeline stage", ["stage"])
+STAGES = {name: STAGE_SECONDS.labels(name) for name in
+          ("persist", "rollup", "detect", "alert", "serialize", "broadcast", "investigate", "decide")}
+BATCH_ROWS = metrics.histogram("paysentinel_pipeline_batch_rows", "Rows per pipeline pass",
+                               buckets=(1, 10, 50, 100, 500, 1000, 5000, 10000, 50000))
+TRANSACTIONS = metrics.counter("paysentinel_transactions_total", "Transactions processed, per issuer", ["issuer"])
+METRICS_MAX_ISSUERS = int(os.getenv("METRICS_MAX_ISSUERS", "100")) # Issuers past this share the issuer="other" series
+transaction_counters: Dict[int, object] = {} # TRANSACTIONS child per issuer code
+PIPELINE_ERRORS = metrics.counter("paysentinel_pipeline_errors_total", "Pipeline passes that raised")
+metrics.gauge("paysentinel_ingest_queue_rows", "Rows waiting in the ingest queue", lambda: ingest_queue.rows)
+metrics.gauge("paysentinel_investigations_in_flight", "Incident dispatches being investigated",
+              lambda: incidents.in_flight)
+metrics.gauge("paysentinel_alert_pipelines", "Analyst/Manager pipelines running", lambda: len(alert_tasks))
+metrics.gauge("paysentinel_broadcast_clients", "Connected /ws/stream clients", lambda: len(broadcaster.clients))
+metrics.gauge("paysentinel_broadcast_queued_frames", "Frames waiting in client send queues",
+              lambda: broadcaster.stats()["queued"])
+metrics.gauge("paysentinel_chat_sessions", "Open chat sessions",
+              lambda: agents.get("assistant").sessions if agents.loaded("assistant") else None)
+metrics.gauge("paysentinel_log_dropped_records", "Records the durable log dropped (writer queue full)",
+              lambda: store.records_dropped if store is not None else None)
+metrics.gauge("paysentinel_log_write_errors", "Durable log write errors (the writer retries)",
+              lambda: store.write_errors if store is not None else None)
+metrics.gauge("paysentinel_rollup_series", "Series kept by the traffic rollups", lambda: len(rollups.key_codes))
+metrics.gauge("paysentinel_rollup_series_evicted", "Rollup series dropped to make room for new ones",
+              lambda: rollups.keys_evicted)
+metrics.gauge("paysentinel_routing_version", "Current routing table version", lambda: routing.version)
+metrics.gauge("paysentinel_cluster_leader", "1 on the cluster leader (cluster mode)",
+              lambda: int(cluster.is_leader) if cluster is not None else None)
+metrics.gauge("paysentinel_cluster_nodes", "Live nodes as of the last window sync (cluster mode)",
+              lambda: len(cluster.nodes) if cluster is not None else None)
 
 class ChatRequest(BaseModel):
     query: str
 
+class InjectionRequest(BaseModel):
+    injection_id: str
+    issuer: Optional[str] = None
+    region: Optional[str] = None
+    payment_method: Optional[str] = None
+    processor: Optional[str] = None
+    bin_range: Optional[str] = None # "low-high" BINs, inclusive
+    error_code: str = "500"
+    failure_rate: float = 0.5
+    latency_ms: Optional[int] = 1500
+    delay_s: float = 0.0
+    duration_s: Optional[float] = None
+    ramp_s: float = 0.0
+
 @app.websocket("/ws/stream")
 async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
-    active_connections.append(websocket)
+    broadcaster.register(websocket)
     try:
         while True:
             data = await websocket.receive_text()
             if data == "inject_failure":
-                simulator.inject_failure("manual_1", issuer="CHASE", error_code="500", failure_rate=0.8)
+                simulator.inject_failure("manual_1", issuer="CHASE", error_code="500", failure_rate=0.8,
+                                         processor=routing.default_processor)
     except WebSocketDisconnect:
-        active_connections.remove(websocket)
+        pass
+    finally:
+        broadcaster.unregister(websocket)
 
 async def broadcast(message: dict):
-    for connection in active_connections:
-        try:
-            await connection.send_json(message)
-        except:
-            pass
+    # Non-blocking: frames are queued per client and sent by their writer tasks
+    frame = dumps(message)
+    broadcaster.publish_frame(frame)
+    if cluster is not None:
+        cluster.publish_frames([frame])
+
+def open_stores():
+    """Open the durable log and the query store (both create files, so startup does it, not import)."""
+    global store, tx_store
+    # Segments older than the latest snapshot go once the log is over PAYSENTINEL_LOG_MAX_BYTES
+    # or they are older than PAYSENTINEL_LOG_MAX_AGE_S
+    store = SegmentLog(os.getenv("PAYSENTINEL_DATA_DIR", "data"),
+                       max_bytes=int(os.getenv("PAYSENTINEL_LOG_MAX_BYTES", str(1024 ** 3))),
+                       max_age_s=float(os.getenv("PAYSENTINEL_LOG_MAX_AGE_S", str(7 * 24 * 3600))))
+    tx_store = default_store()
 
-def log_event(agent: str, message: str, level: str = "info"):
+def log_event(agent: str, message: str, level: str = "info", issuer: Optional[str] = None):
     """Valid levels: info, warning, danger"""
-    entry = {
-        "timestamp": datetime.now().strftime("%H:%M:%S"),
-        "agent": agent,
-        "message": message,
-        "level": level
-    }
-    global_event_log.append(entry)
-    # Keep last 50 events for context
-    if len(global_event_log) > 50:
-        global_event_log.pop(0)
+    entry = event_log.append(agent, message, level, issuer)
+    store.append(segment_log.EVENT, entry)
     return entry
 
-async def simulation_loop():
-    print("Starting Simulation Loop...")
-    async for tx in simulator.run():
-        # 1. Feed Watchdog
-        alert_type = watchdog.process_transaction(tx)
-        
-        agent_logs = []
-        
-        # 2. If Alert, Trigger Agents
-        if alert_type:
-            log_event("Watchdog", f"ALERT: {alert_type} on {tx.issuer}", "warning")
-            
-            # Analyst
-            investigation = await analyst.investigate(alert_type, tx.issuer)
-            diag_msg = f"Diagnosed: {investigation['root_cause']} (Conf: {investigation['confidence']})"
-            agent_logs.append({"agent": "Analyst", "message": diag_msg})
-            log_event("Analyst", diag_msg, "info")
-            
-            # Manager
-            decision = await manager.decide_and_act(investigation, tx.issuer)
-            if decision["decision"] != "MONITOR":
-                action_msg = f"Action: {decision['decision']} - {decision['reason']}"
-                agent_logs.append({"agent": "Manager", "message": action_msg})
-                log_event("Manager", action_msg, "danger")
-
-        # 3. Prepare payload
-        payload = {
-            "type": "transaction",
-            "data": json.loads(tx.model_dump_json()),
-            "alert": alert_type,
-            "agent_logs": agent_logs 
-        }
-        
-        # 4. Broadcast
-        await broadcast(payload)
+def replay_routing(record: dict):
+    """Re-apply a recorded routing change (every change is one version, so versions come back the same)."""
+    data = (record.get("tool_output") or {}).get("data") or {}
+    if "version" not in data:
+        return
+    reason = f"replayed v{data['version']}"
+    if data.get("issuer"):
+        routing.set_weights(data["issuer"], data["weights"], reason)
+    else:
+        routing.load(data["weights"], reason)
+
+def apply_decision(record: dict):
+    """A recorded decision's effect on the routing table and Manager history (replay, or from the leader)."""
+    replay_routing(record)
+    if record["decision"] == "ROLLBACK":
+        if manager.decision_history:
+            manager.decision_history.pop()
+    elif record["decision"] == "ROUTED_TRAFFIC":
+        manager.decision_history.append(record)
+
+def record_decision(record: dict):
+    store.append(segment_log.DECISION, record)
+    if cluster is not None:
+        cluster.publish_decision(record)
+
+def durable_state() -> dict:
+    """What restore_state needs, as a durable log snapshot: the event log, decision history and routing."""
+    versions = {routing.version: routing.current}
+    for record in manager.decision_history:
+        previous = ((record.get("tool_output") or {}).get("data") or {}).get("previous_version")
+        if previous is not None and previous not in versions:
+            try:
+                versions[previous] = routing.get(previous)  # what rolling the decision back restores
+            except KeyError:
+                pass
+    return {"events": event_log.recent(limit=event_log.capacity), "decisions": list(manager.decision_history),
+            "routing": [version.to_dict() for version in versions.values()]}
+
+def restore_state():
+    """Rebuild the event log, Manager decision history and routing table: the latest snapshot, then what followed."""
+    snapshot, records = store.restore({segment_log.EVENT, segment_log.DECISION})
+    if snapshot is not None:
+        for record in snapshot["events"]:
+            event_log.append(record["agent"], record["message"], record["level"], record.get("issuer"), ts=record["ts"])
+        manager.decision_history[:] = snapshot["decisions"]
+        routing.restore(snapshot["routing"])
+    for kind, record in records:
+        if kind == segment_log.EVENT:
+            event_log.append(record["agent"], record["message"], record["level"], record.get("issuer"), ts=record["ts"])
+        else:
+            apply_decision(record)
+
+async def handle_incident(incident: Incident):
+    """Analyst -> Manager pipeline for one incident dispatch. Runs as a background task."""
+    alert_type, issuer = incident.alert_type, incident.issuer
+    agent_logs = []
+    try:
+        # Analyst
+        analyst = await agents.aget("analyst")
+        with STAGES["investigate"].time():
+            investigation = await analyst.investigate(alert_type, issuer)
+        diag_msg = f"Diagnosed: {investigation['root_cause']} (Conf: {investigation['confidence']})"
+        agent_logs.append({"agent": "Analyst", "message": diag_msg})
+        log_event("Analyst", diag_msg, "info", issuer)
+
+        # Manager
+        with STAGES["decide"].time():
+            decision = await manager.decide_and_act(investigation, issuer)
+        if decision["decision"] != "MONITOR":
+            record_decision(decision)
+            action_msg = f"Action: {decision['decision']} - {decision['reason']}"
+            agent_logs.append({"agent": "Manager", "message": action_msg})
+            log_event("Manager", action_msg, "danger", issuer)
+    finally:
+        incidents.complete(incident)
+
+    await broadcast({
+        "type": "agent_logs",
+        "alert": alert_type,
+        "issuer": issuer,
+        "incident_id": incident.incident_id,
+        "agent_logs": agent_logs
+    })
+
+def _on_alert_done(task: asyncio.Task):
+    alert_tasks.discard(task)
+    if not task.cancelled() and task.exception():
+        print(f"ALERT PIPELINE ERROR: {task.exception()}")
+
+def raise_alert(issuer: str, alert_type: str):
+    """
+    Coalesce an alert into an incident and trigger Agents only when the
+    incident opens, escalates or outlives its cooldown (off the hot path;
+    results are broadcast when ready).
+    """
+    if cluster is not None and not cluster.is_leader:
+        cluster.forward_alert(issuer, alert_type) # the leader runs incidents for the whole cluster
+        return
+    incident = incidents.observe(issuer, alert_type)
+    if incident:
+        store.append(segment_log.INCIDENT, incident.to_dict())
+        log_event("Watchdog", f"ALERT: {alert_type} on {issuer} ({incident.incident_id}, {incident.severity}, {incident.alert_count} alerts)", "warning", issuer)
+        task = asyncio.create_task(handle_incident(incident))
+        alert_tasks.add(task)
+        task.add_done_callback(_on_alert_done)
+
+async def local_summaries():
+    if WATCHDOG_SHARDS > 0:
+        return await asyncio.to_thread(watchdog.summaries)
+    return watchdog.summaries()
+
+def check_cluster_windows(node: ClusterNode):
+    """After each window sync, the leader runs the success rate rule over the merged (cluster-wide) windows."""
+    if node.is_leader:
+        for issuer, summary in node.windows.items():
+            alert = watchdog.check_summary(issuer, summary)
+            if alert:
+                raise_alert(issuer, alert)
+
+def on_cluster_frames(payload: bytes):
+    for frame in cluster.received_frames(payload):
+        broadcaster.publish_frame(frame)
+
+def on_cluster_alert(payload: bytes):
+    issuer, alert_type = cluster.received_alert(payload)
+    if cluster.is_leader:
+        raise_alert(issuer, alert_type)
+
+def on_cluster_decision(payload: bytes):
+    record = cluster.received_decision(payload)
+    store.append(segment_log.DECISION, record)
+    apply_decision(record)
+
+def require_leader():
+    """Routing changes belong to the leader (it acts on incidents); other nodes answer 409 naming it."""
+    if cluster is not None and not cluster.is_leader:
+        raise HTTPException(status_code=409, detail={"error": "not the cluster leader", "leader": cluster.leader})
+
+async def detect(batch) -> np.ndarray:
+    if WATCHDOG_SHARDS > 0:
+        return await watchdog.process_batch_async(batch)
+    return watchdog.process_batch_codes(batch)
+
+def count_transactions(batch):
+    """Per-issuer transaction counters (rate() of these is TPS)."""
+    counts = np.bincount(batch.issuer, minlength=len(batch_codes.ISSUERS))
+    for code in np.flatnonzero(counts).tolist():
+        counter = transaction_counters.get(code)
+        if counter is None:
+            # A real feed can bring any number of issuers: keep the series count bounded for the scraper
+            capped = len(transaction_counters) >= METRICS_MAX_ISSUERS
+            counter = TRANSACTIONS.labels("other" if capped else batch_codes.ISSUERS.names[code])
+            transaction_counters[code] = counter
+        counter.inc(int(counts[code]))
+
+def frame_rows(alerted: np.ndarray, size: int) -> np.ndarray:
+    """Rows of a batch to broadcast: all of a small batch, else the first alerted rows plus the last row, once each."""
+    if size <= MAX_FRAMES_PER_TICK:
+        return np.arange(size)
+    return np.union1d(alerted[:MAX_FRAMES_PER_TICK - 1], [size - 1])
+
+async def pipeline_loop():
+    """Drain the ingest queue in batches: persist, roll up, detect, alert, broadcast."""
+    print(f"Starting Ingest Pipeline ({WATCHDOG_SHARDS or 'in-process'} watchdog shards)...")
+    while True:
+        batch = await ingest_queue.get_batch(INGEST_BATCH_ROWS)
+        try:
+            BATCH_ROWS.observe(len(batch))
+            if metrics.enabled:
+                count_transactions(batch)
+            with STAGES["persist"].time():
+                store.append_batch(batch)
+                tx_store.add_batch(batch)
+            with STAGES["rollup"].time():
+                rollups.record_batch(batch)
+
+            with STAGES["detect"].time():
+                codes = await detect(batch)
+            with STAGES["alert"].time():
+                alerted = np.flatnonzero(codes)
+                for row in alerted.tolist():
+                    raise_alert(batch_codes.ISSUERS.names[batch.issuer[row]], ALERT_LABELS[codes[row]])
+
+            rows = frame_rows(alerted, len(batch))
+            with STAGES["serialize"].time():
+                frames = [encode_transaction_frame(tx, ALERT_LABELS[codes[row]])
+                          for row, tx in zip(rows.tolist(), batch[rows].to_schemas())]
+            with STAGES["broadcast"].time():
+                for frame in frames:
+                    broadcaster.publish_frame(frame)
+                if cluster is not None:
+                    cluster.publish_frames(frames)
+        except Exception as e:
+            PIPELINE_ERRORS.inc()
+            print(f"PIPELINE ERROR: {e}")
+
+async def log_snapshot_loop():
+    """A snapshot per log segment, so startup replay and retention only need the segments since."""
+    while True:
+        await asyncio.sleep(LOG_SNAPSHOT_CHECK_S)
+        if store.snapshot_due:
+            store.append_snapshot(durable_state())
+
+async def tx_store_loop():
+    """Batch buffered transactions into SQLite off the event loop; prune hourly."""
+    last_prune = 0.0
+    while True:
+        await asyncio.sleep(TX_STORE_FLUSH_S)
+        try:
+            await asyncio.to_thread(tx_store.flush)
+            now = asyncio.get_running_loop().time()
+            if now - last_prune >= 3600:
+                await asyncio.to_thread(tx_store.prune)
+                last_prune = now
+        except Exception as e:
+            print(f"TX STORE ERROR: {e}")
+
 @app.get("/health")
 async def health_check():
     return {"status": "healthy", "service": "PaySentinel", "version": "2.0.4"}
 
 @app.on_event("startup")
 async def startup_event():
-    asyncio.create_task(simulation_loop())
+    await asyncio.to_thread(open_stores)
+    await asyncio.to_thread(restore_state)
+    store.start()
+    if WATCHDOG_SHARDS > 0:
+        await asyncio.to_thread(watchdog.start)
+    if cluster is not None:
+        await cluster.start(local_summaries, on_sync=check_cluster_windows, on_frames=on_cluster_frames,
+                            on_alert=on_cluster_alert, on_decision=on_cluster_decision)
+    app.state.tasks = [asyncio.create_task(pipeline_loop()), asyncio.create_task(tx_store_loop()),
+                       asyncio.create_task(log_snapshot_loop())]
+    app.state.tasks += [asyncio.create_task(source.run(ingest_queue)) for source in sources]
+    if AGENTS_WARMUP:
+        app.state.tasks.append(asyncio.create_task(agents.warm()))
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    if cluster is not None:
+        await cluster.stop()
+    store.append_snapshot(durable_state()) # the next startup replays nothing
+    await asyncio.to_thread(store.close)
+    await asyncio.to_thread(tx_store.flush)
+    for task in app.state.tasks:
+        task.cancel()
+    from app.clients.http_pool import close_default_pool
+    await close_default_pool()
+    if WATCHDOG_SHARDS > 0:
+        await asyncio.to_thread(watchdog.close)
 
 @app.get("/")
 def read_root():
     return {"status": "PaySentinel Backend Running"}
 
+# Injection endpoints are async so rule changes happen on the event loop, between simulator ticks
 @app.post("/inject")
-def trigger_injection(issuer: str = "CHASE"):
-    simulator.inject_failure("api_trigger", issuer=issuer, failure_rate=0.9)
-    log_event("System", f"Manual Injection Triggered for {issuer}", "danger")
+async def trigger_injection(issuer: str = "CHASE", region: Optional[str] = None, payment_method: Optional[str] = None,
+                            bin_range: Optional[str] = None, duration_s: Optional[float] = None, ramp_s: float = 0.0,
+                            processor: str = routing.default_processor):
+    # Scoped to the issuer's route through `processor` ("*" for every route), so the Manager's reroute mitigates it
+    try:
+        simulator.inject_failure("api_trigger", issuer=issuer, failure_rate=0.9, region=region,
+                                 payment_method=payment_method, processor=None if processor == "*" else processor,
+                                 bin_range=bin_range, duration_s=duration_s, ramp_s=ramp_s)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    log_event("System", f"Manual Injection Triggered for {issuer}", "danger", issuer)
     return {"status": "Injected failure for " + issuer}
 
+@app.post("/injections")
+async def add_injections(rules: List[InjectionRequest]):
+    """Load many scenarios at once (soak tests); a rule replaces any with the same id."""
+    try:
+        for rule in rules:
+            parse_bin_range(rule.bin_range) # every rule checked before any is loaded
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    for rule in rules:
+        simulator.inject_failure(**rule.model_dump())
+    log_event("System", f"Loaded {len(rules)} injection rules", "danger")
+    return simulator.rules.snapshot(limit=0)
+
+@app.get("/injections")
+async def list_injections(limit: int = 100):
+    return simulator.rules.snapshot(limit=limit)
+
+@app.delete("/injections/{injection_id}")
+async def delete_injection(injection_id: str):
+    if not simulator.rules.remove(injection_id):
+        raise HTTPException(status_code=404, detail=f"No injection {injection_id}")
+    return {"status": f"Stopped injection {injection_id}"}
+
+@app.post("/ingest")
+async def ingest(request: Request):
+    """
+    Batched NDJSON ingest, one TransactionSchema per line. Returns 202 with
+    accepted/rejected counts; 429 (nothing queued) when the ingest queue
+    can't take the whole batch, with Retry-After and the current credits.
+    """
+    too_large = HTTPException(status_code=413, detail=f"Body over {INGEST_MAX_BODY_BYTES} bytes; split the batch")
+    if int(request.headers.get("content-length") or 0) > INGEST_MAX_BODY_BYTES:
+        raise too_large
+    # Read chunk by chunk, so a chunked upload without a Content-Length can't buffer past the limit either
+    chunks, size = [], 0
+    async for chunk in request.stream():
+        size += len(chunk)
+        if size > INGEST_MAX_BODY_BYTES:
+            raise too_large
+        chunks.append(chunk)
+    batch, rejected, errors = await parse_lines_async(b"".join(chunks).splitlines())
+    if not ingest_queue.offer(batch):
+        return JSONResponse(status_code=429, headers={"Retry-After": "1"},
+                            content={"detail": "Ingest queue full", "rows": len(batch), "credits": ingest_queue.credits})
+    return JSONResponse(status_code=202, content={"accepted": len(batch), "rejected": rejected, "errors": errors,
+                                                  "credits": ingest_queue.credits})
+
+@app.websocket("/ws/ingest")
+async def websocket_ingest(websocket: WebSocket):
+    try:
+        await serve_websocket(websocket, ingest_queue, INGEST_WS_WINDOW)
+    except WebSocketDisconnect:
+        pass
+
+@app.get("/ingest/stats")
+def ingest_stats():
+    return {**ingest_queue.stats(), "sources": {source.name: source.stats() for source in sources}}
+
+@app.get("/incidents")
+def list_incidents():
+    return incidents.snapshot()
+
+@app.get("/storage/stats")
+def storage_stats():
+    return {**store.stats(), "query_store": {"path": tx_store.path, "rows_ingested": tx_store.rows_ingested}}
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return (await agents.aget("analyst")).cache_stats()
+
+@app.get("/agents")
+def agent_stats():
+    return agents.stats()
+
+@app.get("/http/stats")
+def http_stats():
+    """Outbound pool: requests, retries, failures and circuit state per host."""
+    from app.clients.http_pool import default_pool_stats  # httpx stays off the startup path
+    return default_pool_stats()
+
+@app.get("/metrics")
+async def prometheus_metrics():
+    # On the event loop: the gauges read state only the loop mutates
+    return Response(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/cluster")
+async def cluster_state():
+    """This node's role, the live nodes, cluster-merged detector windows and fan-out counters."""
+    return cluster.snapshot() if cluster is not None else {"mode": "single"}
+
+@app.get("/watchdog/stats")
+async def watchdog_stats():
+    if WATCHDOG_SHARDS > 0:
+        return {"shards": await asyncio.to_thread(watchdog.stats)}
+    return {"shards": [], "issuers": sorted(watchdog.windows)}
+
+@app.get("/stream/stats")
+def stream_stats():
+    return broadcaster.stats()
+
 @app.post("/rollback")
-def rollback_action():
-    result = manager.rollback_last_action()
+async def rollback_action():
+    require_leader()
+    result = await manager.rollback_last_action()
+    if result["status"] == "success":
+        record_decision({"decision": "ROLLBACK", "issuer": result["original_action"]["issuer"],
+                         "tool_output": result["tool_output"]})
     log_event("System", f"Rollback requested: {result['message']}", "warning")
     return result
 
+# Routing table: reads are lock-free snapshots; changes are recorded like Manager decisions so restarts replay them
+@app.get("/routing")
+async def get_routing(limit: int = 20):
+    return routing.snapshot(limit=limit)
+
+@app.get("/routing/versions/{version}")
+async def get_routing_version(version: int):
+    try:
+        return routing.get(version).to_dict()
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Routing version {version} is not retained")
+
+def record_routing_change(result, message: str, issuer: Optional[str] = None):
+    record_decision({"decision": "SET_ROUTING", "reason": message, "issuer": issuer, "tool_output": result.model_dump()})
+    log_event("System", message, "warning", issuer)
+
+@app.put("/routing/{issuer}")
+async def set_routing(issuer: str, weights: Dict[str, float]):
+    """Replace an issuer's processor weights (any positive numbers; they are normalized)."""
+    require_leader()
+    try:
+        result = manager.tools["route_traffic"].set_weights(issuer, weights)
+    except ValueError as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    record_routing_change(result, result.message, issuer)
+    return result.data
+
+@app.post("/routing/rollback")
+async def rollback_routing(version: int, issuer: Optional[str] = None):
+    """Restore version `version` (just one issuer's part of it with `issuer`) as a new version."""
+    require_leader()
+    await get_routing_version(version)  # 404 unless retained
+    result = await manager.tools["route_traffic"].arollback(issuer, version)
+    record_routing_change(result, result.message, issuer)
+    return result.model_dump()
+
+@app.get("/events")
+def list_events(agent: Optional[str] = None, level: Optional[str] = None, issuer: Optional[str] = None,
+                since: Optional[float] = None, until: Optional[float] = None,
+                cursor: Optional[int] = None, limit: int = 50):
+    """Newest-first page of events. since/until are epoch seconds; pass next_cursor back as cursor."""
+    return event_log.query(agent=agent, level=level, issuer=issuer, since=since, until=until,
+                           cursor=cursor, limit=max(1, min(limit, 500)))
+
+@app.get("/rollups")
+async def query_rollups(window_s: float = 3600, group_by: Optional[str] = None, points: bool = False,
+                        resolution_s: Optional[int] = None, issuer: Optional[str] = None,
+                        region: Optional[str] = None, payment_method: Optional[str] = None,
+                        processor: Optional[str] = None):
+    """
+    Traffic stats over the last window_s seconds, e.g. CHASE success rate over
+    the last hour by region: ?issuer=CHASE&window_s=3600&group_by=region.
+    Runs on the event loop, alongside the writer.
+    """
+    try:
+        return rollups.query(window_s, group_by=group_by, points=points, resolution_s=resolution_s,
+                             issuer=issuer, region=region, payment_method=payment_method, processor=processor)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/latency/tails")
+async def tail_latency(issuer: Optional[str] = None, bins: bool = False):
+    """Per-issuer p50/p95/p99 for the last minute vs the 30 minutes before it; bins=true adds the sparse sketches."""
+    if WATCHDOG_SHARDS > 0:
+        return await asyncio.to_thread(watchdog.tail_latency, issuer, bins)
+    return watchdog.tail_latency(issuer, include_bins=bins)
+
+def chat_context(assistant: AssistantAgent, query: str) -> str:
+    """Rank incidents and recent events into the Assistant's token budget, favouring any issuer the question names."""
+    upper = query.upper()
+    events = event_log.recent(CHAT_CANDIDATE_EVENTS)
+    mentioned = [i for i in event_log.issuers() if i.upper() in upper]
+    if mentioned:
+        seqs = {e["seq"] for e in events}
+        extra = [e for i in mentioned for e in event_log.recent(CHAT_CANDIDATE_EVENTS, issuer=i) if e["seq"] not in seqs]
+        events = sorted(events + extra, key=lambda e: e["seq"])
+    return assistant.build_context(query, events, incidents.snapshot())
+
+def chat_busy(assistant: AssistantAgent) -> JSONResponse:
+    return JSONResponse(status_code=429, headers={"Retry-After": "2"},
+                        content={"detail": f"{assistant.max_sessions} chat sessions already open"})
+
 @app.post("/chat")
 async def chat_endpoint(request: ChatRequest):
-    # Construct context from recent logs
-    context_str = "\n".join([f"[{e['timestamp']}] {e['agent']}: {e['message']}" for e in global_event_log])
-    if not context_str:
-        context_str = "No recent significant events."
-        
-    response = await assistant.chat(request.query, context_str)
+    assistant = await agents.aget("assistant")
+    if not assistant.open_session():
+        return chat_busy(assistant)
+    try:
+        response = await assistant.chat(request.query, chat_context(assistant, request.query))
+    finally:
+        assistant.close_session()
     return {"response": response}
 
+def sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+class SessionStreamingResponse(StreamingResponse):
+    """StreamingResponse that runs `on_close` however it ends, even if the client leaves before the body starts."""
+
+    def __init__(self, *args, on_close, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.on_close = on_close
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self.on_close()
+
+@app.post("/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    The /chat reply as server-sent events: `token` events as the model
+    produces them, then `done` with timings. A client disconnect cancels the
+    generator, which closes the model stream; the session is freed either way.
+    """
+    assistant = await agents.aget("assistant")
+    if not assistant.open_session():
+        return chat_busy(assistant)
+
+    async def events():
+        start = time.perf_counter()
+        ttft_ms, tokens = None, 0
+        async for text in assistant.stream_chat(request.query, chat_context(assistant, request.query)):
+            if ttft_ms is None:
+                ttft_ms = round((time.perf_counter() - start) * 1000, 1)
+            tokens += 1
+            yield sse("token", {"text": text})
+        yield sse("done", {"tokens": tokens, "ttft_ms": ttft_ms,
+                           "total_ms": round((time.perf_counter() - start) * 1000, 1)})
+
+    return SessionStreamingResponse(events(), media_type="text/event-stream", on_close=assistant.close_session,
+                                    headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.websocket("/ws/chat")
+async def websocket_chat(websocket: WebSocket):
+    """
+    Streaming chat next to /ws/stream. Send {"query": ...}; replies come as
+    {"type": "token"} messages then {"type": "done"}. {"type": "cancel"}
+    stops the reply in progress; disconnecting cancels it too.
+    """
+    await websocket.accept()
+    assistant = await agents.aget("assistant")
+    reply: Optional[asyncio.Task] = None
+
+    async def answer(query: str):
+        start = time.perf_counter()
+        ttft_ms, tokens = None, 0
+        async for text in assistant.stream_chat(query, chat_context(assistant, query)):
+            if ttft_ms is None:
+                ttft_ms = round((time.perf_counter() - start) * 1000, 1)
+            tokens += 1
+            await websocket.send_json({"type": "token", "text": text})
+        await websocket.send_json({"type": "done", "tokens": tokens, "ttft_ms": ttft_ms,
+                                   "total_ms": round((time.perf_counter() - start) * 1000, 1)})
+
+    try:
+        while True:
+            message = await websocket.receive_json()
+            if reply is not None and not reply.done():
+                if message.get("type") == "cancel":
+                    reply.cancel()
+                    await websocket.send_json({"type": "cancelled"})
+                else:
+                    await websocket.send_json({"type": "error", "detail": "A reply is already streaming; cancel it first"})
+            elif message.get("query"):
+                if not assistant.open_session():
+                    await websocket.send_json({"type": "error", "detail": f"{assistant.max_sessions} chat sessions already open"})
+                else:
+                    reply = asyncio.create_task(answer(message["query"]))
+                    # Not a finally in answer(): a task cancelled before its first step never runs it
+                    reply.add_done_callback(lambda _: assistant.close_session())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        if reply is not None:
+            reply.cancel()
+
+@app.get("/chat/stats")
+async def chat_stats():
+    return (await agents.aget("assistant")).chat_stats()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,298 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import hashlib
+import json
+import re
+import struct
+import threading
+
+import numpy as np
+
+from app.models.transaction import PaymentMethod, TransactionSchema, TransactionStatus
+
+
+class Vocabulary:
+    """
+    Append-only mapping between string values and small integer codes.
+    `max_size` is what the column's dtype can hold; past it, new values
+    raise ValueError instead of wrapping around.
+    """
+
+    def __init__(self, names: Sequence[Optional[str]] = (), max_size: int = 1 << 16):
+        self.names: List[Optional[str]] = []
+        self.index: Dict[Optional[str], int] = {}
+        self.max_size = max_size
+        self._lock = threading.Lock()  # ingest parses in worker threads
+        for name in names:
+            self.code(name)
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+    def code(self, name: Optional[str]) -> int:
+        code = self.index.get(name)
+        if code is None:
+            with self._lock:
+                code = self.index.get(name)
+                if code is None:
+                    if len(self.names) >= self.max_size:
+                        raise ValueError(f"more than {self.max_size} distinct values")
+                    # names first, so a reader that finds the code can always look it up
+                    self.names.append(name)
+                    code = self.index[name] = len(self.names) - 1
+        return code
+
+    def codes(self, names: Sequence[Optional[str]], dtype=np.uint16) -> np.ndarray:
+        return np.fromiter((self.code(n) for n in names), dtype, len(names))
+
+
+# Shared code tables. Enum-backed ones are fixed; the rest grow as new values
+# show up (e.g. issuers from a real feed).
+METHODS = Vocabulary(PaymentMethod, max_size=1 << 8)
+STATUSES = Vocabulary(TransactionStatus, max_size=1 << 8)
+ISSUERS = Vocabulary(["CHASE", "BOA", "WELLS", "STRIPE_TEST"])
+# Regions and processors get 12 bits in an injection rule cell (see simulator/injection_rules.py)
+REGIONS = Vocabulary(["US-EAST", "US-WEST", "EU-CENTRAL"], max_size=1 << 12)
+PROCESSORS = Vocabulary(["STRIPE"], max_size=1 << 12)
+ERROR_CODES = Vocabulary([None])  # code 0 == no error
+CURRENCIES = Vocabulary(["USD"], max_size=1 << 8)
+BIN_RANGES = Vocabulary([None])
+
+# Column -> code table, for the categorical columns
+VOCABULARIES = {
+    "currency": CURRENCIES,
+    "payment_method": METHODS,
+    "issuer": ISSUERS,
+    "processor": PROCESSORS,
+    "status": STATUSES,
+    "error_code": ERROR_CODES,
+    "bin_range": BIN_RANGES,
+    "region": REGIONS,
+}
+
+SUCCESS = STATUSES.code(TransactionStatus.SUCCESS)
+FAILED = STATUSES.code(TransactionStatus.FAILED)
+
+
+class TransactionBatch:
+    """
+    Columnar batch of transactions for the hot paths (generation, detection,
+    buffering). Categorical fields are stored as codes into the module-level
+    vocabularies, timestamps as epoch seconds and ids as 48-bit integers, so a
+    row costs a few dozen bytes instead of a pydantic model plus its dict.
+    Convert to TransactionSchema only at the API boundary (`to_schemas`).
+
+    Ids that aren't tx_<12 hex digits> (e.g. from a real feed) keep their
+    original string in `ids` (None for rows whose tx_id restores it; the
+    whole column is None when every row's does), and tx_id holds a stable
+    hash of them. Metadata is one dict for the batch unless rows differ,
+    in which case `row_metadata` holds one per row.
+    """
+
+    COLUMNS = {
+        "tx_id": np.uint64,
+        "timestamp": np.float64,
+        "amount": np.float64,
+        "currency": np.uint8,
+        "payment_method": np.uint8,
+        "issuer": np.uint16,
+        "processor": np.uint16,
+        "status": np.uint8,
+        "error_code": np.uint16,
+        "latency_ms": np.int32,
+        "retry_count": np.uint8,
+        "bin_range": np.uint16,
+        "region": np.uint16,
+    }
+
+    def __init__(self, metadata: Optional[Dict[str, Any]] = None, ids: Optional[Sequence[Optional[str]]] = None,
+                 row_metadata: Optional[Sequence[Dict[str, Any]]] = None, **columns: np.ndarray):
+        size = len(next(iter(columns.values()))) if columns else 0
+        for name, dtype in self.COLUMNS.items():
+            column = columns.get(name)
+            setattr(self, name, np.zeros(size, dtype) if column is None else np.asarray(column, dtype))
+        # Shared by every row in the batch, unless row_metadata is set
+        self.metadata = metadata or {}
+        self.ids = None if ids is None else _objects(ids)
+        self.row_metadata = None if row_metadata is None else _objects(row_metadata)
+
+    def __len__(self) -> int:
+        return len(self.tx_id)
+
+    def __getitem__(self, rows) -> "TransactionBatch":
+        return TransactionBatch(self.metadata,
+                                ids=None if self.ids is None else self.ids[rows],
+                                row_metadata=None if self.row_metadata is None else self.row_metadata[rows],
+                                **{name: getattr(self, name)[rows] for name in self.COLUMNS})
+
+    @classmethod
+    def out_of_range(cls, tx: TransactionSchema) -> Optional[Tuple[str, str]]:
+        """(field, error) if a valid schema still doesn't fit the columns (checks one row, before packing)."""
+        for name in ("latency_ms", "retry_count"):
+            limits, value = np.iinfo(cls.COLUMNS[name]), getattr(tx, name)
+            if not limits.min <= value <= limits.max:
+                return name, f"must be between {limits.min} and {limits.max}"
+        for name, vocab in VOCABULARIES.items():
+            try:
+                vocab.code(getattr(tx, name))
+            except ValueError as e:
+                return name, str(e)
+        return None
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, name).nbytes for name in self.COLUMNS)
+
+    @property
+    def success(self) -> np.ndarray:
+        return self.status == SUCCESS
+
+    def row_metadata_list(self) -> List[Dict[str, Any]]:
+        return list(self.row_metadata) if self.row_metadata is not None else [self.metadata] * len(self)
+
+    @classmethod
+    def concat(cls, batches: Sequence["TransactionBatch"]) -> "TransactionBatch":
+        metadata = batches[0].metadata if batches else None
+        ids = row_metadata = None
+        if any(b.ids is not None for b in batches):
+            ids = np.concatenate([b.ids if b.ids is not None else _objects([None] * len(b)) for b in batches])
+        if any(b.row_metadata is not None or b.metadata != metadata for b in batches):
+            row_metadata = [row for b in batches for row in b.row_metadata_list()]
+        return cls(metadata, ids=ids, row_metadata=row_metadata,
+                   **{name: np.concatenate([getattr(b, name) for b in batches]) for name in cls.COLUMNS})
+
+    @classmethod
+    def from_schemas(cls, transactions: Sequence[TransactionSchema]) -> "TransactionBatch":
+        metadata = transactions[0].metadata if transactions else None
+        tx_ids, ids = zip(*(_parse_tx_id(tx.transaction_id) for tx in transactions)) if transactions else ((), ())
+        shared = all(tx.metadata == metadata for tx in transactions)
+        return cls(
+            metadata,
+            ids=None if all(i is None for i in ids) else ids,
+            row_metadata=None if shared else [tx.metadata for tx in transactions],
+            tx_id=tx_ids,
+            timestamp=[tx.timestamp.timestamp() for tx in transactions],
+            amount=[tx.amount for tx in transactions],
+            currency=CURRENCIES.codes([tx.currency for tx in transactions]),
+            payment_method=METHODS.codes([tx.payment_method for tx in transactions]),
+            issuer=ISSUERS.codes([tx.issuer for tx in transactions]),
+            processor=PROCESSORS.codes([tx.processor for tx in transactions]),
+            status=STATUSES.codes([tx.status for tx in transactions]),
+            error_code=ERROR_CODES.codes([tx.error_code for tx in transactions]),
+            latency_ms=[tx.latency_ms for tx in transactions],
+            retry_count=[tx.retry_count for tx in transactions],
+            bin_range=BIN_RANGES.codes([tx.bin_range for tx in transactions]),
+            region=REGIONS.codes([tx.region for tx in transactions]),
+        )
+
+    def to_bytes(self, vocab_sizes: Optional[Dict[str, int]] = None) -> bytes:
+        """
+        Compact binary form: a JSON header (row count, metadata and the code
+        tables in use) followed by each column's raw little-endian bytes.
+        Codes are process-local, so the header lets `from_bytes` remap them.
+
+        For a sequence of records (e.g. one log segment), pass the same dict
+        as `vocab_sizes`: the first record carries the full code tables and
+        later ones only the names added since, so a one-row record stays
+        small. Such records have to be read in order with `from_bytes(buf, vocab)`.
+        """
+        header = {"rows": len(self), "metadata": self.metadata}
+        full = not vocab_sizes
+        tables = {}
+        for name, vocab in VOCABULARIES.items():
+            size, known = len(vocab.names), 0 if full else vocab_sizes.get(name, 0)
+            if full or size > known:
+                tables[name] = vocab.names[known:size]
+            if vocab_sizes is not None:
+                vocab_sizes[name] = size
+        if full:
+            header["vocab"] = tables
+        elif tables:
+            header["vocab_delta"] = tables
+        if self.ids is not None:
+            header["ids"] = self.ids.tolist()
+        if self.row_metadata is not None:
+            header["row_metadata"] = self.row_metadata.tolist()
+        header = json.dumps(header).encode()
+        parts = [struct.pack("<I", len(header)), header]
+        parts.extend(getattr(self, name).astype(np.dtype(dtype).newbyteorder("<"), copy=False).tobytes()
+                     for name, dtype in self.COLUMNS.items())
+        return b"".join(parts)
+
+    @classmethod
+    def from_bytes(cls, buf, vocab: Optional[Dict[str, np.ndarray]] = None) -> "TransactionBatch":
+        """`vocab` (one dict per sequence, read in order) carries the code remaps between `to_bytes(vocab_sizes)` records."""
+        (header_len,) = struct.unpack_from("<I", buf, 0)
+        header = json.loads(bytes(buf[4:4 + header_len]))
+        rows = header["rows"]
+        remaps = {} if vocab is None else vocab
+        if "vocab" in header:
+            remaps.clear()
+            remaps.update({name: VOCABULARIES[name].codes(names, cls.COLUMNS[name])
+                           for name, names in header["vocab"].items()})
+        elif vocab is None:
+            raise ValueError("record only has code table changes; read it with the records before it")
+        for name, names in header.get("vocab_delta", {}).items():
+            added = VOCABULARIES[name].codes(names, cls.COLUMNS[name])
+            remaps[name] = np.concatenate([remaps[name], added]) if name in remaps else added
+        offset = 4 + header_len
+        columns = {}
+        for name, dtype in cls.COLUMNS.items():
+            dtype = np.dtype(dtype).newbyteorder("<")
+            column = np.frombuffer(buf, dtype, rows, offset).astype(dtype.newbyteorder("="))
+            offset += rows * dtype.itemsize
+            if name in VOCABULARIES and rows:
+                column = remaps[name][column]
+            columns[name] = column
+        return cls(header["metadata"], ids=header.get("ids"), row_metadata=header.get("row_metadata"), **columns)
+
+    def to_schemas(self) -> List[TransactionSchema]:
+        """Materialize pydantic models (API boundary only)."""
+        ids = self.ids if self.ids is not None else [None] * len(self)
+        return [
+            TransactionSchema(
+                transaction_id=original if original is not None else f"tx_{tx_id:012x}",
+                timestamp=datetime.fromtimestamp(ts),
+                amount=amount,
+                currency=CURRENCIES.names[cur],
+                payment_method=METHODS.names[method],
+                issuer=ISSUERS.names[issuer],
+                processor=PROCESSORS.names[proc],
+                status=STATUSES.names[status],
+                error_code=ERROR_CODES.names[err],
+                latency_ms=latency,
+                retry_count=retries,
+                bin_range=BIN_RANGES.names[bin_range],
+                region=REGIONS.names[region],
+                metadata=dict(metadata)
+            )
+            for original, metadata, tx_id, ts, amount, cur, method, issuer, proc, status, err, latency, retries,
+            bin_range, region in zip(
+                ids, self.row_metadata_list(), self.tx_id.tolist(), self.timestamp.tolist(), self.amount.tolist(),
+                self.currency.tolist(), self.payment_method.tolist(), self.issuer.tolist(), self.processor.tolist(),
+                self.status.tolist(), self.error_code.tolist(), self.latency_ms.tolist(),
+                self.retry_count.tolist(), self.bin_range.tolist(), self.region.tolist()
+            )
+        ]
+
+
+_CANONICAL_ID = re.compile(r"tx_[0-9a-f]{12}")
+
+
+def _parse_tx_id(transaction_id: str) -> Tuple[int, Optional[str]]:
+    """
+    tx_<12 hex digits> -> (its int, None). Any other id -> (a stable 48-bit
+    hash of it, the id itself), so the original survives and the numeric
+    form is the same in every process.
+    """
+    if _CANONICAL_ID.fullmatch(transaction_id):
+        return int(transaction_id[3:], 16), None
+    return int.from_bytes(hashlib.blake2b(transaction_id.encode(), digest_size=6).digest(), "little"), transaction_id
+
+
+def _objects(values) -> np.ndarray:
+    """1-D object array (np.asarray would try to nest sequences and dicts)."""
+    array = np.empty(len(values), object)
+    array[:] = list(values)
+    return array
@@ -0,0 +1,252 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Mapping, Optional, Tuple
+
+import numpy as np
+
+from app.models import transaction_batch as batch_codes
+
+Weights = Dict[str, float]
+
+
+def _normalize(weights: Mapping[str, float]) -> Weights:
+    """Drop zero/negative weights and scale the rest to fractions summing to 1."""
+    kept = {processor: float(w) for processor, w in weights.items() if w > 0}
+    total = sum(kept.values())
+    if not total:
+        raise ValueError("Routing weights must have at least one positive entry")
+    return {processor: w / total for processor, w in kept.items()}
+
+
+class AliasTable:
+    """
+    Walker/Vose alias table over one issuer's processor weights: a selection
+    is one uniform draw, a slot lookup and a compare, however many processors
+    there are.
+    """
+    __slots__ = ("processors", "prob", "alias")
+
+    def __init__(self, weights: Weights):
+        self.processors: Tuple[str, ...] = tuple(weights)
+        n = len(self.processors)
+        scaled = [w * n for w in weights.values()]
+        self.prob = [1.0] * n
+        self.alias = list(range(n))
+        small = [i for i, p in enumerate(scaled) if p < 1.0]
+        large = [i for i, p in enumerate(scaled) if p >= 1.0]
+        while small and large:
+            s, l = small.pop(), large.pop()
+            self.prob[s], self.alias[s] = scaled[s], l
+            scaled[l] -= 1.0 - scaled[s]
+            (small if scaled[l] < 1.0 else large).append(l)
+        # Whatever is left is 1.0 up to rounding: prob stays 1, alias itself
+
+    def pick(self, u: float) -> str:
+        x = u * len(self.processors)
+        slot = int(x)
+        return self.processors[slot if x - slot < self.prob[slot] else self.alias[slot]]
+
+
+class _Packed:
+    """Every issuer's alias table laid end to end, indexed by issuer code, for whole-batch selection."""
+
+    def __init__(self, version: "RoutingVersion", issuers: int):
+        self.issuers = issuers
+        self.offset = np.zeros(issuers, np.int64)
+        self.count = np.zeros(issuers, np.int64)
+        prob, alias, codes = [], [], []
+        for code in range(issuers):
+            table = version.table(batch_codes.ISSUERS.names[code])
+            self.offset[code], self.count[code] = len(prob), len(table.processors)
+            alias.extend(self.offset[code] + a for a in table.alias)
+            prob.extend(table.prob)
+            codes.extend(batch_codes.PROCESSORS.code(p) for p in table.processors)
+        self.prob = np.array(prob)
+        self.alias = np.array(alias, np.int64)
+        self.codes = np.array(codes, np.uint16)
+
+    def sample(self, issuer: np.ndarray, u: np.ndarray) -> np.ndarray:
+        x = u * self.count[issuer]
+        k = x.astype(np.int64)
+        slot = self.offset[issuer] + k
+        return np.where(x - k < self.prob[slot], self.codes[slot], self.codes[self.alias[slot]])
+
+
+class RoutingVersion:
+    """
+    One immutable version of the routing table. Issuers without an entry send
+    everything to the default processor. Unchanged issuers' weights and alias
+    tables are shared with the version this one was copied from.
+    """
+
+    def __init__(self, version: int, weights: Dict[str, Weights], tables: Dict[str, AliasTable],
+                 default: AliasTable, reason: str = ""):
+        self.version = version
+        self.weights = weights  # issuer -> processor -> fraction; never mutated once published
+        self.tables = tables
+        self.default = default
+        self.reason = reason
+        self.created_at = time.time()
+        self._packed: Optional[_Packed] = None
+
+    def table(self, issuer: str) -> AliasTable:
+        return self.tables.get(issuer, self.default)
+
+    def pick(self, issuer: str, u: float) -> str:
+        """Processor for one transaction given a uniform draw `u`."""
+        return self.tables.get(issuer, self.default).pick(u)
+
+    def sample(self, issuer: np.ndarray, rng: np.random.Generator) -> np.ndarray:
+        """Processor codes for a batch of issuer codes (no draws at all while nothing is routed)."""
+        if not self.tables:
+            return np.full(len(issuer), batch_codes.PROCESSORS.code(self.default.processors[0]), np.uint16)
+        packed = self._packed
+        if packed is None or (len(issuer) and int(issuer.max()) >= packed.issuers):
+            # Built on first use (a benign race: concurrent builders produce the same thing)
+            packed = self._packed = _Packed(self, len(batch_codes.ISSUERS))
+        return packed.sample(issuer, rng.random(len(issuer)))
+
+    def to_dict(self) -> Dict:
+        return {"version": self.version, "reason": self.reason, "created_at": self.created_at,
+                "weights": self.weights}
+
+
+class RoutingTable:
+    """
+    Versioned issuer -> processor weights.
+
+    Every change publishes a new RoutingVersion copied on write from the
+    current one, so readers on the hot path just take `current` (one
+    attribute read) and see a consistent table for as long as they hold it;
+    writers are serialized by a lock and never block readers. Old versions
+    are kept (up to `history`) so any of them can be restored by re-publishing
+    its weights, which costs a dict copy and no alias table rebuilds.
+    """
+
+    def __init__(self, default_processor: str = "STRIPE", history: int = 1000,
+                 weights: Optional[Dict[str, Mapping[str, float]]] = None):
+        self.default_processor = default_processor
+        self.history = history
+        self._default = AliasTable({default_processor: 1.0})
+        self._lock = threading.RLock()  # read-modify-write updates (divert) nest _update
+        self._versions: "OrderedDict[int, RoutingVersion]" = OrderedDict()
+        normalized = {issuer: _normalize(w) for issuer, w in (weights or {}).items()}
+        self._publish(normalized, {issuer: AliasTable(w) for issuer, w in normalized.items()}, "initial", 0)
+
+    @property
+    def version(self) -> int:
+        return self.current.version
+
+    def _publish(self, weights: Dict[str, Weights], tables: Dict[str, AliasTable], reason: str,
+                 version: int) -> RoutingVersion:
+        snapshot = RoutingVersion(version, weights, tables, self._default, reason)
+        self._versions[version] = snapshot
+        while len(self._versions) > self.history:
+            self._versions.popitem(last=False)
+        self.current = snapshot  # the atomic switch readers see
+        return snapshot
+
+    def _update(self, changes: Dict[str, Optional[Tuple[Weights, AliasTable]]], reason: str) -> RoutingVersion:
+        """Publish current + `changes` (issuer -> (weights, table), or None for back to the default)."""
+        with self._lock:
+            base = self.current
+            weights, tables = dict(base.weights), dict(base.tables)
+            for issuer, change in changes.items():
+                if change is None or change[0] == {self.default_processor: 1.0}:
+                    weights.pop(issuer, None)
+                    tables.pop(issuer, None)
+                else:
+                    weights[issuer], tables[issuer] = change
+            return self._publish(weights, tables, reason, base.version + 1)
+
+    def get(self, version: int) -> RoutingVersion:
+        """A retained version; KeyError once it has aged out of the history."""
+        return self._versions[version]
+
+    def set_weights(self, issuer: str, weights: Mapping[str, float], reason: str = "") -> RoutingVersion:
+        weights = _normalize(weights)
+        return self._update({issuer: (weights, AliasTable(weights))}, reason or f"set {issuer}")
+
+    def load(self, weights: Dict[str, Mapping[str, float]], reason: str = "") -> RoutingVersion:
+        """Replace the whole table (e.g. replaying a recorded one)."""
+        normalized = {issuer: _normalize(w) for issuer, w in weights.items()}
+        return self._update({**{issuer: None for issuer in self.current.weights},
+                             **{issuer: (w, AliasTable(w)) for issuer, w in normalized.items()}}, reason or "load")
+
+    def reset(self, issuer: Optional[str] = None, reason: str = "") -> RoutingVersion:
+        """Send all of the issuer's (None: everyone's) traffic back to the default processor."""
+        issuers = [issuer] if issuer else list(self.current.weights)
+        return self._update({name: None for name in issuers}, reason or f"reset {issuer or 'all issuers'}")
+
+    def divert(self, issuer: Optional[str], percentage: float, destination: str, reason: str = "") -> RoutingVersion:
+        """
+        Send `percentage` of the issuer's traffic to `destination`, scaling
+        its other processors down to share the rest in their current ratio.
+        With no issuer, every known issuer changes, in one version.
+        """
+        share = min(max(percentage, 0.0), 100.0) / 100
+        issuers = [issuer] if issuer else list(batch_codes.ISSUERS.names)
+        changes = {}
+        with self._lock:
+            for name in issuers:
+                current = {p: w for p, w in self.current.weights.get(name, {self.default_processor: 1.0}).items()
+                           if p != destination}
+                rest = sum(current.values())
+                weights = {p: w / rest * (1 - share) for p, w in current.items()} if rest else {}
+                weights[destination] = share if rest else 1.0
+                weights = _normalize(weights)
+                changes[name] = (weights, AliasTable(weights))
+            return self._update(changes, reason or f"divert {percentage:g}% of {issuer or 'all issuers'} to {destination}")
+
+    def rollback(self, version: int, issuer: Optional[str] = None, reason: str = "") -> RoutingVersion:
+        """
+        Publish `version`'s routing again as a new version (for one issuer,
+        or the whole table). History stays linear, so a rollback can itself
+        be rolled back.
+        """
+        target = self.get(version)
+        if not issuer:
+            with self._lock:
+                return self._publish(target.weights, target.tables, reason or f"rollback to v{version}",
+                                     self.current.version + 1)
+        weights = target.weights.get(issuer)
+        return self._update({issuer: (weights, target.tables[issuer]) if weights else None},
+                            reason or f"rollback {issuer} to v{version}")
+
+    def restore(self, versions: List[Dict]) -> RoutingVersion:
+        """
+        Re-publish versions saved with RoutingVersion.to_dict (e.g. from a
+        durable log snapshot) under their own numbers; the newest is current.
+        """
+        with self._lock:
+            for saved in sorted(versions, key=lambda v: v["version"]):
+                weights = {issuer: _normalize(w) for issuer, w in saved["weights"].items()}
+                self._publish(weights, {issuer: AliasTable(w) for issuer, w in weights.items()}, saved["reason"],
+                              saved["version"])
+            return self.current
+
+    def versions(self, limit: int = 20) -> List[RoutingVersion]:
+        """Most recent versions first."""
+        with self._lock:
+            retained = list(self._versions.values())
+        return retained[::-1][:limit] if limit > 0 else []
+
+    def snapshot(self, limit: int = 20) -> Dict:
+        return {"default_processor": self.default_processor, **self.current.to_dict(),
+                "history": [v.to_dict() for v in self.versions(limit)]}
+
+
+_default_table: Optional[RoutingTable] = None
+_default_table_lock = threading.Lock()
+
+
+def default_table() -> RoutingTable:
+    """Process-wide routing table shared by the simulator and RouteTrafficTool (created on first use)."""
+    global _default_table
+    with _default_table_lock:
+        if _default_table is None:
+            _default_table = RoutingTable(default_processor=os.getenv("DEFAULT_PROCESSOR", "STRIPE"),
+                                          history=int(os.getenv("ROUTING_HISTORY", "1000")))
+        return _default_table
@@ -1,70 +1,122 @@
 import asyncio
 import random
+import time
 import uuid
 from datetime import datetime
 from typing import AsyncGenerator, Dict, Optional, List
 
+import numpy as np
+
 from app.models.transaction import (
     TransactionSchema, 
     TransactionStatus, 
     PaymentMethod
 )
+from app.models import transaction_batch as batch_codes
+from app.models.transaction_batch import TransactionBatch
+from app.routing.routing_table import RoutingTable, default_table
+from app.simulator.injection_rules import RuleEngine, parse_bin_range
+from app.simulator.rate_control import TokenBucket
+
+ISSUERS = ["CHASE", "BOA", "WELLS", "STRIPE_TEST"]
+REGIONS = ["US-EAST", "US-WEST", "EU-CENTRAL"]
+PAYMENT_METHODS = list(PaymentMethod)
+# Card BINs issued by each issuer (same count each), so injections can target BIN ranges
+ISSUER_BINS = {
+    "CHASE": ["414720", "426684", "440066", "483313"],
+    "BOA": ["401795", "431305", "480011", "488893"],
+    "WELLS": ["414740", "446542", "453978", "484718"],
+    "STRIPE_TEST": ["400000", "424242", "555555", "378282"],
+}
+
+# Draw index -> columnar code, for the batched generator
+_ISSUER_CODES = batch_codes.ISSUERS.codes(ISSUERS)
+_REGION_CODES = batch_codes.REGIONS.codes(REGIONS)
+_METHOD_CODES = batch_codes.METHODS.codes(PAYMENT_METHODS, np.uint8)
+_BIN_CODES = np.array([batch_codes.BIN_RANGES.codes(ISSUER_BINS[issuer]) for issuer in ISSUERS])  # [issuer, draw]
 
 class ChaosSimulator:
-    def __init__(self, base_tps: int = 1):
+    def __init__(self, base_tps: int = 1, seed: Optional[int] = None, routing: Optional[RoutingTable] = None):
         self.base_tps = base_tps
-        self.active_injections: Dict[str, Dict] = {}
+        # Issuer -> processor weights each transaction is routed by (what RouteTrafficTool changes)
+        self.routing = routing or default_table()
+        # Failure scenarios, indexed by what they match
+        self.rules = RuleEngine(bin_ for bins in ISSUER_BINS.values() for bin_ in bins)
+        self.clock = time.monotonic  # rule windows run on this (swap in a fake one to replay a soak test fast)
         self.running = False
+        # Used by the batched generator only
+        self.rng = np.random.default_rng(seed)
         
     def inject_failure(self, 
                       injection_id: str,
                       issuer: Optional[str] = None,
                       error_code: str = "500", 
                       failure_rate: float = 0.5,
-                      latency_ms: int = 1500) -> str:
-        """Inject specific failure scenario"""
-        self.active_injections[injection_id] = {
-            "issuer": issuer,
-            "error_code": error_code,
-            "failure_rate": failure_rate,
-            "latency_ms": latency_ms
-        }
+                      latency_ms: Optional[int] = 1500,
+                      region: Optional[str] = None,
+                      payment_method: Optional[str] = None,
+                      processor: Optional[str] = None,
+                      bin_range=None,
+                      delay_s: float = 0.0,
+                      duration_s: Optional[float] = None,
+                      ramp_s: float = 0.0) -> str:
+        """
+        Inject specific failure scenario. Unset match fields match anything
+        (a `processor` scopes it to one route, so rerouting mitigates it);
+        `bin_range` is (low, high) or "low-high". The scenario starts after
+        `delay_s`, ramps up over `ramp_s` and expires after `duration_s`.
+        """
+        self.rules.add(injection_id, issuer=issuer, region=region, payment_method=payment_method,
+                       processor=processor, bin_range=parse_bin_range(bin_range), error_code=error_code, failure_rate=failure_rate,
+                       latency_ms=latency_ms, ramp_s=ramp_s, delay_s=delay_s, duration_s=duration_s,
+                       now=self.clock())
         return f"Injection {injection_id} started."
 
     def stop_injection(self, injection_id: str):
-        if injection_id in self.active_injections:
-            del self.active_injections[injection_id]
+        self.rules.remove(injection_id)
+
+    @property
+    def active_injections(self) -> Dict[str, Dict]:
+        now = self.clock()
+        return {rule_id: rule.to_dict(now) for rule_id, rule in self.rules.rules.items()}
 
     def _generate_transaction(self) -> TransactionSchema:
         # Defaults
         status = TransactionStatus.SUCCESS
         error_code = None
         latency = random.randint(50, 300) # Baseline latency
-        issuer = random.choice(["CHASE", "BOA", "WELLS", "STRIPE_TEST"])
+        issuer = random.choice(ISSUERS)
+        region = random.choice(REGIONS)
+        method = random.choice(PAYMENT_METHODS)
+        bin_ = random.choice(ISSUER_BINS[issuer])
+        processor = self.routing.current.pick(issuer, random.random())
         
-        # Check active injections
-        for _, params in self.active_injections.items():
-            # If issuer matches (or global injection)
-            if params["issuer"] is None or params["issuer"] == issuer:
-                if random.random() < params["failure_rate"]:
-                    status = TransactionStatus.FAILED
-                    error_code = params["error_code"]
-                    # Add latency spike if defined
-                    if "latency_ms" in params:
-                        latency = params["latency_ms"] + random.randint(-100, 100)
+        # Check the injections that match this transaction (later ones win)
+        now = self.clock()
+        self.rules.advance(now)
+        rule = self.rules.pick(batch_codes.ISSUERS.code(issuer), batch_codes.REGIONS.code(region),
+                               batch_codes.METHODS.code(method), batch_codes.PROCESSORS.code(processor),
+                               batch_codes.BIN_RANGES.code(bin_), random.random(), now)
+        if rule is not None:
+            status = TransactionStatus.FAILED
+            error_code = rule.error_code
+            # Add latency spike if defined
+            if rule.latency_ms is not None:
+                latency = rule.latency_ms + random.randint(-100, 100)
 
         return TransactionSchema(
             transaction_id=f"tx_{uuid.uuid4().hex[:12]}",
             timestamp=datetime.now(),
             amount=round(random.uniform(10.0, 500.0), 2),
             currency="USD",
-            payment_method=random.choice(list(PaymentMethod)),
+            payment_method=method,
             issuer=issuer,
-            processor="STRIPE",
+            processor=processor,
             status=status,
             error_code=error_code,
             latency_ms=latency,
-            region=random.choice(["US-EAST", "US-WEST", "EU-CENTRAL"]),
+            bin_range=bin_,
+            region=region,
             metadata={"environment": "production"}
         )
 
@@ -75,3 +127,47 @@ class ChaosSimulator:
             yield tx
             # Sleep to maintain approximate TPS
             await asyncio.sleep(1.0 / self.base_tps)
+
+    def _generate_batch(self, size: int) -> TransactionBatch:
+        """
+        Generate `size` transactions as a columnar batch with vectorized draws,
+        routed to processors by the current routing version (one version for
+        the whole batch). Matching injection rules then fail their rows in place (in the same
+        order, so later injections override earlier ones exactly like the
+        per-event path); rules that match nothing in the batch cost nothing.
+        """
+        rng = self.rng
+        latency = rng.integers(50, 301, size)
+        drawn_issuer = rng.integers(0, len(ISSUERS), size)
+        issuer = _ISSUER_CODES[drawn_issuer]
+        batch = TransactionBatch(
+            {"environment": "production"},
+            tx_id=rng.integers(0, 1 << 48, size, dtype=np.uint64),
+            timestamp=np.full(size, time.time()),  # one timestamp per tick
+            amount=np.round(rng.uniform(10.0, 500.0, size), 2),
+            currency=np.full(size, batch_codes.CURRENCIES.code("USD")),
+            payment_method=_METHOD_CODES[rng.integers(0, len(PAYMENT_METHODS), size)],
+            issuer=issuer,
+            processor=self.routing.current.sample(issuer, rng),
+            status=np.full(size, batch_codes.SUCCESS, np.uint8),
+            latency_ms=latency,
+            bin_range=_BIN_CODES[drawn_issuer, rng.integers(0, _BIN_CODES.shape[1], size)],
+            region=_REGION_CODES[rng.integers(0, len(REGIONS), size)],
+        )
+        self.rules.apply(batch, rng, self.clock())
+        return batch
+
+    async def run_batches(self, target_tps: int = None, tick_s: float = 0.05,
+                          max_batch: int = None) -> AsyncGenerator[TransactionBatch, None]:
+        """
+        High-throughput mode: yields a columnar chunk of transactions per tick,
+        sized by a token bucket so the long-run rate holds `target_tps`
+        (default base_tps) without one sleep per event.
+        """
+        target_tps = target_tps or self.base_tps
+        bucket = TokenBucket(target_tps, burst=target_tps * max(tick_s, 1.0))
+        max_batch = max_batch or max(1, int(target_tps * tick_s * 4))
+        self.running = True
+        while self.running:
+            size = await bucket.acquire(tick_s, limit=max_batch)
+            yield self._generate_batch(size)
@@ -0,0 +1,312 @@
+import bisect
+import heapq
+import itertools
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.models import transaction_batch as batch_codes
+from app.models.transaction_batch import TransactionBatch
+
+# A cell packs a transaction's issuer, region, payment method, processor and
+# BIN codes (as (shift, mask) below, in that order); bit i of a rule's mask
+# means it constrains field i. Each width holds every code its vocabulary can
+# hand out (REGIONS and PROCESSORS are capped at 12 bits for this), so cells never collide.
+_FIELDS = ((48, 0xFFFF), (36, 0xFFF), (28, 0xFF), (16, 0xFFF), (0, 0xFFFF))
+_BIN_BIT = 1 << 4
+
+
+@dataclass(eq=False)
+class InjectionRule:
+    """
+    One failure scenario: transactions matching every set field fail with
+    `failure_rate` (reached linearly over `ramp_s` after the rule starts),
+    with `error_code` and a latency around `latency_ms`. Unset fields match
+    anything; `bin_range` is an inclusive (low, high) BIN interval. The rule
+    is live from `starts_at` until `expires_at` (monotonic seconds; None = no
+    expiry).
+    """
+    rule_id: str
+    issuer: Optional[str] = None
+    region: Optional[str] = None
+    payment_method: Optional[str] = None
+    processor: Optional[str] = None
+    bin_range: Optional[Tuple[int, int]] = None
+    error_code: str = "500"
+    failure_rate: float = 0.5
+    latency_ms: Optional[int] = 1500
+    starts_at: float = 0.0
+    expires_at: Optional[float] = None
+    ramp_s: float = 0.0
+    seq: int = 0  # insertion order; later rules override earlier ones on the same row
+    state: str = "pending"  # pending -> active -> expired/removed
+
+    def rate_at(self, now: float) -> float:
+        if self.ramp_s <= 0:
+            return self.failure_rate
+        return self.failure_rate * min(1.0, max(0.0, (now - self.starts_at) / self.ramp_s))
+
+    def to_dict(self, now: float) -> Dict:
+        return {
+            "rule_id": self.rule_id, "issuer": self.issuer, "region": self.region,
+            "payment_method": self.payment_method, "processor": self.processor,
+            "bin_range": list(self.bin_range) if self.bin_range else None,
+            "error_code": self.error_code, "failure_rate": self.failure_rate, "current_rate": self.rate_at(now),
+            "latency_ms": self.latency_ms, "state": self.state,
+            "starts_in_s": round(max(0.0, self.starts_at - now), 3),
+            "expires_in_s": round(self.expires_at - now, 3) if self.expires_at is not None else None,
+        }
+
+
+class _CellRules:
+    """
+    The live rules matching one cell, and the distribution of which of them
+    fails a transaction there. Every rule rolls independently and the latest
+    hit wins, so rule k wins with p_k * prod(1 - p_j for later j); the CDF
+    over those (plus "none") needs one uniform draw per transaction.
+    """
+
+    def __init__(self, rules: List[InjectionRule]):
+        self.rules = tuple(rules)
+        self.error_codes = np.array([batch_codes.ERROR_CODES.code(r.error_code) for r in rules], np.uint16)
+        self.latency_ms = np.array([-1 if r.latency_ms is None else r.latency_ms for r in rules], np.int64)
+        self.ramp_until = max((r.starts_at + r.ramp_s for r in rules if r.ramp_s > 0), default=0.0)
+        self._cdf: Optional[np.ndarray] = None
+
+    def cdf(self, now: float) -> np.ndarray:
+        if self._cdf is not None:
+            return self._cdf
+        rates = np.fromiter((r.rate_at(now) for r in self.rules), np.float64, len(self.rules))
+        later_miss = np.append(np.cumprod((1 - rates)[::-1])[::-1][1:], 1.0)  # prod over later rules
+        cdf = np.cumsum(rates * later_miss)
+        if now >= self.ramp_until:  # rates are constant from here on
+            self._cdf = cdf
+        return cdf
+
+
+class RuleEngine:
+    """
+    Injection rules indexed by what they match, so evaluating a transaction
+    costs a few hash lookups however many rules exist.
+
+    Live rules sit in one dict per match mask (which fields they constrain),
+    keyed by the codes of those fields; BIN-range rules are expanded into one
+    key per known BIN in range when they go live. A transaction's "cell"
+    (issuer, region, method, processor, BIN codes) is resolved by probing each mask in
+    use, and the result is cached per cell until the live set changes.
+    Pending and expiring rules wait in heaps ordered by time, so inactive
+    rules cost nothing until their window opens.
+
+    BIN ranges are resolved against `bins` (the BINs the simulator
+    generates); BINs added later only match rules that go live after them.
+    """
+
+    def __init__(self, bins: Iterable[str] = ()):
+        self.bins: List[Tuple[int, int]] = [(int(b), batch_codes.BIN_RANGES.code(b)) for b in bins]
+        self.rules: Dict[str, InjectionRule] = {}
+        self._index: Dict[int, Dict[Tuple[int, ...], Dict[int, InjectionRule]]] = {}  # mask -> key -> seq -> rule
+        self._keys: Dict[str, List[Tuple[int, Tuple[int, ...]]]] = {}  # rule_id -> its index entries
+        self._cells: Dict[int, _CellRules] = {}
+        self._pending: List[Tuple[float, int, InjectionRule]] = []
+        self._expiring: List[Tuple[float, int, InjectionRule]] = []
+        self._seq = itertools.count()
+        self.active = 0
+        self.activated = 0
+        self.expired = 0
+
+    # -- rule lifecycle -------------------------------------------------
+
+    def add(self, rule_id: str, *, delay_s: float = 0.0, duration_s: Optional[float] = None,
+            now: Optional[float] = None, **match) -> InjectionRule:
+        """Add (or replace) a rule; `match` takes the InjectionRule fields."""
+        now = time.monotonic() if now is None else now
+        self.remove(rule_id)
+        rule = InjectionRule(rule_id, starts_at=now + delay_s, seq=next(self._seq), **match)
+        if duration_s is not None:
+            rule.expires_at = rule.starts_at + duration_s
+        self.rules[rule_id] = rule
+        if delay_s > 0:
+            heapq.heappush(self._pending, (rule.starts_at, rule.seq, rule))
+        else:
+            self._activate(rule)
+        return rule
+
+    def remove(self, rule_id: str) -> bool:
+        rule = self.rules.pop(rule_id, None)
+        if rule is None:
+            return False
+        if rule.state == "active":
+            self._deactivate(rule)
+        rule.state = "removed"  # lazily dropped from the heaps
+        return True
+
+    def clear(self):
+        for rule_id in list(self.rules):
+            self.remove(rule_id)
+
+    def advance(self, now: Optional[float] = None):
+        """Start rules whose window opened and expire those whose window closed."""
+        now = time.monotonic() if now is None else now
+        while self._pending and self._pending[0][0] <= now:
+            _, _, rule = heapq.heappop(self._pending)
+            if rule.state == "pending":
+                self._activate(rule)
+        while self._expiring and self._expiring[0][0] <= now:
+            _, _, rule = heapq.heappop(self._expiring)
+            if rule.state == "active":
+                self._deactivate(rule)
+                rule.state = "expired"
+                self.expired += 1
+                del self.rules[rule.rule_id]
+
+    def _entries(self, rule: InjectionRule) -> List[Tuple[int, Tuple[int, ...]]]:
+        mask, key = 0, []
+        for bit, (name, vocab) in enumerate((("issuer", batch_codes.ISSUERS), ("region", batch_codes.REGIONS),
+                                             ("payment_method", batch_codes.METHODS),
+                                             ("processor", batch_codes.PROCESSORS))):
+            value = getattr(rule, name)
+            if value is not None:
+                mask |= 1 << bit
+                key.append(vocab.code(value))
+        if rule.bin_range is None:
+            return [(mask, tuple(key))]
+        low, high = rule.bin_range
+        return [(mask | _BIN_BIT, tuple(key) + (code,)) for bin_, code in self.bins if low <= bin_ <= high]
+
+    def _activate(self, rule: InjectionRule):
+        entries = self._entries(rule)
+        for mask, key in entries:
+            self._index.setdefault(mask, {}).setdefault(key, {})[rule.seq] = rule
+        self._keys[rule.rule_id] = entries
+        rule.state = "active"
+        self.active += 1
+        self.activated += 1
+        if rule.expires_at is not None:
+            heapq.heappush(self._expiring, (rule.expires_at, rule.seq, rule))
+        self._invalidate(entries)
+
+    def _deactivate(self, rule: InjectionRule):
+        entries = self._keys.pop(rule.rule_id)
+        for mask, key in entries:
+            bucket = self._index[mask]
+            del bucket[key][rule.seq]
+            if not bucket[key]:
+                del bucket[key]
+                if not bucket:
+                    del self._index[mask]
+        self.active -= 1
+        self._invalidate(entries)
+
+    def _invalidate(self, entries: List[Tuple[int, Tuple[int, ...]]]):
+        """Drop the cached cells a rule's index entries cover."""
+        masks = {}
+        for mask, key in entries:
+            masks.setdefault(mask, set()).add(key)
+        stale = []
+        for cell in self._cells:
+            codes = [(cell >> shift) & width for shift, width in _FIELDS]
+            for mask, keys in masks.items():
+                if tuple(code for bit, code in enumerate(codes) if mask & (1 << bit)) in keys:
+                    stale.append(cell)
+                    break
+        for cell in stale:
+            del self._cells[cell]
+
+    # -- matching -------------------------------------------------------
+
+    @staticmethod
+    def cell(issuer: int, region: int, method: int, processor: int, bin_: int) -> int:
+        return (issuer << 48) | (region << 36) | (method << 28) | (processor << 16) | bin_
+
+    def _cell(self, cell: int) -> "_CellRules":
+        entry = self._cells.get(cell)
+        if entry is None:
+            codes = [(cell >> shift) & width for shift, width in _FIELDS]
+            found = []
+            for mask, bucket in self._index.items():
+                matched = bucket.get(tuple(code for bit, code in enumerate(codes) if mask & (1 << bit)))
+                if matched:
+                    found.extend(matched.values())
+            entry = self._cells[cell] = _CellRules(sorted(found, key=lambda r: r.seq))
+        return entry
+
+    def match(self, issuer: int, region: int, method: int, processor: int, bin_: int) -> Tuple[InjectionRule, ...]:
+        """Live rules for one transaction (by codes), in the order they apply."""
+        return self._cell(self.cell(issuer, region, method, processor, bin_)).rules if self.active else ()
+
+    def pick(self, issuer: int, region: int, method: int, processor: int, bin_: int, u: float,
+             now: Optional[float] = None) -> Optional[InjectionRule]:
+        """The rule that fails one transaction given a uniform draw `u` (None: it goes through)."""
+        if not self.active:
+            return None
+        entry = self._cell(self.cell(issuer, region, method, processor, bin_))
+        if not entry.rules:
+            return None
+        winner = bisect.bisect_right(entry.cdf(time.monotonic() if now is None else now), u)
+        return entry.rules[winner] if winner < len(entry.rules) else None
+
+    def apply(self, batch: TransactionBatch, rng: np.random.Generator, now: Optional[float] = None):
+        """
+        Fail matching rows of `batch` in place, with one uniform draw per row.
+
+        The per-cell outcome CDFs are laid end to end, each shifted by its
+        position, so a single searchsorted picks every row's winning rule (or
+        none) whatever the number of rules and cells.
+        """
+        now = time.monotonic() if now is None else now
+        self.advance(now)
+        if not self.active or not len(batch):
+            return
+        cells = ((batch.issuer.astype(np.uint64) << np.uint64(48)) | (batch.region.astype(np.uint64) << np.uint64(36))
+                 | (batch.payment_method.astype(np.uint64) << np.uint64(28))
+                 | (batch.processor.astype(np.uint64) << np.uint64(16)) | batch.bin_range.astype(np.uint64))
+        unique, inverse = np.unique(cells, return_inverse=True)
+        entries = [self._cell(cell) for cell in unique.tolist()]
+        sizes = np.fromiter((len(e.rules) for e in entries), np.int64, len(entries))
+        if not sizes.any():
+            return
+        starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+        flat_cdf = np.concatenate([e.cdf(now) + i for i, e in enumerate(entries) if e.rules])
+        picked = np.searchsorted(flat_cdf, rng.random(len(batch)) + inverse, side="right")
+        failed = picked - starts[inverse] < sizes[inverse]
+        rows = np.flatnonzero(failed)
+        if not len(rows):
+            return
+        winners = picked[rows]
+        error_codes = np.concatenate([e.error_codes for e in entries if e.rules])
+        spikes = np.concatenate([e.latency_ms for e in entries if e.rules])[winners]
+        batch.status[rows] = batch_codes.FAILED
+        batch.error_code[rows] = error_codes[winners]
+        spiked = spikes >= 0
+        batch.latency_ms[rows[spiked]] = spikes[spiked] + rng.integers(-100, 101, int(spiked.sum()))
+
+    def snapshot(self, now: Optional[float] = None, limit: int = 100) -> Dict:
+        now = time.monotonic() if now is None else now
+        return {
+            "rules": len(self.rules),
+            "active": self.active,
+            "pending": sum(rule.state == "pending" for rule in self.rules.values()),
+            "activated": self.activated,
+            "expired": self.expired,
+            "masks": {format(mask, "05b"): len(bucket) for mask, bucket in self._index.items()},
+            "sample": [rule.to_dict(now) for rule in itertools.islice(self.rules.values(), limit)],
+        }
+
+
+def parse_bin_range(value: Optional[Sequence]) -> Optional[Tuple[int, int]]:
+    """(low, high), "low-high" or a single BIN -> inclusive integer range; ValueError for anything else."""
+    if value is None or value == "":
+        return None
+    try:
+        if isinstance(value, str):
+            low, dash, high = value.partition("-")
+            low, high = int(low), int(high if dash else low)
+        else:
+            low, high = (int(v) for v in value)
+    except (TypeError, ValueError):
+        raise ValueError(f"bin_range must be 'low-high' or a single BIN, got {value!r}") from None
+    if low > high:
+        raise ValueError(f"bin_range {value!r} is empty (low > high)")
+    return low, high
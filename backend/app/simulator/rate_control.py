@@ -0,0 +1,42 @@
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket for pacing batched generation at a target rate.
+
+    Tokens accrue continuously at `rate` per second (fractions carry over
+    between ticks) up to `burst`, so a producer that takes whatever is
+    available each tick holds the target rate without sleeping per event,
+    and a stalled producer can't catch up with an unbounded burst.
+    """
+
+    def __init__(self, rate: float, burst: float = None):
+        self.rate = rate
+        self.burst = burst if burst is not None else rate
+        self.tokens = 0.0
+        self.last = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.last) * self.rate)
+        self.last = now
+
+    def take(self, limit: int = None) -> int:
+        """Consume and return the whole tokens currently available (at most `limit`)."""
+        self._refill()
+        count = int(self.tokens)
+        if limit is not None:
+            count = min(count, limit)
+        self.tokens -= count
+        return count
+
+    async def acquire(self, tick_s: float, limit: int = None) -> int:
+        """Sleep for one tick (longer if the bucket is still empty), then take()."""
+        await asyncio.sleep(tick_s)
+        count = self.take(limit)
+        while count == 0:
+            await asyncio.sleep((1.0 - self.tokens) / self.rate)
+            count = self.take(limit)
+        return count
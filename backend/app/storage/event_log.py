@@ -0,0 +1,153 @@
+import bisect
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+
+class _SeqIndex:
+    """Ascending list of event sequence numbers; evicts from the front in O(1) amortized."""
+
+    __slots__ = ("seqs", "head")
+
+    def __init__(self):
+        self.seqs: List[int] = []
+        self.head = 0
+
+    def __len__(self) -> int:
+        return len(self.seqs) - self.head
+
+    def append(self, seq: int):
+        self.seqs.append(seq)
+
+    def evict(self, seq: int):
+        if self.head < len(self.seqs) and self.seqs[self.head] == seq:
+            self.head += 1
+            # Compact once the dead prefix dominates
+            if self.head > 64 and self.head * 2 > len(self.seqs):
+                del self.seqs[:self.head]
+                self.head = 0
+
+    def before(self, seq: int, lo_seq: int, limit: int) -> List[int]:
+        """Up to `limit` seqs in [lo_seq, seq), newest first."""
+        hi = bisect.bisect_left(self.seqs, seq, self.head)
+        lo = bisect.bisect_left(self.seqs, lo_seq, self.head, hi)
+        return self.seqs[max(lo, hi - limit):hi][::-1]
+
+
+class EventLog:
+    """
+    Bounded in-memory event store.
+
+    Events live in a fixed-capacity ring buffer addressed by a monotonically
+    increasing sequence number (slot = seq % capacity), so appends and
+    evictions are O(1). Per-agent/level/issuer indexes hold ascending seqs,
+    and since seqs are time ordered, time ranges resolve to seq ranges with a
+    binary search. Queries page newest-first with the seq as cursor.
+    """
+
+    INDEXED = ("agent", "level", "issuer")
+
+    def __init__(self, capacity: int = 1000):
+        self.capacity = capacity
+        self._slots: List[Optional[Dict[str, Any]]] = [None] * capacity
+        self.next_seq = 0
+        self._indexes: Dict[str, Dict[str, _SeqIndex]] = {field: {} for field in self.INDEXED}
+
+    def __len__(self) -> int:
+        return self.next_seq - self.oldest_seq
+
+    @property
+    def oldest_seq(self) -> int:
+        return max(0, self.next_seq - self.capacity)
+
+    def append(self, agent: str, message: str, level: str = "info", issuer: Optional[str] = None,
+               ts: Optional[float] = None) -> Dict[str, Any]:
+        """Record an event. `ts` (epoch seconds) is only passed when restoring history."""
+        now = time.time() if ts is None else ts
+        seq = self.next_seq
+        entry = {
+            "seq": seq,
+            "ts": now,
+            "timestamp": datetime.fromtimestamp(now).strftime("%H:%M:%S"),
+            "agent": agent,
+            "message": message,
+            "level": level,
+            "issuer": issuer,
+        }
+
+        slot = seq % self.capacity
+        evicted = self._slots[slot]
+        if evicted is not None:
+            for field in self.INDEXED:
+                if evicted[field] is not None:
+                    self._indexes[field][evicted[field]].evict(evicted["seq"])
+
+        self._slots[slot] = entry
+        for field in self.INDEXED:
+            if entry[field] is not None:
+                self._indexes[field].setdefault(entry[field], _SeqIndex()).append(seq)
+        self.next_seq += 1
+        return entry
+
+    def get(self, seq: int) -> Optional[Dict[str, Any]]:
+        if self.oldest_seq <= seq < self.next_seq:
+            return self._slots[seq % self.capacity]
+        return None
+
+    def _seq_at_time(self, ts: float) -> int:
+        """First seq whose event happened at or after `ts`."""
+        lo, hi = self.oldest_seq, self.next_seq
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._slots[mid % self.capacity]["ts"] < ts:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def query(self, agent: Optional[str] = None, level: Optional[str] = None, issuer: Optional[str] = None,
+              since: Optional[float] = None, until: Optional[float] = None,
+              cursor: Optional[int] = None, limit: int = 50) -> Dict[str, Any]:
+        """
+        Events matching every given filter, newest first. Pass the returned
+        `next_cursor` back as `cursor` for the next (older) page.
+        """
+        lo_seq = self.oldest_seq if since is None else self._seq_at_time(since)
+        hi_seq = self.next_seq if until is None else self._seq_at_time(until)
+        if cursor is not None:
+            hi_seq = min(hi_seq, cursor)
+
+        filters = {field: value for field, value in (("agent", agent), ("level", level), ("issuer", issuer))
+                   if value is not None}
+        events: List[Dict[str, Any]] = []
+        if filters:
+            # Walk the most selective index, check the remaining filters per event
+            candidates = [self._indexes[f].get(v) for f, v in filters.items()]
+            if any(c is None for c in candidates):
+                return {"events": [], "next_cursor": None}
+            index = min(candidates, key=len)
+            seq = hi_seq
+            while len(events) < limit:
+                chunk = index.before(seq, lo_seq, limit)
+                if not chunk:
+                    break
+                for candidate in chunk:
+                    entry = self._slots[candidate % self.capacity]
+                    if all(entry[f] == v for f, v in filters.items()):
+                        events.append(entry)
+                        if len(events) == limit:
+                            break
+                seq = chunk[-1]
+        else:
+            start = max(lo_seq, hi_seq - limit)
+            events = [self._slots[s % self.capacity] for s in range(hi_seq - 1, start - 1, -1)]
+
+        next_cursor = events[-1]["seq"] if len(events) == limit and events[-1]["seq"] > lo_seq else None
+        return {"events": events, "next_cursor": next_cursor}
+
+    def recent(self, limit: int = 50, **filters) -> List[Dict[str, Any]]:
+        """Most recent matching events, oldest first (handy for prompts)."""
+        return self.query(limit=limit, **filters)["events"][::-1]
+
+    def issuers(self) -> List[str]:
+        return [name for name, index in self._indexes["issuer"].items() if len(index)]
@@ -0,0 +1,378 @@
+import asyncio
+import json
+import mmap
+import os
+import queue
+import struct
+import threading
+import time
+import zlib
+from typing import Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from app.models.transaction import TransactionSchema
+from app.models.transaction_batch import TransactionBatch
+
+# Record kinds
+TRANSACTIONS = 1
+EVENT = 2
+DECISION = 3
+INCIDENT = 4
+SNAPSHOT = 5  # state to restore from; replay (and retention) needn't go further back than the latest
+
+# Frame header: length and crc32 of (kind byte + payload)
+HEADER = struct.Struct("<II")
+SEGMENT_PATTERN = "segment-{:06d}.log"
+
+
+def _segment_index(path: str) -> int:
+    return int(os.path.basename(path)[8:14])
+
+
+class SegmentLog:
+    """
+    Durable append-only log split into fixed-size segment files.
+
+    Appends never touch the disk on the caller's thread: records go onto a
+    bounded queue that a writer thread drains in groups, writing each group
+    with one write() and one fsync (group commit). Single transactions are
+    buffered and written as columnar TransactionBatch records, so the log
+    keeps up with the simulator's batched mode; within a segment they only
+    carry code table additions, not the whole tables. Replay memory-maps
+    each segment and yields records in order, stopping cleanly at a torn tail.
+
+    A full queue drops the record (counted in stats). An I/O error is logged
+    and the writer retries the same records on a reopened segment. Callers
+    append SNAPSHOT records (e.g. when `snapshot_due`); `restore` starts from
+    the latest one, and segments before it are deleted once the log is over
+    `max_bytes` or they are older than `max_age_s`.
+    """
+
+    def __init__(self, directory: str, segment_bytes: int = 64 * 1024 * 1024,
+                 max_pending: int = 10_000, fsync: bool = True,
+                 tx_batch_rows: int = 1024, tx_flush_s: float = 0.5,
+                 max_bytes: Optional[int] = None, max_age_s: Optional[float] = None, retry_s: float = 1.0):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self.fsync = fsync
+        self.tx_batch_rows = tx_batch_rows
+        self.tx_flush_s = tx_flush_s
+        self.max_bytes = max_bytes
+        self.max_age_s = max_age_s
+        self.retry_s = retry_s
+        self._queue: "queue.Queue[Tuple[int, Any]]" = queue.Queue(maxsize=max_pending)
+        self._thread: Optional[threading.Thread] = None
+        self._file = None
+        self._segment_index = 0
+        self._committed_end: Optional[int] = None  # end of the last commit in the open segment
+        self._vocab_sizes: Dict[str, int] = {}  # code table names already in the open segment
+        self._pending_txs: List[TransactionSchema] = []
+        self._unwritten: List[Tuple[int, Any]] = []  # taken off the queue, not committed yet
+        self._stopping = False
+        self._snapshot_segment = 0  # segment holding the latest committed snapshot
+        self._snapshot_queued = 0
+        self.records_written = 0
+        self.bytes_written = 0
+        self.commits = 0
+        self.records_dropped = 0
+        self.rows_dropped = 0
+        self.write_errors = 0
+        self.last_error: Optional[str] = None
+        self.segments_deleted = 0
+        os.makedirs(directory, exist_ok=True)
+
+    # -- write path -----------------------------------------------------
+
+    def start(self):
+        if self._thread is None:
+            self._stopping = False
+            found = self._latest_snapshot()
+            self._snapshot_segment = _segment_index(found[0]) if found else 0
+            self._open_segment()
+            self._apply_retention()
+            self._thread = threading.Thread(target=self._writer, name="segment-log-writer", daemon=True)
+            self._thread.start()
+
+    def close(self):
+        """Flush everything queued so far and stop the writer."""
+        if self._thread is not None:
+            self._queue.put((0, None))
+            self._thread.join()
+            self._thread = None
+        self._close_file()
+
+    def append(self, kind: int, record: Any) -> bool:
+        """Queue a record without blocking. Returns False (and counts a drop) if the queue is full."""
+        try:
+            self._queue.put_nowait((kind, record))
+            return True
+        except queue.Full:
+            self.records_dropped += 1
+            if kind == TRANSACTIONS:
+                self.rows_dropped += len(record) if isinstance(record, TransactionBatch) else 1
+            return False
+
+    async def append_async(self, kind: int, record: Any):
+        """Queue a record, waiting off the event loop if the writer is behind."""
+        try:
+            self._queue.put_nowait((kind, record))
+        except queue.Full:
+            await asyncio.to_thread(self._queue.put, (kind, record))
+
+    def append_transaction(self, tx: TransactionSchema) -> bool:
+        return self.append(TRANSACTIONS, tx)
+
+    def append_batch(self, batch: TransactionBatch) -> bool:
+        return self.append(TRANSACTIONS, batch)
+
+    def append_snapshot(self, state: Dict[str, Any]) -> bool:
+        if not self.append(SNAPSHOT, state):
+            return False
+        self._snapshot_queued = self._segment_index
+        return True
+
+    @property
+    def snapshot_due(self) -> bool:
+        """True while the segment being written has no snapshot in it (or on its way)."""
+        return self._thread is not None and self._segment_index > max(self._snapshot_segment, self._snapshot_queued)
+
+    def _open_segment(self):
+        existing = self.segments()
+        if existing:
+            last = existing[-1]
+            self._segment_index = _segment_index(last)
+            # Drop a torn tail (a crash, or a failed write we're about to retry) so new records stay reachable
+            valid = self._valid_length(last)
+            if self._committed_end is not None:
+                valid = min(valid, self._committed_end)
+            if valid < os.path.getsize(last):
+                os.truncate(last, valid)
+            if valid >= self.segment_bytes:
+                self._segment_index += 1
+        else:
+            self._segment_index = 1
+        path = os.path.join(self.directory, SEGMENT_PATTERN.format(self._segment_index))
+        self._file = open(path, "ab")
+        self._committed_end = self._file.tell()
+        self._vocab_sizes = {}
+
+    def _roll_segment(self):
+        self._file.close()
+        self._segment_index += 1
+        path = os.path.join(self.directory, SEGMENT_PATTERN.format(self._segment_index))
+        self._file = open(path, "ab")
+        self._committed_end = 0
+        self._vocab_sizes = {}
+
+    def _close_file(self):
+        if self._file is not None:
+            try:
+                self._file.close()
+            except OSError:
+                pass
+            self._file = None
+
+    def _writer(self):
+        while True:
+            try:
+                self._write_loop()
+                return
+            except Exception as e:
+                self.write_errors += 1
+                self.last_error = f"{type(e).__name__}: {e}"
+                self._close_file()
+                if self._stopping:
+                    print(f"SEGMENT LOG ERROR: {self.last_error}; {len(self._unwritten)} records lost at shutdown")
+                    self.records_dropped += len(self._unwritten)
+                    return
+                print(f"SEGMENT LOG ERROR: {self.last_error}; retrying {len(self._unwritten)} records "
+                      f"in {self.retry_s}s")
+                time.sleep(self.retry_s)
+
+    def _write_loop(self):
+        if self._file is None:
+            self._open_segment()
+        if self._unwritten:
+            self._commit()
+        last_tx_flush = time.monotonic()
+        while not self._stopping:
+            try:
+                group = [self._queue.get(timeout=self.tx_flush_s)]
+            except queue.Empty:
+                group = []
+            while True:
+                try:
+                    group.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            for kind, record in group:
+                if record is None:
+                    self._stopping = True
+                elif kind == TRANSACTIONS and isinstance(record, TransactionSchema):
+                    self._pending_txs.append(record)
+                else:
+                    self._unwritten.append((kind, record))
+
+            now = time.monotonic()
+            if self._pending_txs and (self._stopping or len(self._pending_txs) >= self.tx_batch_rows
+                                      or now - last_tx_flush >= self.tx_flush_s):
+                self._unwritten.append((TRANSACTIONS, TransactionBatch.from_schemas(self._pending_txs)))
+                self._pending_txs = []
+                last_tx_flush = now
+
+            if self._unwritten:
+                self._commit()
+
+    def _frame(self, kind: int, record: Any) -> bytes:
+        if kind == TRANSACTIONS:
+            payload = record.to_bytes(self._vocab_sizes)
+        else:
+            payload = json.dumps(record, default=str).encode()
+        body = bytes((kind,)) + payload
+        return HEADER.pack(len(body), zlib.crc32(body)) + body
+
+    def _commit(self):
+        """Write `_unwritten` as one group; on an error it stays there to be retried."""
+        if self._file.tell() >= self.segment_bytes:
+            self._roll_segment()
+            self._apply_retention()
+        # Encoded per attempt: code table deltas depend on what the segment being written already holds
+        data = b"".join(self._frame(kind, record) for kind, record in self._unwritten)
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self._committed_end = self._file.tell()
+        if any(kind == SNAPSHOT for kind, _ in self._unwritten):
+            self._snapshot_segment = self._segment_index
+        self.records_written += len(self._unwritten)
+        self.bytes_written += len(data)
+        self.commits += 1
+        self._unwritten = []
+
+    def _apply_retention(self):
+        """Delete the oldest segments that the latest snapshot covers while over max_bytes or older than max_age_s."""
+        if self.max_bytes is None and self.max_age_s is None:
+            return
+        try:
+            paths = self.segments()
+            total = sum(os.path.getsize(path) for path in paths)
+            cutoff = time.time() - self.max_age_s if self.max_age_s is not None else None
+            for path in paths:
+                if _segment_index(path) >= self._snapshot_segment:
+                    break
+                stat = os.stat(path)
+                if not ((self.max_bytes is not None and total > self.max_bytes)
+                        or (cutoff is not None and stat.st_mtime < cutoff)):
+                    break
+                os.remove(path)
+                total -= stat.st_size
+                self.segments_deleted += 1
+        except OSError as e:
+            print(f"SEGMENT LOG ERROR: retention: {e}")
+
+    # -- read path ------------------------------------------------------
+
+    def segments(self) -> List[str]:
+        names = sorted(n for n in os.listdir(self.directory) if n.startswith("segment-") and n.endswith(".log"))
+        return [os.path.join(self.directory, n) for n in names]
+
+    def replay(self, kinds: Optional[Set[int]] = None,
+               after: Optional[Tuple[str, int]] = None) -> Iterator[Tuple[int, Any]]:
+        """
+        Yield (kind, record) for every committed record, oldest first (only
+        those past `after`, a (segment path, offset) position, if given).
+        Transactions come back as TransactionBatch, everything else as dicts.
+        """
+        for path in self.segments():
+            if after is not None and path < after[0]:
+                continue
+            size = os.path.getsize(path)
+            if size == 0:
+                continue
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    yield from self._read_segment(view, size, kinds, after[1] if after and path == after[0] else 0)
+                finally:
+                    view.release()
+
+    def _frames(self, view, size: int, kinds: Optional[Set[int]] = None) -> Iterator[Tuple[int, int, int]]:
+        """
+        (kind, payload_start, end) per frame; stops at a torn or corrupt tail.
+        Checksums are only verified for frames of the requested kinds, so
+        skipping over large transaction records stays cheap.
+        """
+        offset = 0
+        while offset + HEADER.size <= size:
+            length, crc = HEADER.unpack_from(view, offset)
+            start, end = offset + HEADER.size, offset + HEADER.size + length
+            if length == 0 or end > size:
+                return
+            kind = view[start]
+            if (kinds is None or kind in kinds) and zlib.crc32(view[start:end]) != crc:
+                return
+            yield kind, start + 1, end
+            offset = end
+
+    def _valid_length(self, path: str) -> int:
+        with open(path, "rb") as f:
+            data = f.read()
+        end = 0
+        for _, _, end in self._frames(data, len(data)):
+            pass
+        return end
+
+    def _read_segment(self, view: memoryview, size: int, kinds: Optional[Set[int]], skip_to: int = 0):
+        vocab: Dict[str, Any] = {}  # code table state of the segment's transaction records so far
+        for kind, start, end in self._frames(view, size, kinds):
+            if kinds is None or kind in kinds:
+                if kind == TRANSACTIONS:
+                    batch = TransactionBatch.from_bytes(view[start:end], vocab)
+                    if start >= skip_to:
+                        yield kind, batch
+                elif start >= skip_to:
+                    yield kind, json.loads(bytes(view[start:end]))
+
+    def _latest_snapshot(self) -> Optional[Tuple[str, int, Dict[str, Any]]]:
+        """(segment path, end offset, state) of the newest snapshot record, searching from the last segment back."""
+        for path in reversed(self.segments()):
+            size = os.path.getsize(path)
+            if size == 0:
+                continue
+            with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                found = None
+                for kind, start, end in self._frames(mm, size, {SNAPSHOT}):
+                    if kind == SNAPSHOT:
+                        found = start, end
+                if found is not None:
+                    return path, found[1], json.loads(mm[found[0]:found[1]])
+        return None
+
+    def restore(self, kinds: Optional[Set[int]] = None) -> Tuple[Optional[Dict[str, Any]], Iterator[Tuple[int, Any]]]:
+        """The latest snapshot (None if there is none) and the records of `kinds` committed after it."""
+        found = self._latest_snapshot()
+        if found is None:
+            return None, self.replay(kinds)
+        path, end, state = found
+        return state, self.replay(kinds, after=(path, end))
+
+    def replay_transactions(self) -> Iterator[TransactionBatch]:
+        for _, batch in self.replay({TRANSACTIONS}):
+            yield batch
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "directory": self.directory,
+            "segments": len(self.segments()),
+            "pending": self._queue.qsize(),
+            "records_written": self.records_written,
+            "bytes_written": self.bytes_written,
+            "commits": self.commits,
+            "records_dropped": self.records_dropped,
+            "rows_dropped": self.rows_dropped,
+            "write_errors": self.write_errors,
+            "last_error": self.last_error,
+            "segments_deleted": self.segments_deleted,
+            "snapshot_segment": self._snapshot_segment,
+        }
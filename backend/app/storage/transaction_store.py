@@ -0,0 +1,201 @@
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Union
+
+import numpy as np
+
+from app.models import transaction_batch as batch_codes
+from app.models.transaction import TransactionSchema
+from app.models.transaction_batch import TransactionBatch
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    tx_id INTEGER NOT NULL,
+    ts REAL NOT NULL,
+    issuer TEXT NOT NULL,
+    region TEXT,
+    payment_method TEXT,
+    status TEXT NOT NULL,
+    error_code TEXT,
+    latency_ms INTEGER NOT NULL,
+    ext_id TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_tx_issuer_ts ON transactions (issuer, ts);
+CREATE INDEX IF NOT EXISTS idx_tx_error_ts ON transactions (error_code, ts);
+CREATE INDEX IF NOT EXISTS idx_tx_issuer_failed_ts ON transactions (issuer, ts) WHERE error_code IS NOT NULL;
+CREATE TABLE IF NOT EXISTS error_counts_minute (
+    issuer TEXT NOT NULL,
+    minute INTEGER NOT NULL,
+    error_code TEXT NOT NULL,
+    count INTEGER NOT NULL,
+    PRIMARY KEY (issuer, minute, error_code)
+) WITHOUT ROWID;
+"""
+
+
+class TransactionStore:
+    """
+    Embedded SQLite (WAL) store behind QueryDatabaseTool.
+
+    Transactions are buffered with `add` and written in one executemany per
+    `flush`, together with pre-aggregated per-minute error counts, so the
+    Analyst's "recent errors for issuer X" question reads a handful of
+    aggregate rows instead of scanning raw transactions. All SQL is
+    parameterized.
+    """
+
+    def __init__(self, path: str, retention_s: Optional[float] = None):
+        self.path = path
+        self.retention_s = retention_s
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(transactions)")]
+        if "ext_id" not in columns:  # databases created before ids from real feeds were kept
+            self._conn.execute("ALTER TABLE transactions ADD COLUMN ext_id TEXT")
+        self._lock = threading.Lock()
+        self._pending: List[Union[TransactionSchema, TransactionBatch]] = []
+        self.rows_ingested = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    # -- ingestion ------------------------------------------------------
+
+    def add(self, tx: TransactionSchema):
+        """Buffer one transaction (cheap; safe to call from the event loop)."""
+        self._pending.append(tx)
+
+    def add_batch(self, batch: TransactionBatch):
+        self._pending.append(batch)
+
+    def flush(self) -> int:
+        """Write buffered transactions. Meant to run in a worker thread."""
+        pending, self._pending = self._pending, []
+        if not pending:
+            return 0
+        batches: List[TransactionBatch] = []
+        schemas: List[TransactionSchema] = []
+        for item in pending:
+            if isinstance(item, TransactionBatch):
+                if schemas:
+                    batches.append(TransactionBatch.from_schemas(schemas))
+                    schemas = []
+                batches.append(item)
+            else:
+                schemas.append(item)
+        if schemas:
+            batches.append(TransactionBatch.from_schemas(schemas))
+        return self.ingest(TransactionBatch.concat(batches))
+
+    def ingest(self, batch: TransactionBatch) -> int:
+        if not len(batch):
+            return 0
+        issuers = np.array(batch_codes.ISSUERS.names, dtype=object)[batch.issuer]
+        errors = np.array(batch_codes.ERROR_CODES.names, dtype=object)[batch.error_code]
+        rows = zip(
+            batch.tx_id.tolist(),
+            batch.timestamp.tolist(),
+            issuers.tolist(),
+            np.array(batch_codes.REGIONS.names, dtype=object)[batch.region].tolist(),
+            [m.value for m in np.array(batch_codes.METHODS.names, dtype=object)[batch.payment_method]],
+            [s.value for s in np.array(batch_codes.STATUSES.names, dtype=object)[batch.status]],
+            errors.tolist(),
+            batch.latency_ms.tolist(),
+            batch.ids.tolist() if batch.ids is not None else [None] * len(batch),
+        )
+
+        # Per-minute error counts for this batch, merged into the rollup table
+        failed = batch.error_code != 0
+        minutes = (batch.timestamp[failed] // 60).astype(np.int64)
+        keys, counts = np.unique(
+            np.stack([batch.issuer[failed].astype(np.int64), minutes, batch.error_code[failed].astype(np.int64)]),
+            axis=1, return_counts=True,
+        ) if failed.any() else (np.empty((3, 0), np.int64), np.empty(0, np.int64))
+        rollup = [
+            (batch_codes.ISSUERS.names[i], m, batch_codes.ERROR_CODES.names[e], c)
+            for i, m, e, c in zip(keys[0].tolist(), keys[1].tolist(), keys[2].tolist(), counts.tolist())
+        ]
+
+        with self._lock, self._conn:
+            self._conn.executemany("INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+            self._conn.executemany(
+                "INSERT INTO error_counts_minute VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (issuer, minute, error_code) DO UPDATE SET count = count + excluded.count",
+                rollup,
+            )
+        self.rows_ingested += len(batch)
+        return len(batch)
+
+    def prune(self, now: float = None) -> int:
+        """Drop raw rows and rollups older than the retention window."""
+        if not self.retention_s:
+            return 0
+        cutoff = (time.time() if now is None else now) - self.retention_s
+        with self._lock, self._conn:
+            deleted = self._conn.execute("DELETE FROM transactions WHERE ts < ?", (cutoff,)).rowcount
+            self._conn.execute("DELETE FROM error_counts_minute WHERE minute < ?", (int(cutoff // 60),))
+        return deleted
+
+    # -- queries --------------------------------------------------------
+
+    def recent_errors(self, issuer: str, minutes: int = 5, error_code: Optional[str] = None,
+                      now: float = None, sample: int = 10) -> Dict[str, Any]:
+        """Per-minute error counts for `issuer` over the last `minutes`, plus a few recent failures."""
+        now = time.time() if now is None else now
+        since = now - minutes * 60
+        params: List[Any] = [issuer, int(since // 60)]
+        sql = "SELECT minute, error_code, count FROM error_counts_minute WHERE issuer = ? AND minute >= ?"
+        sample_params: List[Any] = [issuer, since]
+        sample_sql = ("SELECT tx_id, ext_id, ts, error_code, latency_ms, region FROM transactions "
+                      "WHERE issuer = ? AND ts >= ? AND error_code IS NOT NULL")
+        if error_code is not None:
+            sql += " AND error_code = ?"
+            sample_sql += " AND error_code = ?"
+            params.append(error_code)
+            sample_params.append(error_code)
+        sql += " ORDER BY minute, error_code"
+        sample_sql += " ORDER BY ts DESC LIMIT ?"
+        sample_params.append(sample)
+
+        with self._lock:
+            counts = self._conn.execute(sql, params).fetchall()
+            # Partial index over failed rows only, so healthy traffic is never scanned
+            failures = self._conn.execute(sample_sql, sample_params).fetchall() if counts else []
+
+        return {
+            "issuer": issuer,
+            "window_minutes": minutes,
+            "total_errors": sum(c for _, _, c in counts),
+            "rows": [
+                {"timestamp": datetime.fromtimestamp(m * 60).isoformat(), "error": code, "count": c}
+                for m, code, c in counts
+            ],
+            "recent_failures": [
+                {"transaction_id": ext_id or f"tx_{tx_id:012x}", "timestamp": datetime.fromtimestamp(ts).isoformat(),
+                 "error": code, "latency_ms": latency, "region": region}
+                for tx_id, ext_id, ts, code, latency, region in failures
+            ],
+        }
+
+
+_default_store: Optional[TransactionStore] = None
+
+
+def default_store() -> TransactionStore:
+    """Process-wide store at PAYSENTINEL_DB_PATH (opened on first use)."""
+    global _default_store
+    if _default_store is None:
+        retention_h = float(os.getenv("PAYSENTINEL_DB_RETENTION_H", "24"))
+        _default_store = TransactionStore(
+            os.getenv("PAYSENTINEL_DB_PATH", os.path.join("data", "transactions.db")),
+            retention_s=retention_h * 3600,
+        )
+    return _default_store
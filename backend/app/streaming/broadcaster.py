@@ -0,0 +1,131 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Dict, List
+
+from fastapi import WebSocket
+
+from app.streaming.wire import dumps
+
+DROP_OLDEST = "drop_oldest"
+DISCONNECT = "disconnect"
+
+
+class Client:
+    """One WebSocket connection with its own bounded send queue and writer task."""
+
+    def __init__(self, websocket: WebSocket, queue_size: int, policy: str, send_timeout_s: float):
+        self.websocket = websocket
+        self.policy = policy
+        self.send_timeout_s = send_timeout_s
+        self.queue: deque = deque(maxlen=queue_size)
+        self.ready = asyncio.Event()
+        self.closed = False
+        self.sent = 0
+        self.dropped = 0
+        self.sending_since = 0.0  # monotonic start of the in-progress send, 0 when idle
+        self.task: asyncio.Task = None
+
+    def offer(self, frame: str, now: float) -> bool:
+        """Queue a frame without blocking. Returns False if the client should be evicted."""
+        if self.sending_since and now - self.sending_since > self.send_timeout_s:
+            return False
+        if len(self.queue) == self.queue.maxlen:
+            if self.policy == DISCONNECT:
+                return False
+            self.dropped += 1  # deque(maxlen) discards the oldest frame
+        self.queue.append(frame)
+        self.ready.set()
+        return True
+
+    async def run(self):
+        while not self.closed:
+            await self.ready.wait()
+            self.ready.clear()
+            while self.queue and not self.closed:
+                frame = self.queue.popleft()
+                # Stuck sends are detected by the publisher (see offer), which is
+                # much cheaper than wrapping every send in wait_for.
+                self.sending_since = time.monotonic()
+                await self.websocket.send_text(frame)
+                self.sending_since = 0.0
+                self.sent += 1
+
+
+class Broadcaster:
+    """
+    Fan-out of server events to every connected dashboard.
+
+    `publish` serializes a message once and hands the same frame to each
+    client's queue, so it never awaits a socket. Each client drains its queue
+    from its own task; a client that falls `queue_size` frames behind either
+    loses its oldest frames (drop_oldest) or is disconnected (disconnect), and
+    clients whose sends fail or stay stuck for `send_timeout_s` are evicted.
+    """
+
+    def __init__(self, queue_size: int = 256, policy: str = DROP_OLDEST, send_timeout_s: float = 5.0):
+        if policy not in (DROP_OLDEST, DISCONNECT):
+            raise ValueError(f"Unknown slow-consumer policy: {policy}")
+        self.queue_size = queue_size
+        self.policy = policy
+        self.send_timeout_s = send_timeout_s
+        self.clients: Dict[WebSocket, Client] = {}
+        self.evicted = 0
+        self._tasks = set()  # in-flight closes (the loop only keeps weak references to tasks)
+
+    def __len__(self) -> int:
+        return len(self.clients)
+
+    def register(self, websocket: WebSocket) -> Client:
+        client = Client(websocket, self.queue_size, self.policy, self.send_timeout_s)
+        client.task = asyncio.create_task(self._drain(client))
+        self.clients[websocket] = client
+        return client
+
+    def unregister(self, websocket: WebSocket):
+        client = self.clients.pop(websocket, None)
+        if client is not None:
+            client.closed = True
+            client.ready.set()
+
+    async def _drain(self, client: Client):
+        try:
+            await client.run()
+        except Exception:
+            # Dead or stuck socket
+            self.evicted += 1
+            self.unregister(client.websocket)
+            await self._close(client.websocket)
+
+    def publish(self, message: Dict[str, Any]):
+        self.publish_frame(dumps(message))
+
+    def publish_frame(self, frame: str):
+        now = time.monotonic()
+        slow: List[Client] = []
+        for client in self.clients.values():
+            if not client.offer(frame, now):
+                slow.append(client)
+        for client in slow:
+            self.evicted += 1
+            self.unregister(client.websocket)
+            client.task.cancel()
+            task = asyncio.create_task(self._close(client.websocket))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _close(self, websocket: WebSocket):
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "clients": len(self.clients),
+            "policy": self.policy,
+            "queue_size": self.queue_size,
+            "queued": sum(len(c.queue) for c in self.clients.values()),
+            "dropped": sum(c.dropped for c in self.clients.values()),
+            "evicted": self.evicted,
+        }
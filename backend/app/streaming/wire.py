@@ -0,0 +1,34 @@
+import json
+from typing import Any, Dict, List, Optional
+
+from app.models.transaction import TransactionSchema
+
+try:
+    import orjson
+except ImportError:  # optional speedup
+    orjson = None
+
+
+def dumps(message: Any) -> str:
+    """Compact JSON text for a WebSocket frame (orjson when installed)."""
+    if orjson is not None:
+        return orjson.dumps(message).decode()
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False)
+
+
+def encode_transaction_frame(tx: TransactionSchema,
+                             alert: Optional[str] = None,
+                             agent_logs: Optional[List[Dict[str, Any]]] = None) -> str:
+    """
+    Final text of a {"type": "transaction", ...} broadcast frame.
+
+    The transaction is encoded exactly once by pydantic's JSON serializer and
+    spliced into the envelope, instead of dump -> parse -> dump. The shape
+    matches TransactionSchema in frontend/src/types.ts.
+    """
+    return (
+        '{"type":"transaction","data":' + tx.model_dump_json()
+        + ',"alert":' + dumps(alert)
+        + ',"agent_logs":' + dumps(agent_logs or [])
+        + "}"
+    )
@@ -1,3 +1,4 @@
+import os
 from typing import List, Dict, Any, Optional
 from pydantic import BaseModel, Field
 
@@ -12,20 +13,79 @@ class RouteTrafficTool:
     name = "route_traffic"
     description = "Redirects a percentage of traffic from one processor/issuer to another."
 
+    def __init__(self, url: Optional[str] = None, table=None):
+        # Load balancer API base (POST {url}/routes); unset -> only the in-process routing table changes
+        self.url = url or os.getenv("LOAD_BALANCER_URL")
+        # Opened lazily, like the store below
+        self._table = table
+
+    @property
+    def table(self):
+        if self._table is None:
+            from app.routing.routing_table import default_table
+            self._table = default_table()
+        return self._table
+
+    def _result(self, message: str, issuer: Optional[str], previous: int, version, **data) -> ToolResult:
+        return ToolResult(success=True, message=message, data={
+            **data, "issuer": issuer, "previous_version": previous, "version": version.version,
+            "weights": version.weights.get(issuer, {self.table.default_processor: 1.0}) if issuer else version.weights,
+        })
+
     def execute(self, percentage: int, destination: str, target_issuer: str = None) -> ToolResult:
-        # In a real system, this would call a Load Balancer API
         print(f"TOOL EXECUTION: Routing {percentage}% of {target_issuer or 'ALL'} traffic to {destination}")
-        return ToolResult(
-            success=True, 
-            message=f"Successfully routed {percentage}% of traffic to {destination}",
-            data={"percentage": percentage, "destination": destination}
-        )
+        previous = self.table.version
+        version = self.table.divert(target_issuer, percentage, destination)
+        return self._result(f"Successfully routed {percentage}% of traffic to {destination}", target_issuer,
+                            previous, version, percentage=percentage, destination=destination)
+
+    async def aexecute(self, percentage: int, destination: str, target_issuer: str = None) -> ToolResult:
+        if self.url:
+            from app.clients.http_pool import default_pool
+            payload = {"percentage": percentage, "destination": destination, "issuer": target_issuer}
+            try:
+                await default_pool().post_json(f"{self.url.rstrip('/')}/routes", payload)
+            except Exception as e:  # HTTP error, open circuit, bad JSON
+                return ToolResult(success=False, message=f"Load balancer rejected routing change: {e}", data=payload)
+        # The load balancer took it (or there is none): now route the simulated traffic the same way
+        return self.execute(percentage, destination, target_issuer)
+
+    def set_weights(self, issuer: str, weights: Dict[str, float]) -> ToolResult:
+        """Replace the issuer's processor weights outright (ValueError if none are positive)."""
+        previous = self.table.version
+        version = self.table.set_weights(issuer, weights, f"manual {issuer}")
+        return self._result(f"Routing for {issuer} set to {version.weights.get(issuer)}", issuer, previous, version)
+
+    def rollback(self, issuer: Optional[str], version: Optional[int]) -> ToolResult:
+        """Restore the issuer's (None: the whole table's) routing as of `version`; unknown versions reset to the default processor."""
+        previous = self.table.version
+        try:
+            restored = self.table.rollback(version, issuer=issuer)
+        except KeyError:  # aged out of the history, or from before a restart
+            restored = self.table.reset(issuer, reason=f"reset {issuer} (v{version} not retained)")
+        return self._result(f"Restored routing for {issuer or 'all issuers'} to v{version}", issuer, previous, restored,
+                            restored_version=version)
+
+    async def arollback(self, issuer: Optional[str], version: Optional[int]) -> ToolResult:
+        result = self.rollback(issuer, version)
+        if self.url:
+            from app.clients.http_pool import default_pool
+            payload = {"issuer": issuer, "weights": result.data["weights"]}
+            try:
+                await default_pool().post_json(f"{self.url.rstrip('/')}/routes", payload)
+            except Exception as e:  # the table is restored either way; report the mismatch
+                return ToolResult(success=False, message=f"Load balancer rejected rollback: {e}", data=result.data)
+        return result
 
 # 2. Check External Status Tool
 class CheckExternalStatusTool:
     name = "check_external_status"
     description = "Checks external status pages for banks and processors."
 
+    def __init__(self, url_template: Optional[str] = None):
+        # e.g. https://status.internal/api/{service}; unset -> canned responses
+        self.url_template = url_template or os.getenv("STATUS_PAGE_URL")
+
     def execute(self, service: str) -> ToolResult:
         # Mocking external API responses
         mock_status = {
@@ -41,16 +101,40 @@ class CheckExternalStatusTool:
             data=status
         )
 
-# 3. Query Database Tool (Mock)
+    async def aexecute(self, service: str) -> ToolResult:
+        if not self.url_template:
+            return self.execute(service)
+        from app.clients.http_pool import default_pool
+        try:
+            page = await default_pool().get_json(self.url_template.format(service=service.upper()))
+        except Exception as e:  # HTTP error, open circuit, bad JSON
+            return ToolResult(success=False, message=f"Status page for {service} unavailable: {e}",
+                              data={"status": "unknown", "details": str(e)})
+        status = {"status": page.get("status", "unknown"), "details": page.get("details", "")}
+        return ToolResult(success=True, message=f"Status for {service}: {status['status']}", data=status)
+
+# 3. Query Database Tool
 class QueryDatabaseTool:
     name = "query_database"
-    description = "Queries historical transaction data."
+    description = "Queries historical transaction data (per-minute error counts and recent failures for an issuer)."
+
+    def __init__(self, store=None):
+        # Opened lazily so importing the registry doesn't create a database file
+        self._store = store
+
+    @property
+    def store(self):
+        if self._store is None:
+            from app.storage.transaction_store import default_store
+            self._store = default_store()
+        return self._store
 
-    def execute(self, query: str) -> ToolResult:
+    def execute(self, issuer: str, minutes: int = 5, error_code: Optional[str] = None) -> ToolResult:
+        data = self.store.recent_errors(issuer, minutes=minutes, error_code=error_code)
         return ToolResult(
             success=True,
-            message=f"Executed query: {query}",
-            data={"rows": [{"timestamp": "2023-10-27T10:00:00", "error": "500", "count": 150}]}
+            message=f"{data['total_errors']} errors for {issuer} in the last {minutes} min",
+            data=data
         )
 
 # Registry
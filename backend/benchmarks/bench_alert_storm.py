@@ -0,0 +1,128 @@
+"""
+Alert storm check: event-loop latency while the Analyst is busy with a slow LLM.
+
+A fake chain takes LLM_DELAY_S per diagnosis. We drive an injected outage
+through the Watchdog at a fixed TPS, dispatch an investigation per alert, and
+measure how late a 5ms ticker wakes up. The legacy mode reproduces the old
+synchronous `chain.invoke` call inside the loop for comparison.
+
+Run from backend/:  python -m benchmarks.bench_alert_storm
+"""
+import asyncio
+import contextlib
+import json
+import os
+import random
+import time
+
+from app.agents.analyst import AnalystAgent
+from app.agents.watchdog import WatchdogAgent
+from app.clients.batching import MicroBatcher
+from app.simulator.chaos_simulator import ChaosSimulator
+
+LLM_DELAY_S = 0.5
+TPS = 500
+DURATION_S = 3.0
+TICK_S = 0.005
+
+
+class FakeMessage:
+    def __init__(self, content: str):
+        self.content = content
+        self.usage_metadata = None
+
+
+class JsonParser:
+    def parse(self, text: str):
+        return json.loads(text)
+
+
+class SlowFakeChain:
+    """Stands in for the Analyst's prompt | llm chains (single and batched) with a fixed model latency."""
+
+    def __init__(self, delay_s: float):
+        self.delay_s = delay_s
+
+    def _diagnosis(self, inputs):
+        diagnosis = {"root_cause": "Fake outage", "confidence": 0.9,
+                     "evidence": ["fake"], "recommended_action": "route_traffic"}
+        if "incidents" in inputs:
+            return FakeMessage(json.dumps({"diagnoses": [diagnosis] * inputs["incidents"].count("### Incident")}))
+        return FakeMessage(json.dumps(diagnosis))
+
+    def invoke(self, inputs):
+        time.sleep(self.delay_s)
+        return self._diagnosis(inputs)
+
+    async def ainvoke(self, inputs):
+        await asyncio.sleep(self.delay_s)
+        return self._diagnosis(inputs)
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def ticker(lags, stop: asyncio.Event):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_S)
+        lags.append((time.perf_counter() - start - TICK_S) * 1000)
+
+
+async def storm(blocking: bool):
+    random.seed(7)
+    analyst = AnalystAgent(max_concurrency=8, timeout_s=5)
+    analyst.llm = analyst.chain = analyst.batch_chain = SlowFakeChain(LLM_DELAY_S)
+    analyst.parser = analyst.batch_parser = JsonParser()
+    analyst.batcher = MicroBatcher(analyst._diagnose_batch, max_size=4, max_wait_s=0.05)
+    watchdog = WatchdogAgent()
+    simulator = ChaosSimulator()
+    simulator.inject_failure("storm", issuer="CHASE", failure_rate=0.9)
+
+    lags, stop, tasks = [], asyncio.Event(), set()
+    tick = asyncio.create_task(ticker(lags, stop))
+    alerts = 0
+    deadline = time.perf_counter() + DURATION_S
+    while time.perf_counter() < deadline:
+        tx = simulator._generate_transaction()
+        if watchdog.process_transaction(tx):
+            alerts += 1
+            if blocking:
+                analyst.chain.invoke({})
+            else:
+                task = asyncio.create_task(analyst.investigate("SUCCESS_DROP", tx.issuer))
+                tasks.add(task)
+                task.add_done_callback(tasks.discard)
+        await asyncio.sleep(1.0 / TPS)
+
+    stop.set()
+    await tick
+    for task in tasks:
+        task.cancel()
+    return alerts, lags
+
+
+async def main():
+    idle = []
+    stop = asyncio.Event()
+    tick = asyncio.create_task(ticker(idle, stop))
+    await asyncio.sleep(1.0)
+    stop.set()
+    await tick
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        async_alerts, async_lags = await storm(blocking=False)
+        legacy_alerts, legacy_lags = await storm(blocking=True)
+
+    print(f"fake LLM latency {LLM_DELAY_S * 1000:.0f}ms, target {TPS} TPS, ticker every {TICK_S * 1000:.0f}ms")
+    print(f"{'mode':<22} {'alerts':>7} {'lag p50 ms':>11} {'lag p99 ms':>11} {'lag max ms':>11}")
+    for name, alerts, lags in (("idle loop", 0, idle),
+                               ("async analyst", async_alerts, async_lags),
+                               ("legacy sync invoke", legacy_alerts, legacy_lags)):
+        print(f"{name:<22} {alerts:>7} {percentile(lags, 50):>11.2f} {percentile(lags, 99):>11.2f} {max(lags):>11.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
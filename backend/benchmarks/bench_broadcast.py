@@ -0,0 +1,101 @@
+"""
+Fan-out load test: Broadcaster vs the old sequential send_json loop.
+
+1,000 fake WebSocket clients receive a stream of transaction frames; a few of
+them are throttled (every send takes THROTTLE_S). We record, for each healthy
+client, the delay between publish and the frame hitting its socket.
+
+Run from backend/:  python -m benchmarks.bench_broadcast [clients] [throttled]
+"""
+import asyncio
+import json
+import sys
+import time
+
+from app.streaming.broadcaster import Broadcaster
+
+MESSAGES = 100
+PUBLISH_INTERVAL_S = 0.05
+THROTTLE_S = 0.05
+
+# frame -> publish time, so fake sockets don't pay to decode every frame
+SENT_AT = {}
+
+
+class FakeWebSocket:
+    def __init__(self, throttled: bool, latencies: list):
+        self.throttled = throttled
+        self.latencies = latencies
+
+    async def _deliver(self, sent_at: float):
+        if self.throttled:
+            await asyncio.sleep(THROTTLE_S)
+        else:
+            await asyncio.sleep(0)
+            self.latencies.append(time.perf_counter() - sent_at)
+
+    async def send_text(self, frame: str):
+        await self._deliver(SENT_AT[frame])
+
+    async def send_json(self, message: dict):
+        json.dumps(message)
+        await self._deliver(message["sent_at"])
+
+    async def close(self):
+        pass
+
+
+def make_clients(count: int, throttled: int, latencies: list):
+    return [FakeWebSocket(i < throttled, latencies) for i in range(count)]
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run_legacy(clients):
+    for i in range(MESSAGES):
+        message = {"type": "transaction", "seq": i, "sent_at": time.perf_counter()}
+        for connection in clients:
+            try:
+                await connection.send_json(message)
+            except Exception:
+                pass
+        await asyncio.sleep(PUBLISH_INTERVAL_S)
+
+
+async def run_broadcaster(clients):
+    broadcaster = Broadcaster(queue_size=64)
+    for ws in clients:
+        broadcaster.register(ws)
+    for i in range(MESSAGES):
+        frame = json.dumps({"type": "transaction", "seq": i})
+        SENT_AT[frame] = time.perf_counter()
+        broadcaster.publish_frame(frame)
+        await asyncio.sleep(PUBLISH_INTERVAL_S)
+    await asyncio.sleep(0.5)  # let healthy clients drain
+    stats = broadcaster.stats()
+    for ws in clients:
+        broadcaster.unregister(ws)
+    return stats
+
+
+async def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    throttled_counts = [int(sys.argv[2])] if len(sys.argv) > 2 else [0, 10]
+
+    print(f"{count} clients, {MESSAGES} messages every {PUBLISH_INTERVAL_S * 1000:.0f}ms, throttled send = {THROTTLE_S * 1000:.0f}ms")
+    print(f"{'mode':<14} {'throttled':>9} {'wall s':>8} {'p50 ms':>9} {'p99 ms':>9}")
+    for throttled in throttled_counts:
+        for name, runner in (("legacy", run_legacy), ("broadcaster", run_broadcaster)):
+            latencies = []
+            start = time.perf_counter()
+            await runner(make_clients(count, throttled, latencies))
+            wall = time.perf_counter() - start
+            print(f"{name:<14} {throttled:>9} {wall:>8.2f} "
+                  f"{percentile(latencies, 50) * 1000:>9.2f} {percentile(latencies, 99) * 1000:>9.2f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
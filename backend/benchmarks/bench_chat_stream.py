@@ -0,0 +1,128 @@
+"""
+Time to first token for /chat vs /chat/stream, against a real uvicorn server
+whose Assistant is backed by a local fake streaming LLM (fixed delay to the
+first token, then a steady token rate). Also checks that a client dropping
+mid-reply aborts the model stream and frees its session, and that the
+session cap turns excess concurrent chats into 429s.
+
+Run from backend/:  python -m benchmarks.bench_chat_stream [requests]
+"""
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+DATA_DIR = tempfile.mkdtemp(prefix="bench_chat_")
+os.environ.update({
+    "OPENAI_API_KEY": os.environ.get("OPENAI_API_KEY", "sk-bench"),
+    "PAYSENTINEL_DATA_DIR": DATA_DIR,
+    "PAYSENTINEL_DB_PATH": os.path.join(DATA_DIR, "transactions.db"),
+    "INGEST_SIMULATOR": "0",
+    "CHAT_MAX_SESSIONS": "4",
+})
+
+import httpx
+import uvicorn
+from langchain_core.messages import AIMessage, AIMessageChunk
+
+from app import main
+
+PORT = 8765
+FIRST_TOKEN_S = 0.5
+TOKEN_S = 0.01
+TOKENS = 150
+
+
+class FakeStreamingLLM:
+    def __init__(self):
+        self.completed = 0
+        self.aborted = 0
+
+    async def astream(self, messages):
+        done = False
+        try:
+            await asyncio.sleep(FIRST_TOKEN_S)
+            for i in range(TOKENS):
+                yield AIMessageChunk(content=f"token{i} ")
+                await asyncio.sleep(TOKEN_S)
+            done = True
+        finally:
+            if done:
+                self.completed += 1
+            else:
+                self.aborted += 1
+
+    async def ainvoke(self, messages):
+        await asyncio.sleep(FIRST_TOKEN_S + TOKENS * TOKEN_S)
+        return AIMessage(content="".join(f"token{i} " for i in range(TOKENS)))
+
+
+def serve() -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=PORT, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
+
+
+async def first_token(client: httpx.AsyncClient, stream: bool):
+    """(seconds to the first token, seconds to the full reply, status)"""
+    start = time.perf_counter()
+    if not stream:
+        r = await client.post("/chat", json={"query": "status?"})
+        elapsed = time.perf_counter() - start
+        return elapsed, elapsed, r.status_code
+    ttft = None
+    async with client.stream("POST", "/chat/stream", json={"query": "status?"}) as r:
+        async for line in r.aiter_lines():
+            if ttft is None and line == "event: token":
+                ttft = time.perf_counter() - start
+    return ttft, time.perf_counter() - start, r.status_code
+
+
+async def run(requests: int, llm: FakeStreamingLLM):
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{PORT}", timeout=30) as client:
+        print(f"fake LLM: {FIRST_TOKEN_S * 1000:.0f}ms to first token, {TOKENS} tokens at {TOKEN_S * 1000:.0f}ms")
+        print(f"{'endpoint':<14} {'ttft p50':>10} {'ttft max':>10} {'total p50':>10}")
+        for stream in (False, True):
+            results = [await first_token(client, stream) for _ in range(requests)]
+            ttft = [r[0] * 1000 for r in results]
+            total = [r[1] * 1000 for r in results]
+            print(f"{'/chat/stream' if stream else '/chat':<14} {statistics.median(ttft):>8.0f}ms "
+                  f"{max(ttft):>8.0f}ms {statistics.median(total):>8.0f}ms")
+
+        # Disconnect after the first token: the model stream should be aborted and the session freed
+        aborted = llm.aborted
+        async with client.stream("POST", "/chat/stream", json={"query": "status?"}) as r:
+            async for line in r.aiter_lines():
+                if line == "event: token":
+                    break
+        await asyncio.sleep(0.3)
+        print(f"\nclient dropped mid-reply: model streams aborted {llm.aborted - aborted}, "
+              f"open sessions {main.agents.get('assistant').sessions}")
+
+        # More concurrent chats than the cap
+        results = await asyncio.gather(*(first_token(client, True) for _ in range(10)))
+        codes = [r[2] for r in results]
+        print(f"10 concurrent streams with CHAT_MAX_SESSIONS={main.agents.get('assistant').max_sessions}: "
+              f"{codes.count(200)} served, {codes.count(429)} x 429")
+        stats = (await client.get("/chat/stats")).json()
+        print(f"/chat/stats: {stats}")
+
+
+def main_():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    llm = FakeStreamingLLM()
+    main.agents.get("assistant").llm = llm
+    server = serve()
+    try:
+        asyncio.run(run(requests, llm))
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main_()
@@ -0,0 +1,237 @@
+"""
+Cluster mode with several real API processes (uvicorn), sharing the RESP
+stand-in from app.cluster.stand_in, with stub_upstream.py as the model,
+status pages and load balancer.
+
+- scaling: aggregate pipeline rows/s for 1, 2 and 4 nodes, each fed by
+  its own simulator flat out, against one node without CLUSTER_URL.
+  Nodes are separate processes, so this only scales with free cores
+  (the CPU count is printed next to the numbers).
+- coordination: 3 nodes, the same injection on every node. Counts
+  leaders and routing decisions against load balancer calls (one call
+  per routed issuer expected), compares every node's routing weights, and checks that a
+  /ws/stream client on a follower sees the leader's agent frames and the
+  other nodes' transactions.
+- failover: SIGKILL the leader (no lease release) and time until another
+  node leads.
+
+Run from backend/:  python -m benchmarks.bench_cluster [--duration 10] [--nodes 1,2,4]
+"""
+import argparse
+import asyncio
+import json
+import os
+import signal
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from app.cluster.stand_in import serve_in_thread
+from benchmarks import stub_upstream as stub
+from benchmarks.bench_e2e import free_port
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class Node:
+    """One API process."""
+
+    def __init__(self, name: str, stub_port: int, cluster_url=None, tps: int = 1_000_000, **env):
+        self.name, self.port = name, free_port()
+        self.data_dir = tempfile.mkdtemp(prefix=f"bench_cluster_{name}_")
+        stub_url = f"http://127.0.0.1:{stub_port}"
+        self.env = {
+            **os.environ, "PYTHONPATH": BACKEND_DIR, "NODE_ID": name, "SIMULATOR_TPS": str(tps),
+            "INGEST_SIMULATOR": "1", "AGENTS_WARMUP": "0", "OPENAI_API_KEY": "sk-bench",
+            "OPENAI_BASE_URL": f"{stub_url}/v1", "LOAD_BALANCER_URL": stub_url,
+            "STATUS_PAGE_URL": f"{stub_url}/status/{{service}}",
+            "PAYSENTINEL_DATA_DIR": self.data_dir, "PAYSENTINEL_DB_PATH": os.path.join(self.data_dir, "tx.db"),
+            **{key: str(value) for key, value in env.items()},
+        }
+        if cluster_url:
+            self.env["CLUSTER_URL"] = cluster_url
+        # Generous: nodes share the CPUs with simulators running flat out
+        self.http = httpx.Client(base_url=f"http://127.0.0.1:{self.port}", timeout=60)
+        self.process = None
+
+    def start(self) -> "Node":
+        self.log = open(os.path.join(self.data_dir, "node.log"), "w")
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(self.port), "--log-level", "warning"],
+            cwd=BACKEND_DIR, env=self.env, stdout=self.log, stderr=subprocess.STDOUT)
+        return self
+
+    def wait_ready(self, timeout_s: float = 60):
+        deadline = time.monotonic() + timeout_s
+        while time.monotonic() < deadline:
+            try:
+                self.http.get("/health").raise_for_status()
+                return
+            except httpx.HTTPError:
+                if self.process.poll() is not None:
+                    raise RuntimeError(f"{self.name} exited, see {self.log.name}")
+                time.sleep(0.2)
+        raise TimeoutError(f"{self.name} not ready, see {self.log.name}")
+
+    def get(self, path: str, **params):
+        return self.http.get(path, params=params).json()
+
+    def processed(self) -> int:
+        stats = self.get("/ingest/stats")
+        return stats["accepted"] - stats["rows"]
+
+    def kill(self):
+        if self.process and self.process.poll() is None:
+            self.process.send_signal(signal.SIGKILL)
+            self.process.wait()
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(10)
+            except subprocess.TimeoutExpired:
+                self.kill()
+        self.http.close()
+        self.log.close()
+
+
+def started(nodes):
+    for node in nodes:
+        node.start()
+    for node in nodes:
+        node.wait_ready()
+    return nodes
+
+
+def stand_in_url() -> str:
+    """A fresh stand-in per run, so no run sees another's leader or windows."""
+    port = free_port()
+    serve_in_thread(port)
+    return f"redis://127.0.0.1:{port}"
+
+
+def scaling(stub_port: int, counts, duration_s: float, warmup_s: float = 3.0):
+    print(f"scaling ({os.cpu_count()} CPU{'s' if os.cpu_count() > 1 else ''}; "
+          f"each node's simulator runs flat out, {duration_s:.0f}s measured)")
+    print(f"{'nodes':>10}{'rows/s total':>15}{'per node':>12}{'vs 1 node':>11}")
+    base = None
+    for label, k in [("single", 1)] + [(str(k), k) for k in counts]:
+        url = stand_in_url() if label != "single" else None
+        nodes = started([Node(f"s{label}-{i}", stub_port, url) for i in range(k)])
+        try:
+            time.sleep(warmup_s)
+            before = [node.processed() for node in nodes]
+            start = time.perf_counter()
+            time.sleep(duration_s)
+            rows = sum(node.processed() - b for node, b in zip(nodes, before))
+            total = rows / (time.perf_counter() - start)
+        finally:
+            for node in nodes:
+                node.stop()
+        base = base or total
+        print(f"{label:>10}{total:>15,.0f}{total / k:>12,.0f}{total / base:>10.2f}x", flush=True)
+
+
+async def watch(node: Node, seen: dict):
+    import websockets
+
+    async with websockets.connect(f"ws://127.0.0.1:{node.port}/ws/stream", max_size=None) as ws:
+        async for text in ws:
+            message = json.loads(text)
+            if message.get("type") == "transaction":
+                seen["transactions"] += 1
+            elif message.get("type") == "agent_logs":
+                seen["agent_logs"] += 1
+
+
+def leaders(nodes):
+    return [node.name for node in nodes if node.process.poll() is None and node.get("/cluster")["is_leader"]]
+
+
+async def coordination(stub_port: int, timeout_s: float = 30):
+    url = stand_in_url()
+    # Tail latency alerts off: on a cold start they reroute issuers before the injection and muddy the count
+    nodes = started([Node(f"c{i}", stub_port, url, tps=2000, CLUSTER_LEASE_S=2, CLUSTER_SYNC_S=0.25,
+                          WATCHDOG_P99_MIN_DELTA_MS=1e9) for i in range(3)])
+    try:
+        await asyncio.sleep(1.0)
+        leader_names = leaders(nodes)
+        leader = next(node for node in nodes if node.name in leader_names)
+        follower = next(node for node in nodes if node is not leader)
+        print(f"\ncoordination (3 nodes): leaders {leader_names}")
+
+        seen = {"transactions": 0, "agent_logs": 0}
+        watcher = asyncio.create_task(watch(follower, seen))
+        await asyncio.sleep(1.0)
+        stub.reset_stats()
+        injected, injected_at = time.monotonic(), time.time()
+        for node in nodes:
+            node.http.post("/inject", params={"issuer": "CHASE"}).raise_for_status()
+        decided = None
+        while time.monotonic() - injected < timeout_s:
+            routing = [node.get("/routing") for node in nodes]
+            if all("CHASE" in r["weights"] for r in routing):
+                decided = time.monotonic() - injected
+                break
+            await asyncio.sleep(0.1)
+        await asyncio.sleep(2.0)  # room for any duplicate action to show up
+        watcher.cancel()
+
+        routing = [node.get("/routing") for node in nodes]
+        decisions = [[event["issuer"] for event in node.get("/events", agent="Manager", limit=500)["events"]
+                      if "ROUTED_TRAFFIC" in event["message"] and event["ts"] >= injected_at] for node in nodes]
+        clusters = [node.get("/cluster") for node in nodes]
+        print(f"  all nodes rerouted CHASE {decided * 1000:.0f} ms after the injection" if decided
+              else f"  no reroute within {timeout_s:.0f}s")
+        # Every alert gets a reroute from the stub's diagnosis, so other issuers' z-score alerts add decisions too
+        print(f"  routing decisions since the injection, per node: {decisions}")
+        print(f"  load balancer calls: {stub.stats['requests']['routes']}; repeats suppressed by the idempotency key: "
+              f"{sum(c['actions_suppressed'] for c in clusters)}")
+        print(f"  CHASE weights: {[r['weights'].get('CHASE') for r in routing]}")
+        print(f"  same weights on every node: {all(r['weights'] == routing[0]['weights'] for r in routing)}; "
+              f"versions {[r['version'] for r in routing]}")
+        print(f"  incidents opened: {[len(node.get('/incidents')['open']) for node in nodes]} (leader {leader.name})")
+        print(f"  follower {follower.name} client: {seen['transactions']:,} transaction frames "
+              f"({clusters[nodes.index(follower)]['frames_received']:,} relayed from other nodes), "
+              f"{seen['agent_logs']} agent frames from the leader")
+
+        killed_at = time.monotonic()
+        leader.kill()
+        while time.monotonic() - killed_at < timeout_s:
+            now_leading = leaders(nodes)
+            if now_leading:
+                print(f"\nfailover (lease 2s): {leader.name} killed, {now_leading[0]} leads after "
+                      f"{(time.monotonic() - killed_at) * 1000:.0f} ms")
+                break
+            await asyncio.sleep(0.05)
+        else:
+            print(f"\nfailover: no new leader within {timeout_s:.0f}s")
+        await asyncio.sleep(2.0)
+        print(f"  live nodes 2s later: {follower.get('/cluster')['nodes']}")
+    finally:
+        for node in nodes:
+            node.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--nodes", default="1,2,4")
+    args = parser.parse_args()
+
+    stub.configure(llm_latency_s=0.3)
+    stub_port = free_port()
+    stub_server = stub.serve(stub_port)
+    try:
+        scaling(stub_port, [int(k) for k in args.nodes.split(",")], args.duration)
+        asyncio.run(coordination(stub_port))
+    finally:
+        stub_server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
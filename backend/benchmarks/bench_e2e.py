@@ -0,0 +1,275 @@
+"""
+End-to-end load and latency run of the whole backend, in one process:
+
+- the FastAPI app under uvicorn, fed by a seeded ChaosSimulator (SIMULATOR_SEED)
+- the OpenAI-compatible stub from stub_upstream.py as the model, with a
+  configurable completion latency
+- N synthetic /ws/stream clients
+
+After a warm-up it injects a failure on one issuer (POST /inject) and keeps
+the load on for the run. It reports:
+
+- sustained TPS through the pipeline
+- injection -> first alert frame (detection) -> Manager routing decision
+- broadcast latency p50/p99 (tick generated -> frame received)
+- RSS growth over the run
+- mean time per pipeline stage
+
+Results go to a JSON file tagged with the git commit. --compare prints the
+change against an earlier file.
+
+Run from backend/:  python -m benchmarks.bench_e2e [--tps 2000] [--clients 10] [--duration 30]
+                    python -m benchmarks.bench_e2e --compare benchmarks/results/e2e_<commit>.json
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import platform
+import socket
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import numpy as np
+
+RESULTS_DIR = os.path.join(os.path.dirname(__file__), "results")
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2 ** 20
+    except OSError:  # not Linux: peak RSS is the best we have
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_commit():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True).stdout.strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+class LatencyHistogram:
+    """Fixed 0.1 ms bins up to 10 s, so recording every frame doesn't grow the RSS being measured."""
+
+    def __init__(self, resolution_ms: float = 0.1, max_ms: float = 10_000):
+        self.resolution_ms = resolution_ms
+        self.counts = [0] * (int(max_ms / resolution_ms) + 1)
+
+    def add(self, ms: float):
+        self.counts[min(max(int(ms / self.resolution_ms), 0), len(self.counts) - 1)] += 1
+
+    def clear(self):
+        self.counts = [0] * len(self.counts)
+
+    def summary(self, qs=(50, 99)):
+        cumulative = np.cumsum(self.counts)
+        total = int(cumulative[-1])
+        if not total:
+            return {**{f"p{q}": None for q in qs}, "frames": 0}
+        return {**{f"p{q}": round(float(np.searchsorted(cumulative, total * q / 100)) * self.resolution_ms, 2)
+                   for q in qs}, "frames": total}
+
+
+class Observer:
+    """
+    What the synthetic clients saw. Every client contributes broadcast
+    latencies; the injection timeline and alert counts come from the first.
+
+    Baseline simulator traffic never fails, so detection is the first alert
+    frame on a failed (injected) row of the issuer. Baseline noise can open
+    incidents on the issuer before the injection, so routing decisions are
+    kept per incident and matched to incidents opened after it.
+    """
+
+    def __init__(self, issuer: str):
+        self.issuer = issuer
+        self.broadcast_ms = LatencyHistogram()
+        self.injected_at = None
+        self.detected_at = None
+        self.decisions = {}  # incident_id -> first ROUTED_TRAFFIC frame time
+        self.alerts_before_injection = 0
+
+    def on_frame(self, text: str, received: float, primary: bool):
+        message = json.loads(text)
+        if message.get("type") == "transaction":
+            tx = message["data"]
+            self.broadcast_ms.add((received - datetime.fromisoformat(tx["timestamp"]).timestamp()) * 1000)
+            if not primary or not message["alert"]:
+                return
+            if self.injected_at is None:
+                self.alerts_before_injection += 1
+            elif self.detected_at is None and tx["issuer"] == self.issuer and tx["status"] == "failed":
+                self.detected_at = received
+        elif message.get("type") == "agent_logs" and primary and message["issuer"] == self.issuer:
+            if any("ROUTED_TRAFFIC" in log["message"] for log in message["agent_logs"]):
+                self.decisions.setdefault(message["incident_id"], received)
+
+    def decided_at(self, incidents):
+        """First routing decision for an incident on the issuer opened after the injection."""
+        opened = {inc["incident_id"]: datetime.fromisoformat(inc["opened_at"]).timestamp()
+                  for inc in incidents["open"] + incidents["resolved"] if inc["issuer"] == self.issuer}
+        after = [at for incident_id, at in self.decisions.items()
+                 if opened.get(incident_id, 0) >= self.injected_at]
+        return min(after, default=None)
+
+
+async def client(url: str, observer: Observer, ready: asyncio.Event, primary: bool):
+    import websockets
+
+    async with websockets.connect(url, max_size=None) as ws:
+        ready.set()
+        async for text in ws:
+            observer.on_frame(text, time.time(), primary)
+
+
+async def drive(main, stub, args, port: int):
+    import httpx
+
+    observer = Observer(args.issuer)
+    url = f"ws://127.0.0.1:{port}/ws/stream"
+    connected = [asyncio.Event() for _ in range(args.clients)]
+    clients = [asyncio.create_task(client(url, observer, ready, i == 0)) for i, ready in enumerate(connected)]
+    await asyncio.gather(*(ready.wait() for ready in connected))
+
+    def delivered():
+        return main.ingest_queue.accepted - main.ingest_queue.rows
+
+    await asyncio.sleep(args.warmup)
+    observer.broadcast_ms.clear()
+    memory, per_second = [(0.0, rss_mb())], []
+    start, rows_at_start = time.perf_counter(), delivered()
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}") as http:
+        observer.injected_at = time.time()
+        (await http.post("/inject", params={"issuer": args.issuer})).raise_for_status()
+        last = rows_at_start
+        for _ in range(args.duration):
+            await asyncio.sleep(1.0)
+            rows = delivered()
+            per_second.append(rows - last)
+            last = rows
+            memory.append((time.perf_counter() - start, rss_mb()))
+        elapsed = time.perf_counter() - start
+        rows = delivered() - rows_at_start
+        incidents = (await http.get("/incidents")).json()
+    for task in clients:
+        task.cancel()
+
+    def since_injection(at):
+        return round((at - observer.injected_at) * 1000, 1) if at else None
+
+    t, mb = np.array(memory).T
+    stages = {values[0]: round(child.sum / max(sum(child.counts), 1) * 1000, 3)
+              for values, child in main.STAGE_SECONDS._children.items()}
+    return {
+        "tps": {"sustained": round(rows / elapsed, 1), "target": args.tps,
+                "worst_second": min(per_second) if per_second else None},
+        "injection_ms": {"detection": since_injection(observer.detected_at),
+                         "routing_decision": since_injection(observer.decided_at(incidents))},
+        "alerts_before_injection": observer.alerts_before_injection,
+        "broadcast_ms": observer.broadcast_ms.summary(),
+        "memory_mb": {"start": round(mb[0], 1), "end": round(mb[-1], 1), "peak": round(mb.max(), 1),
+                      "growth_mb_per_min": round(float(np.polyfit(t, mb, 1)[0]) * 60, 2) if len(t) > 2 else None},
+        "stage_mean_ms": stages,
+        "model_calls": stub.stats["requests"]["v1"],
+        "incidents_opened": len(incidents.get("open", [])) + len(incidents.get("resolved", [])),
+        "ingest_rejected": main.ingest_queue.rejected,
+    }
+
+
+def flatten(results, prefix=""):
+    for key, value in results.items():
+        if isinstance(value, dict):
+            yield from flatten(value, f"{prefix}{key}.")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            yield f"{prefix}{key}", value
+
+
+def compare(old_path: str, new: dict):
+    with open(old_path) as f:
+        old = json.load(f)
+    before = dict(flatten(old["results"]))
+    print(f"\n{'metric':<34}{old.get('commit') or '?':>12}{new.get('commit') or '?':>12}{'change':>10}")
+    for key, value in flatten(new["results"]):
+        if key in before and before[key] is not None:
+            change = f"{(value - before[key]) / before[key]:+.1%}" if before[key] else ""
+            print(f"{key:<34}{before[key]:>12}{value:>12}{change:>10}")
+    if old.get("config") != new.get("config"):
+        print("(configs differ: " + ", ".join(f"{k}: {old['config'].get(k)} -> {v}" for k, v in new["config"].items()
+                                             if old["config"].get(k) != v) + ")")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--tps", type=int, default=2000)
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--warmup", type=float, default=5.0, help="seconds of load before the injection")
+    parser.add_argument("--duration", type=int, default=30, help="seconds measured after the injection")
+    parser.add_argument("--llm-latency", type=float, default=0.5, help="seconds per stub completion")
+    parser.add_argument("--issuer", default="CHASE")
+    parser.add_argument("--out", help=f"result file (default {RESULTS_DIR}/e2e_<commit>.json)")
+    parser.add_argument("--compare", help="earlier result file to diff against")
+    args = parser.parse_args()
+
+    stub_port, app_port = free_port(), free_port()
+    data_dir = tempfile.mkdtemp(prefix="bench_e2e_")
+    os.environ.update({
+        "SIMULATOR_SEED": str(args.seed), "SIMULATOR_TPS": str(args.tps), "INGEST_SIMULATOR": "1",
+        "OPENAI_API_KEY": "sk-bench", "OPENAI_BASE_URL": f"http://127.0.0.1:{stub_port}/v1",
+        "PAYSENTINEL_DATA_DIR": data_dir, "PAYSENTINEL_DB_PATH": os.path.join(data_dir, "transactions.db"),
+    })
+    import uvicorn
+    from benchmarks import stub_upstream as stub
+
+    stub.configure(llm_latency_s=args.llm_latency)
+    stub_server = stub.serve(stub_port)
+    log = io.StringIO()
+    with contextlib.redirect_stdout(log):  # the agents narrate every step
+        from app import main as app_main
+        server = uvicorn.Server(uvicorn.Config(app_main.app, host="127.0.0.1", port=app_port, log_level="warning"))
+        threading.Thread(target=server.run, daemon=True).start()
+        while not server.started:
+            time.sleep(0.05)
+        try:
+            results = asyncio.run(drive(app_main, stub, args, app_port))
+        finally:
+            server.should_exit = True
+            stub_server.should_exit = True
+
+    commit, dirty = git_commit()
+    report = {
+        "commit": commit, "dirty": dirty, "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(), "cpus": os.cpu_count(),
+        "config": {k: v for k, v in vars(args).items() if k not in ("out", "compare")},
+        "results": results,
+    }
+    out = args.out or os.path.join(RESULTS_DIR, f"e2e_{commit or 'nogit'}{'-dirty' if dirty else ''}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, "w") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"\nwrote {out}")
+    if args.compare:
+        compare(args.compare, report)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Outbound HTTP layer against a local stub upstream (benchmarks/stub_upstream.py):
+
+- keep-alive pool vs a new client per request (latency, connections opened)
+- retries with jittered backoff under injected 503s (success rate)
+- circuit breaker while the upstream is down (time to fail)
+- per-host concurrency limit (peak in-flight requests seen by the upstream)
+- micro-batching concurrent Analyst diagnoses into one model call (calls, wall time)
+
+Run from backend/:  python -m benchmarks.bench_http_pool
+"""
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+PORT = 8766
+BASE = f"http://127.0.0.1:{PORT}"
+
+data_dir = tempfile.mkdtemp(prefix="bench_http_")
+os.environ.update({
+    "OPENAI_API_KEY": "sk-bench", "OPENAI_BASE_URL": f"{BASE}/v1",
+    "STATUS_PAGE_URL": f"{BASE}/status/{{service}}", "LOAD_BALANCER_URL": BASE,
+    "PAYSENTINEL_DATA_DIR": data_dir, "PAYSENTINEL_DB_PATH": os.path.join(data_dir, "transactions.db"),
+})
+
+import httpx  # noqa: E402
+
+from app.clients.http_pool import CircuitOpenError, HostPolicy, HttpPool  # noqa: E402
+from benchmarks import stub_upstream as stub  # noqa: E402
+
+
+def fresh(**behaviour):
+    stub.configure(**{"latency_s": 0.0, "llm_latency_s": 0.3, "error_rate": 0.0, "down": False, **behaviour})
+    stub.reset_stats()
+
+
+async def keep_alive(n: int = 300):
+    fresh(latency_s=0.002)
+    start = time.perf_counter()
+    for _ in range(n):
+        async with httpx.AsyncClient() as client:
+            (await client.get(f"{BASE}/status/CHASE")).raise_for_status()
+    cold = (time.perf_counter() - start) / n * 1000
+    cold_conns = len(stub.stats["connections"])
+
+    fresh(latency_s=0.002)
+    pool = HttpPool()
+    start = time.perf_counter()
+    for _ in range(n):
+        await pool.get_json(f"{BASE}/status/CHASE")
+    warm = (time.perf_counter() - start) / n * 1000
+    await pool.aclose()
+    print(f"keep-alive     new client/request: {cold:.2f} ms/req, {cold_conns} connections | "
+          f"pooled: {warm:.2f} ms/req, {len(stub.stats['connections'])} connections")
+
+
+async def retries(n: int = 400, error_rate: float = 0.2):
+    line = []
+    for attempts in (0, 3):
+        fresh(error_rate=error_rate)
+        pool = HttpPool(default=HostPolicy(retries=attempts, backoff_s=0.005, failure_threshold=10 ** 6))
+        results = await asyncio.gather(*(pool.get_json(f"{BASE}/status/VISA") for _ in range(n)),
+                                       return_exceptions=True)
+        ok = sum(not isinstance(r, Exception) for r in results)
+        line.append(f"retries={attempts}: {ok / n:.1%} ok ({pool.stats()['retries']} retries)")
+        await pool.aclose()
+    print(f"retries        {error_rate:.0%} injected 503s -> " + " | ".join(line))
+
+
+async def breaker(n: int = 200):
+    fresh(down=True, latency_s=0.05)
+    pool = HttpPool(default=HostPolicy(retries=0, failure_threshold=5, reset_s=60))
+    fails = []
+    for _ in range(n):
+        start = time.perf_counter()
+        try:
+            await pool.get_json(f"{BASE}/status/AMEX")
+        except (httpx.HTTPStatusError, CircuitOpenError):
+            pass
+        fails.append((time.perf_counter() - start) * 1000)
+    host = next(iter(pool.stats()["hosts"].values()))
+    print(f"breaker        upstream down: {stub.stats['requests']['status']} of {n} calls reached it, "
+          f"first fail {fails[0]:.1f} ms, median fail {statistics.median(fails):.3f} ms, "
+          f"{host['short_circuited']} short-circuited")
+    await pool.aclose()
+
+
+async def per_host_limit(n: int = 100, limit: int = 8):
+    fresh(latency_s=0.02)
+    pool = HttpPool(default=HostPolicy(concurrency=limit))
+    start = time.perf_counter()
+    await asyncio.gather(*(pool.get_json(f"{BASE}/status/VISA") for _ in range(n)))
+    print(f"per-host limit {n} concurrent calls, limit {limit}: peak in flight at upstream "
+          f"{stub.stats['max_in_flight']}, {(time.perf_counter() - start) * 1000:.0f} ms")
+    await pool.aclose()
+
+
+async def batching(issuers=("CHASE", "WELLS", "VISA", "AMEX", "CITI", "BOA", "HSBC", "BARC")):
+    from app.agents.analyst import AnalystAgent
+    for batch_max in (1, 4, 8):
+        fresh()
+        analyst = AnalystAgent(max_concurrency=len(issuers))
+        analyst.batcher.max_size = batch_max
+        start = time.perf_counter()
+        diagnoses = await asyncio.gather(*(analyst.investigate("High decline rate", i) for i in issuers))
+        wall = (time.perf_counter() - start) * 1000
+        assert all(d["root_cause"] == stub.DIAGNOSIS["root_cause"] for d in diagnoses), diagnoses
+        print(f"batching       {len(issuers)} diagnoses, batch max {batch_max}: "
+              f"{stub.stats['requests']['v1']} model calls, {wall:.0f} ms")
+
+
+async def run():
+    await keep_alive()
+    await retries()
+    await breaker()
+    await per_host_limit()
+    await batching()
+
+
+def main():
+    server = stub.serve(PORT)
+    try:
+        asyncio.run(run())
+    finally:
+        server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
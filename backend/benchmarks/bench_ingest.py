@@ -0,0 +1,92 @@
+"""
+Ingest path: NDJSON parse throughput, then a burst 10x faster than the
+pipeline drains, once with offer() (what POST /ingest does: 429 when full)
+and once with put() (what the WebSocket/TCP sources do: the sender stalls).
+Either way the queue never holds more than max_rows.
+
+Run from backend/:  python -m benchmarks.bench_ingest [rows] [queue_rows]
+"""
+import asyncio
+import json
+import resource
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from app.ingest.ingest_queue import IngestQueue
+from app.ingest.ndjson import parse_lines
+from app.models.transaction_batch import TransactionBatch
+
+DRAIN_TPS = 50_000
+BURST_TPS = 10 * DRAIN_TPS
+CHUNK = 1_000
+
+
+def ndjson(rows: int) -> bytes:
+    rng = np.random.default_rng(1)
+    now = datetime.now().isoformat()
+    return "\n".join(json.dumps({
+        "transaction_id": f"tx_{i}", "timestamp": now, "amount": 25.0, "currency": "USD",
+        "payment_method": "credit_card", "issuer": ["CHASE", "BOA", "WELLS"][i % 3], "processor": "STRIPE",
+        "status": "success", "latency_ms": int(rng.integers(50, 300)), "region": "US-EAST",
+    }) for i in range(rows)).encode()
+
+
+async def drain(queue: IngestQueue):
+    while True:
+        batch = await queue.get_batch(5_000)
+        await asyncio.sleep(len(batch) / DRAIN_TPS)  # stand-in for persist + detect
+
+
+async def burst(queue: IngestQueue, chunk: TransactionBatch, rows: int, blocking: bool):
+    """Send `rows` at BURST_TPS. Returns (rows rejected, seconds spent stalled)."""
+    rejected, stalled, sent = 0, 0.0, 0
+    while sent < rows:
+        if blocking:
+            start = time.perf_counter()
+            await queue.put(chunk)
+            stalled += time.perf_counter() - start
+        elif not queue.offer(chunk):
+            rejected += len(chunk)
+        sent += len(chunk)
+        await asyncio.sleep(len(chunk) / BURST_TPS)
+    return rejected, stalled
+
+
+async def scenario(chunk: TransactionBatch, rows: int, queue_rows: int, blocking: bool):
+    queue = IngestQueue(max_rows=queue_rows)
+    start = time.perf_counter()
+    pipeline = asyncio.create_task(drain(queue))
+    rejected, stalled = await burst(queue, chunk, rows, blocking)
+    while queue.rows:
+        await asyncio.sleep(0.01)
+    pipeline.cancel()
+    elapsed = time.perf_counter() - start
+    mode = "put (ws/tcp)" if blocking else "offer (POST)"
+    print(f"{mode:<14} {queue.accepted:>10,} {rejected:>10,} {queue.high_watermark:>10,} {stalled:>9.2f}s {elapsed:>8.2f}s")
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    queue_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 50_000
+
+    body = ndjson(50_000)
+    lines = body.splitlines()
+    start = time.perf_counter()
+    batch, rejected, _ = parse_lines(lines)
+    elapsed = time.perf_counter() - start
+    print(f"parse: {len(lines):,} lines in {elapsed:.2f}s ({len(lines) / elapsed:,.0f} rows/s, "
+          f"{len(body) / elapsed / 1e6:.1f} MB/s), {rejected} rejected")
+
+    print(f"\nburst of {rows:,} rows at {BURST_TPS:,}/s into a {queue_rows:,}-row queue drained at {DRAIN_TPS:,}/s")
+    print(f"{'mode':<14} {'accepted':>10} {'429 rows':>10} {'peak rows':>10} {'stalled':>10} {'total':>9}")
+    chunk = batch[:CHUNK]
+    for blocking in (False, True):
+        asyncio.run(scenario(chunk, rows, queue_rows, blocking))
+    print(f"\npeak RSS {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:.0f} MB")
+
+
+if __name__ == "__main__":
+    main()
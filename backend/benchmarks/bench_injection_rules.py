@@ -0,0 +1,145 @@
+"""
+Injection rule engine: cost of the injection step as the number of live
+rules grows, against the previous approach (every injection scanned for
+every batch / transaction).
+
+- idle: N rules that match none of the generated traffic (other issuers,
+  BIN ranges nobody issues) plus 4 that do
+- mixed: N rules over random issuer/region/method/BIN-range combinations
+  of the real traffic, with low rates
+- churn: 10k rules with staggered windows, ramps and expiry while the
+  simulated clock runs, so rules start and expire every tick
+
+Run from backend/:  python -m benchmarks.bench_injection_rules [batch_rows]
+"""
+import random
+import sys
+import time
+
+import numpy as np
+
+from app.models import transaction_batch as batch_codes
+from app.simulator import chaos_simulator
+from app.simulator.chaos_simulator import ISSUER_BINS, ISSUERS, PAYMENT_METHODS, REGIONS, ChaosSimulator
+
+COUNTS = (0, 100, 1_000, 10_000)
+
+
+def legacy_batch(batch, rng: np.random.Generator, injections: dict):
+    """Previous _generate_batch injection step: one full-batch mask per injection."""
+    size = len(batch)
+    for params in injections.values():
+        hit = rng.random(size) < params["failure_rate"]
+        if params["issuer"] is not None:
+            hit &= batch.issuer == batch_codes.ISSUERS.code(params["issuer"])
+        batch.status[hit] = batch_codes.FAILED
+        batch.latency_ms[hit] = params["latency_ms"] + rng.integers(-100, 101, int(hit.sum()))
+
+
+def legacy_event(injections: dict, issuer: str):
+    """Previous _generate_transaction injection step."""
+    failed = False
+    for params in injections.values():
+        if params["issuer"] is None or params["issuer"] == issuer:
+            if random.random() < params["failure_rate"]:
+                failed = True
+    return failed
+
+
+def idle_rules(n: int):
+    rules = [dict(issuer=issuer, failure_rate=0.5) for issuer in ISSUERS]
+    for i in range(n):
+        if i % 2:
+            rules.append(dict(issuer=f"OTHER_{i % 500}", region=random.choice(REGIONS), failure_rate=0.5))
+        else:
+            low = random.randrange(600000, 700000)
+            rules.append(dict(bin_range=(low, low + 999), failure_rate=0.5))
+    return rules
+
+
+def mixed_rules(n: int):
+    bins = sorted(int(b) for bins in ISSUER_BINS.values() for b in bins)
+    rules = []
+    for _ in range(n):
+        rule = dict(failure_rate=0.001)
+        if random.random() < 0.9:
+            rule["issuer"] = random.choice(ISSUERS)
+        if random.random() < 0.5:
+            rule["region"] = random.choice(REGIONS)
+        if random.random() < 0.5:
+            rule["payment_method"] = random.choice(PAYMENT_METHODS).value
+        if random.random() < 0.3:
+            low = random.choice(bins)
+            rule["bin_range"] = (low, low + random.randrange(0, 50000))
+        rules.append(rule)
+    return rules
+
+
+def per_call_us(fn, budget_s: float = 0.5) -> float:
+    calls, start = 0, time.perf_counter()
+    while time.perf_counter() - start < budget_s:
+        fn()
+        calls += 1
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def scaling(name: str, make_rules, batch_rows: int):
+    """Just the injection step, engine vs legacy, on the same generated traffic."""
+    print(f"\n{name}: injection step per {batch_rows:,}-row batch / per transaction (us)")
+    print(f"{'rules':>8}{'engine batch':>15}{'legacy batch':>15}{'engine event':>15}{'legacy event':>15}")
+    for n in COUNTS:
+        random.seed(n)
+        sim = ChaosSimulator(seed=1)
+        batch = sim._generate_batch(batch_rows)
+        rules = make_rules(n)
+        for i, rule in enumerate(rules):
+            sim.rules.add(f"r{i}", **rule)
+        legacy = {f"r{i}": {"issuer": r.get("issuer"), "failure_rate": r["failure_rate"], "latency_ms": 1500}
+                  for i, r in enumerate(rules)}
+        codes = (batch_codes.ISSUERS.code("CHASE"), batch_codes.REGIONS.code("US-EAST"),
+                 batch_codes.METHODS.code(PAYMENT_METHODS[0]), batch_codes.PROCESSORS.code("STRIPE"),
+                 batch_codes.BIN_RANGES.code(ISSUER_BINS["CHASE"][0]))
+
+        def engine_event():
+            now = sim.clock()
+            sim.rules.advance(now)
+            return sim.rules.pick(*codes, random.random(), now)
+
+        engine_batch = per_call_us(lambda: sim.rules.apply(batch, sim.rng))
+        engine_event_us = per_call_us(engine_event)
+        legacy_batch_us = per_call_us(lambda: legacy_batch(batch, sim.rng, legacy), 0.3)
+        legacy_event_us = per_call_us(lambda: legacy_event(legacy, "CHASE"), 0.3)
+        print(f"{len(rules):>8,}{engine_batch:>15,.0f}{legacy_batch_us:>15,.0f}"
+              f"{engine_event_us:>15,.2f}{legacy_event_us:>15,.2f}")
+
+
+def churn(batch_rows: int, rules: int = 10_000, ticks: int = 400, tick_s: float = 0.05):
+    random.seed(3)
+    sim = ChaosSimulator(seed=1)
+    clock = [0.0]
+    sim.clock = lambda: clock[0]
+    for i, rule in enumerate(mixed_rules(rules)):
+        rule = {**rule, "bin_range": "-".join(map(str, rule["bin_range"])) if "bin_range" in rule else None}
+        sim.inject_failure(f"c{i}", delay_s=random.uniform(0, ticks * tick_s), duration_s=random.uniform(1, 10),
+                           ramp_s=random.uniform(0, 2), **rule)
+    peak, elapsed = 0, 0.0
+    for tick in range(ticks):
+        clock[0] = tick * tick_s
+        start = time.perf_counter()
+        sim._generate_batch(batch_rows)
+        elapsed += time.perf_counter() - start
+        peak = max(peak, sim.rules.active)
+    print(f"\nchurn: {rules:,} rules over {ticks * tick_s:.0f}s simulated, peak {peak:,} live, "
+          f"{sim.rules.activated:,} started / {sim.rules.expired:,} expired: "
+          f"{elapsed / ticks * 1e6:,.0f} us per {batch_rows:,}-row tick")
+
+
+def main():
+    batch_rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    scaling("idle (4 matching + N elsewhere)", idle_rules, batch_rows)
+    scaling("mixed (N over the real traffic)", mixed_rules, batch_rows)
+    churn(batch_rows)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Cost of the /metrics instrumentation: per-call cost of each instrument, then
+the real pipeline_loop draining pre-generated simulator batches with
+METRICS_ENABLED=1 vs 0 (separate processes, runs interleaved, median taken),
+at large batches (high TPS) and small ones (low-latency ticks). Run-to-run
+noise here is a few percent, so the instrumentation a pipeline pass adds is
+also timed on its own and compared with the time per pass.
+
+Run from backend/:  python -m benchmarks.bench_metrics [rows] [runs]
+"""
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import timeit
+
+
+def micro():
+    from app.telemetry.metrics import MetricsRegistry
+
+    print(f"{'instrument':<28}{'enabled':>10}{'disabled':>10}")
+    for name, stmt in (("histogram.observe", "h.observe(0.003)"),
+                       ("with histogram.time()", "with h.time(): pass"),
+                       ("counter.inc", "c.inc(5)"),
+                       ("counter.labels(x).inc", "counter.labels('CHASE').inc(5)")):
+        row = []
+        for enabled in (True, False):
+            registry = MetricsRegistry(enabled)
+            counter = registry.counter("c_total", "c", ["issuer"])
+            env = {"h": registry.histogram("h", "h", ["stage"]).labels("detect"), "c": counter.labels("CHASE"),
+                   "counter": counter}
+            n = 200_000
+            row.append(min(timeit.repeat(stmt, globals=env, number=n, repeat=3)) / n * 1e9)
+        print(f"{name:<28}{row[0]:>8.0f}ns{row[1]:>8.0f}ns")
+
+
+def child(rows: int, batch_rows: int):
+    """One pipeline run in this process; prints rows/s as JSON."""
+    import asyncio
+
+    data_dir = tempfile.mkdtemp(prefix="bench_metrics_")
+    os.environ.update({"PAYSENTINEL_DATA_DIR": data_dir, "PAYSENTINEL_DB_PATH": os.path.join(data_dir, "tx.db"),
+                       "INGEST_SIMULATOR": "0", "AGENTS_WARMUP": "0", "OPENAI_API_KEY": "",
+                       "INGEST_QUEUE_ROWS": str(rows * 2), "INGEST_BATCH_ROWS": str(batch_rows)})
+    import contextlib
+    import io
+    with contextlib.redirect_stdout(io.StringIO()):
+        from app import main
+        from app.simulator.chaos_simulator import ChaosSimulator
+
+    sim = ChaosSimulator(seed=11)
+    sim.inject_failure("bench", issuer="CHASE", error_code="500", failure_rate=0.3)
+    batches = [sim._generate_batch(batch_rows) for _ in range(rows // batch_rows)]
+
+    async def run():
+        main.open_stores()
+        main.store.start()
+        for batch in batches:
+            main.ingest_queue.offer(batch)
+        with contextlib.redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            pipeline = asyncio.create_task(main.pipeline_loop())
+            while main.ingest_queue.rows:
+                await asyncio.sleep(0)
+            elapsed = time.perf_counter() - start
+            pipeline.cancel()
+            scrape = min(timeit.repeat(main.metrics.render, number=20, repeat=3)) / 20
+        main.store.close()
+        return elapsed, scrape
+
+    def instrumentation():
+        # Everything pipeline_loop records for one pass
+        main.BATCH_ROWS.observe(batch_rows)
+        if main.metrics.enabled:
+            main.count_transactions(batches[0])
+        for stage in ("persist", "rollup", "detect", "alert", "serialize", "broadcast"):
+            with main.STAGES[stage].time():
+                pass
+
+    elapsed, scrape = asyncio.run(run())
+    per_pass = min(timeit.repeat(instrumentation, number=1000, repeat=3)) / 1000
+    print(json.dumps({"rows_per_s": len(batches) * batch_rows / elapsed, "scrape_ms": scrape * 1000,
+                      "instrumentation_us": per_pass * 1e6, "pass_us": elapsed / len(batches) * 1e6}))
+
+
+def pipeline(rows: int, batch_rows: int, runs: int):
+    results = {"1": [], "0": []}
+    scrape, instrumentation, per_pass = [], [], []
+    for run in range(runs):
+        for enabled in (("1", "0") if run % 2 else ("0", "1")):  # alternate who goes first
+            out = subprocess.run([sys.executable, "-m", "benchmarks.bench_metrics", "--child", str(rows), str(batch_rows)],
+                                 env={**os.environ, "METRICS_ENABLED": enabled}, capture_output=True, text=True, check=True)
+            result = json.loads(out.stdout.strip().splitlines()[-1])
+            results[enabled].append(result["rows_per_s"])
+            if enabled == "1":
+                scrape.append(result["scrape_ms"])
+                instrumentation.append(result["instrumentation_us"])
+                per_pass.append(result["pass_us"])
+    on, off = statistics.median(results["1"]), statistics.median(results["0"])
+    cost, pass_us = statistics.median(instrumentation), statistics.median(per_pass)
+    print(f"{batch_rows:>10,}{off:>14,.0f}{on:>14,.0f}{(off - on) / off:>9.1%}"
+          f"{cost:>12.1f}us{pass_us:>11.0f}us{cost / pass_us:>9.2%}{statistics.median(scrape):>11.2f}ms")
+
+
+def main():
+    if sys.argv[1:2] == ["--child"]:
+        return child(int(sys.argv[2]), int(sys.argv[3]))
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 500_000
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    micro()
+    print(f"\npipeline_loop over {rows:,} rows, median of {runs} interleaved runs")
+    print(f"{'batch rows':>10}{'off rows/s':>14}{'on rows/s':>14}{'A/B':>9}"
+          f"{'instr/pass':>14}{'pass':>13}{'share':>9}{'/metrics':>13}")
+    for batch_rows in (5_000, 100):
+        pipeline(rows if batch_rows >= 1000 else rows // 10, batch_rows, runs)
+
+
+if __name__ == "__main__":
+    main()
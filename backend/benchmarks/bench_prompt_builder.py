@@ -0,0 +1,180 @@
+"""
+Prompt size and end-to-end latency for /chat and the Analyst, before (raw
+event lines / str() of tool dicts) and after the token-budgeted builder.
+
+The LLM is a stub whose latency follows a simple provider model: fixed
+overhead + prefill per uncached prompt token (+ a quarter of that for
+cached ones) + a fixed-length reply. Cached tokens follow OpenAI's rule:
+the longest prefix shared with the previous request, counted only when it
+is at least 1024 tokens, in 128-token steps.
+
+Run from backend/:  python -m benchmarks.bench_prompt_builder [requests]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+
+os.environ.setdefault("OPENAI_API_KEY", "sk-bench")  # agents build their chains; the stub replaces the model
+
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+from app.agents import prompt_builder
+from app.agents.analyst import AnalystAgent, SYSTEM_PROMPT as ANALYST_PROMPT
+from app.agents.assistant import AssistantAgent
+from app.incidents.incident_manager import IncidentManager
+from app.storage.event_log import EventLog
+
+OVERHEAD_S = 0.25
+PREFILL_S_PER_TOKEN = 0.0002
+REPLY_S = 0.4
+TIME_SCALE = 0.1  # sleep a tenth of the modelled time to keep the run short
+
+ISSUERS = ["CHASE", "BOA", "WELLS"]
+ALERTS = ["LATENCY_SPIKE", "SUCCESS_DROP"]
+ERRORS = ["500", "502", "TIMEOUT", "DECLINED"]
+
+
+class StubLLM:
+    def __init__(self, counter: prompt_builder.TokenCounter):
+        self.counter = counter
+        self.previous = ""
+        self.calls = []
+
+    def _cached_tokens(self, prompt: str) -> int:
+        shared = 0
+        for a, b in zip(prompt, self.previous):
+            if a != b:
+                break
+            shared += 1
+        tokens = self.counter.count(prompt[:shared])
+        return tokens // 128 * 128 if tokens >= 1024 else 0
+
+    async def ainvoke(self, messages, *args, **kwargs):
+        if hasattr(messages, "to_messages"):  # a ChatPromptValue when called inside a chain
+            messages = messages.to_messages()
+        prompt = "\n".join(m.content for m in messages)
+        tokens = self.counter.count(prompt)
+        cached = self._cached_tokens(prompt)
+        self.previous = prompt
+        modelled = OVERHEAD_S + PREFILL_S_PER_TOKEN * (tokens - cached + cached / 4) + REPLY_S
+        self.calls.append((tokens, cached, modelled))
+        await asyncio.sleep(modelled * TIME_SCALE)
+        return AIMessage(content='{"root_cause": "issuer outage", "confidence": 0.9, '
+                                 '"evidence": ["errors"], "recommended_action": "route_traffic"}')
+
+
+def storm():
+    """30 minutes of an alert storm across issuers, logged the way main.raise_alert/handle_incident do."""
+    log, incidents = EventLog(capacity=1000), IncidentManager(max_in_flight=100)
+    start, clock = time.time() - 1800, time.monotonic() - 1800
+    rng = random.Random(3)
+    for step in range(1800 * 4):
+        ts, now = start + step / 4, clock + step / 4
+        issuer, alert = rng.choice(ISSUERS), rng.choice(ALERTS)
+        incident = incidents.observe(issuer, alert, now=now)
+        if incident:
+            log.append("Watchdog", f"ALERT: {alert} on {issuer} ({incident.incident_id}, {incident.severity}, "
+                                   f"{incident.alert_count} alerts)", "warning", issuer, ts=ts)
+            log.append("Analyst", f"Diagnosed: External outage detected at {issuer} (Conf: 0.95)", "info", issuer, ts=ts)
+            log.append("Manager", f"Action: ROUTE_TRAFFIC - {issuer} degraded, rerouting 50%", "danger", issuer, ts=ts)
+            incidents.complete(incident)
+    return log, incidents
+
+
+def tool_context(issuer: str):
+    now = datetime.now()
+    rows = [{"timestamp": (now - timedelta(minutes=m)).strftime("%Y-%m-%d %H:%M"), "error": e, "count": 40 + 7 * m}
+            for m in range(5) for e in ERRORS]
+    failures = [{"transaction_id": f"tx_{i:012x}", "timestamp": now.isoformat(), "error": ERRORS[i % 4],
+                 "latency_ms": 1200 + i, "region": "US-EAST"}
+                for i in range(10)]
+    return {
+        "external_status": {"status": "degraded", "details": "High latency on payment gateway."},
+        "recent_errors": {"issuer": issuer, "window_minutes": 5, "total_errors": sum(r["count"] for r in rows),
+                          "rows": rows, "recent_failures": failures},
+    }
+
+
+def legacy_chat_context(log: EventLog, query: str) -> str:
+    mentioned = [i for i in log.issuers() if i.upper() in query.upper()]
+    if mentioned:
+        events = sorted((e for i in mentioned for e in log.recent(50, issuer=i)), key=lambda e: e["seq"])
+    else:
+        events = log.recent(50)
+    return "\n".join(f"[{e['timestamp']}] {e['agent']}: {e['message']}" for e in events)
+
+
+def covered(text: str, incidents) -> int:
+    return sum(inc.incident_id in text for inc in list(incidents.open.values()) + list(incidents.resolved))
+
+
+def report(name: str, stub: StubLLM, elapsed: float, coverage: float):
+    tokens = sum(c[0] for c in stub.calls) / len(stub.calls)
+    cached = sum(c[1] for c in stub.calls) / len(stub.calls)
+    modelled = sum(c[2] for c in stub.calls) / len(stub.calls)
+    print(f"{name:<22} {tokens:>8.0f} {cached:>8.0f} {modelled * 1000:>10.0f} {elapsed * 1000 / len(stub.calls):>10.1f} "
+          f"{coverage:>10.1f}")
+
+
+async def bench_chat(requests: int, log: EventLog, incidents: IncidentManager):
+    queries = ["What is going on with CHASE?", "Summarize the last hour", "Is BOA healthy?", "Any critical incidents?"]
+    assistant = AssistantAgent()
+    for name, build in (("chat before", lambda q: legacy_chat_context(log, q)),
+                        ("chat after", lambda q: assistant.build_context(q, log.recent(500), incidents.snapshot()))):
+        assistant.llm = stub = StubLLM(assistant.prompts.counter)
+        coverage, start = 0, time.perf_counter()
+        for i in range(requests):
+            query = queries[i % len(queries)]
+            context = build(query)
+            coverage += covered(context, incidents)
+            await assistant.chat(query, context)
+        report(name, stub, (time.perf_counter() - start) / TIME_SCALE, coverage / requests)
+
+
+async def bench_analyst(requests: int):
+    analyst = AnalystAgent()
+    counter = analyst.prompts.counter
+    for name in ("analyst before", "analyst after"):
+        stub = StubLLM(counter)
+        analyst.llm = RunnableLambda(stub.ainvoke)
+        analyst._setup_chain()
+        if name == "analyst before":
+            # The old chain: format instructions in the human turn, str() of the tool dicts as context
+            from langchain_core.output_parsers import JsonOutputParser
+            from langchain_core.prompts import ChatPromptTemplate
+            from app.agents.analyst import AnalystInvestigation
+            parser = JsonOutputParser(pydantic_object=AnalystInvestigation)
+            system = ANALYST_PROMPT.replace("\n\n{format_instructions}", "")
+            prompt = ChatPromptTemplate.from_messages([
+                ("system", system),
+                ("human", "Alert: {alert}\nContext: {context}\n\nProvide diagnosis.\n{format_instructions}")])
+            chain = prompt | analyst.llm | parser
+            render = lambda ctx: {"context": str(ctx), "format_instructions": parser.get_format_instructions()}
+        else:
+            chain = analyst.chain
+            render = lambda ctx: {"context": prompt_builder.investigation_context(analyst.prompts, ctx)}
+        start = time.perf_counter()
+        for i in range(requests):
+            issuer = ISSUERS[i % len(ISSUERS)]
+            await chain.ainvoke({"alert": f"SUCCESS_DROP on {issuer}", **render(tool_context(issuer))})
+        report(name, stub, (time.perf_counter() - start) / TIME_SCALE, 0)
+
+
+async def main():
+    requests = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    log, incidents = storm()
+    counter = prompt_builder.TokenCounter("gpt-4o")
+    print(f"{len(log)} events, {len(incidents.open) + len(incidents.resolved)} incidents; "
+          f"token counts {'exact (tiktoken)' if counter.exact else 'estimated'}")
+    print(f"budgets: {prompt_builder.MODEL_BUDGETS}")
+    print(f"{'':<22} {'prompt':>8} {'cached':>8} {'model ms':>10} {'e2e ms':>10} {'incidents':>10}")
+    await bench_chat(requests, log, incidents)
+    await bench_analyst(requests)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,100 @@
+"""
+Multi-resolution rollups: ingest simulated traffic through RollupEngine,
+check windowed answers against a brute-force scan of the raw rows, then time
+ingestion and queries.
+
+Run from backend/:  python -m benchmarks.bench_rollups [rows] [batch_rows]
+"""
+import sys
+import time
+
+import numpy as np
+
+from app.analytics.rollups import RollupEngine
+from app.models import transaction_batch as batch_codes
+from app.models.transaction_batch import TransactionBatch
+from app.simulator.chaos_simulator import ChaosSimulator
+
+SPAN_S = 2 * 3600  # traffic is spread over the last two hours
+QUERIES = 200
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def brute_force(raw: TransactionBatch, lo_ts: float, hi_ts: float, issuer: str, region: str):
+    rows = ((raw.timestamp >= lo_ts) & (raw.timestamp < hi_ts)
+            & (raw.issuer == batch_codes.ISSUERS.code(issuer)) & (raw.region == batch_codes.REGIONS.code(region)))
+    latency = raw.latency_ms[rows]
+    return {
+        "count": int(rows.sum()),
+        "successes": int(raw.success[rows].sum()),
+        "latency_min": int(latency.min()),
+        "latency_max": int(latency.max()),
+        "latency_mean": round(float(latency.mean()), 1),
+        "p99": float(np.quantile(latency, 0.99, method="lower")),
+    }
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    batch_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 5_000
+    sim = ChaosSimulator(seed=3)
+    sim.inject_failure("bench", issuer="CHASE", failure_rate=0.4)
+    now = time.time()
+
+    engine = RollupEngine()
+    batches = []
+    ingest_s = 0.0
+    ingested = 0
+    while ingested < rows:
+        batch = sim._generate_batch(min(batch_rows, rows - ingested))
+        # Batches arrive in time order, each within a tick (~50ms)
+        batch.timestamp[:] = now - SPAN_S + SPAN_S * ingested / rows + np.linspace(0, 0.05, len(batch))
+        batches.append(batch)
+        start = time.perf_counter()
+        engine.record_batch(batch)
+        ingest_s += time.perf_counter() - start
+        ingested += len(batch)
+    print(f"record_batch: {ingested:,} rows in {ingest_s:.2f}s ({ingested / ingest_s:,.0f} rows/s), "
+          f"{len(engine.key_codes)} series")
+
+    # Per-event path on a slice, for the live simulation loop
+    single = RollupEngine()
+    sample = batches[-1].to_schemas()[:2000]
+    start = time.perf_counter()
+    for tx in sample:
+        single.record(tx)
+    per_event_us = (time.perf_counter() - start) / len(sample) * 1e6
+    print(f"record (per event): {per_event_us:.1f}us/tx")
+
+    # Parity against a raw scan (window aligned to the chosen resolution)
+    raw = TransactionBatch.concat(batches)
+    ok = True
+    for window_s in (60, 600, 3600):
+        result = engine.query(window_s, now=now, issuer="CHASE", region="US-EAST")
+        got = result["groups"][0]
+        expected = brute_force(raw, result["from"], result["to"], "CHASE", "US-EAST")
+        exact = all(got[k] == expected[k] for k in ("count", "successes", "latency_min", "latency_max", "latency_mean"))
+        p99_err = abs(got["p99"] - expected["p99"]) / expected["p99"]
+        ok &= exact and p99_err <= engine.mapping.relative_accuracy
+        print(f"  {window_s:>5}s window @ {result['resolution_s']}s: count {got['count']:,}  "
+              f"success {got['success_rate']:.3f}  p99 {got['p99']} vs {expected['p99']} "
+              f"({p99_err:.1%} err)  {'OK' if exact else 'MISMATCH'}")
+    print(f"parity: {'OK' if ok else 'MISMATCH'}")
+
+    for label, kwargs in (("1h by region", {"window_s": 3600, "group_by": "region", "issuer": "CHASE"}),
+                          ("10m all series", {"window_s": 600}),
+                          ("5m series points", {"window_s": 300, "issuer": "BOA", "points": True})):
+        timings = []
+        for _ in range(QUERIES):
+            start = time.perf_counter()
+            engine.query(now=now, **kwargs)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"query {label}: p50 {percentile(timings, 50):.2f}ms  p99 {percentile(timings, 99):.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
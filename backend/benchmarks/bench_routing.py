@@ -0,0 +1,147 @@
+"""
+Routing table: processor selection throughput, behaviour under concurrent
+weight updates, rollback cost, and what a reroute does to simulated traffic.
+
+- selection: alias table pick (per transaction) and packed sample (per
+  batch) against a linear walk over cumulative weights, for 2-64 processors
+- updates: a writer thread publishes versions flat out while a reader
+  selects flat out; each version routes everything to a processor
+  named after it, so any selection that disagrees with the version the
+  reader holds would be a torn read
+- rollback: restoring a retained version (whole table, one issuer)
+- outcome: an injection on CHASE's STRIPE route, before / after the
+  Manager's 50% divert to the fallback processor / after rollback
+
+Run from backend/:  python -m benchmarks.bench_routing
+"""
+import random
+import threading
+import time
+from bisect import bisect_right
+from itertools import accumulate
+
+import numpy as np
+
+from app.agents.manager import FALLBACK_PROCESSOR
+from app.models import transaction_batch as batch_codes
+from app.routing.routing_table import RoutingTable
+from app.simulator.chaos_simulator import ISSUERS, ChaosSimulator
+
+TARGET_PER_S = 100_000
+
+
+def linear_pick(processors, cumulative, u: float) -> str:
+    """The obvious alternative: walk the cumulative weights."""
+    target = u * cumulative[-1]
+    for processor, bound in zip(processors, cumulative):
+        if target < bound:
+            return processor
+    return processors[-1]
+
+
+def rate(fn, budget_s: float = 0.5, chunk: int = 1000) -> float:
+    calls, start = 0, time.perf_counter()
+    while time.perf_counter() - start < budget_s:
+        fn(chunk)
+        calls += chunk
+    return calls / (time.perf_counter() - start)
+
+
+def selection():
+    print(f"selection (per second; target {TARGET_PER_S:,}/s per transaction)")
+    print(f"{'processors':>11}{'alias pick':>14}{'linear walk':>14}{'bisect':>14}{'batch sample':>16}")
+    rng = np.random.default_rng(1)
+    for n in (2, 8, 64):
+        weights = {f"P{i}": random.random() for i in range(n)}
+        table = RoutingTable(weights={issuer: weights for issuer in ISSUERS})
+        processors, cumulative = list(weights), list(accumulate(weights.values()))
+        draw = random.random
+
+        def alias(chunk):
+            current = table.current
+            for _ in range(chunk):
+                current.pick("CHASE", draw())
+
+        def linear(chunk):
+            for _ in range(chunk):
+                linear_pick(processors, cumulative, draw())
+
+        def bisected(chunk):
+            for _ in range(chunk):
+                processors[min(bisect_right(cumulative, draw() * cumulative[-1]), n - 1)]
+
+        issuers = batch_codes.ISSUERS.codes([random.choice(ISSUERS) for _ in range(10_000)])
+        batched = rate(lambda chunk: table.current.sample(issuers, rng), chunk=len(issuers))
+        print(f"{n:>11}{rate(alias):>14,.0f}{rate(linear):>14,.0f}{rate(bisected):>14,.0f}{batched:>16,.0f}")
+
+
+def updates(duration_s: float = 2.0):
+    table = RoutingTable()
+    stop = threading.Event()
+    published = [0]
+
+    def writer():
+        while not stop.is_set():
+            version = table.version + 1
+            table.set_weights("CHASE", {f"V{version}": 1.0})
+            published[0] += 1
+
+    selections, torn = 0, 0
+    thread = threading.Thread(target=writer)
+    thread.start()
+    start = time.perf_counter()
+    while time.perf_counter() - start < duration_s:
+        current = table.current  # what a simulator tick holds for its whole batch
+        expected = f"V{current.version}" if current.version else table.default_processor
+        for _ in range(1000):
+            if current.pick("CHASE", random.random()) != expected:
+                torn += 1
+        selections += 1000
+    elapsed = time.perf_counter() - start
+    stop.set()
+    thread.join()
+    print(f"\nupdates: {published[0] / elapsed:,.0f} versions/s published while selecting "
+          f"{selections / elapsed:,.0f}/s, {torn} selections disagreeing with their version")
+
+
+def rollback():
+    table = RoutingTable(history=1000)
+    for i in range(1000):
+        issuer = ISSUERS[i % len(ISSUERS)]
+        table.set_weights(issuer, {f"P{j}": random.random() for j in range(8)})
+    # Rollbacks are versions too, so pick targets among the newest half to stay inside the history
+    whole = rate(lambda chunk: [table.rollback(table.version - random.randrange(500)) for _ in range(chunk)], chunk=100)
+    one = rate(lambda chunk: [table.rollback(table.version - random.randrange(500), "CHASE") for _ in range(chunk)],
+               chunk=100)
+    print(f"\nrollback to any of the last 500 versions ({table.history:,} retained, 4 issuers x 8 processors): "
+          f"whole table {1e6 / whole:.1f} us, one issuer {1e6 / one:.1f} us")
+
+
+def outcome(rows: int = 50_000):
+    table = RoutingTable()
+    sim = ChaosSimulator(seed=3, routing=table)
+    sim.inject_failure("outage", issuer="CHASE", processor=table.default_processor, failure_rate=0.9)
+    chase = batch_codes.ISSUERS.code("CHASE")
+    print(f"\noutcome: CHASE on {table.default_processor} failing at 0.9")
+
+    def report(label):
+        batch = sim._generate_batch(rows)
+        mask = batch.issuer == chase
+        counts = np.unique(batch.processor[mask], return_counts=True)
+        shares = ", ".join(f"{batch_codes.PROCESSORS.names[code]} {count / mask.sum():.2f}" for code, count in zip(*counts))
+        print(f"  {label:<22} v{table.version}  failed {(batch.status[mask] == batch_codes.FAILED).mean():.3f}  ({shares})")
+
+    report("before")
+    before = table.version
+    table.divert("CHASE", 50, FALLBACK_PROCESSOR)
+    report(f"50% to {FALLBACK_PROCESSOR}")
+    table.rollback(before, "CHASE")
+    report("rolled back")
+
+
+if __name__ == "__main__":
+    random.seed(0)
+    selection()
+    updates()
+    rollback()
+    outcome()
@@ -0,0 +1,90 @@
+"""
+Sharded detection: labels from ShardedWatchdog must match the in-process
+WatchdogAgent exactly; then throughput from 1 to N worker processes.
+Traffic spans many issuers so the hash partition has something to spread.
+
+Run from backend/:  python -m benchmarks.bench_sharded_watchdog [rows] [max_shards] [batch_rows]
+"""
+import contextlib
+import os
+import sys
+import time
+
+import numpy as np
+
+from app.agents.sharded_watchdog import ShardedWatchdog
+from app.agents.watchdog import WatchdogAgent
+from app.models import transaction_batch as batch_codes
+from app.models.transaction_batch import TransactionBatch
+
+ISSUERS = 64
+
+
+def traffic(rows: int) -> TransactionBatch:
+    rng = np.random.default_rng(5)
+    codes = np.array([batch_codes.ISSUERS.code(f"ISSUER_{i:02d}") for i in range(ISSUERS)], np.uint16)
+    issuers = codes[rng.integers(0, ISSUERS, rows)]
+    latency = rng.integers(50, 301, rows)
+    spikes = rng.random(rows) < 0.01
+    latency[spikes] = rng.integers(1000, 2000, int(spikes.sum()))
+    status = np.where(rng.random(rows) < 0.9, batch_codes.SUCCESS, batch_codes.FAILED)
+    return TransactionBatch(
+        tx_id=np.arange(rows),
+        timestamp=time.time() - 600 + np.linspace(0, 600, rows),
+        issuer=issuers,
+        latency_ms=latency,
+        status=status,
+    )
+
+
+@contextlib.contextmanager
+def silenced_fd1():
+    """Point fd 1 at /dev/null so spawned shards inherit it (they print every alert)."""
+    sys.stdout.flush()
+    saved = os.dup(1)
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    try:
+        yield
+    finally:
+        os.dup2(saved, 1)
+        os.close(saved)
+        os.close(devnull)
+
+
+def run(detector, batch: TransactionBatch, batch_rows: int):
+    labels = []
+    start = time.perf_counter()
+    for i in range(0, len(batch), batch_rows):
+        labels.append(detector.process_batch_codes(batch[i:i + batch_rows]))
+    return np.concatenate(labels), time.perf_counter() - start
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    max_shards = int(sys.argv[2]) if len(sys.argv) > 2 else max(2, os.cpu_count() or 1)
+    batch_rows = int(sys.argv[3]) if len(sys.argv) > 3 else 50_000
+    batch = traffic(rows)
+    print(f"{rows:,} tx over {ISSUERS} issuers, {batch_rows:,}-row batches, {os.cpu_count()} CPU(s)")
+
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        expected, single_s = run(WatchdogAgent(), batch, batch_rows)
+    print(f"{'mode':<18} {'seconds':>8} {'tx/s':>12} {'speedup':>8} {'parity':>7}")
+    print(f"{'in-process':<18} {single_s:>8.2f} {rows / single_s:>12,.0f} {1.0:>7.1f}x {'-':>7}")
+
+    shards = 1
+    while shards <= max_shards:
+        sharded = ShardedWatchdog(shards)
+        with silenced_fd1():
+            sharded.start()
+        sharded.stats()  # round trip: workers are up before the clock starts
+        labels, elapsed = run(sharded, batch, batch_rows)
+        parity = "ok" if np.array_equal(labels, expected) else "MISMATCH"
+        print(f"{f'{shards} shard(s)':<18} {elapsed:>8.2f} {rows / elapsed:>12,.0f} "
+              f"{single_s / elapsed:>7.1f}x {parity:>7}")
+        sharded.close()
+        shards *= 2
+
+
+if __name__ == "__main__":
+    main()
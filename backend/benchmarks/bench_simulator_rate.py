@@ -0,0 +1,39 @@
+"""
+Simulator throughput: per-event run() vs batched run_batches() with a token bucket.
+
+For each target TPS, consume the generator for DURATION_S and report the rate
+actually achieved.
+
+Run from backend/:  python -m benchmarks.bench_simulator_rate
+"""
+import asyncio
+import time
+
+from app.simulator.chaos_simulator import ChaosSimulator
+
+TARGETS = [1_000, 10_000, 50_000, 100_000]
+DURATION_S = 3.0
+
+
+async def measure(stream, sim: ChaosSimulator, batched: bool) -> float:
+    count = 0
+    start = time.perf_counter()
+    async for item in stream:
+        count += len(item) if batched else 1
+        if time.perf_counter() - start >= DURATION_S:
+            sim.running = False
+    return count / (time.perf_counter() - start)
+
+
+async def main():
+    print(f"{'target tps':>10} {'run() tps':>12} {'run_batches() tps':>18} {'error':>7}")
+    for target in TARGETS:
+        sim = ChaosSimulator(base_tps=target, seed=1)
+        sim.inject_failure("bench", issuer="CHASE", failure_rate=0.9)
+        per_event = await measure(sim.run(), sim, batched=False)
+        batched = await measure(sim.run_batches(), sim, batched=True)
+        print(f"{target:>10,} {per_event:>12,.0f} {batched:>18,.0f} {(batched - target) / target:>6.1%}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
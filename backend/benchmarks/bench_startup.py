@@ -0,0 +1,100 @@
+"""
+Startup: how long a fresh `uvicorn app.main:app` takes to answer /health,
+the heaviest imports behind `import app.main` (python -X importtime), and
+what the first request that needs an LLM-backed agent pays when it has to
+build it (warm-up disabled).
+
+Run from backend/:  python -m benchmarks.bench_startup [runs]
+"""
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def environment(**extra) -> dict:
+    data_dir = tempfile.mkdtemp(prefix="bench_startup_")
+    env = {**os.environ, "PAYSENTINEL_DATA_DIR": data_dir, "INGEST_SIMULATOR": "0",
+           "PAYSENTINEL_DB_PATH": os.path.join(data_dir, "transactions.db"), **extra}
+    env.setdefault("OPENAI_API_KEY", "sk-bench")  # real key shape, so the agents build their LLM clients
+    return env
+
+
+def get(port: int, path: str) -> int:
+    with urllib.request.urlopen(f"http://127.0.0.1:{port}{path}", timeout=30) as r:
+        return r.status
+
+
+def start_server(env: dict):
+    """(process, port, seconds until /health answered)"""
+    port = free_port()
+    start = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+                            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    while True:
+        try:
+            if get(port, "/health") == 200:
+                return proc, port, time.perf_counter() - start
+        except OSError:
+            time.sleep(0.01)
+        if proc.poll() is not None:
+            raise RuntimeError("server exited during startup")
+
+
+def stop(proc):
+    proc.terminate()
+    proc.wait(timeout=10)
+
+
+def import_profile(top: int = 8):
+    out = subprocess.run([sys.executable, "-X", "importtime", "-c", "import app.main"],
+                         env=environment(), capture_output=True, text=True).stderr
+    rows = []
+    for line in out.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            _, cumulative, name = line[len("import time:"):].split("|")
+            if cumulative.strip().isdigit():
+                rows.append((int(cumulative), name.rstrip()))
+    total = next(us for us, name in rows if name.strip() == "app.main")
+    print(f"import app.main: {total / 1000:.0f} ms; heaviest imports (cumulative):")
+    for us, name in sorted(rows, reverse=True)[1:top + 1]:
+        print(f"  {us / 1000:>7.0f} ms  {name}")
+
+
+def main():
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    import_profile()
+
+    ready = []
+    for _ in range(runs):
+        proc, _, seconds = start_server(environment())
+        ready.append(seconds * 1000)
+        stop(proc)
+    print(f"\n/health ready: median {statistics.median(ready):.0f} ms, max {max(ready):.0f} ms over {runs} starts")
+
+    # Without warm-up, the first request that needs the Analyst builds it
+    proc, port, _ = start_server(environment(AGENTS_WARMUP="0"))
+    try:
+        start = time.perf_counter()
+        get(port, "/cache/stats")
+        first = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        get(port, "/cache/stats")
+        second = (time.perf_counter() - start) * 1000
+        print(f"first Analyst request (cold build): {first:.0f} ms, next: {second:.1f} ms")
+    finally:
+        stop(proc)
+
+
+if __name__ == "__main__":
+    main()
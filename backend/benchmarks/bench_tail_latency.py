@@ -0,0 +1,105 @@
+"""
+Tail latency sketches: quantile accuracy and footprint on heavy-tailed
+latencies, then the Watchdog's p99-over-baseline rule on an hour of traffic
+with a tail regression injected (per-event vs batched parity, detection
+delay, throughput).
+
+Run from backend/:  python -m benchmarks.bench_tail_latency [samples]
+"""
+import contextlib
+import os
+import sys
+import time
+
+import numpy as np
+
+from app.agents.watchdog import WatchdogAgent
+from app.analytics.sketch import LatencySketch
+from app.models import transaction_batch as batch_codes
+from app.models.transaction_batch import TransactionBatch
+
+TPS = 50
+MINUTES = 60
+REGRESSION_AT_S = 45 * 60  # CHASE p99 degrades 45 minutes in
+
+
+def accuracy(samples: int):
+    rng = np.random.default_rng(7)
+    latencies = np.round(rng.lognormal(np.log(150), 0.6, samples)).astype(np.int64)
+    sketch = LatencySketch()
+    start = time.perf_counter()
+    sketch.add_many(latencies)
+    elapsed = time.perf_counter() - start
+    halves = LatencySketch(), LatencySketch()
+    halves[0].add_many(latencies[::2])
+    halves[1].add_many(latencies[1::2])
+    halves[0].merge(halves[1])
+
+    print(f"{samples:,} lognormal samples in {elapsed * 1000:.1f}ms, sketch {sketch.counts.nbytes:,} bytes "
+          f"({sketch.mapping.relative_accuracy:.0%} relative accuracy), merged halves identical: "
+          f"{np.array_equal(halves[0].counts, sketch.counts)}")
+    for q in LatencySketch.QUANTILES:
+        exact = float(np.quantile(latencies, q, method="lower"))
+        estimate = sketch.quantile(q)
+        print(f"  p{q * 100:g}: exact {exact:.0f}ms  sketch {estimate:.1f}ms  ({abs(estimate - exact) / exact:.2%} err)")
+
+
+def traffic() -> TransactionBatch:
+    """An hour of traffic over four issuers; CHASE's slowest 3% get much slower after REGRESSION_AT_S."""
+    rng = np.random.default_rng(11)
+    rows = TPS * 60 * MINUTES
+    start = time.time() - MINUTES * 60
+    timestamps = start + np.sort(rng.uniform(0, MINUTES * 60, rows))
+    issuers = rng.integers(0, 4, rows).astype(np.uint16)
+    latency = rng.integers(50, 301, rows)
+    chase = batch_codes.ISSUERS.code("CHASE")
+    slow = (issuers == chase) & (timestamps - start >= REGRESSION_AT_S) & (rng.random(rows) < 0.03)
+    latency[slow] = rng.integers(900, 1200, int(slow.sum()))
+    return TransactionBatch(
+        tx_id=np.arange(rows),
+        timestamp=timestamps,
+        issuer=issuers,
+        latency_ms=latency,
+        status=np.full(rows, batch_codes.SUCCESS),
+        region=rng.integers(0, 3, rows),
+    ), start
+
+
+def main():
+    samples = int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000
+    accuracy(samples)
+
+    batch, start = traffic()
+    stream = batch.to_schemas()
+
+    scalar = WatchdogAgent()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        began = time.perf_counter()
+        scalar_labels = [scalar.process_transaction(tx) for tx in stream]
+        scalar_s = time.perf_counter() - began
+
+        batched = WatchdogAgent()
+        began = time.perf_counter()
+        batch_labels = []
+        for i in range(0, len(batch), 5000):
+            batch_labels.extend(batched.process_batch(batch[i:i + 5000]))
+        batch_s = time.perf_counter() - began
+
+    tail_rows = [i for i, label in enumerate(scalar_labels) if label == "TAIL_LATENCY"]
+    print(f"\n{len(stream):,} tx over {MINUTES} min, CHASE tail regression at +{REGRESSION_AT_S // 60} min")
+    print(f"  parity (per-event vs batched): {'ok' if scalar_labels == batch_labels else 'MISMATCH'}")
+    if tail_rows:
+        first = tail_rows[0]
+        delay = batch.timestamp[first] - start - REGRESSION_AT_S
+        print(f"  TAIL_LATENCY alerts: {len(tail_rows):,}, first on {stream[first].issuer} "
+              f"{delay:.1f}s after the regression began")
+        false_alarms = sum(1 for i in tail_rows if batch.timestamp[i] - start < REGRESSION_AT_S)
+        print(f"  alerts before the regression: {false_alarms}")
+    else:
+        print("  no TAIL_LATENCY alerts")
+    print(f"  per-event {len(stream) / scalar_s:,.0f} tx/s, batched {len(batch) / batch_s:,.0f} tx/s")
+    print(f"  CHASE now: {batched.tail_latency('CHASE')['CHASE']}")
+
+
+if __name__ == "__main__":
+    main()
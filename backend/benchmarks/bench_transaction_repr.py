@@ -0,0 +1,45 @@
+"""
+Memory per transaction and construction cost: TransactionSchema vs TransactionBatch.
+
+Run from backend/:  python -m benchmarks.bench_transaction_repr [count]
+"""
+import sys
+import time
+import tracemalloc
+
+from app.models.transaction_batch import TransactionBatch
+from app.simulator.chaos_simulator import ChaosSimulator
+
+
+def measure(build):
+    """(result, seconds, bytes); timed separately since tracemalloc slows allocation."""
+    start = time.perf_counter()
+    build()
+    elapsed = time.perf_counter() - start
+    tracemalloc.start()
+    result = build()
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, size
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    sim = ChaosSimulator(seed=1)
+    sim.inject_failure("bench", issuer="CHASE", failure_rate=0.5)
+
+    batch, batch_time, batch_bytes = measure(lambda: sim._generate_batch(count))
+    schemas, schema_time, schema_bytes = measure(batch.to_schemas)
+    _, legacy_time, legacy_bytes = measure(lambda: [sim._generate_transaction() for _ in range(count)])
+
+    print(f"{count:,} transactions")
+    print(f"{'representation':<34} {'bytes/tx':>9} {'us/tx':>8}")
+    print(f"{'TransactionSchema (per-event gen)':<34} {legacy_bytes / count:>9.0f} {legacy_time / count * 1e6:>8.2f}")
+    print(f"{'TransactionSchema (from batch)':<34} {schema_bytes / count:>9.0f} {schema_time / count * 1e6:>8.2f}")
+    print(f"{'TransactionBatch (vectorized gen)':<34} {batch_bytes / count:>9.0f} {batch_time / count * 1e6:>8.2f}")
+    print(f"TransactionBatch column payload: {batch.nbytes / count:.0f} bytes/tx")
+    del schemas
+
+
+if __name__ == "__main__":
+    main()
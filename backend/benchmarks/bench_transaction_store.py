@@ -0,0 +1,73 @@
+"""
+QueryDatabaseTool backing store: bulk-ingest simulated traffic into SQLite
+(WAL) and time the Analyst's "recent errors for issuer X" query against it.
+
+Run from backend/:  python -m benchmarks.bench_transaction_store [rows] [batch_rows]
+"""
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from app.simulator.chaos_simulator import ChaosSimulator
+from app.storage.transaction_store import TransactionStore
+from app.tools.definitions import QueryDatabaseTool
+
+QUERIES = 501
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2_000_000
+    batch_rows = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+    directory = tempfile.mkdtemp(prefix="paysentinel-db-")
+    try:
+        store = TransactionStore(os.path.join(directory, "transactions.db"))
+        sim = ChaosSimulator(seed=1)
+        sim.inject_failure("bench", issuer="CHASE", failure_rate=0.3)
+
+        # Spread the traffic over the last hour so the 5-minute window is realistic
+        now = time.time()
+        span_s = 3600.0
+        ingested = 0
+        ingest_s = 0.0
+        while ingested < rows:
+            batch = sim._generate_batch(min(batch_rows, rows - ingested))
+            batch.timestamp[:] = now - span_s + span_s * (ingested / rows)
+            start = time.perf_counter()
+            store.ingest(batch)
+            ingest_s += time.perf_counter() - start
+            ingested += len(batch)
+        print(f"ingested {ingested:,} rows in {ingest_s:.2f}s ({ingested / ingest_s:,.0f} rows/s), "
+              f"db {os.path.getsize(store.path) / 1e6:.0f} MB")
+
+        tool = QueryDatabaseTool(store)
+        timings = []
+        for i in range(QUERIES):
+            issuer = ("BOA", "WELLS", "CHASE")[i % 3]
+            start = time.perf_counter()
+            result = tool.execute(issuer, 5)
+            timings.append((time.perf_counter() - start) * 1000)
+        print(f"query_database(issuer, 5 min) x{QUERIES}: p50 {percentile(timings, 50):.2f}ms  "
+              f"p99 {percentile(timings, 99):.2f}ms")
+        print(f"  last result: {result.message}, {len(result.data['rows'])} rollup rows, "
+              f"{len(result.data['recent_failures'])} sample failures")
+
+        plan = store._conn.execute(
+            "EXPLAIN QUERY PLAN SELECT tx_id FROM transactions "
+            "WHERE issuer = ? AND ts >= ? AND error_code IS NOT NULL ORDER BY ts DESC LIMIT 10",
+            ("CHASE", now - 300),
+        ).fetchall()
+        print("  sample plan:", "; ".join(row[-1] for row in plan))
+        store.close()
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
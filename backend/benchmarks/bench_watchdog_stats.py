@@ -0,0 +1,108 @@
+"""
+Micro-benchmark: rolling-statistics Watchdog vs the original full-window scan.
+
+Run from backend/:  python -m benchmarks.bench_watchdog_stats
+"""
+import contextlib
+import os
+import random
+import time
+from collections import deque
+from statistics import mean, stdev
+
+from app.agents.watchdog import WatchdogAgent
+from app.models.transaction import TransactionStatus
+from app.simulator.chaos_simulator import ChaosSimulator
+
+WINDOW_SIZES = [50, 500, 5_000, 50_000, 100_000]
+MEASURED_EVENTS = 2_000
+# The legacy path costs O(window) per event; cap the total work per size
+LEGACY_BUDGET = 2_000_000
+
+
+class LegacyWatchdog:
+    """The original implementation: mean/stdev/sum over the whole deque per event."""
+
+    def __init__(self, window_size: int = 50, z_threshold: float = 2.0):
+        self.window_size = window_size
+        self.z_threshold = z_threshold
+        self.latency_windows = {}
+        self.success_windows = {}
+
+    def process_transaction(self, tx):
+        if tx.issuer not in self.latency_windows:
+            self.latency_windows[tx.issuer] = deque(maxlen=self.window_size)
+            self.success_windows[tx.issuer] = deque(maxlen=self.window_size)
+        self.latency_windows[tx.issuer].append(tx.latency_ms)
+        self.success_windows[tx.issuer].append(1 if tx.status == TransactionStatus.SUCCESS else 0)
+        return self.detect_anomalies(tx.issuer)
+
+    def detect_anomalies(self, issuer):
+        latencies = self.latency_windows[issuer]
+        if len(latencies) < 10:
+            return None
+        avg_latency = mean(latencies)
+        try:
+            std_dev = stdev(latencies)
+            if std_dev > 0 and (latencies[-1] - avg_latency) / std_dev > self.z_threshold:
+                return "LATENCY_SPIKE"
+        except ValueError:
+            pass
+        successes = self.success_windows[issuer]
+        if len(successes) > 10:
+            if sum(successes) / len(successes) < 0.8:
+                return "SUCCESS_DROP"
+        return None
+
+
+def make_stream(count: int, seed: int = 42):
+    random.seed(seed)
+    sim = ChaosSimulator()
+    stream = []
+    for i in range(count):
+        # Toggle an outage on CHASE every so often so both alert types fire
+        if i % 4_000 == 2_000:
+            sim.inject_failure("bench", issuer="CHASE", failure_rate=0.9)
+        elif i % 4_000 == 0:
+            sim.stop_injection("bench")
+        stream.append(sim._generate_transaction())
+    return stream
+
+
+def run(agent, stream):
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        start = time.perf_counter()
+        labels = [agent.process_transaction(tx) for tx in stream]
+        elapsed = time.perf_counter() - start
+    return labels, elapsed
+
+
+def main():
+    print(f"{'window':>8} {'legacy us/tx':>14} {'rolling us/tx':>14} {'speedup':>9} {'parity':>7}")
+    for window in WINDOW_SIZES:
+        # Fill every issuer window before measuring so the per-event cost is
+        # representative of steady state.
+        warmup = make_stream(window * 4 + 4_000, seed=window)
+        events = max(20, min(MEASURED_EVENTS, LEGACY_BUDGET // window))
+        measured = make_stream(events, seed=window + 1)
+
+        legacy = LegacyWatchdog(window_size=window)
+        rolling = WatchdogAgent(window_size=window)
+        for tx in warmup:
+            legacy.latency_windows.setdefault(tx.issuer, deque(maxlen=window)).append(tx.latency_ms)
+            legacy.success_windows.setdefault(tx.issuer, deque(maxlen=window)).append(
+                1 if tx.status == TransactionStatus.SUCCESS else 0
+            )
+        run(rolling, warmup)
+
+        legacy_labels, legacy_time = run(legacy, measured)
+        rolling_labels, rolling_time = run(rolling, measured)
+
+        legacy_us = legacy_time / events * 1e6
+        rolling_us = rolling_time / events * 1e6
+        parity = "ok" if legacy_labels == rolling_labels else "MISMATCH"
+        print(f"{window:>8} {legacy_us:>14.2f} {rolling_us:>14.2f} {legacy_us / rolling_us:>8.1f}x {parity:>7}")
+
+
+if __name__ == "__main__":
+    main()
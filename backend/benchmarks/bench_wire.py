@@ -0,0 +1,39 @@
+"""
+Per-transaction broadcast serialization cost: old dump/parse/dump vs the wire encoder.
+
+Run from backend/:  python -m benchmarks.bench_wire
+"""
+import json
+import timeit
+
+from app.simulator.chaos_simulator import ChaosSimulator
+from app.streaming import wire
+
+ROUNDS = 20_000
+
+
+def legacy_frame(tx, alert):
+    # What simulation_loop + WebSocket.send_json used to do
+    payload = {
+        "type": "transaction",
+        "data": json.loads(tx.model_dump_json()),
+        "alert": alert,
+        "agent_logs": []
+    }
+    return json.dumps(payload, separators=(",", ":"), ensure_ascii=False)
+
+
+def main():
+    tx = ChaosSimulator()._generate_transaction()
+    assert json.loads(wire.encode_transaction_frame(tx, "SUCCESS_DROP")) == json.loads(legacy_frame(tx, "SUCCESS_DROP"))
+
+    legacy = timeit.timeit(lambda: legacy_frame(tx, None), number=ROUNDS) / ROUNDS
+    encoder = timeit.timeit(lambda: wire.encode_transaction_frame(tx, None), number=ROUNDS) / ROUNDS
+    print(f"JSON backend: {'orjson' if wire.orjson else 'json'}")
+    print(f"{'path':<22} {'us/tx':>8}")
+    print(f"{'dump/parse/dump':<22} {legacy * 1e6:>8.2f}")
+    print(f"{'wire encoder':<22} {encoder * 1e6:>8.2f}  ({legacy / encoder:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Local stand-in for the services the agents call: status pages
+(GET /status/{service}), the load balancer (POST /routes) and an
+OpenAI-compatible chat completions endpoint (POST /v1/chat/completions)
+that answers the Analyst's single and batched diagnosis prompts.
+
+Latency, error rate and a hard "down" switch are set per run with
+configure(); `stats` records requests, distinct client connections and peak
+concurrency. Runs in a background thread with its own event loop.
+"""
+import asyncio
+import json
+import random
+import re
+import threading
+import time
+from collections import Counter
+
+import uvicorn
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+
+app = FastAPI()
+behaviour = {"latency_s": 0.0, "llm_latency_s": 0.3, "error_rate": 0.0, "down": False}
+stats = {"requests": Counter(), "connections": set(), "in_flight": 0, "max_in_flight": 0}
+
+DIAGNOSIS = {"root_cause": "Issuer gateway outage", "confidence": 0.9,
+             "evidence": ["status page degraded", "5xx errors rising"], "recommended_action": "route_traffic"}
+
+
+def configure(**changes):
+    behaviour.update(changes)
+
+
+def reset_stats():
+    stats["requests"].clear()
+    stats["connections"].clear()
+    stats["in_flight"] = stats["max_in_flight"] = 0
+
+
+@app.middleware("http")
+async def inject(request: Request, call_next):
+    stats["requests"][request.url.path.split("/")[1]] += 1
+    stats["connections"].add(request.client.port)
+    stats["in_flight"] += 1
+    stats["max_in_flight"] = max(stats["max_in_flight"], stats["in_flight"])
+    try:
+        if behaviour["latency_s"]:
+            await asyncio.sleep(behaviour["latency_s"])
+        if behaviour["down"] or random.random() < behaviour["error_rate"]:
+            return JSONResponse({"error": "injected"}, status_code=503)
+        return await call_next(request)
+    finally:
+        stats["in_flight"] -= 1
+
+
+@app.get("/status/{service}")
+async def status(service: str):
+    degraded = service in ("CHASE", "WELLS")
+    return {"status": "degraded" if degraded else "operational",
+            "details": "High latency on payment gateway." if degraded else "All systems go."}
+
+
+@app.post("/routes")
+async def routes(request: Request):
+    return {"applied": await request.json()}
+
+
+@app.post("/v1/chat/completions")
+async def completions(request: Request):
+    body = await request.json()
+    prompt = body["messages"][-1]["content"]
+    incidents = len(re.findall(r"^### Incident \d+", prompt, re.M))
+    await asyncio.sleep(behaviour["llm_latency_s"])
+    content = json.dumps({"diagnoses": [DIAGNOSIS] * incidents} if incidents else DIAGNOSIS)
+    return {
+        "id": "chatcmpl-stub", "object": "chat.completion", "created": int(time.time()), "model": body["model"],
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4,
+                  "total_tokens": (len(prompt) + len(content)) // 4},
+    }
+
+
+def serve(port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+    return server
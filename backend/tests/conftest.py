@@ -0,0 +1,11 @@
+import os
+import tempfile
+
+# app.main reads its configuration from the environment when imported: keep its files in a scratch
+# directory, leave the simulator and agent warm-up off, and run the agents offline (no API key)
+_data_dir = tempfile.mkdtemp(prefix="paysentinel_tests_")
+os.environ.setdefault("PAYSENTINEL_DATA_DIR", _data_dir)
+os.environ.setdefault("PAYSENTINEL_DB_PATH", os.path.join(_data_dir, "transactions.db"))
+os.environ.setdefault("INGEST_SIMULATOR", "0")
+os.environ.setdefault("AGENTS_WARMUP", "0")
+os.environ["OPENAI_API_KEY"] = ""
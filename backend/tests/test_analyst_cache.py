@@ -0,0 +1,62 @@
+import asyncio
+
+from app.agents.analyst import AnalystAgent, evidence_fingerprint
+from app.tools.definitions import ToolResult
+
+
+def errors(total, codes=("500",), sample="tx_000000000001", minute="12:00"):
+    return {"issuer": "CHASE", "window_minutes": 5, "total_errors": total,
+            "rows": [{"timestamp": f"2026-01-01T{minute}:00", "error": code, "count": total} for code in codes],
+            "recent_failures": [{"transaction_id": sample, "timestamp": f"2026-01-01T{minute}:59", "error": codes[0],
+                                 "latency_ms": 120, "region": "US-EAST"}]}
+
+
+def context(**kwargs):
+    return {"external_status": {"status": "degraded"}, "recent_errors": errors(**kwargs)}
+
+
+def test_fingerprint_ignores_refresh_noise():
+    base = evidence_fingerprint(context(total=40))
+    assert evidence_fingerprint(context(total=60, sample="tx_0000000000ff", minute="12:03")) == base
+    assert evidence_fingerprint(context(total=70)) != base  # past the next power of two
+    assert evidence_fingerprint(context(total=40, codes=("500", "504"))) != base
+    assert evidence_fingerprint({**context(total=40), "external_status": {"status": "operational"}}) != base
+
+
+class FakeTool:
+    def __init__(self, results):
+        self.results = iter(results)
+
+    async def aexecute(self, *args):
+        return ToolResult(success=True, message="", data=next(self.results))
+
+
+class CountingBatcher:
+    def __init__(self):
+        self.calls = 0
+
+    async def submit(self, request):
+        self.calls += 1
+        return {"root_cause": "outage", "confidence": 0.9, "evidence": [], "recommended_action": "route_traffic"}
+
+
+def test_diagnosis_cache_hits_across_tool_refreshes():
+    analyst = AnalystAgent()
+    analyst.llm, analyst.batcher = object(), CountingBatcher()
+    analyst.tools = {
+        "check_external_status": FakeTool([{"status": "degraded"}] * 3),
+        "query_database": FakeTool([errors(40), errors(52, sample="tx_0000000000aa", minute="12:01"),
+                                    errors(300)]),
+    }
+
+    async def investigate():
+        result = await analyst.investigate("SUCCESS_DROP", "CHASE")
+        analyst.tool_cache.clear()  # as if the 5s tool TTL ran out before the next dispatch
+        return result
+
+    async def run():
+        for _ in range(3):
+            await investigate()
+
+    asyncio.run(run())
+    assert analyst.batcher.calls == 2  # the refresh with new samples hit; 300 errors is new evidence
@@ -0,0 +1,101 @@
+import asyncio
+import json
+import time
+
+from app.agents.analyst import AnalystAgent
+from app.clients.batching import MicroBatcher
+from app.tools.definitions import ToolResult
+
+LLM_DELAY_S = 0.3
+TICK_S = 0.005
+MAX_LAG_S = 0.05
+
+
+class Message:
+    def __init__(self, content):
+        self.content = content
+        self.usage_metadata = None
+
+
+class SlowFakeLLM:
+    """Stands in for both analyst chains (single and batched) with a fixed model latency."""
+
+    def __init__(self, delay_s: float, blocking: bool = False):
+        self.delay_s = delay_s
+        self.blocking = blocking
+        self.calls = 0
+
+    async def ainvoke(self, inputs):
+        self.calls += 1
+        if self.blocking:
+            time.sleep(self.delay_s)  # what a sync invoke inside the loop would do
+        else:
+            await asyncio.sleep(self.delay_s)
+        diagnosis = {"root_cause": "Fake outage", "confidence": 0.9, "evidence": [],
+                     "recommended_action": "route_traffic"}
+        if "incidents" in inputs:
+            return Message(json.dumps({"diagnoses": [diagnosis] * inputs["incidents"].count("### Incident")}))
+        return Message(json.dumps(diagnosis))
+
+
+class JsonParser:
+    def parse(self, text):
+        return json.loads(text)
+
+
+class SlowSyncTool:
+    """A tool with only a blocking execute (e.g. a database query)."""
+
+    def __init__(self, data, delay_s: float = 0.05):
+        self.data = data
+        self.delay_s = delay_s
+
+    def execute(self, *args):
+        time.sleep(self.delay_s)
+        return ToolResult(success=True, message="", data=self.data)
+
+
+def storm_analyst(llm: SlowFakeLLM) -> AnalystAgent:
+    analyst = AnalystAgent(max_concurrency=4, timeout_s=5)
+    analyst.llm = analyst.chain = analyst.batch_chain = llm
+    analyst.parser = analyst.batch_parser = JsonParser()
+    analyst.batcher = MicroBatcher(analyst._diagnose_batch, max_size=4, max_wait_s=0.02)
+    analyst.tools = {
+        "check_external_status": SlowSyncTool({"status": "degraded"}),
+        "query_database": SlowSyncTool({"total_errors": 40, "rows": [], "recent_failures": []}),
+    }
+    return analyst
+
+
+async def storm(analyst: AnalystAgent, alerts: int = 16):
+    """Loop lag (seconds) seen by a 5ms ticker while `alerts` investigations run, and their results."""
+    lags, done = [], asyncio.Event()
+
+    async def ticker():
+        while not done.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(TICK_S)
+            lags.append(time.perf_counter() - start - TICK_S)
+
+    tick = asyncio.create_task(ticker())
+    await asyncio.sleep(0.05)
+    # Distinct issuers, so no investigation is answered from another's cached diagnosis
+    results = await asyncio.gather(*(analyst.investigate("SUCCESS_DROP", f"ISSUER_{i}") for i in range(alerts)))
+    done.set()
+    await tick
+    return lags, results
+
+
+def test_alert_storm_keeps_the_event_loop_responsive():
+    llm = SlowFakeLLM(LLM_DELAY_S)
+    lags, results = asyncio.run(storm(storm_analyst(llm)))
+
+    assert all(r["root_cause"] == "Fake outage" for r in results)  # answered by the model, not the fallback
+    assert 0 < llm.calls < len(results)  # concurrent diagnoses shared model calls
+    assert max(lags) < MAX_LAG_S
+
+
+def test_blocking_model_call_would_stall_the_loop():
+    # Control: the same storm with a model call that blocks is visible to the ticker
+    lags, _ = asyncio.run(storm(storm_analyst(SlowFakeLLM(LLM_DELAY_S, blocking=True)), alerts=2))
+    assert max(lags) >= LLM_DELAY_S * 0.9
@@ -0,0 +1,95 @@
+import asyncio
+
+from app.streaming.broadcaster import DISCONNECT, Broadcaster
+
+
+class FakeWebSocket:
+    def __init__(self, blocked: bool = False, broken: bool = False):
+        self.frames = []
+        self.unblocked = asyncio.Event()
+        if not blocked:
+            self.unblocked.set()
+        self.broken = broken
+        self.closed = False
+
+    async def send_text(self, frame):
+        if self.broken:
+            raise ConnectionError("gone")
+        await self.unblocked.wait()
+        self.frames.append(frame)
+
+    async def close(self):
+        self.closed = True
+
+
+def publish(broadcaster, *frames):
+    for frame in frames:
+        broadcaster.publish_frame(frame)
+
+
+def test_drop_oldest_keeps_the_newest_frames():
+    async def scenario():
+        broadcaster = Broadcaster(queue_size=2)
+        socket = FakeWebSocket(blocked=True)
+        broadcaster.register(socket)
+        publish(broadcaster, "f1", "f2", "f3", "f4", "f5")  # before the writer gets to run
+        assert broadcaster.stats()["dropped"] == 3
+        socket.unblocked.set()
+        await asyncio.sleep(0.01)
+        assert socket.frames == ["f4", "f5"]
+        assert (len(broadcaster), broadcaster.evicted) == (1, 0)
+
+    asyncio.run(scenario())
+
+
+def test_disconnect_policy_evicts_a_full_client():
+    async def scenario():
+        broadcaster = Broadcaster(queue_size=2, policy=DISCONNECT)
+        slow, healthy = FakeWebSocket(blocked=True), FakeWebSocket()
+        client = broadcaster.register(slow)
+        broadcaster.register(healthy)
+        publish(broadcaster, "f1", "f2")
+        await asyncio.sleep(0.01)  # healthy drains; slow is stuck on f1 with f2 queued
+        publish(broadcaster, "f3", "f4")
+        assert broadcaster.evicted == 1 and slow not in broadcaster.clients
+        await asyncio.sleep(0.01)
+        assert slow.closed and client.task.cancelled()
+        assert not broadcaster._tasks  # the close finished and was let go
+        assert healthy.frames == ["f1", "f2", "f3", "f4"]
+
+    asyncio.run(scenario())
+
+
+def test_stuck_and_failing_sends_are_evicted():
+    async def scenario():
+        broadcaster = Broadcaster(send_timeout_s=0.05)
+        stuck, broken, healthy = FakeWebSocket(blocked=True), FakeWebSocket(broken=True), FakeWebSocket()
+        for socket in (stuck, broken, healthy):
+            broadcaster.register(socket)
+        publish(broadcaster, "f1")
+        await asyncio.sleep(0.01)
+        assert broadcaster.evicted == 1 and broken.closed  # its send raised
+        publish(broadcaster, "f2")
+        assert stuck in broadcaster.clients  # not stuck for long yet
+        await asyncio.sleep(0.06)
+        publish(broadcaster, "f3")
+        await asyncio.sleep(0.01)
+        assert broadcaster.evicted == 2 and stuck.closed and list(broadcaster.clients) == [healthy]
+        assert healthy.frames == ["f1", "f2", "f3"]
+
+    asyncio.run(scenario())
+
+
+def test_unregister_stops_the_writer():
+    async def scenario():
+        broadcaster = Broadcaster()
+        socket = FakeWebSocket()
+        client = broadcaster.register(socket)
+        publish(broadcaster, "f1")
+        await asyncio.sleep(0.01)
+        broadcaster.unregister(socket)
+        await asyncio.wait_for(client.task, 1)
+        publish(broadcaster, "f2")
+        assert socket.frames == ["f1"] and len(broadcaster) == 0 and broadcaster.evicted == 0
+
+    asyncio.run(scenario())
@@ -0,0 +1,178 @@
+import asyncio
+
+import pytest
+
+from app.analytics.rolling import WindowSummary
+from app.cluster.backend import MemoryBackend, RespBackend
+from app.cluster.node import WINDOWS_KEY, ClusterNode
+from app.cluster.stand_in import Keyspace, StandInServer
+
+LEASE_S = 0.3
+SYNC_S = 0.05
+
+
+def summaries(**windows):
+    async def read():
+        return windows
+    return read
+
+
+async def start_nodes(backends, windows=None):
+    nodes = [ClusterNode(backend, node_id=f"n{i}", lease_s=LEASE_S, sync_s=SYNC_S)
+             for i, backend in enumerate(backends)]
+    for i, node in enumerate(nodes):
+        await node.start(summaries(**(windows[i] if windows else {})))
+    return nodes
+
+
+def memory_backends(count):
+    keyspace = Keyspace()
+    return [MemoryBackend(keyspace) for _ in range(count)]
+
+
+def leaders(nodes):
+    return [node for node in nodes if node.is_leader]
+
+
+def test_one_leader_and_failover_when_it_stops():
+    async def scenario():
+        nodes = await start_nodes(memory_backends(3))
+        assert leaders(nodes) == [nodes[0]] and nodes[0].epoch == 1
+        await asyncio.sleep(LEASE_S / 2)
+        assert {node.leader for node in nodes} == {"n0"}
+
+        await nodes[0].stop()  # hands over without waiting for the lease
+        await asyncio.sleep(LEASE_S / 3 + 0.05)
+        (successor,) = leaders(nodes[1:])
+        assert successor.epoch == 2
+        assert {node.leader for node in nodes[1:]} == {successor.node_id}
+        for node in nodes[1:]:
+            await node.stop()
+
+    asyncio.run(scenario())
+
+
+def test_failover_on_lease_expiry_and_stale_nodes_drop_out():
+    async def scenario():
+        nodes = await start_nodes(memory_backends(3), [{"CHASE": WindowSummary(1, 100, 10_000, 1)}] * 3)
+        await asyncio.sleep(SYNC_S * 2)
+        assert all(node.nodes == ["n0", "n1", "n2"] for node in nodes)
+
+        hung = nodes[0]
+        for task in hung._tasks:  # stops renewing and syncing, but never hands over
+            task.cancel()
+        await asyncio.sleep(LEASE_S / 2)
+        assert leaders(nodes[1:]) == []  # the lease hasn't run out yet
+        await asyncio.sleep(LEASE_S)
+        (successor,) = leaders(nodes[1:])
+        assert successor.epoch == 2
+
+        # The old leader steps down the next time it campaigns
+        await hung._campaign()
+        assert not hung.is_leader and hung.leader == successor.node_id
+
+        # Its window summaries went stale: dropped from the merge, and the leader removes them
+        assert all(node.nodes == ["n1", "n2"] for node in nodes[1:])
+        assert all(node.windows["CHASE"].count == 2 for node in nodes[1:])
+        assert sorted(await nodes[1].backend.hgetall(WINDOWS_KEY)) == ["n1", "n2"]
+        for node in nodes:
+            await node.stop()
+
+    asyncio.run(scenario())
+
+
+def test_window_summaries_merge_across_nodes():
+    async def scenario():
+        windows = [{"CHASE": WindowSummary(2, 200, 20_000, 1)},
+                   {"CHASE": WindowSummary(3, 450, 70_000, 3), "BOA": WindowSummary(1, 90, 8_100, 0)}]
+        nodes = await start_nodes(memory_backends(2), windows)
+        await asyncio.sleep(SYNC_S * 2)
+        expected = {"CHASE": WindowSummary(5, 650, 90_000, 4), "BOA": WindowSummary(1, 90, 8_100, 0)}
+        assert [node.windows for node in nodes] == [expected, expected]
+        assert nodes[0].windows["CHASE"].success_rate() == 0.8
+        for node in nodes:
+            await node.stop()
+
+    asyncio.run(scenario())
+
+
+def test_run_once_runs_once_and_releases_its_key():
+    async def scenario():
+        nodes = await start_nodes(memory_backends(3))
+        calls = []
+
+        async def reroute():
+            calls.append(1)
+            await asyncio.sleep(0.01)
+            return {"version": 3}
+
+        results = await asyncio.gather(*(node.run_once("route:CHASE", 5, reroute) for node in nodes))
+        assert len(calls) == 1
+        assert [result for ran, result in results if ran] == [{"version": 3}]
+        assert all(claim["state"] == "running" and claim["node"] == "n0" for ran, claim in results if not ran)
+        ran, claim = await nodes[2].run_once("route:CHASE", 5, reroute)
+        assert not ran and claim["state"] == "done" and claim["result"] == {"version": 3}
+
+        # A rolled-back action is forgotten and may run again
+        await nodes[1].forget("route:CHASE")
+        assert (await nodes[2].run_once("route:CHASE", 5, reroute))[0]
+        assert len(calls) == 2
+
+        # A failed action releases its key for the next attempt
+        async def fail():
+            raise RuntimeError("load balancer unavailable")
+
+        with pytest.raises(RuntimeError):
+            await nodes[0].run_once("route:BOA", 5, fail)
+        assert (await nodes[1].run_once("route:BOA", 5, reroute))[0]
+        for node in nodes:
+            await node.stop()
+
+    asyncio.run(scenario())
+
+
+def test_nodes_over_the_stand_in_server():
+    async def scenario():
+        server = await StandInServer().start("127.0.0.1", 0)
+        port = server.server.sockets[0].getsockname()[1]
+        windows = [{"CHASE": WindowSummary(1, 100, 10_000, 1)}] * 3
+        nodes = await start_nodes([RespBackend("127.0.0.1", port) for _ in range(3)], windows)
+        await asyncio.sleep(SYNC_S * 2)
+        assert leaders(nodes) == [nodes[0]]
+        assert all(node.windows == {"CHASE": WindowSummary(3, 300, 30_000, 3)} for node in nodes)
+
+        async def reroute():
+            return "ok"
+
+        results = await asyncio.gather(*(node.run_once("route:CHASE", 5, reroute) for node in nodes))
+        assert sum(ran for ran, _ in results) == 1
+
+        await nodes[0].stop()
+        await asyncio.sleep(LEASE_S / 3 + 0.05)
+        (successor,) = leaders(nodes[1:])
+        assert successor.epoch == 2
+        for node in nodes[1:]:
+            await node.stop()
+        await server.close()
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_command_does_not_shift_later_replies():
+    async def scenario():
+        server = await StandInServer().start("127.0.0.1", 0)
+        backend = RespBackend("127.0.0.1", server.server.sockets[0].getsockname()[1])
+        await backend.set("held", "n0")
+        pending = asyncio.create_task(backend.get("held"))
+        await asyncio.sleep(0)  # sent, now waiting for its reply
+        pending.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await pending
+
+        # Without dropping the connection, this SET would read the GET's reply
+        assert await backend.set("other", "1", nx=True)
+        assert await backend.get("other") == b"1"
+        await backend.close()
+        await server.close()
+
+    asyncio.run(scenario())
@@ -0,0 +1,84 @@
+import random
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.storage.event_log import EventLog
+
+AGENTS = ("watchdog", "analyst", "system")
+LEVELS = ("info", "warning", "critical")
+ISSUERS = ("CHASE", "BOA", None)
+
+
+def filled(capacity=100, n=250, seed=7):
+    """A log that has wrapped, with event i at ts=1000+i."""
+    rng = random.Random(seed)
+    log = EventLog(capacity=capacity)
+    for i in range(n):
+        log.append(rng.choice(AGENTS), f"event {i}", level=rng.choice(LEVELS), issuer=rng.choice(ISSUERS),
+                   ts=1000 + i)
+    return log
+
+
+def pages(log, **query):
+    """Every page of a query, following next_cursor."""
+    seqs, cursor = [], None
+    while True:
+        page = log.query(cursor=cursor, **query)
+        seqs.append([event["seq"] for event in page["events"]])
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return seqs
+
+
+@pytest.mark.parametrize("filters", [{}, {"agent": "analyst"}, {"level": "critical", "issuer": "BOA"},
+                                     {"agent": "watchdog", "level": "info", "issuer": "CHASE"}])
+@pytest.mark.parametrize("window", [(None, None), (1200, None), (None, 1180), (1160.5, 1210)])
+def test_query_pages_match_a_scan(filters, window):
+    log = filled()
+    since, until = window
+    expected = [e["seq"] for e in (log.get(s) for s in range(log.next_seq - 1, log.oldest_seq - 1, -1))
+                if all(e[f] == v for f, v in filters.items())
+                and (since is None or e["ts"] >= since) and (until is None or e["ts"] < until)]
+
+    seqs = pages(log, since=since, until=until, limit=7, **filters)
+    assert [seq for page in seqs for seq in page] == expected
+    assert all(len(page) == 7 for page in seqs[:-1])
+
+
+def test_evicted_events_leave_the_indexes():
+    log = EventLog(capacity=3)
+    for i in range(5):
+        log.append("analyst" if i % 2 else "watchdog", f"event {i}", issuer="CHASE" if i < 2 else "BOA")
+    assert len(log) == 3 and log.oldest_seq == 2 and log.get(1) is None
+    assert [e["seq"] for e in log.query(agent="analyst")["events"]] == [3]
+    assert log.query(issuer="CHASE")["events"] == [] and log.issuers() == ["BOA"]
+    assert log.query(agent="nobody") == {"events": [], "next_cursor": None}
+    assert [e["message"] for e in log.recent(limit=2)] == ["event 3", "event 4"]
+
+
+def test_cursor_into_evicted_entries_returns_an_empty_page():
+    log = filled(capacity=10, n=10)
+    page = log.query(limit=4)
+    assert [e["seq"] for e in page["events"]] == [9, 8, 7, 6] and page["next_cursor"] == 6
+    for i in range(10, 30):  # the rest of the first listing is evicted before the client comes back
+        log.append("system", f"event {i}", level="info", issuer="CHASE", ts=1000 + i)
+    assert log.query(cursor=page["next_cursor"], limit=4) == {"events": [], "next_cursor": None}
+    assert log.query(cursor=page["next_cursor"], issuer="CHASE", limit=4) == {"events": [], "next_cursor": None}
+
+
+def test_get_events_endpoint(monkeypatch):
+    log = filled()
+    monkeypatch.setattr(main, "event_log", log)
+    client = TestClient(main.app)
+
+    first = client.get("/events", params={"issuer": "BOA", "since": 1200, "limit": 3}).json()
+    assert [e["seq"] for e in first["events"]] == pages(log, issuer="BOA", since=1200, limit=3)[0]
+    following = client.get("/events", params={"issuer": "BOA", "since": 1200, "limit": 3,
+                                              "cursor": first["next_cursor"]}).json()
+    assert following["events"][0]["seq"] < first["events"][-1]["seq"]
+    assert all(e["issuer"] == "BOA" and e["ts"] >= 1200 for e in first["events"] + following["events"])
+    # limit is clamped to [1, 500]
+    assert len(client.get("/events", params={"limit": 0}).json()["events"]) == 1
+    assert len(client.get("/events", params={"limit": 10_000}).json()["events"]) == len(log) == 100
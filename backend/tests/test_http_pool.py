@@ -0,0 +1,44 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.clients.http_pool import HostPolicy, HttpPool
+
+
+def pool_failing_with(error):
+    calls = []
+
+    def handler(request):
+        calls.append(request.method)
+        if len(calls) == 1:
+            raise error("boom", request=request)
+        return httpx.Response(200, json={"ok": True})
+
+    pool = HttpPool(transport=httpx.MockTransport(handler), default=HostPolicy(backoff_s=0, failure_threshold=100))
+    return pool, calls
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+@pytest.mark.parametrize("error", [httpx.ReadTimeout, httpx.RemoteProtocolError])
+def test_post_is_not_retried_once_it_may_have_been_sent(error):
+    pool, calls = pool_failing_with(error)
+    with pytest.raises(error):
+        run(pool.post_json("http://lb.test/routes", {"issuer": "CHASE"}))
+    assert calls == ["POST"]
+
+
+@pytest.mark.parametrize("error", [httpx.ConnectError, httpx.ConnectTimeout])
+def test_post_is_retried_when_never_sent(error):
+    pool, calls = pool_failing_with(error)
+    assert run(pool.post_json("http://lb.test/routes", {"issuer": "CHASE"})) == {"ok": True}
+    assert calls == ["POST", "POST"]
+
+
+def test_get_is_retried_after_a_read_timeout():
+    pool, calls = pool_failing_with(httpx.ReadTimeout)
+    assert run(pool.get_json("http://status.test/CHASE")) == {"ok": True}
+    assert calls == ["GET", "GET"]
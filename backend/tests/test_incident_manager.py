@@ -0,0 +1,59 @@
+from app.incidents.incident_manager import IncidentManager
+
+
+def test_alerts_coalesce_within_the_cooldown():
+    incidents = IncidentManager(ttl_s=60, cooldown_s=30)
+    incident = incidents.observe("CHASE", "SUCCESS_DROP", now=0)
+    assert incident is not None and incident.investigations == 1
+    assert [incidents.observe("CHASE", "SUCCESS_DROP", now=t) for t in range(1, 6)] == [None] * 5
+    incidents.complete(incident)
+    assert incidents.observe("CHASE", "SUCCESS_DROP", now=20) is None  # still cooling down
+    assert incidents.observe("CHASE", "SUCCESS_DROP", now=30) is incident  # still firing after the cooldown
+    assert (incident.alert_count, incident.investigations) == (8, 2)
+    # Other issuers and alert types are separate incidents
+    other = incidents.observe("CHASE", "LATENCY_SPIKE", now=31)
+    assert other is not None and other.incident_id != incident.incident_id
+    assert (incidents.alerts_seen, incidents.dispatches) == (9, 3)
+
+
+def test_escalation_redispatches_before_the_cooldown():
+    incidents = IncidentManager(cooldown_s=1000)
+    incident = incidents.observe("BOA", "SUCCESS_DROP", now=0)
+    incidents.complete(incident)
+    dispatched_at = [incident.alert_count for i in range(60)
+                     if incidents.observe("BOA", "SUCCESS_DROP", now=1 + i * 0.01)]
+    # Re-dispatched as it reaches medium (10 alerts); reaching high (50) mid-investigation waits for complete()
+    assert dispatched_at == [10]
+    incidents.complete(incident)
+    assert incident.severity == "high" and incident.dispatched_severity == "medium"
+    assert incidents.observe("BOA", "SUCCESS_DROP", now=2) is incident  # escalated while busy: goes on the next alert
+    assert incident.dispatched_severity == "high"
+
+
+def test_max_in_flight_caps_investigations():
+    incidents = IncidentManager(max_in_flight=2)
+    first = incidents.observe("CHASE", "SUCCESS_DROP", now=0)
+    second = incidents.observe("BOA", "SUCCESS_DROP", now=0)
+    assert first and second and incidents.in_flight == 2
+    assert incidents.observe("WELLS", "SUCCESS_DROP", now=0) is None  # skipped, not queued
+    incidents.complete(first)
+    incidents.complete(first)  # completing twice doesn't free a second slot
+    assert incidents.in_flight == 1
+    wells = incidents.observe("WELLS", "SUCCESS_DROP", now=1)  # retried on its next alert
+    assert wells is not None and wells.investigations == 1 and incidents.in_flight == 2
+    assert incidents.observe("STRIPE_TEST", "SUCCESS_DROP", now=1) is None
+
+
+def test_quiet_incidents_expire_to_resolved():
+    incidents = IncidentManager(ttl_s=60)
+    chase = incidents.observe("CHASE", "SUCCESS_DROP", now=0)
+    boa = incidents.observe("BOA", "SUCCESS_DROP", now=30)
+    assert incidents.expire(now=60) == []
+    assert incidents.expire(now=61) == [chase]
+    assert chase.status == "resolved" and list(incidents.open.values()) == [boa]
+    assert list(incidents.resolved) == [chase]
+
+    # An alert after the TTL opens a fresh incident (the stale one resolves first)
+    reopened = incidents.observe("BOA", "SUCCESS_DROP", now=200)
+    assert boa.status == "resolved" and reopened.incident_id != boa.incident_id
+    assert [incident.issuer for incident in incidents.resolved] == ["CHASE", "BOA"]
@@ -0,0 +1,109 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.ingest.ingest_queue import IngestQueue
+from app.models.transaction_batch import TransactionBatch
+
+
+def rows(n, first=0):
+    return TransactionBatch(tx_id=np.arange(first, first + n), timestamp=np.zeros(n))
+
+
+def line(n) -> str:
+    return json.dumps({"transaction_id": f"tx_{n:012x}", "amount": 10.0, "currency": "USD",
+                       "payment_method": "credit_card", "issuer": "CHASE", "processor": "STRIPE",
+                       "status": "success", "latency_ms": 120, "region": "US-EAST"})
+
+
+def test_offer_is_limited_by_credits_and_get_batch_coalesces():
+    async def scenario():
+        queue = IngestQueue(max_rows=10)
+        assert queue.offer(rows(4)) and queue.offer(rows(4, first=4))
+        assert not queue.offer(rows(3, first=8))  # all or nothing
+        assert (queue.credits, queue.rejected) == (2, 3)
+
+        first = await queue.get_batch(max_rows=6)  # one whole chunk plus the head of the next
+        assert first.tx_id.tolist() == [0, 1, 2, 3, 4, 5]
+        assert (await queue.get_batch()).tx_id.tolist() == [6, 7]
+        assert (queue.rows, queue.accepted, queue.high_watermark) == (0, 8, 8)
+
+    asyncio.run(scenario())
+
+
+def test_put_waits_for_room():
+    async def scenario():
+        queue = IngestQueue(max_rows=4)
+        await queue.put(rows(4))
+        waiting = asyncio.create_task(queue.put(rows(2, first=4)))
+        await asyncio.sleep(0.01)
+        assert not waiting.done() and queue.rows == 4
+
+        assert len(await queue.get_batch(max_rows=3)) == 3
+        await asyncio.wait_for(waiting, 1)
+        assert queue.rows == 3
+        assert (await queue.get_batch()).tx_id.tolist() == [3, 4, 5]
+
+    asyncio.run(scenario())
+
+
+@pytest.fixture
+def small_queue(monkeypatch):
+    # No lifespan: the pipeline isn't running, so nothing drains the queue behind the test's back
+    queue = IngestQueue(max_rows=3)
+    monkeypatch.setattr(main, "ingest_queue", queue)
+    monkeypatch.setattr(main, "INGEST_WS_WINDOW", 2)
+    return queue
+
+
+def test_post_ingest_answers_429_when_the_queue_is_full(small_queue):
+    client = TestClient(main.app)
+    response = client.post("/ingest", content="\n".join([line(1), "{not json", line(2)]))
+    assert response.status_code == 202
+    assert (response.json()["accepted"], response.json()["rejected"], response.json()["credits"]) == (2, 1, 1)
+
+    response = client.post("/ingest", content="\n".join([line(3), line(4)]))
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert (response.json()["rows"], response.json()["credits"]) == (2, 1)
+    assert small_queue.rows == 2
+
+
+def test_ws_ingest_rejects_lines_past_the_credit_window(small_queue):
+    with TestClient(main.app).websocket_connect("/ws/ingest") as ws:
+        assert ws.receive_json() == {"type": "credit", "credits": 2}
+        ws.send_text("\n".join([line(1), line(2), line(3)]))
+        ack = ws.receive_json()
+    assert (ack["type"], ack["accepted"], ack["rejected"], ack["credits"]) == ("ack", 2, 1, 2)
+    assert small_queue.rows == 2
+
+
+def test_post_ingest_stops_reading_past_the_body_limit(small_queue, monkeypatch):
+    monkeypatch.setattr(main, "INGEST_MAX_BODY_BYTES", 1000)
+    body = "\n".join(line(n) for n in range(20)).encode()
+    response = TestClient(main.app).post("/ingest", content=body)
+    assert response.status_code == 413  # refused on Content-Length alone
+
+    # Without a Content-Length (chunked), reading stops at the first chunk over the limit
+    chunks = [body[i:i + 400] for i in range(0, len(body), 400)]
+    messages = [{"type": "http.request", "body": c, "more_body": True} for c in chunks]
+    received, sent = [], []
+
+    async def receive():
+        received.append(messages[len(received)])
+        return received[-1]
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {"type": "http", "http_version": "1.1", "method": "POST", "scheme": "http", "path": "/ingest",
+             "raw_path": b"/ingest", "root_path": "", "query_string": b"", "headers": [(b"host", b"test")],
+             "client": ("127.0.0.1", 1), "server": ("test", 80)}
+    asyncio.run(main.app(scope, receive, send))
+    assert sent[0]["status"] == 413
+    assert len(received) == 3 < len(chunks)
+    assert small_queue.rows == 0
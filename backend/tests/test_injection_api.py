@@ -0,0 +1,40 @@
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+from app.simulator.injection_rules import parse_bin_range
+
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as client:
+        yield client
+    for injection_id in list(main.simulator.rules.rules):
+        main.simulator.rules.remove(injection_id)
+
+
+@pytest.mark.parametrize("value", ["abc", "400000-", "-", "411111-400000", "4e5"])
+def test_malformed_bin_range_is_a_value_error(value):
+    with pytest.raises(ValueError, match="bin_range"):
+        parse_bin_range(value)
+
+
+def test_bin_range_forms():
+    assert parse_bin_range("400000-499999") == (400000, 499999)
+    assert parse_bin_range("411111") == (411111, 411111)
+    assert parse_bin_range([400000, 499999]) == (400000, 499999)
+    assert parse_bin_range("") is None
+
+
+def test_inject_rejects_malformed_bin_range(client):
+    response = client.post("/inject", params={"issuer": "CHASE", "bin_range": "abc"})
+    assert response.status_code == 422
+    assert "bin_range" in response.json()["detail"]
+    assert client.post("/inject", params={"issuer": "CHASE", "bin_range": "400000-499999"}).status_code == 200
+
+
+def test_injections_load_nothing_when_one_rule_is_malformed(client):
+    rules = [{"injection_id": "good", "issuer": "CHASE", "bin_range": "400000-499999"},
+             {"injection_id": "bad", "issuer": "BOA", "bin_range": "499999-400000"}]
+    assert client.post("/injections", json=rules).status_code == 422
+    assert client.get("/injections").json()["rules"] == 0
@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+
+from app.models import transaction_batch as batch_codes
+from app.routing.routing_table import RoutingTable
+from app.simulator.chaos_simulator import ChaosSimulator
+from app.simulator.injection_rules import _FIELDS, RuleEngine
+
+CELL_VOCABS = (batch_codes.ISSUERS, batch_codes.REGIONS, batch_codes.METHODS, batch_codes.PROCESSORS,
+               batch_codes.BIN_RANGES)
+
+
+def test_cell_fields_hold_every_code():
+    for vocab, (_, width) in zip(CELL_VOCABS, _FIELDS):
+        assert vocab.max_size - 1 <= width
+    highest = [vocab.max_size - 1 for vocab in CELL_VOCABS]
+    cell = RuleEngine.cell(*highest)
+    assert [(cell >> shift) & width for shift, width in _FIELDS] == highest
+    assert RuleEngine.cell(0, 0, 0, 0, highest[-1]) != RuleEngine.cell(0, 0, 0, 1, 0)
+
+
+def cell(issuer="CHASE", region="US-EAST", method="credit_card", processor="STRIPE", bin_="414720"):
+    return (batch_codes.ISSUERS.code(issuer), batch_codes.REGIONS.code(region), batch_codes.METHODS.code(method),
+            batch_codes.PROCESSORS.code(processor), batch_codes.BIN_RANGES.code(bin_))
+
+
+def engine():
+    return RuleEngine(["414720", "414740", "426684"])
+
+
+def test_delay_expiry_and_removal():
+    rules = engine()
+    rule = rules.add("outage", issuer="CHASE", delay_s=10, duration_s=20, now=0)
+    assert rule.state == "pending" and rules.match(*cell()) == ()
+    rules.advance(9.9)
+    assert rules.match(*cell()) == ()
+    rules.advance(10)
+    assert rule.state == "active" and rules.match(*cell()) == (rule,)
+    rules.advance(29.9)
+    assert rules.match(*cell()) == (rule,)
+    rules.advance(30)
+    assert rule.state == "expired" and rules.match(*cell()) == ()
+    assert "outage" not in rules.rules and rules.expired == 1
+
+    rule = rules.add("blip", issuer="CHASE", now=40)
+    assert rules.remove("blip") and rule.state == "removed"
+    assert rules.match(*cell()) == () and not rules.remove("blip")
+    rules.advance(1000)  # a removed rule left in the heaps stays removed
+    assert rules.active == 0
+
+
+def test_ramp_raises_the_failure_rate_linearly():
+    rules = engine()
+    rule = rules.add("ramp", issuer="CHASE", failure_rate=0.8, ramp_s=10, now=100)
+    assert [rule.rate_at(t) for t in (100, 105, 110, 200)] == [0.0, 0.4, 0.8, 0.8]
+    assert rules.pick(*cell(), u=0.3, now=102) is None  # 16% so far
+    assert rules.pick(*cell(), u=0.3, now=105) is rule
+    assert rules.pick(*cell(), u=0.79, now=110) is rule and rules.pick(*cell(), u=0.81, now=150) is None
+
+
+def test_last_added_rule_wins():
+    rules = engine()
+    first = rules.add("issuer", issuer="CHASE", failure_rate=1.0, error_code="500", now=0)
+    second = rules.add("region", region="US-EAST", failure_rate=0.5, error_code="503", now=0)
+    assert rules.match(*cell()) == (first, second)
+    # The later rule wins whenever it fires (half the time); the earlier one takes the rest
+    assert rules.pick(*cell(), u=0.2, now=0) is first
+    assert rules.pick(*cell(), u=0.7, now=0) is second
+    assert rules.match(*cell(region="US-WEST")) == (first,)
+    # Replacing a rule moves it to the end
+    first = rules.add("issuer", issuer="CHASE", failure_rate=1.0, now=0)
+    assert rules.match(*cell()) == (second, first)
+
+
+def test_bin_range_matches_known_bins_in_range():
+    rules = engine()
+    rule = rules.add("bins", bin_range=(414000, 415000), now=0)
+    assert rules.match(*cell(bin_="414720")) == (rule,)
+    assert rules.match(*cell(issuer="WELLS", bin_="414740")) == (rule,)
+    assert rules.match(*cell(bin_="426684")) == ()
+    scoped = rules.add("chase-bins", issuer="CHASE", bin_range=(414720, 414720), now=0)
+    assert rules.match(*cell(bin_="414720")) == (rule, scoped)
+    assert rules.match(*cell(issuer="WELLS", bin_="414740")) == (rule,)
+
+
+def test_apply_fails_matching_rows_at_the_rule_rate():
+    batch = ChaosSimulator(seed=1, routing=RoutingTable())._generate_batch(40_000)
+    rules = engine()
+    rules.add("chase", issuer="CHASE", failure_rate=0.3, error_code="503", latency_ms=1500, now=0)
+    rules.apply(batch, np.random.default_rng(5), now=0)
+
+    chase = batch.issuer == batch_codes.ISSUERS.code("CHASE")
+    failed = batch.status == batch_codes.FAILED
+    assert np.mean(failed[chase]) == pytest.approx(0.3, abs=0.02)
+    assert not failed[~chase].any()
+    assert (batch.error_code[failed] == batch_codes.ERROR_CODES.code("503")).all()
+    assert ((batch.latency_ms[failed] >= 1400) & (batch.latency_ms[failed] <= 1600)).all()
+
+
+def test_adding_a_rule_invalidates_cached_cells():
+    rules = engine()
+    rules.add("boa", issuer="BOA", failure_rate=1.0, now=0)
+    assert rules.match(*cell()) == ()  # cached as "no rules" for the CHASE cell
+    chase = rules.add("chase", issuer="CHASE", failure_rate=1.0, now=0)
+    assert rules.match(*cell()) == (chase,)
+    assert rules.pick(*cell(), u=0.5, now=0) is chase
+    rules.remove("chase")
+    assert rules.match(*cell()) == () and rules.pick(*cell(), u=0.5, now=0) is None
@@ -0,0 +1,45 @@
+import asyncio
+
+import pytest
+
+from app.agents.manager import ManagerAgent
+from app.cluster.backend import MemoryBackend
+from app.cluster.node import ClusterNode
+from app.tools.definitions import ToolResult
+
+INVESTIGATION = {"root_cause": "outage", "confidence": 0.95, "recommended_action": "route_traffic"}
+
+
+class FakeRouteTool:
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = 0
+
+    async def aexecute(self, **kwargs):
+        self.calls += 1
+        success = self.outcomes.pop(0)
+        return ToolResult(success=success, message="ok" if success else "Failed to route traffic: 409",
+                          data={"version": 3, "previous_version": 2} if success else None)
+
+
+def manager(tool, coordinator=None):
+    agent = ManagerAgent(coordinator=coordinator)
+    agent.tools = {**agent.tools, "route_traffic": tool}
+    return agent
+
+
+@pytest.mark.parametrize("clustered", [False, True])
+def test_rejected_reroute_is_not_recorded(clustered):
+    coordinator = ClusterNode(MemoryBackend(), node_id="n1") if clustered else None
+    tool = FakeRouteTool(False, True)
+    agent = manager(tool, coordinator)
+
+    decision = asyncio.run(agent.decide_and_act(INVESTIGATION, "CHASE"))
+    assert decision["decision"] == "ROUTE_FAILED"
+    assert agent.decision_history == []
+
+    # The failed attempt doesn't hold the idempotency key, so the next alert can retry
+    decision = asyncio.run(agent.decide_and_act(INVESTIGATION, "CHASE"))
+    assert decision["decision"] == "ROUTED_TRAFFIC"
+    assert tool.calls == 2
+    assert [d["decision"] for d in agent.decision_history] == ["ROUTED_TRAFFIC"]
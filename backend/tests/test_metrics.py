@@ -0,0 +1,71 @@
+import numpy as np
+
+from app import main
+from app.models import transaction_batch as batch_codes
+from app.models.transaction_batch import TransactionBatch
+from app.telemetry.metrics import Counter, MetricsRegistry
+
+
+def samples(text):
+    """{series: value} for every sample line of a scrape."""
+    return {line.rsplit(" ", 1)[0]: line.rsplit(" ", 1)[1] for line in text.splitlines()
+            if line and not line.startswith("#")}
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    seconds = registry.histogram("stage_seconds", "Stage time", ["stage"], buckets=(0.1, 1, 0.5))
+    for value in (0.05, 0.1, 0.3, 0.7, 2, 30):
+        seconds.labels("detect").observe(value)
+    scraped = samples(registry.render())
+    assert [scraped[f'stage_seconds_bucket{{stage="detect",le="{le}"}}'] for le in ("0.1", "0.5", "1", "+Inf")] \
+        == ["2", "3", "4", "6"]  # bounds sorted; a value on a bound falls in that bucket
+    assert scraped['stage_seconds_count{stage="detect"}'] == "6"
+    assert float(scraped['stage_seconds_sum{stage="detect"}']) == 33.15
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter("calls_total", "Calls", ["agent"]).labels('a "quoted"\\back\nslash').inc(2)
+    assert 'calls_total{agent="a \\"quoted\\"\\\\back\\nslash"} 2' in registry.render().splitlines()
+
+
+def test_unlabelled_instruments_start_at_zero_and_none_gauges_are_skipped():
+    registry = MetricsRegistry()
+    registry.counter("errors_total", "Errors")
+    registry.gauge("cluster_leader", "Only in cluster mode", lambda: None)
+    registry.gauge("queue_rows", "Rows queued", lambda: 3)
+    registry.gauge("nodes", "Nodes per role", lambda: {("leader",): 1, ("follower",): 2.5}, ["role"])
+    registry.gauge("broken", "Raises", lambda: 1 / 0)
+    text = registry.render()
+    assert "cluster_leader" not in text and "broken" not in text
+    assert samples(text) == {"errors_total": "0", "queue_rows": "3", 'nodes{role="leader"}': "1",
+                             'nodes{role="follower"}': "2.5"}
+    assert "# TYPE queue_rows gauge" in text
+
+
+def test_disabled_registry_records_nothing():
+    registry = MetricsRegistry(enabled=False)
+    counter = registry.counter("errors_total", "Errors")
+    histogram = registry.histogram("stage_seconds", "Stage time", ["stage"])
+    counter.inc()
+    counter.labels().inc(5)
+    histogram.observe(1.0)
+    with histogram.labels("detect").time():
+        pass
+    assert samples(registry.render()) == {}
+
+
+def test_transaction_counts_bucket_rare_issuers_under_other(monkeypatch):
+    counter = Counter("paysentinel_transactions_total", "Transactions processed, per issuer", ["issuer"])
+    monkeypatch.setattr(main, "TRANSACTIONS", counter)
+    monkeypatch.setattr(main, "transaction_counters", {})
+    monkeypatch.setattr(main, "METRICS_MAX_ISSUERS", 2)
+
+    names = ["CHASE", "BOA", "WELLS", "STRIPE_TEST"]
+    issuer = np.repeat(batch_codes.ISSUERS.codes(names), [3, 2, 1, 4])
+    main.count_transactions(TransactionBatch(issuer=issuer, tx_id=np.arange(10), timestamp=np.zeros(10)))
+    main.count_transactions(TransactionBatch(issuer=issuer[:5], tx_id=np.arange(5), timestamp=np.zeros(5)))
+    assert samples("\n".join(counter.render())) == {'paysentinel_transactions_total{issuer="CHASE"}': "6",
+                                                    'paysentinel_transactions_total{issuer="BOA"}': "4",
+                                                    'paysentinel_transactions_total{issuer="other"}': "5"}
@@ -0,0 +1,34 @@
+import json
+
+from app.ingest.ndjson import parse_lines
+from app.models.transaction_batch import CURRENCIES, Vocabulary
+
+import pytest
+
+
+def line(**fields) -> bytes:
+    return json.dumps({
+        "transaction_id": "tx_00000000abcd", "amount": 10.0, "currency": "USD", "payment_method": "credit_card",
+        "issuer": "CHASE", "processor": "STRIPE", "status": "success", "latency_ms": 120, "region": "US-EAST",
+        **fields}).encode()
+
+
+@pytest.mark.parametrize("field, value", [("retry_count", 300), ("retry_count", -1), ("latency_ms", 2 ** 31)])
+def test_out_of_range_values_reject_only_their_line(field, value):
+    batch, rejected, errors = parse_lines([line(), line(**{field: value}), b"", line(retry_count=3)])
+    assert (len(batch), rejected) == (2, 1)
+    assert errors[0]["line"] == 2 and errors[0]["field"] == field
+    assert batch.retry_count.tolist() == [0, 3]
+
+
+def test_full_code_table_rejects_new_values(monkeypatch):
+    monkeypatch.setattr(CURRENCIES, "max_size", len(CURRENCIES))
+    batch, rejected, errors = parse_lines([line(currency="USD"), line(currency="XTS-NEW")])
+    assert (len(batch), rejected, errors[0]["field"]) == (1, 1, "currency")
+
+
+def test_vocabulary_refuses_codes_past_its_dtype():
+    vocab = Vocabulary(["a", "b"], max_size=2)
+    assert vocab.code("b") == 1
+    with pytest.raises(ValueError):
+        vocab.code("c")
@@ -0,0 +1,12 @@
+import numpy as np
+
+from app import main
+
+
+def test_frame_rows_send_each_row_once():
+    assert main.frame_rows(np.array([3]), 10).tolist() == list(range(10))
+    # The last row is always sampled, but not twice when it was also alerted
+    assert main.frame_rows(np.array([5, 999]), 1000).tolist() == [5, 999]
+    assert main.frame_rows(np.array([5, 7]), 1000).tolist() == [5, 7, 999]
+    many = main.frame_rows(np.arange(0, 1000, 10), 1000)
+    assert len(many) == main.MAX_FRAMES_PER_TICK and many[-1] == 999 and len(set(many.tolist())) == len(many)
@@ -0,0 +1,29 @@
+from app.agents.prompt_builder import PromptBuilder, investigation_context
+
+
+def context(rows, failures=0):
+    return {
+        "external_status": {"status": "degraded", "details": "elevated 5xx"},
+        "recent_errors": {
+            "issuer": "CHASE", "window_minutes": 5, "total_errors": sum(r[2] for r in rows),
+            "rows": [{"timestamp": ts, "error": code, "count": count} for ts, code, count in rows],
+            "recent_failures": [{"transaction_id": f"tx_{i:012x}", "timestamp": f"2026-01-01T13:01:{i % 60:02d}",
+                                 "error": "500", "latency_ms": 120 + i, "region": "US-EAST"}
+                                for i in range(failures)],
+        },
+    }
+
+
+def test_error_trend_is_labelled_and_ordered_by_time_of_day():
+    rows = [("2026-01-01T13:00:00", "500", 5), ("2026-01-01T12:59:00", "500", 3), ("2026-01-01T13:01:00", "504", 1)]
+    text = investigation_context(PromptBuilder("gpt-4o"), context(rows))
+    assert "500: 8 (12:59 3, 13:00 5)" in text
+    assert "504: 1 (13:01 1)" in text
+
+
+def test_context_fits_the_budget_and_keeps_the_best_lines():
+    builder = PromptBuilder("gpt-4o", budget_tokens=120)
+    text = investigation_context(builder, context([("2026-01-01T13:00:00", "500", 400)], failures=200))
+    assert builder.last_tokens <= 120
+    assert "degraded: elevated 5xx" in text and "500: 400 (13:00 400)" in text
+    assert f"({builder.last_dropped} lower-priority lines omitted)" in text and builder.last_dropped > 150
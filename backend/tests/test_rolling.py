@@ -0,0 +1,40 @@
+import random
+from collections import deque
+from statistics import mean, stdev
+
+import pytest
+
+from app.agents.watchdog import WatchdogAgent
+from app.analytics.rolling import RollingWindow
+from benchmarks.bench_watchdog_stats import LegacyWatchdog, make_stream
+
+
+def test_window_stats_match_a_full_scan():
+    rng = random.Random(11)
+    window, latencies, successes = RollingWindow(20), deque(maxlen=20), deque(maxlen=20)
+    for i in range(500):
+        latency, success = rng.choice((rng.randint(80, 200), rng.randint(0, 10**6))), int(rng.random() < 0.9)
+        window.push(latency, success)
+        latencies.append(latency)
+        successes.append(success)
+        assert (len(window), window.last_latency) == (len(latencies), latency)
+        assert window.mean() == pytest.approx(mean(latencies), rel=1e-12)
+        assert window.stdev() == (None if i == 0 else pytest.approx(stdev(latencies), rel=1e-9))
+        assert window.success_rate() == sum(successes) / len(successes)
+        if i == 250:  # reloading keeps the tail and the running sums in step
+            window.load(range(100), [1] * 100)
+            latencies.extend(range(100))
+            successes.extend([1] * 100)
+    summary = window.summary()
+    assert (summary.count, summary.latency_sum, summary.success_count) == (20, sum(latencies), sum(successes))
+
+
+@pytest.mark.parametrize("window_size", [20, 200])
+def test_watchdog_labels_match_the_legacy_scan(window_size):
+    stream = make_stream(6_000, seed=window_size)
+    legacy = LegacyWatchdog(window_size=window_size)
+    # The legacy watchdog has no p99 rule; keep the tail check from ever running
+    rolling = WatchdogAgent(window_size=window_size, tail_check_every=10**9)
+    expected = [legacy.process_transaction(tx) for tx in stream]
+    assert [rolling.process_transaction(tx) for tx in stream] == expected
+    assert {"LATENCY_SPIKE", "SUCCESS_DROP"} <= set(expected)
@@ -0,0 +1,76 @@
+import numpy as np
+
+from app.analytics.rollups import RollupEngine
+from app.models import transaction_batch as batch_codes
+from app.models.transaction_batch import TransactionBatch
+from app.simulator.chaos_simulator import ChaosSimulator
+
+NOW = 1_700_000_000.0
+
+
+def batch(ts, issuer, latency=100):
+    ts = np.atleast_1d(np.asarray(ts, np.float64))
+    return TransactionBatch(timestamp=ts, issuer=np.broadcast_to(issuer, ts.shape),
+                            latency_ms=np.broadcast_to(latency, ts.shape),
+                            status=np.full(ts.shape, batch_codes.SUCCESS))
+
+
+def series_counts(engine):
+    return {codes[0]: int(engine.resolutions[-1].count[key].sum()) for key, codes in enumerate(engine.key_codes)}
+
+
+def test_least_recently_seen_series_make_room():
+    engine = RollupEngine(max_keys=4)
+    for code in range(6):
+        engine.record_batch(batch(NOW + code, code))
+    assert series_counts(engine) == {4: 1, 5: 1, 2: 1, 3: 1}
+
+    # Series 0 comes back in the place of series 2, the least recently seen one not in the batch
+    engine.record_batch(batch([NOW + 6, NOW + 6], [5, 0]))
+    assert series_counts(engine) == {4: 1, 5: 2, 0: 1, 3: 1}
+    assert engine.keys_evicted == 3
+    chase = batch_codes.ISSUERS.names[0]
+    assert engine.query(window_s=60, now=NOW + 7, issuer=chase)["groups"][0]["count"] == 1
+
+
+def test_sketch_memory_follows_traffic():
+    engine = RollupEngine()
+    engine.record_batch(batch(NOW + np.arange(1000) / 1000, np.arange(1000)))
+    assert engine.stats()["sketch_rows"] == {"1s": 1000, "10s": 1000, "60s": 1000, "3600s": 1000}
+    # Dense per-slot sketches took ~250KB per series
+    assert engine.stats()["bytes"] / 1000 < 25_000
+
+    # Once the 1s buckets age out of their ring, a later batch for any series frees their sketches
+    engine.record_batch(batch(NOW + 200, 0, latency=5000))
+    assert engine.stats()["sketch_rows"]["1s"] == 1
+    assert engine.stats()["sketch_rows"]["3600s"] == 1000
+    # A reused sketch row starts empty
+    result = engine.query(window_s=60, now=NOW + 200, issuer=batch_codes.ISSUERS.names[0])
+    assert result["resolution_s"] == 1 and result["groups"][0]["p50"] > 4000
+
+
+def test_windows_match_a_scan_of_the_raw_rows():
+    sim = ChaosSimulator(seed=3)
+    sim.inject_failure("test", issuer="CHASE", failure_rate=0.4)
+    engine, batches, rows, span_s = RollupEngine(), [], 60_000, 2 * 3600
+    for start in range(0, rows, 100):
+        traffic = sim._generate_batch(100)
+        traffic.timestamp[:] = NOW - span_s + span_s * start / rows + np.linspace(0, 0.05, len(traffic))
+        engine.record_batch(traffic)
+        batches.append(traffic)
+    raw = TransactionBatch.concat(batches)
+
+    for window_s in (60, 600, 3600):
+        result = engine.query(window_s, now=NOW, issuer="CHASE", region="US-EAST")
+        got = result["groups"][0]
+        mask = ((raw.timestamp >= result["from"]) & (raw.timestamp < result["to"])
+                & (raw.issuer == batch_codes.ISSUERS.code("CHASE")) & (raw.region == batch_codes.REGIONS.code("US-EAST")))
+        latency = raw.latency_ms[mask]
+        assert (got["count"], got["successes"]) == (int(mask.sum()), int(raw.success[mask].sum()))
+        assert (got["latency_min"], got["latency_max"]) == (int(latency.min()), int(latency.max()))
+        assert got["latency_mean"] == round(float(latency.mean()), 1)
+        p99 = float(np.quantile(latency, 0.99, method="lower"))
+        assert abs(got["p99"] - p99) / p99 <= engine.mapping.relative_accuracy
+
+    by_region = engine.query(3600, now=NOW, group_by="region", issuer="CHASE")
+    assert sum(g["count"] for g in by_region["groups"]) == engine.query(3600, now=NOW, issuer="CHASE")["groups"][0]["count"]
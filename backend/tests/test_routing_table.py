@@ -0,0 +1,98 @@
+import numpy as np
+import pytest
+
+from app.models import transaction_batch as batch_codes
+from app.routing.routing_table import AliasTable, RoutingTable
+
+WEIGHTS = {"STRIPE": 0.5, "ADYEN": 0.3, "BRAINTREE": 0.15, "WORLDPAY": 0.05}
+
+
+def test_alias_table_picks_match_the_weights():
+    table = AliasTable(WEIGHTS)
+    # Evenly spaced draws land in each processor's share of [0, 1) exactly, up to the spacing
+    picks = [table.pick(u) for u in (np.arange(100_000) + 0.5) / 100_000]
+    for processor, weight in WEIGHTS.items():
+        assert picks.count(processor) / len(picks) == pytest.approx(weight, abs=1e-4)
+
+
+def test_batch_sampling_matches_the_weights():
+    table = RoutingTable()
+    table.set_weights("CHASE", WEIGHTS)
+    table.set_weights("BOA", {"ADYEN": 1, "BRAINTREE": 3})
+    chase, boa, wells = (batch_codes.ISSUERS.code(name) for name in ("CHASE", "BOA", "WELLS"))
+    issuers = np.repeat(np.array([chase, boa, wells], np.uint16), 100_000)
+    codes = table.current.sample(issuers, np.random.default_rng(3))
+
+    expected = {chase: WEIGHTS, boa: {"ADYEN": 0.25, "BRAINTREE": 0.75}, wells: {"STRIPE": 1.0}}
+    for issuer, weights in expected.items():
+        picked = codes[issuers == issuer]
+        for processor, weight in weights.items():
+            share = np.mean(picked == batch_codes.PROCESSORS.code(processor))
+            assert share == pytest.approx(weight, abs=0.01)
+    # Matches the per-transaction path
+    assert table.current.pick("BOA", 0.1) == "ADYEN" and table.current.pick("WELLS", 0.99) == "STRIPE"
+
+
+def test_versions_are_copy_on_write():
+    table = RoutingTable()
+    v1 = table.set_weights("CHASE", {"ADYEN": 2, "STRIPE": 2})
+    v2 = table.set_weights("BOA", {"ADYEN": 1})
+    assert (v1.version, v2.version) == (1, 2)
+    assert v1.weights == {"CHASE": {"ADYEN": 0.5, "STRIPE": 0.5}}  # published versions never change
+    assert v2.tables["CHASE"] is v1.tables["CHASE"]  # unchanged issuers share their alias table
+    assert table.current is v2 and table.get(1) is v1
+
+
+def test_divert_scales_the_other_processors_down():
+    table = RoutingTable()
+    table.set_weights("CHASE", {"ADYEN": 0.6, "STRIPE": 0.4})
+    weights = table.divert("CHASE", 50, "BRAINTREE").weights
+    assert weights["CHASE"] == pytest.approx({"ADYEN": 0.3, "STRIPE": 0.2, "BRAINTREE": 0.5})
+    # An issuer without an entry diverts away from the default processor
+    assert table.divert("BOA", 25, "ADYEN").weights["BOA"] == pytest.approx({"STRIPE": 0.75, "ADYEN": 0.25})
+    # Diverting to a processor already in the mix, and diverting everything
+    assert table.divert("CHASE", 50, "ADYEN").weights["CHASE"] == pytest.approx(
+        {"STRIPE": 0.5 * 2 / 7, "BRAINTREE": 0.5 * 5 / 7, "ADYEN": 0.5})
+    assert table.divert("CHASE", 100, "ADYEN").weights["CHASE"] == {"ADYEN": 1.0}
+
+
+def test_rollback_one_issuer_or_the_whole_table():
+    table = RoutingTable()
+    table.set_weights("CHASE", {"ADYEN": 1})
+    table.set_weights("BOA", {"ADYEN": 1})
+    table.set_weights("CHASE", {"BRAINTREE": 1})
+
+    v4 = table.rollback(1, issuer="CHASE")
+    assert v4.version == 4
+    assert v4.weights == {"CHASE": {"ADYEN": 1.0}, "BOA": {"ADYEN": 1.0}}  # BOA keeps its later change
+    assert "BOA" not in table.rollback(1, issuer="BOA").weights  # not routed in v1: back to the default
+
+    v6 = table.rollback(1)
+    assert v6.version == 6 and v6.weights == {"CHASE": {"ADYEN": 1.0}}
+    assert table.rollback(5).weights == table.get(5).weights  # a rollback can itself be rolled back
+    assert table.version == 7
+
+
+def test_restore_round_trips_saved_versions():
+    table = RoutingTable()
+    table.set_weights("CHASE", {"ADYEN": 0.5, "STRIPE": 0.5}, reason="outage")
+    table.divert("BOA", 30, "ADYEN")
+    saved = [version.to_dict() for version in table.versions()]
+
+    restored = RoutingTable()
+    assert restored.restore(saved).version == 2
+    assert [v.to_dict() | {"created_at": 0} for v in restored.versions()] == \
+        [v | {"created_at": 0} for v in saved]
+    assert restored.get(1).reason == "outage"
+    assert restored.set_weights("WELLS", {"ADYEN": 1}).version == 3
+
+
+def test_history_evicts_the_oldest_versions():
+    table = RoutingTable(history=3)
+    for share in range(10, 60, 10):
+        table.divert("CHASE", share, "ADYEN")
+    assert [v.version for v in table.versions()] == [5, 4, 3]
+    with pytest.raises(KeyError):
+        table.get(2)
+    with pytest.raises(KeyError):
+        table.rollback(1)
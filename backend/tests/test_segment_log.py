@@ -0,0 +1,100 @@
+import os
+
+from app.models.transaction import TransactionSchema
+from app.models.transaction_batch import TransactionBatch
+from app.routing.routing_table import RoutingTable
+from app.storage import segment_log
+from app.storage.segment_log import DECISION, EVENT, TRANSACTIONS, SegmentLog
+
+
+def tx(issuer="CHASE"):
+    return TransactionSchema(transaction_id="tx_00000000abcd", amount=10.0, currency="USD",
+                             payment_method="credit_card", issuer=issuer, processor="STRIPE", status="failed",
+                             error_code="500", latency_ms=120, region="US-EAST")
+
+
+def event(n):
+    return {"agent": "System", "message": f"event {n}", "level": "info", "issuer": None, "ts": float(n)}
+
+
+def test_full_queue_counts_drops(tmp_path):
+    log = SegmentLog(str(tmp_path), max_pending=1)  # not started: nothing drains the queue
+    assert log.append(EVENT, event(0))
+    assert not log.append(EVENT, event(1))
+    assert not log.append_batch(TransactionBatch.from_schemas([tx(), tx()]))
+    assert log.stats()["records_dropped"] == 2
+    assert log.stats()["rows_dropped"] == 2
+
+
+def test_writer_retries_after_io_error(tmp_path, monkeypatch):
+    fsync, failures = os.fsync, []
+
+    def flaky_fsync(fd):
+        if not failures:
+            failures.append(fd)
+            raise OSError(5, "Input/output error")
+        fsync(fd)
+
+    monkeypatch.setattr(segment_log.os, "fsync", flaky_fsync)
+    log = SegmentLog(str(tmp_path), retry_s=0.01, tx_flush_s=0.01)
+    log.start()
+    log.append(EVENT, event(0))
+    log.close()
+    log.start()  # the writer is still usable afterwards
+    log.append(EVENT, event(1))
+    log.close()
+    assert log.write_errors == 1
+    # The failed write was rolled back before the retry: no duplicates
+    assert [record["message"] for _, record in log.replay()] == ["event 0", "event 1"]
+
+
+def test_transaction_frames_carry_only_new_codes(tmp_path):
+    log = SegmentLog(str(tmp_path), fsync=False, tx_flush_s=0.01)
+    log.start()
+    for issuer in ["CHASE"] * 50 + ["SEGMENT_LOG_TEST_BANK"] * 50:
+        log.append_batch(TransactionBatch.from_schemas([tx(issuer)]))
+    log.close()
+    assert log.bytes_written / log.records_written < 200
+    # A new writer (e.g. after a restart) starts again from the full tables
+    log = SegmentLog(str(tmp_path), fsync=False)
+    log.start()
+    log.append_batch(TransactionBatch.from_schemas([tx("BOA")]))
+    log.close()
+
+    issuers = [t.issuer for batch in log.replay_transactions() for t in batch.to_schemas()]
+    assert issuers == ["CHASE"] * 50 + ["SEGMENT_LOG_TEST_BANK"] * 50 + ["BOA"]
+
+
+def test_restore_starts_at_latest_snapshot_and_retention_keeps_it(tmp_path):
+    log = SegmentLog(str(tmp_path), segment_bytes=512, max_bytes=2048, fsync=False, tx_flush_s=0.01)
+    log.start()
+    for n in range(40):
+        log.append(EVENT, event(n))
+        log.close()  # one commit each, so segments roll every few events
+        log.start()
+        if log.snapshot_due:
+            log.append_snapshot({"events": n})
+    log.append(DECISION, {"decision": "ROUTED_TRAFFIC"})
+    log.close()
+
+    stats = log.stats()
+    assert stats["segments_deleted"] > 0
+    assert sum(os.path.getsize(path) for path in log.segments()) <= 2048 + 512
+    snapshot, records = SegmentLog(str(tmp_path)).restore({EVENT, DECISION})
+    records = [record for _, record in records]
+    assert [r["message"] for r in records[:-1]] == [f"event {n}" for n in range(snapshot["events"] + 1, 40)]
+    assert records[-1] == {"decision": "ROUTED_TRAFFIC"}
+
+
+def test_routing_restore_keeps_version_numbers():
+    table = RoutingTable()
+    table.set_weights("CHASE", {"ADYEN": 0.5, "STRIPE": 0.5})
+    table.set_weights("BOA", {"ADYEN": 1.0})
+    saved = [table.get(1).to_dict(), table.current.to_dict()]
+
+    restored = RoutingTable()
+    restored.restore(saved)
+    assert restored.version == 2
+    assert restored.current.weights == table.current.weights
+    assert restored.get(1).weights == {"CHASE": {"ADYEN": 0.5, "STRIPE": 0.5}}
+    assert restored.set_weights("BOA", {"STRIPE": 1.0}).version == 3
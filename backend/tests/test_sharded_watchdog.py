@@ -0,0 +1,48 @@
+import numpy as np
+import pytest
+
+from app.agents.sharded_watchdog import ShardedWatchdog, shard_for
+from app.agents.watchdog import WatchdogAgent
+from app.models import transaction_batch as batch_codes
+from app.models.transaction_batch import TransactionBatch
+
+START = 1_700_000_000.0
+ISSUERS = 16
+
+
+def traffic(rows=40_000):
+    rng = np.random.default_rng(5)
+    codes = np.array([batch_codes.ISSUERS.code(f"SHARD_TEST_{i:02d}") for i in range(ISSUERS)], np.uint16)
+    latency = rng.integers(50, 301, rows)
+    spikes = rng.random(rows) < 0.01
+    latency[spikes] = rng.integers(1000, 2000, int(spikes.sum()))
+    return TransactionBatch(tx_id=np.arange(rows), timestamp=START + np.linspace(0, 600, rows),
+                            issuer=codes[rng.integers(0, ISSUERS, rows)], latency_ms=latency,
+                            status=np.where(rng.random(rows) < 0.9, batch_codes.SUCCESS, batch_codes.FAILED))
+
+
+@pytest.fixture
+def sharded():
+    watchdog = ShardedWatchdog(2)
+    yield watchdog
+    watchdog.close()
+
+
+def test_shards_label_exactly_like_one_watchdog(sharded):
+    batch = traffic()
+    single = WatchdogAgent()
+    expected = np.concatenate([single.process_batch_codes(batch[i:i + 5000]) for i in range(0, len(batch), 5000)])
+    labels = np.concatenate([sharded.process_batch_codes(batch[i:i + 5000]) for i in range(0, len(batch), 5000)])
+    assert np.count_nonzero(expected)
+    assert np.array_equal(labels, expected)
+
+    # Every issuer lives on the shard its name hashes to, and the merged views match the single process
+    stats = sharded.stats()
+    assert sum(s["rows"] for s in stats) == len(batch)
+    assert sum(s["alerts"] for s in stats) == np.count_nonzero(expected)
+    for s in stats:
+        assert s["issuers"] and all(shard_for(issuer, 2) == s["shard"] for issuer in s["issuers"])
+    assert sharded.tail_latency() == single.tail_latency()
+    assert sharded.tail_latency("SHARD_TEST_03") == single.tail_latency("SHARD_TEST_03")
+    assert {k: v.to_list() for k, v in sharded.summaries().items()} == \
+        {k: v.to_list() for k, v in single.summaries().items()}
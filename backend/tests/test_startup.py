@@ -0,0 +1,24 @@
+import os
+import subprocess
+import sys
+
+from fastapi.testclient import TestClient
+
+
+def test_import_writes_nothing_and_builds_no_llm_client(tmp_path):
+    data_dir = tmp_path / "data"
+    env = {**os.environ, "PYTHONPATH": ".", "PAYSENTINEL_DATA_DIR": str(data_dir),
+           "PAYSENTINEL_DB_PATH": str(data_dir / "tx.db"), "OPENAI_API_KEY": "sk-test"}
+    script = "import sys, app.main; print(sorted(m for m in ('langchain_openai', 'openai', 'httpx') if m in sys.modules))"
+    result = subprocess.run([sys.executable, "-c", script], env=env, capture_output=True, text=True, check=True)
+    assert result.stdout.strip().splitlines()[-1] == "[]"
+    assert not data_dir.exists()
+
+
+def test_startup_opens_the_stores():
+    from app import main
+
+    with TestClient(main.app) as client:
+        stats = client.get("/storage/stats").json()
+    assert stats["directory"] == os.environ["PAYSENTINEL_DATA_DIR"]
+    assert stats["query_store"]["path"] == os.environ["PAYSENTINEL_DB_PATH"]
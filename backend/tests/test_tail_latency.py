@@ -0,0 +1,60 @@
+import numpy as np
+
+from app.agents.watchdog import WatchdogAgent
+from app.analytics.sketch import LatencySketch
+from app.models import transaction_batch as batch_codes
+from app.models.transaction_batch import TransactionBatch
+
+START = 1_700_000_000.0
+MINUTES = 20
+REGRESSION_AT_S = 15 * 60
+
+
+def test_sketch_quantiles_within_relative_accuracy():
+    latencies = np.round(np.random.default_rng(7).lognormal(np.log(150), 0.6, 100_000)).astype(np.int64)
+    sketch = LatencySketch()
+    sketch.add_many(latencies)
+    for q in LatencySketch.QUANTILES:
+        exact = float(np.quantile(latencies, q, method="lower"))
+        assert abs(sketch.quantile(q) - exact) / exact <= sketch.mapping.relative_accuracy
+
+    # Per-shard sketches merge into exactly the sketch of all the samples
+    halves = LatencySketch(), LatencySketch()
+    halves[0].add_many(latencies[::2])
+    for value in latencies[1::2].tolist():
+        halves[1].add(value)
+    halves[0].merge(halves[1])
+    assert np.array_equal(halves[0].counts, sketch.counts) and halves[0].count == sketch.count
+
+
+def traffic(tps=30):
+    """Four issuers at `tps`; CHASE's slowest 3% get much slower after REGRESSION_AT_S."""
+    rng = np.random.default_rng(11)
+    rows = tps * 60 * MINUTES
+    timestamps = START + np.sort(rng.uniform(0, MINUTES * 60, rows))
+    issuers = rng.integers(0, 4, rows).astype(np.uint16)
+    latency = rng.integers(50, 301, rows)
+    chase = batch_codes.ISSUERS.code("CHASE")
+    slow = (issuers == chase) & (timestamps - START >= REGRESSION_AT_S) & (rng.random(rows) < 0.03)
+    latency[slow] = rng.integers(900, 1200, int(slow.sum()))
+    return TransactionBatch(tx_id=np.arange(rows), timestamp=timestamps, issuer=issuers, latency_ms=latency,
+                            status=np.full(rows, batch_codes.SUCCESS), region=rng.integers(0, 3, rows))
+
+
+def test_watchdog_flags_a_tail_regression_only_after_it_starts():
+    batch = traffic()
+    scalar = WatchdogAgent()
+    scalar_labels = [scalar.process_transaction(tx) for tx in batch.to_schemas()]
+    batched = WatchdogAgent()
+    batch_labels = []
+    for i in range(0, len(batch), 5000):
+        batch_labels.extend(batched.process_batch(batch[i:i + 5000]))
+    assert batch_labels == scalar_labels
+
+    tail_rows = np.array([i for i, label in enumerate(scalar_labels) if label == "TAIL_LATENCY"])
+    assert len(tail_rows)
+    assert (batch.timestamp[tail_rows] - START >= REGRESSION_AT_S).all()
+    assert set(batch.issuer[tail_rows].tolist()) == {batch_codes.ISSUERS.code("CHASE")}
+    assert batch.timestamp[tail_rows[0]] - START - REGRESSION_AT_S < 60  # within the recent window
+    chase = batched.tail_latency("CHASE")["CHASE"]
+    assert chase["recent"]["p99"] > chase["threshold_ms"] > chase["baseline"]["p99"]
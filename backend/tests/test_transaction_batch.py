@@ -0,0 +1,58 @@
+import subprocess
+import sys
+
+import numpy as np
+
+from app.models.transaction import TransactionSchema
+from app.models.transaction_batch import TransactionBatch, _parse_tx_id
+from app.storage.transaction_store import TransactionStore
+
+
+def tx(transaction_id, **fields):
+    return TransactionSchema(**{
+        "transaction_id": transaction_id, "amount": 10.0, "currency": "USD", "payment_method": "credit_card",
+        "issuer": "CHASE", "processor": "STRIPE", "status": "failed", "error_code": "500", "latency_ms": 120,
+        "region": "US-EAST", **fields})
+
+
+def test_external_ids_survive_round_trips():
+    schemas = [tx("order-98765"), tx("tx_00000000abcd"), tx("tx_123")]
+    batch = TransactionBatch.from_schemas(schemas)
+    assert batch.ids.tolist() == ["order-98765", None, "tx_123"]
+    restored = TransactionBatch.from_bytes(batch.to_bytes())
+    assert [t.transaction_id for t in restored.to_schemas()] == ["order-98765", "tx_00000000abcd", "tx_123"]
+    assert [t.transaction_id for t in batch[np.array([2, 0])].to_schemas()] == ["tx_123", "order-98765"]
+
+
+def test_generated_ids_need_no_id_column():
+    batch = TransactionBatch.from_schemas([tx("tx_00000000abcd"), tx("tx_0123456789ab")])
+    assert batch.ids is None
+    assert batch.tx_id.tolist() == [0xabcd, 0x0123456789ab]
+
+
+def test_hashed_ids_are_stable_across_processes():
+    script = "from app.models.transaction_batch import _parse_tx_id; print(_parse_tx_id('order-98765')[0])"
+    values = {subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True,
+                             env={"PYTHONHASHSEED": seed, "PYTHONPATH": "."}).stdout.strip() for seed in ("1", "2")}
+    assert values == {str(_parse_tx_id("order-98765")[0])}
+
+
+def test_metadata_is_kept_per_row():
+    batch = TransactionBatch.from_schemas([tx("a", metadata={"shop": 1}), tx("b", metadata={"shop": 2})])
+    assert [t.metadata for t in TransactionBatch.from_bytes(batch.to_bytes()).to_schemas()] == [{"shop": 1},
+                                                                                                   {"shop": 2}]
+    shared = TransactionBatch.from_schemas([tx("c", metadata={"shop": 3})] * 2)
+    assert shared.row_metadata is None
+    merged = TransactionBatch.concat([shared, batch])
+    assert [t.metadata for t in merged.to_schemas()] == [{"shop": 3}, {"shop": 3}, {"shop": 1}, {"shop": 2}]
+    assert [t.transaction_id for t in merged.to_schemas()] == ["c", "c", "a", "b"]
+
+
+def test_store_returns_original_ids(tmp_path):
+    store = TransactionStore(str(tmp_path / "tx.db"))
+    store.add(tx("order-98765"))
+    store.add(tx("tx_00000000abcd"))
+    store.flush()
+    ids = {f["transaction_id"] for f in store.recent_errors("CHASE")["recent_failures"]}
+    assert ids == {"order-98765", "tx_00000000abcd"}
+    store.close()
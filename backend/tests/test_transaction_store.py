@@ -0,0 +1,70 @@
+from collections import Counter
+from datetime import datetime
+
+import numpy as np
+
+from app.simulator.chaos_simulator import ChaosSimulator
+from app.storage.transaction_store import TransactionStore
+
+NOW = 1_700_000_000.0
+SPAN_S = 1200.0
+
+
+def traffic(rows=20_000, batch_rows=1000):
+    """Simulated batches with CHASE failing, spread evenly over the SPAN_S seconds before NOW."""
+    sim = ChaosSimulator(seed=7)
+    sim.inject_failure("test", issuer="CHASE", failure_rate=0.3)
+    batches = []
+    for start in range(0, rows, batch_rows):
+        batch = sim._generate_batch(batch_rows)
+        batch.timestamp[:] = NOW - SPAN_S + SPAN_S * (start + np.arange(batch_rows)) / rows
+        batches.append(batch)
+    return batches
+
+
+def brute_force(batches, issuer, minutes, error_code=None):
+    """Per-minute error counts straight from the raw rows, with the store's minute alignment."""
+    since = NOW - minutes * 60
+    counts, failures = Counter(), []
+    for batch in batches:
+        for tx in batch.to_schemas():
+            if tx.issuer != issuer or tx.error_code is None or (error_code and tx.error_code != error_code):
+                continue
+            if int(tx.timestamp.timestamp() // 60) >= int(since // 60):
+                counts[(int(tx.timestamp.timestamp() // 60), tx.error_code)] += 1
+            if tx.timestamp.timestamp() >= since:
+                failures.append(tx)
+    return counts, failures
+
+
+def test_recent_errors_match_a_scan_of_the_raw_rows(tmp_path):
+    store = TransactionStore(str(tmp_path / "transactions.db"))
+    batches = traffic()
+    for batch in batches:
+        store.ingest(batch)
+
+    for issuer, minutes, error_code in [("CHASE", 5, None), ("CHASE", 15, "500"), ("BOA", 5, None)]:
+        result = store.recent_errors(issuer, minutes, error_code=error_code, now=NOW)
+        counts, failures = brute_force(batches, issuer, minutes, error_code)
+        got = Counter({(int(datetime.fromisoformat(row["timestamp"]).timestamp()) // 60, row["error"]): row["count"]
+                       for row in result["rows"]})
+        assert got == counts
+        assert result["total_errors"] == sum(counts.values())
+        newest = sorted(failures, key=lambda tx: tx.timestamp, reverse=True)[:10]
+        assert [f["transaction_id"] for f in result["recent_failures"]] == [tx.transaction_id for tx in newest]
+    assert store.recent_errors("CHASE", 5, now=NOW)["total_errors"] > 0
+    assert store.recent_errors("BOA", 5, now=NOW)["total_errors"] == 0
+    store.close()
+
+
+def test_prune_drops_rows_and_rollups_past_retention(tmp_path):
+    store = TransactionStore(str(tmp_path / "transactions.db"), retention_s=600)
+    for batch in traffic(rows=4000):
+        store.ingest(batch)
+
+    assert store.prune(now=NOW) == 2000  # the older half of the span
+    assert store.recent_errors("CHASE", 30, now=NOW) == store.recent_errors("CHASE", 10, now=NOW) | {"window_minutes": 30}
+    (oldest,) = store._conn.execute("SELECT min(minute) FROM error_counts_minute").fetchone()
+    assert oldest >= (NOW - 600) // 60
+    assert TransactionStore(str(tmp_path / "other.db")).prune(now=NOW) == 0  # no retention configured
+    store.close()
@@ -0,0 +1,49 @@
+import random
+
+import pytest
+
+from app.agents.watchdog import WatchdogAgent
+from app.models.transaction_batch import TransactionBatch
+from benchmarks.bench_watchdog_stats import make_stream
+
+STREAM = make_stream(9_000, seed=3)
+
+
+def chunks(size, seed):
+    """Uneven [start, stop) ranges covering the stream, some of them single rows."""
+    rng, start, ranges = random.Random(seed), 0, []
+    while start < size:
+        stop = min(size, start + rng.choice((1, 2, 17, 64, 500, 1_500)))
+        ranges.append((start, stop))
+        start = stop
+    return ranges
+
+
+@pytest.mark.parametrize("columnar", [False, True])
+def test_batches_match_the_per_event_path(columnar):
+    scalar = WatchdogAgent(tail_check_every=5)
+    expected = [scalar.process_transaction(tx) for tx in STREAM]
+    assert {"LATENCY_SPIKE", "SUCCESS_DROP"} <= set(expected)
+
+    batched = WatchdogAgent(tail_check_every=5)
+    rows = TransactionBatch.from_schemas(STREAM) if columnar else STREAM
+    labels = []
+    for start, stop in chunks(len(STREAM), seed=7):
+        labels += batched.process_batch(rows[start:stop])
+    assert labels == expected
+    assert {issuer: window.summary() for issuer, window in batched.windows.items()} == \
+        {issuer: window.summary() for issuer, window in scalar.windows.items()}
+
+
+def test_batch_and_per_event_calls_can_be_mixed():
+    scalar = WatchdogAgent(window_size=30)
+    expected = [scalar.process_transaction(tx) for tx in STREAM]
+
+    mixed = WatchdogAgent(window_size=30)
+    labels = []
+    for n, (start, stop) in enumerate(chunks(len(STREAM), seed=8)):
+        if n % 2:
+            labels += [mixed.process_transaction(tx) for tx in STREAM[start:stop]]
+        else:
+            labels += mixed.process_batch(STREAM[start:stop])
+    assert labels == expected
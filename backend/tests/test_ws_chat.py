@@ -0,0 +1,94 @@
+import json
+import socket
+import threading
+import time
+
+import uvicorn
+from fastapi.testclient import TestClient
+from websockets.client import ClientProtocol
+from websockets.protocol import State
+from websockets.uri import parse_uri
+
+from app import main
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve(port: int) -> uvicorn.Server:
+    server = uvicorn.Server(uvicorn.Config(main.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.02)
+    return server
+
+
+def send_at_once(port: int, *messages, wait_for: int = 0):
+    """Open /ws/chat and send every message in one TCP write, so the server reads them back to back."""
+    protocol = ClientProtocol(parse_uri(f"ws://127.0.0.1:{port}/ws/chat"))
+    with socket.create_connection(("127.0.0.1", port)) as sock:
+        protocol.send_request(protocol.connect())
+        sock.sendall(b"".join(protocol.data_to_send()))
+        while protocol.state is State.CONNECTING:
+            protocol.receive_data(sock.recv(65536))
+        protocol.events_received()  # the handshake response
+        for message in messages:
+            protocol.send_text(json.dumps(message).encode())
+        sock.sendall(b"".join(protocol.data_to_send()))
+        replies = []
+        while len(replies) < wait_for:
+            protocol.receive_data(sock.recv(65536))
+            replies += [json.loads(event.data) for event in protocol.events_received()]
+        return replies  # closing the socket disconnects mid-reply
+
+
+def test_cancelled_and_abandoned_replies_release_their_sessions(monkeypatch):
+    assistant = main.agents.get("assistant")
+
+    async def stream_chat(query, context):
+        import asyncio
+        await asyncio.sleep(30)
+        yield "never"
+
+    monkeypatch.setattr(assistant, "stream_chat", stream_chat)
+    server = serve(free_port())
+    try:
+        port = server.config.port
+        for _ in range(assistant.max_sessions + 2):
+            # The cancel arrives with the query, before the reply task has taken a step
+            replies = send_at_once(port, {"query": "what happened?"}, {"type": "cancel"}, wait_for=1)
+            assert replies[0]["type"] == "cancelled"
+            send_at_once(port, {"query": "what happened?"})
+        deadline = time.monotonic() + 2
+        while assistant.sessions and time.monotonic() < deadline:  # disconnects are handled on the server's loop
+            time.sleep(0.02)
+        assert assistant.sessions == 0
+    finally:
+        server.should_exit = True
+
+
+def test_chat_stream_sends_tokens_then_done_and_frees_the_session(monkeypatch):
+    assistant = main.agents.get("assistant")
+
+    async def stream_chat(query, context):
+        for text in ("Issuer ", "CHASE ", "recovered."):
+            yield text
+
+    monkeypatch.setattr(assistant, "stream_chat", stream_chat)
+    client = TestClient(main.app)
+    with client.stream("POST", "/chat/stream", json={"query": "what happened?"}) as response:
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = response.read().decode()
+    events = [(block.split("\n")[0].removeprefix("event: "), json.loads(block.split("\n")[1].removeprefix("data: ")))
+              for block in body.strip().split("\n\n")]
+    assert [data["text"] for kind, data in events if kind == "token"] == ["Issuer ", "CHASE ", "recovered."]
+    assert events[-1][0] == "done" and events[-1][1]["tokens"] == 3
+    assert assistant.sessions == 0
+
+    # With every session taken, a new stream is turned away before it starts
+    monkeypatch.setattr(assistant, "sessions", assistant.max_sessions)
+    response = client.post("/chat/stream", json={"query": "again?"})
+    assert response.status_code == 429 and response.headers["Retry-After"] == "2"
@@ -58,6 +58,10 @@ function App() {
       const payload = JSON.parse(event.data);
       if (payload.type === 'transaction') {
         processTransaction(payload.data, payload.alert, payload.agent_logs);
+      } else if (payload.type === 'agent_logs') {
+        payload.agent_logs.forEach(log => {
+          addLog(log.agent, log.message, 'info');
+        });
       }
     };
 